@@ -7,77 +7,21 @@ import glob
 import pytz
 
 _eastern_tz = pytz.timezone('America/New_York')
-import sqlite3
-import json
 import hashlib
 from io import BytesIO
 import base64
 
-# Calendar export functionality
-try:
-    from modules.calendar_export import (
-        check_database_exists,
-        extract_staff_names_from_db,
-        get_all_staff_schedules,
-        generate_calendar_for_staff,
-        preview_schedule,
-        get_fiscal_year_info
-    )
-    CALENDAR_EXPORT_AVAILABLE = True
-except ImportError as e:
-    CALENDAR_EXPORT_AVAILABLE = False
-    print(f"Calendar export functionality not available: {e}")
-
-# Import modules with correct paths based on original working app
-try:
-    from modules.fiscal_year import add_fiscal_year_display_to_app, add_fiscal_year_export_to_admin
-except ImportError:
-    # Create stub functions if fiscal year module doesn't exist
-    def add_fiscal_year_display_to_app():
-        pass
-    def add_fiscal_year_export_to_admin():
-        pass
-
-from modules.db_utils import initialize_database
-# Import existing modules that actually work
+# Only what the login and landing pages need is imported here. Every other
+# subsystem is registered per module tile in modules/module_loader.py and
+# imported the first time that tile is opened.
+from modules.db_utils import initialize_database, get_active_track_config, get_track_capacity
 from modules.security import display_user_login, display_session_info, check_admin_access
-from modules.summer_leave import display_summer_leave_app
-from modules.shift_definitions import day_shifts, night_shifts
-from modules.shift_utils import get_shift_end_time, calculate_rest_conflict
-from modules.staff_utils import is_special_conflict
-from modules.ui_components import display_roster_results
-from modules.column_mapper import auto_detect_columns
-from modules.track_management import display_staff_track_interface
-from modules.pdf_generator import generate_schedule_pdf
-from modules.export_utils import export_tracks_to_excel, export_track_history_to_excel
-from modules.enhanced_track_validator import validate_track_comprehensive
-from modules.enhanced_validation_display import display_comprehensive_validation
-from modules.preference_editor import initialize_preference_tables
-from modules.admin_export import integrate_admin_export_in_sidebar
-from modules.track_source_consistency import ensure_track_source_consistency
-from modules.app_helper import validate_uploaded_database, restore_database_from_backup, restore_database_from_upload, cleanup_old_backups
-from modules.track_display import display_track_viewer
 from modules.enhanced_landing import inject_custom_css
-from modules.track_swap import display_track_swap_section, handle_track_swap_navigation
-from modules.track_bidding import display_track_bidding
-from modules.db_utils import get_active_track_config, get_track_capacity
-
-# Import training modules with new unified database approach
-try:
-    from training_modules.unified_database import UnifiedDatabase, get_active_roster_path
-    from training_modules.excel_handler import ExcelHandler
-    from training_modules.enrollment_manager import EnrollmentManager
-    from training_modules.ui_components import UIComponents as TrainingUIComponents  # Renamed to avoid conflict
-    from training_modules.class_display_components import ClassDisplayComponents
-    from training_modules.enrollment_session_components import EnrollmentSessionComponents
-    from training_modules.staff_meeting_components import StaffMeetingComponents
-    from training_modules.track_manager import TrainingTrackManager
-    from training_modules.admin_access import AdminAccess
-    from training_modules.admin_excel_functions import ExcelAdminFunctions, enhance_admin_reports
-    TRAINING_MODULES_AVAILABLE = True
-except ImportError as e:
-    TRAINING_MODULES_AVAILABLE = False
-    print(f"Training modules not available: {e}")
+from modules.module_loader import load_tile_modules, is_module_available
+from modules.instrumentation import begin_rerun, render_timing_panel
+from modules.query_profiler import open_connection
+
+TRAINING_MODULES_AVAILABLE = is_module_available('training_modules')
 
 # Set page config - MUST BE FIRST STREAMLIT COMMAND
 st.set_page_config(
@@ -87,6 +31,9 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Per-rerun timings for the admin panel (no-op unless recording is turned on)
+begin_rerun(st.session_state.get('selected_module') or 'landing')
+
 # Inject custom CSS for enhanced styling
 inject_custom_css()
 
@@ -448,53 +395,38 @@ def display_training_events_app():
     
     # Initialize unified database and training components
     try:
+        from training_modules.unified_database import UnifiedDatabase
+        from training_modules.enrollment_manager import EnrollmentManager
+        from training_modules.ui_components import UIComponents as TrainingUIComponents  # Renamed to avoid conflict
+        from training_modules.class_display_components import ClassDisplayComponents
+        from training_modules.enrollment_session_components import EnrollmentSessionComponents
+        from training_modules.shared_data import get_session_training_data
+        from training_modules.admin_access import AdminAccess
+        from training_modules.admin_excel_functions import ExcelAdminFunctions
+
         # Initialize unified database (uses main medflight_tracks.db)
         if 'unified_db' not in st.session_state:
                     st.session_state.unified_db = UnifiedDatabase('data/medflight_tracks.db')
                     st.session_state.unified_db.initialize_training_tables()
                 
-        # Update unified_db with excel_handler reference after it's initialized
-        if 'training_excel_handler' in st.session_state and st.session_state.training_excel_handler:
-            st.session_state.unified_db.excel_handler = st.session_state.training_excel_handler
+        # Roster workbook, Tracks.xlsx and decoded tracks are shared process-wide;
+        # the session only keeps lightweight proxies pinned to the current snapshot
+        training_data = get_session_training_data()
+        excel_path = training_data.roster_path
 
-        # Initialize Excel handler
-        if 'training_excel_handler' not in st.session_state:
-            excel_path = get_active_roster_path()
+        if not os.path.exists(excel_path):
+            st.error(f"Excel file not found: {excel_path}")
+            st.info("Please ensure the roster file is in the training/upload folder, or check the active Training Year's roster filename in Training Admin > Training Years")
+            return
 
-            if not os.path.exists(excel_path):
-                st.error(f"Excel file not found: {excel_path}")
-                st.info("Please ensure the roster file is in the training/upload folder, or check the active Training Year's roster filename in Training Admin > Training Years")
-                return
-            
-            st.session_state.training_excel_handler = ExcelHandler(excel_path)
-            
-            if st.session_state.training_excel_handler.load_error:
-                st.error(f"Error loading Excel file: {st.session_state.training_excel_handler.load_error}")
-                return
+        if training_data.excel_handler.load_error:
+            st.error(f"Error loading Excel file: {training_data.excel_handler.load_error}")
+            return
 
-        # Initialize Track Manager (existing code)
-        if 'training_track_manager' not in st.session_state:
-            st.session_state.training_track_manager = TrainingTrackManager('data/medflight_tracks.db')
-            print("✓ Track Manager initialized")
-
-        # Initialize separate Excel Handler for Tracks.xlsx (CCEMT schedules)
-        if 'tracks_excel_handler' not in st.session_state:
-            tracks_excel_path = 'upload files/Tracks.xlsx'
-            if os.path.exists(tracks_excel_path):
-                st.session_state.tracks_excel_handler = ExcelHandler(tracks_excel_path)
-                print("✓ Tracks Excel Handler initialized")
-                
-                # Connect BOTH Excel handlers to Track Manager
-                # - tracks_excel_handler: for loading CCEMT schedules
-                # - training_excel_handler: for getting staff roles
-                st.session_state.training_track_manager.set_excel_handler(
-                    tracks_excel_handler=st.session_state.tracks_excel_handler,
-                    enrollment_excel_handler=st.session_state.training_excel_handler
-                )
-                print("✓ CCEMT schedules loaded")
-            else:
-                print(f"⚠ Tracks.xlsx not found at {tracks_excel_path} - CCEMT schedules unavailable")
-                st.session_state.tracks_excel_handler = None
+        st.session_state.training_excel_handler = training_data.excel_handler
+        st.session_state.training_track_manager = training_data.track_manager
+        st.session_state.tracks_excel_handler = training_data.tracks_excel_handler
+        st.session_state.unified_db.excel_handler = training_data.excel_handler
 
         # Initialize enrollment manager
         if 'training_enrollment_manager' not in st.session_state:
@@ -791,6 +723,43 @@ def display_clinical_track_hub():
 
 def run_clinical_track_hub():
     """Run the original Clinical Track Hub functionality"""
+    # Calendar export functionality
+    try:
+        from modules.calendar_export import (
+            check_database_exists,
+            extract_staff_names_from_db,
+            get_all_staff_schedules,
+            generate_calendar_for_staff,
+            preview_schedule,
+            get_fiscal_year_info,
+            generate_all_staff_calendars
+        )
+        CALENDAR_EXPORT_AVAILABLE = True
+    except ImportError as e:
+        CALENDAR_EXPORT_AVAILABLE = False
+        print(f"Calendar export functionality not available: {e}")
+
+    try:
+        from modules.fiscal_year import add_fiscal_year_display_to_app, add_fiscal_year_export_to_admin
+    except ImportError:
+        # Create stub functions if fiscal year module doesn't exist
+        def add_fiscal_year_display_to_app():
+            pass
+        def add_fiscal_year_export_to_admin():
+            pass
+
+    from modules.shift_definitions import day_shifts, night_shifts
+    from modules.column_mapper import auto_detect_columns
+    from modules.track_management import display_staff_track_interface
+    from modules.export_utils import export_tracks_to_excel, export_track_history_to_excel
+    from modules.enhanced_track_validator import validate_track_comprehensive
+    from modules.preference_editor import initialize_preference_tables
+    from modules.admin_export import integrate_admin_export_in_sidebar
+    from modules.app_helper import restore_database_from_backup, restore_database_from_upload, cleanup_old_backups
+    from modules.backup_utils import snapshot_database, apply_retention_policy
+    from modules.track_display import display_track_viewer
+    from modules.track_swap import display_track_swap_section, handle_track_swap_navigation
+
     # Create wrapper classes for compatibility with new app structure
     class TrainingTrackManager:
         """Track manager wrapper using existing functionality"""
@@ -933,8 +902,10 @@ def run_clinical_track_hub():
         Clears existing tracks and replaces with Excel data
         """
         try:
-            import json
             from datetime import datetime
+            from modules.staffing_counts import rebuild_day_staffing_counts
+            from modules.track_history_store import append_track_history
+            from modules.track_codes import encode_track_data
             
             tracks_df = pd.read_excel(tracks_file_path)
             
@@ -951,7 +922,7 @@ def run_clinical_track_hub():
             initialize_database()
             
             db_path = 'data/medflight_tracks.db'
-            conn = sqlite3.connect(db_path)
+            conn = open_connection(db_path)
             cursor = conn.cursor()
             
             cursor.execute("DELETE FROM tracks")
@@ -979,7 +950,7 @@ def run_clinical_track_hub():
                         else:
                             track_data[day_col] = str(day_value).strip()
                     
-                    track_json = json.dumps(track_data)
+                    track_json = encode_track_data(track_data)
                     
                     cursor.execute('''
                         INSERT INTO tracks (
@@ -1000,17 +971,9 @@ def run_clinical_track_hub():
                     ))
                     
                     track_id = cursor.lastrowid
-                    cursor.execute('''
-                        INSERT INTO track_history (
-                            track_id, staff_name, track_data, submission_date, status
-                        ) VALUES (?, ?, ?, ?, ?)
-                    ''', (
-                        track_id,
-                        staff_name,
-                        track_json,
-                        submission_date,
-                        "Manual Import from Excel"
-                    ))
+                    append_track_history(
+                        cursor, track_id, staff_name, track_data, submission_date, "Manual Import from Excel"
+                    )
                     
                     conversion_count += 1
                     
@@ -1019,6 +982,7 @@ def run_clinical_track_hub():
                     print(f"Error processing row {index} for staff '{staff_name}': {str(row_error)}")
                     continue
             
+            rebuild_day_staffing_counts(cursor)
             conn.commit()
             conn.close()
             
@@ -1042,7 +1006,7 @@ def run_clinical_track_hub():
             Verify the integrity of the database structure and data
             """
             try:
-                conn = sqlite3.connect('data/medflight_tracks.db')
+                conn = open_connection('data/medflight_tracks.db')
                 cursor = conn.cursor()
                 
                 # Test basic connectivity
@@ -1068,14 +1032,15 @@ def run_clinical_track_hub():
                 if missing_columns:
                     return False
                 
-                # Test data integrity - check for corrupted JSON
-                cursor.execute("SELECT id, staff_name, track_data FROM tracks WHERE is_active = 1")
+                # Test data integrity - check for corrupted JSON / code bytes
+                from modules.track_codes import decode_track_data, get_day_schema
+                cursor.execute("SELECT id, staff_name, track_name, track_data FROM tracks WHERE is_active = 1")
                 tracks = cursor.fetchall()
                 
-                for track_id, staff_name, track_data in tracks:
+                for track_id, staff_name, track_name, track_data in tracks:
                     try:
-                        json.loads(track_data)
-                    except json.JSONDecodeError:
+                        decode_track_data(track_data, get_day_schema(cursor, track_name))
+                    except (ValueError, TypeError):
                         return False
                 
                 conn.close()
@@ -1500,6 +1465,7 @@ def run_clinical_track_hub():
             # Approval queue for active track modifications
             st.header("Pending Track Approvals")
             from modules.db_utils import get_db_connection
+            from modules.track_history_store import append_track_history
             try:
                 _conn = get_db_connection()
                 _cur = _conn.cursor()
@@ -1525,10 +1491,7 @@ def run_clinical_track_hub():
                                 if st.button(f"Reject", key=f"reject_{pid}", use_container_width=True):
                                     now = datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S")
                                     _cur.execute("UPDATE tracks SET is_approved = -1, approved_by = 'admin', approval_date = ? WHERE id = ?", (now, pid))
-                                    _cur.execute("""INSERT INTO track_history
-                                        (track_id, staff_name, track_data, submission_date, status)
-                                        VALUES (?, ?, 'rejected', ?, ?)""",
-                                        (pid, pname, now, f"rejected: {reject_notes}"))
+                                    append_track_history(_cur, pid, pname, 'rejected', now, f"rejected: {reject_notes}")
                                     _conn.commit()
                                     st.warning(f"Rejected {pname}")
                                     st.rerun()
@@ -1576,9 +1539,8 @@ def run_clinical_track_hub():
                         timestamp = datetime.now(_eastern_tz).strftime("%Y%m%d_%H%M%S")
                         backup_file = f"{backup_dir}/medflight_tracks_backup_{timestamp}.db"
                         
-                        import shutil
                         if os.path.exists('data/medflight_tracks.db'):
-                            shutil.copy2('data/medflight_tracks.db', backup_file)
+                            snapshot_database(backup_file)
                             st.success(f"✅ Database backed up to {backup_file}")
                         else:
                             st.error("❌ Database file not found")
@@ -1590,10 +1552,12 @@ def run_clinical_track_hub():
                     try:
                         backup_dir = "backups"
                         if os.path.exists(backup_dir):
+                            # Automatic .db.gz snapshots follow the backup retention policy;
+                            # plain .db backups are removed after 30 days as before
+                            deleted_count = apply_retention_policy(backup_dir)
                             backup_files = glob.glob(os.path.join(backup_dir, "*.db"))
                             old_files = [f for f in backup_files if os.path.getctime(f) < (datetime.now(_eastern_tz) - timedelta(days=30)).timestamp()]
                             
-                            deleted_count = 0
                             for old_file in old_files:
                                 try:
                                     os.remove(old_file)
@@ -1695,6 +1659,77 @@ def run_clinical_track_hub():
                                     
                     except Exception as e:
                         st.error(f"Error during export: {str(e)}")
+            
+            with st.expander("All Staff Calendars", expanded=False):
+                st.markdown("""
+                Regenerate fiscal year calendars for every staff member with an active track in one pass:
+                - **Zip**: one file per staff member, same files as the individual Calendar Export
+                - **Combined**: a single feed with every staff member's shifts (titles prefixed with the name)
+                """)
+                
+                if not CALENDAR_EXPORT_AVAILABLE:
+                    st.error("📅 Calendar export functionality is not available. Please install required dependencies.")
+                else:
+                    bulk_col1, bulk_col2 = st.columns(2)
+                    with bulk_col1:
+                        bulk_calendar_format = st.radio(
+                            "Calendar Format",
+                            options=["iCal (ICS)", "Google Calendar (CSV)"],
+                            key="bulk_calendar_format"
+                        )
+                    with bulk_col2:
+                        bulk_calendar_bundle = st.radio(
+                            "Package",
+                            options=["Zip (one file per staff)", "Combined feed"],
+                            key="bulk_calendar_bundle"
+                        )
+                    
+                    if st.button("Generate All Staff Calendars", use_container_width=True):
+                        with st.spinner("Generating calendars for all staff..."):
+                            calendar_data, calendar_filename, calendar_count = generate_all_staff_calendars(
+                                "google" if "Google" in bulk_calendar_format else "ical",
+                                "combined" if bulk_calendar_bundle == "Combined feed" else "zip"
+                            )
+                        
+                        if calendar_data:
+                            if calendar_filename.endswith('.zip'):
+                                calendar_mime = "application/zip"
+                            elif calendar_filename.endswith('.csv'):
+                                calendar_mime = "text/csv"
+                            else:
+                                calendar_mime = "text/calendar"
+                            
+                            st.download_button(
+                                label=f"📥 Download {calendar_filename}",
+                                data=calendar_data,
+                                file_name=calendar_filename,
+                                mime=calendar_mime,
+                                use_container_width=True
+                            )
+                            st.success(f"✅ Calendars generated for {calendar_count} staff members")
+                        else:
+                            st.error("❌ Failed to generate calendars. Please check that active tracks exist.")
+
+            with st.expander("Startup Import Profile", expanded=False):
+                from modules.module_loader import get_import_timings, profile_startup_imports
+                st.markdown("""
+                Subsystems are imported the first time their module tile is opened.
+                - **This process**: first-import time of each subsystem since the server started
+                - **Cold profile**: imports every subsystem in a fresh interpreter (takes a few seconds)
+                """)
+
+                import_timings = get_import_timings()
+                if import_timings:
+                    timings_df = pd.DataFrame(import_timings)
+                    timings_df['ms'] = (timings_df['seconds'] * 1000).round(1)
+                    st.dataframe(timings_df[['module', 'tile', 'ms', 'error']], use_container_width=True, hide_index=True)
+
+                if st.button("Run Cold Import Profile", use_container_width=True):
+                    with st.spinner("Profiling imports..."):
+                        profile_df = pd.DataFrame(profile_startup_imports())
+                    profile_df['ms'] = (profile_df['seconds'] * 1000).round(1)
+                    profile_df['tiles'] = profile_df['tiles'].apply(', '.join)
+                    st.dataframe(profile_df[['module', 'tiles', 'ms', 'error']], use_container_width=True, hide_index=True)
 
             # Database Restore Section
             st.header("🔄 Database Restore")
@@ -1722,7 +1757,7 @@ def run_clinical_track_hub():
                     for backup_dir in backup_directories:
                         if os.path.exists(backup_dir):
                             for file in os.listdir(backup_dir):
-                                if file.endswith('.db') and ('backup' in file.lower() or 'medflight' in file.lower()):
+                                if file.endswith(('.db', '.db.gz')) and ('backup' in file.lower() or 'medflight' in file.lower()):
                                     file_path = os.path.join(backup_dir, file)
                                     file_stat = os.stat(file_path)
                                     backup_files.append({
@@ -1844,7 +1879,7 @@ def run_clinical_track_hub():
                         for backup_dir in backup_directories:
                             if os.path.exists(backup_dir):
                                 for file in os.listdir(backup_dir):
-                                    if file.endswith('.db'):
+                                    if file.endswith(('.db', '.db.gz')):
                                         file_path = os.path.join(backup_dir, file)
                                         file_stat = os.stat(file_path)
                                         all_backups.append({
@@ -2086,7 +2121,12 @@ if not display_user_login():
 # If we get here, user is authenticated - show session info
 display_session_info()
 
-# Main Navigation Logic
+# Main Navigation Logic - import the selected tile's subsystems on first use
+if st.session_state.selected_module is not None:
+    _tile_loaded, _tile_error = load_tile_modules(st.session_state.selected_module)
+    if not _tile_loaded:
+        st.error(f"Could not load this module: {_tile_error}")
+
 if st.session_state.selected_module is None:
     # Show main CrewOps360 landing page
     display_module_selection()
@@ -2095,6 +2135,7 @@ elif st.session_state.selected_module == "clinical_track_hub":
     display_clinical_track_hub()
 elif st.session_state.selected_module == "track_bidding":
     # Show Track Bidding
+    from modules.track_bidding import display_track_bidding
     display_track_bidding()
 elif st.session_state.selected_module == "training_events":
     # Show Training & Events application (FULL VERSION)
@@ -2104,37 +2145,22 @@ elif st.session_state.selected_module == "shift_location_preferences":
     display_shift_location_preferences_module()
 elif st.session_state.selected_module == "summer_leave":
     # Show Summer Leave Requests application
-    # Initialize Excel handler and track manager if not already done
-    if 'training_excel_handler' not in st.session_state or st.session_state.training_excel_handler is None:
-        from training_modules.excel_handler import ExcelHandler
-        from training_modules.unified_database import get_active_roster_path
-        excel_path = get_active_roster_path()
-        if os.path.exists(excel_path):
-            st.session_state.training_excel_handler = ExcelHandler(excel_path)
-        else:
-            st.error(f"Excel file not found: {excel_path}")
-            st.stop()
-
-    if 'training_track_manager' not in st.session_state or st.session_state.training_track_manager is None:
-        from training_modules.track_manager import TrainingTrackManager
-        st.session_state.training_track_manager = TrainingTrackManager('data/medflight_tracks.db')
-
-        # Load tracks from database
-        st.session_state.training_track_manager.reload_tracks()
-
-        # Set up Excel handlers for CCEMT schedules
-        if 'tracks_excel_handler' not in st.session_state:
-            from training_modules.excel_handler import ExcelHandler
-            tracks_excel_path = 'upload files/Tracks.xlsx'
-            if os.path.exists(tracks_excel_path):
-                st.session_state.tracks_excel_handler = ExcelHandler(tracks_excel_path)
-                st.session_state.training_track_manager.set_excel_handler(
-                    tracks_excel_handler=st.session_state.tracks_excel_handler,
-                    enrollment_excel_handler=st.session_state.training_excel_handler
-                )
+    # Excel handler and track manager come from the shared training data plane
+    from modules.summer_leave import display_summer_leave_app
+    from training_modules.shared_data import get_session_training_data
+    training_data = get_session_training_data()
+    if not os.path.exists(training_data.roster_path):
+        st.error(f"Excel file not found: {training_data.roster_path}")
+        st.stop()
+
+    st.session_state.training_excel_handler = training_data.excel_handler
+    st.session_state.training_track_manager = training_data.track_manager
+    st.session_state.tracks_excel_handler = training_data.tracks_excel_handler
 
     display_summer_leave_app(
         st.session_state.training_excel_handler,
         st.session_state.training_track_manager
     )
 
+# Admin-only timing panel for this rerun
+render_timing_panel()
@@ -6,7 +6,6 @@ Integrates with Streamlit admin sidebar
 
 import streamlit as st
 import pandas as pd
-import sqlite3
 import io
 import os
 from datetime import datetime
@@ -16,7 +15,10 @@ import pytz
 
 _eastern_tz = pytz.timezone('America/New_York')
 from .db_utils import get_all_location_preferences
+from .instrumentation import instrument_class
+from .query_profiler import open_connection
 
+@instrument_class
 class AdminExportManager:
     """Manages admin export functionality for preferences"""
 
@@ -111,7 +113,7 @@ class AdminExportManager:
             Dict of shift names to preference scores, or None if not found
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = open_connection(self.db_path)
             cursor = conn.cursor()
 
             # Check if table exists
@@ -170,7 +172,7 @@ class AdminExportManager:
             if not os.path.exists(self.db_path):
                 return "Database file not found"
             
-            conn = sqlite3.connect(self.db_path)
+            conn = open_connection(self.db_path)
             cursor = conn.cursor()
             
             # Check for preference tables
@@ -235,7 +237,7 @@ class AdminExportManager:
     def get_app_preferences(self) -> pd.DataFrame:
         """Load app preferences from database (LEGACY - for old shift-based system)"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = open_connection(self.db_path)
 
             # Check if user_preferences table exists
             cursor = conn.cursor()
@@ -448,7 +450,7 @@ class AdminExportManager:
             dict: {staff_name_lower: {pref_name: pref_value}}
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = open_connection(self.db_path)
             cursor = conn.cursor()
             
             # Check if boolean preferences table exists
@@ -700,7 +702,7 @@ class AdminExportManager:
     def export_raw_preferences_data(self) -> bytes:
         """Export raw preferences data as downloadable content"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = open_connection(self.db_path)
             cursor = conn.cursor()
             
             # Check if tables exist
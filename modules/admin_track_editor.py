@@ -11,12 +11,14 @@ Allows administrators to directly edit active track assignments
 
 import streamlit as st
 import sqlite3
-import json
 from datetime import datetime
 import pytz
 
 _eastern_tz = pytz.timezone('America/New_York')
 from modules.db_utils import get_db_connection
+from modules.staffing_counts import staffing_state_for_ids, apply_staffing_change
+from modules.track_history_store import append_track_history
+from modules.track_codes import encode_track_data, decode_track_data, get_day_schema
 from modules.admin_pdf_generator import generate_admin_edit_pdf
 
 # Define the 42 day columns (6 weeks)
@@ -79,7 +81,8 @@ def get_track_data(track_id):
                 version,
                 effective_role,
                 has_preassignments,
-                preassignment_count
+                preassignment_count,
+                track_name
             FROM tracks
             WHERE id = ?
         """, (track_id,))
@@ -89,8 +92,8 @@ def get_track_data(track_id):
         if not result:
             return None
         
-        # Parse the track data JSON
-        track_json = json.loads(result[2])
+        # Parse the stored track (code bytes or legacy JSON)
+        track_json = decode_track_data(result[2], get_day_schema(cursor, result[8]))
         
         return {
             "track_id": result[0],
@@ -185,7 +188,7 @@ def save_edited_track(track_id, staff_name, edited_track_data, admin_user, chang
         cursor = conn.cursor()
         
         # Get current version
-        cursor.execute("SELECT version FROM tracks WHERE id = ?", (track_id,))
+        cursor.execute("SELECT version, track_name FROM tracks WHERE id = ?", (track_id,))
         result = cursor.fetchone()
         
         if not result:
@@ -194,27 +197,17 @@ def save_edited_track(track_id, staff_name, edited_track_data, admin_user, chang
         current_version = result[0]
         new_version = current_version + 1
         
-        # Convert edited track data to JSON
-        track_json = json.dumps(edited_track_data)
+        # Encode edited track data for storage
+        track_json = encode_track_data(edited_track_data, get_day_schema(cursor, result[1]))
         timestamp = datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S")
         
         # Log to track_history with admin_edit status
         notes = f"Admin edit by {admin_user}. Changes: {len(changes_summary)} days modified"
         
-        cursor.execute("""
-            INSERT INTO track_history 
-            (track_id, staff_name, track_data, submission_date, status, notes) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            track_id,
-            staff_name,
-            track_json,
-            timestamp,
-            "admin_edit",
-            notes
-        ))
+        append_track_history(cursor, track_id, staff_name, edited_track_data, timestamp, "admin_edit", notes)
         
         # Update the main tracks table
+        staffing_before = staffing_state_for_ids(cursor, [track_id])
         cursor.execute("""
             UPDATE tracks 
             SET track_data = ?,
@@ -225,6 +218,7 @@ def save_edited_track(track_id, staff_name, edited_track_data, admin_user, chang
                 approval_date = NULL
             WHERE id = ?
         """, (track_json, timestamp, new_version, track_id))
+        apply_staffing_change(cursor, staffing_before, staffing_state_for_ids(cursor, [track_id]))
         
         conn.commit()
         
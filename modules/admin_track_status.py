@@ -9,6 +9,9 @@ import sqlite3
 from datetime import datetime
 import pytz
 from modules.db_utils import get_db_connection
+from modules.staffing_counts import staffing_state_for_ids, apply_staffing_change
+from modules.track_history_store import append_track_history
+from modules.track_codes import decode_track_data, get_day_schema
 
 _eastern_tz = pytz.timezone('America/New_York')
 
@@ -31,31 +34,23 @@ def log_status_change(track_id, staff_name, old_status, new_status, admin_user):
         cursor = conn.cursor()
         
         # Get current track data
-        cursor.execute("SELECT track_data FROM tracks WHERE id = ?", (track_id,))
+        cursor.execute("SELECT track_data, track_name FROM tracks WHERE id = ?", (track_id,))
         result = cursor.fetchone()
         
         if not result:
             return (False, "Track not found")
         
-        track_data = result[0]
+        track_data = decode_track_data(result[0], get_day_schema(cursor, result[1]))
         timestamp = datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S")
         
         # Determine status text
         status_text = "activated" if new_status == 1 else "deactivated"
         
         # Insert into track_history
-        cursor.execute("""
-            INSERT INTO track_history 
-            (track_id, staff_name, track_data, submission_date, status, notes) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            track_id,
-            staff_name,
-            track_data,
-            timestamp,
-            status_text,
+        append_track_history(
+            cursor, track_id, staff_name, track_data, timestamp, status_text,
             f"Status changed by {admin_user} from {old_status} to {new_status}"
-        ))
+        )
         
         conn.commit()
         return (True, f"Status change logged successfully")
@@ -95,11 +90,13 @@ def change_track_status(track_id, staff_name, new_status, admin_user):
             return (False, f"Track is already {status_text}")
         
         # Update the status
+        staffing_before = staffing_state_for_ids(cursor, [track_id])
         cursor.execute("""
             UPDATE tracks 
             SET is_active = ? 
             WHERE id = ?
         """, (new_status, track_id))
+        apply_staffing_change(cursor, staffing_before, staffing_state_for_ids(cursor, [track_id]))
         
         conn.commit()
         
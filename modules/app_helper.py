@@ -1,10 +1,11 @@
 import os
-import shutil
 import tempfile
 import sqlite3
 from datetime import datetime
 import pytz
 
+from modules.backup_utils import snapshot_database, decompress_backup
+
 _eastern_tz = pytz.timezone('America/New_York')
 
 def validate_uploaded_database(uploaded_file):
@@ -87,8 +88,6 @@ def restore_database_from_backup(backup_path):
         tuple: (success, message)
     """
     try:
-        import shutil
-        
         # Paths
         current_db_path = 'data/medflight_tracks.db'
         
@@ -100,10 +99,10 @@ def restore_database_from_backup(backup_path):
             # Ensure backups directory exists
             os.makedirs('backups', exist_ok=True)
             
-            shutil.copy2(current_db_path, pre_restore_backup)
+            snapshot_database(pre_restore_backup, current_db_path)
         
-        # Copy the backup to replace the current database
-        shutil.copy2(backup_path, current_db_path)
+        # Copy the backup to replace the current database (.db.gz snapshots are decompressed)
+        decompress_backup(backup_path, current_db_path)
         
         # Verify the restored database
         import sqlite3
@@ -147,7 +146,7 @@ def restore_database_from_upload(uploaded_file):
             # Ensure backups directory exists
             os.makedirs('backups', exist_ok=True)
             
-            shutil.copy2(current_db_path, pre_restore_backup)
+            snapshot_database(pre_restore_backup, current_db_path)
         
         # Write uploaded file to temporary location
         with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as temp_file:
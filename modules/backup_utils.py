@@ -1,56 +1,308 @@
-"""
-Module for handling track submission backups
-"""
-
-import os
-import shutil
-from datetime import datetime
-import pytz
-
-_eastern_tz = pytz.timezone('America/New_York')
-
-def create_backup(staff_name):
-    """
-    Create a backup of the SQLite database
-    
-    Args:
-        staff_name (str): Name of the staff member who submitted the track
-    """
-    try:
-        # Source database file
-        db_source = 'data/medflight_tracks.db'
-        
-        # Check if database file exists
-        if not os.path.exists(db_source):
-            return False, "Database file not found. Please ensure the database is initialized."
-        
-        # Create backups directory if it doesn't exist
-        os.makedirs('backups', exist_ok=True)
-        
-        # Create timestamp for backup
-        timestamp = datetime.now(_eastern_tz).strftime("%Y%m%d_%H%M%S")
-        
-        # Create backup filename
-        backup_filename = f"backups/medflight_tracks_{timestamp}.db"
-        
-        # Copy the database file
-        shutil.copy2(db_source, backup_filename)
-            
-        return True, "Database backup created successfully"
-    except Exception as e:
-        return False, f"Error creating database backup: {str(e)}"
-
-def handle_track_submission(staff_name, track_data):
-    """
-    Handle backup for a track submission
-    
-    Args:
-        staff_name (str): Name of the staff member
-        track_data (dict): The track data that was submitted
-    """
-    # Create backup
-    backup_success, backup_message = create_backup(staff_name)
-    
-    return {
-        'backup': {'success': backup_success, 'message': backup_message}
-    } 
\ No newline at end of file
+"""
+Module for handling track submission backups
+
+Backups are taken with SQLite's online backup API (sqlite3.Connection.backup), so
+a snapshot is always a consistent copy even while other sessions are writing.
+Submissions only enqueue a request; a single background worker thread takes the
+snapshot, skips it when nothing changed since the last one, gzips it into
+backups/ and applies the retention policy.
+"""
+
+import os
+import gzip
+import json
+import queue
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, timedelta
+import pytz
+
+from modules.post_commit_jobs import register_job_handler
+
+_eastern_tz = pytz.timezone('America/New_York')
+
+DB_SOURCE = 'data/medflight_tracks.db'
+BACKUP_DIR = 'backups'
+
+# Post-commit job type for backups after a committed submission
+BACKUP_JOB_TYPE = 'database_backup'
+
+# Automatic snapshots are named medflight_tracks_<timestamp>.db.gz; retention only
+# ever touches files with this prefix/suffix (manual and pre-restore backups are kept)
+AUTO_BACKUP_PREFIX = 'medflight_tracks_'
+AUTO_BACKUP_SUFFIX = '.db.gz'
+MANIFEST_FILE = os.path.join(BACKUP_DIR, '.backup_manifest.json')
+
+# Retention: always keep the newest KEEP_RECENT snapshots, plus the newest
+# snapshot of each day for KEEP_DAILY_DAYS days
+KEEP_RECENT = 20
+KEEP_DAILY_DAYS = 30
+
+# Pages copied per backup step; the source is only locked for one step at a time
+BACKUP_PAGES_PER_STEP = 256
+
+
+def snapshot_database(dest_path, source_path=DB_SOURCE, source_conn=None):
+    """
+    Write a consistent copy of the database to dest_path using the online backup API
+
+    Args:
+        dest_path (str): Path of the uncompressed .db file to create
+        source_path (str): Database to copy (ignored when source_conn is given)
+        source_conn (sqlite3.Connection, optional): Existing connection to copy from
+    """
+    src = source_conn or sqlite3.connect(source_path)
+    try:
+        dest = sqlite3.connect(dest_path)
+        try:
+            src.backup(dest, pages=BACKUP_PAGES_PER_STEP)
+        finally:
+            dest.close()
+    finally:
+        if source_conn is None:
+            src.close()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_manifest():
+    try:
+        with open(MANIFEST_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest):
+    tmp_path = MANIFEST_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+
+def apply_retention_policy(backup_dir=BACKUP_DIR, keep_recent=KEEP_RECENT, keep_daily_days=KEEP_DAILY_DAYS):
+    """
+    Delete automatic snapshots outside the retention window
+
+    Returns:
+        int: Number of snapshots deleted
+    """
+    if not os.path.isdir(backup_dir):
+        return 0
+
+    snapshots = sorted(
+        (name for name in os.listdir(backup_dir)
+         if name.startswith(AUTO_BACKUP_PREFIX) and name.endswith(AUTO_BACKUP_SUFFIX)),
+        reverse=True
+    )
+
+    keep = set(snapshots[:keep_recent])
+    cutoff = (datetime.now(_eastern_tz) - timedelta(days=keep_daily_days)).strftime("%Y%m%d")
+    seen_days = set()
+    for name in snapshots:
+        # medflight_tracks_YYYYMMDD_HHMMSS.db.gz - newest first, so the first per day wins
+        day = name[len(AUTO_BACKUP_PREFIX):len(AUTO_BACKUP_PREFIX) + 8]
+        if day >= cutoff and day not in seen_days:
+            seen_days.add(day)
+            keep.add(name)
+
+    deleted = 0
+    for name in snapshots:
+        if name not in keep:
+            try:
+                os.remove(os.path.join(backup_dir, name))
+                deleted += 1
+            except OSError:
+                continue
+    return deleted
+
+
+class _BackupWorker:
+    """Single background thread that serializes every backup request"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._source_conn = None
+        self._last_data_version = None
+        self.last_result = None
+
+    def request(self, staff_name=None):
+        """Enqueue a backup; requests that arrive while one is pending are coalesced"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db-backup-worker', daemon=True)
+                self._thread.start()
+            if self._pending.is_set():
+                return False
+            self._pending.set()
+            self._queue.put(staff_name)
+            return True
+
+    def wait_idle(self):
+        """Block until every queued request has been processed"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            staff_name = self._queue.get()
+            # Clear before running so a submission during the snapshot queues another one
+            self._pending.clear()
+            try:
+                self.last_result = self._backup_once(staff_name)
+            except Exception as e:
+                self.last_result = (False, f"Error creating database backup: {str(e)}")
+            finally:
+                self._queue.task_done()
+            if not self.last_result[0]:
+                print(f"Background backup failed: {self.last_result[1]}")
+
+    def _backup_once(self, staff_name):
+        if not os.path.exists(DB_SOURCE):
+            return False, "Database file not found. Please ensure the database is initialized."
+
+        if self._source_conn is None:
+            self._source_conn = sqlite3.connect(DB_SOURCE)
+
+        # data_version changes whenever another connection commits to the file, so an
+        # unchanged value means the last snapshot from this worker is still current
+        data_version = self._source_conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._last_data_version:
+            return True, "Database unchanged since last backup - skipped"
+
+        return self._write_snapshot(data_version, staff_name)
+
+    def _write_snapshot(self, data_version, staff_name):
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.db', dir=BACKUP_DIR)
+        os.close(fd)
+        try:
+            snapshot_database(tmp_path, source_conn=self._source_conn)
+            content_hash = _file_sha256(tmp_path)
+
+            manifest = _load_manifest()
+            last_file = manifest.get('last_file')
+            if (manifest.get('last_sha256') == content_hash and last_file
+                    and os.path.exists(os.path.join(BACKUP_DIR, last_file))):
+                self._last_data_version = data_version
+                return True, "Database unchanged since last backup - skipped"
+
+            timestamp = datetime.now(_eastern_tz).strftime("%Y%m%d_%H%M%S")
+            backup_filename = f"{AUTO_BACKUP_PREFIX}{timestamp}{AUTO_BACKUP_SUFFIX}"
+            backup_path = os.path.join(BACKUP_DIR, backup_filename)
+            with open(tmp_path, 'rb') as src, gzip.open(backup_path + '.part', 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(backup_path + '.part', backup_path)
+
+            _save_manifest({
+                'last_file': backup_filename,
+                'last_sha256': content_hash,
+                'last_staff': staff_name,
+                'created': timestamp,
+            })
+            self._last_data_version = data_version
+            apply_retention_policy()
+
+            return True, f"Database backup created: {backup_filename}"
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+_backup_worker = _BackupWorker()
+
+
+def request_backup(staff_name=None):
+    """
+    Queue a background database backup
+
+    Args:
+        staff_name (str, optional): Staff member whose submission triggered it
+
+    Returns:
+        bool: True if queued, False if one was already pending (it will cover this change)
+    """
+    return _backup_worker.request(staff_name)
+
+
+def get_last_backup_result():
+    """
+    Returns:
+        tuple or None: (success, message) of the most recent background backup
+    """
+    return _backup_worker.last_result
+
+
+def create_backup(staff_name):
+    """
+    Create a backup of the SQLite database synchronously (same snapshot, dedup and
+    retention rules as the background worker)
+
+    Args:
+        staff_name (str): Name of the staff member who submitted the track
+    """
+    try:
+        if not os.path.exists(DB_SOURCE):
+            return False, "Database file not found. Please ensure the database is initialized."
+
+        request_backup(staff_name)
+        _backup_worker.wait_idle()
+        return _backup_worker.last_result or (True, "Database backup created successfully")
+    except Exception as e:
+        return False, f"Error creating database backup: {str(e)}"
+
+
+def _backup_job(payload):
+    """Post-commit job: back up the database after a committed submission"""
+    success, message = create_backup(payload.get('staff_name'))
+    return {'success': success, 'message': message}
+
+
+register_job_handler(BACKUP_JOB_TYPE, _backup_job)
+
+
+def decompress_backup(backup_path, dest_path):
+    """
+    Write a plain .db file for a backup, decompressing .db.gz snapshots
+
+    Args:
+        backup_path (str): Path to a .db or .db.gz backup
+        dest_path (str): Where to write the uncompressed database
+    """
+    if backup_path.endswith('.gz'):
+        with gzip.open(backup_path, 'rb') as src, open(dest_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+    else:
+        shutil.copy2(backup_path, dest_path)
+
+
+def handle_track_submission(staff_name, track_data):
+    """
+    Handle backup for a track submission
+
+    Args:
+        staff_name (str): Name of the staff member
+        track_data (dict): The track data that was submitted
+    """
+    # Only enqueue - the snapshot is taken by the background worker
+    if not os.path.exists(DB_SOURCE):
+        return {
+            'backup': {'success': False, 'message': "Database file not found. Please ensure the database is initialized."}
+        }
+
+    request_backup(staff_name)
+
+    return {
+        'backup': {'success': True, 'message': "Database backup queued"}
+    }
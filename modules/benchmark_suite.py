@@ -0,0 +1,308 @@
+# modules/benchmark_suite.py
+"""
+End-to-end benchmarks of the scheduling hot paths against a synthetic roster.
+
+Builds a production-scale roster with modules.sample_data.generate_synthetic_roster()
+in a scratch directory (its own data/medflight_tracks.db and training workbook, so
+the real database is never touched), times each hot path and writes the results
+as JSON. Comparing against a previous results file flags regressions:
+
+    python -m modules.benchmark_suite --staff 300 --bids 240 --classes 20 --output bench.json
+    python -m modules.benchmark_suite --staff 300 --baseline bench.json --tolerance 1.25
+
+Exits with status 1 when any benchmark's median is more than `tolerance` times
+its baseline median.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Staff members whose hypothetical schedule is generated per run
+HYPOTHETICAL_SAMPLE = 5
+
+
+def _time_call(func, repeat):
+    """Run func `repeat` times (output suppressed) and return the timings in ms"""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _summarize(timings):
+    return {
+        'runs': len(timings),
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def build_benchmarks(roster, workbook_path, bid_track_name='FY27'):
+    """
+    Hot paths to time, as name -> zero-argument callable
+
+    Each callable calls the same entry point the Streamlit pages do, with the
+    inputs those pages would build from the synthetic roster.
+    """
+    from modules.cycle_calendar import DAY_KEYS
+    from modules.db_utils import get_all_active_tracks, get_all_bid_tracks
+    from modules.query_cache import clear_query_cache
+    from modules.hypothetical_scheduler_new import (
+        generate_hypothetical_schedule_new, generate_roster_hypothetical_schedules, _roster_schedule_cache
+    )
+    from modules.track_bidding import _compute_bid_day_stats
+    from modules.enhanced_track_validator import validate_track_comprehensive
+    from modules.track_suggestions import suggest_tracks, suggestion_scores_from_options
+    from modules.swap_matcher import build_swap_index, find_swap_partners, _swap_index_cache
+    from modules.fiscal_year import FiscalYearDisplay
+    from training_modules.excel_handler import ExcelHandler
+    from training_modules.unified_database import UnifiedDatabase
+    from training_modules.enrollment_manager import EnrollmentManager
+    from training_modules.track_manager import TrainingTrackManager
+    from training_modules.availability_analyzer import AvailabilityAnalyzer
+
+    days = list(DAY_KEYS)
+    preferences_df = roster['preferences_df']
+    requirements_df = roster['requirements_df']
+    current_tracks_df = roster['current_tracks_df']
+    role_mapping = dict(zip(preferences_df['STAFF NAME'], preferences_df['ROLE']))
+    no_matrix_mapping = dict(zip(preferences_df['STAFF NAME'], preferences_df['No Matrix'] == 1))
+    requirements = requirements_df.set_index('STAFF NAME').to_dict('index')
+
+    def read_active_tracks_cold():
+        clear_query_cache()
+        get_all_active_tracks()
+
+    def bid_day_stats():
+        ok, bids = get_all_bid_tracks(bid_track_name)
+        _compute_bid_day_stats(days, bids if ok else [], role_mapping, no_matrix_mapping)
+
+    def validate_all_tracks():
+        for name, track in roster['tracks'].items():
+            staff_requirements = requirements[name]
+            validate_track_comprehensive(
+                track,
+                shifts_per_pay_period=int(staff_requirements['SHIFTS PER PAY PERIOD']),
+                night_minimum=int(staff_requirements['NIGHT MINIMUM']),
+                weekend_minimum=int(staff_requirements['WEEKEND MINIMUM']),
+                days=days,
+                weekend_group=staff_requirements['WEEKEND GROUP'],
+                staff_name=name,
+            )
+
+    # One schedule per staff member, as the bidding page runs it; a fixed sample keeps it bounded
+    hypothetical_staff = sorted(roster['bids'])[:HYPOTHETICAL_SAMPLE]
+
+    def hypothetical_schedule():
+        for name in hypothetical_staff:
+            generate_hypothetical_schedule_new(
+                name, preferences_df, current_tracks_df, days,
+                'STAFF NAME', 'STAFF NAME', 'ROLE', 'Seniority', bid_track_name
+            )
+
+    def roster_hypothetical_schedules():
+        # Cold: the per-snapshot cache would turn every timed run after the first into a lookup
+        _roster_schedule_cache.clear()
+        generate_roster_hypothetical_schedules(
+            preferences_df, current_tracks_df, days,
+            'STAFF NAME', 'STAFF NAME', 'ROLE', 'Seniority', bid_track_name, use_database_logic=True
+        )
+
+    # Every shift open, so the search runs over the widest space the editor can hand it
+    open_options = {day: {'day_shift': {'is_needed': True}, 'night_shift': {'is_needed': True}} for day in days}
+
+    def track_suggestions():
+        for name in hypothetical_staff:
+            staff_requirements = requirements[name]
+            suggest_tracks(
+                days,
+                suggestion_scores_from_options(open_options, {}, days, roster['tracks'][name]),
+                int(staff_requirements['SHIFTS PER PAY PERIOD']),
+                int(staff_requirements['NIGHT MINIMUM']),
+                int(staff_requirements['WEEKEND MINIMUM']),
+                weekend_group=staff_requirements['WEEKEND GROUP'],
+            )
+
+    def swap_partners():
+        # Cold: the index is rebuilt from the active roster, then each sample member asks
+        # to trade their first worked day for their first day off
+        _swap_index_cache.clear()
+        index, _ = build_swap_index(days, preferences_df, 'STAFF NAME', 'ROLE')
+        for name in hypothetical_staff:
+            track = index.tracks.get(name) if index else None
+            if not track:
+                continue
+            worked = [day for day in days if track[day] in ('D', 'N')]
+            off = [day for day in days if not track[day]]
+            if worked and off:
+                find_swap_partners(index, name, worked[:1], off[:1], requirements_df=requirements_df)
+
+    def fiscal_year_export():
+        FiscalYearDisplay().export_to_excel()
+
+    excel_handler = ExcelHandler(workbook_path)
+    unified_db = UnifiedDatabase('data/medflight_tracks.db', excel_handler)
+    unified_db.initialize_training_tables()
+    track_manager = TrainingTrackManager('data/medflight_tracks.db')
+    enrollment_manager = EnrollmentManager(unified_db, excel_handler, track_manager)
+    analyzer = AvailabilityAnalyzer(unified_db, excel_handler, enrollment_manager, track_manager)
+    class_dates = [class_date for training_class in roster['classes'] for class_date in training_class['dates']]
+    first_date = min(class_dates).strftime('%Y-%m-%d') if class_dates else datetime.now().strftime('%Y-%m-%d')
+    last_date = max(class_dates).strftime('%Y-%m-%d') if class_dates else (
+        datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
+
+    def training_availability():
+        analyzer.get_no_conflict_enrollment_availability(first_date, last_date)
+
+    return {
+        'read_active_tracks_cold': read_active_tracks_cold,
+        'bid_day_stats': bid_day_stats,
+        'validate_all_tracks': validate_all_tracks,
+        'hypothetical_schedule': hypothetical_schedule,
+        'roster_hypothetical_schedules': roster_hypothetical_schedules,
+        'track_suggestions': track_suggestions,
+        'swap_partners': swap_partners,
+        'fiscal_year_export': fiscal_year_export,
+        'training_availability': training_availability,
+    }
+
+
+def run_benchmarks(n_staff=300, bids_per_cycle=None, history_years=3, n_classes=20, repeat=3,
+                   seed=0, only=None, workdir=None):
+    """
+    Generate a synthetic roster in a scratch directory and time every hot path
+
+    Args:
+        n_staff (int): Staff on the roster
+        bids_per_cycle (int, optional): Bids for the next cycle (default 80% of staff)
+        history_years (int): Years of track history per staff member
+        n_classes (int): Classes in the training workbook
+        repeat (int): Timed runs per benchmark (after one warm-up run)
+        seed (int): Random seed for the roster
+        only (list, optional): Benchmark names to run (default all)
+        workdir (str, optional): Directory to build the data in (default a temporary one)
+
+    Returns:
+        dict: params, environment, setup_ms and per-benchmark timing summaries
+    """
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    from modules.sample_data import generate_synthetic_roster, write_synthetic_database, write_training_workbook
+
+    previous_cwd = os.getcwd()
+    scratch = None
+    if workdir is None:
+        scratch = tempfile.TemporaryDirectory(prefix='crewops_bench_')
+        workdir = scratch.name
+    os.makedirs(os.path.join(workdir, 'data'), exist_ok=True)
+    os.chdir(workdir)
+
+    try:
+        setup_start = time.perf_counter()
+        roster = generate_synthetic_roster(n_staff=n_staff, bids_per_cycle=bids_per_cycle,
+                                           history_years=history_years, n_classes=n_classes, seed=seed)
+        workbook_path = os.path.join(workdir, 'training_roster.xlsx')
+        with contextlib.redirect_stdout(io.StringIO()):
+            success, message = write_synthetic_database(roster)
+            write_training_workbook(roster, workbook_path)
+        if not success:
+            raise RuntimeError(message)
+        setup_ms = (time.perf_counter() - setup_start) * 1000
+
+        results = {}
+        for name, func in build_benchmarks(roster, workbook_path).items():
+            if only and name not in only:
+                continue
+            try:
+                _time_call(func, 1)
+                results[name] = _summarize(_time_call(func, repeat))
+            except Exception as e:
+                results[name] = {'error': str(e)}
+            print(f"{name}: {results[name]}")
+    finally:
+        os.chdir(previous_cwd)
+        if scratch is not None:
+            from modules.db_utils import close_all_connections
+            close_all_connections()
+            scratch.cleanup()
+
+    return {
+        'params': roster['params'],
+        'repeat': repeat,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        'setup_ms': round(setup_ms, 3),
+        'benchmarks': results,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance=1.25):
+    """
+    Benchmarks whose median got slower than `tolerance` x the baseline median
+
+    Returns:
+        list: (name, baseline_ms, current_ms) for each regression
+    """
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous or 'median_ms' not in previous or 'median_ms' not in current:
+            continue
+        if current['median_ms'] > previous['median_ms'] * tolerance:
+            regressions.append((name, previous['median_ms'], current['median_ms']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CrewOps360 hot paths on a synthetic roster")
+    parser.add_argument('--staff', type=int, default=300)
+    parser.add_argument('--bids', type=int, default=None, help="Bids for the next cycle (default 80%% of staff)")
+    parser.add_argument('--history-years', type=int, default=3)
+    parser.add_argument('--classes', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='*', help="Benchmark names to run")
+    parser.add_argument('--output', help="Write results JSON here")
+    parser.add_argument('--baseline', help="Previous results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(n_staff=args.staff, bids_per_cycle=args.bids, history_years=args.history_years,
+                             n_classes=args.classes, repeat=args.repeat, seed=args.seed, only=args.only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.1f} ms -> {after:.1f} ms")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,17 +2,45 @@
 Module for generating Google Calendar and iCal files from staffing schedules.
 Handles 6-week repeating schedule patterns with fiscal year calendar generation.
 Reads from the medflight_tracks.db database in the data folder.
+
+iCal VEVENTs and Google CSV rows are streamed as text per staff member, so the
+all-staff export (generate_all_staff_calendars) is a single pass over the cached
+fiscal-year projection of every active track.
 """
 import csv
 import io
 from datetime import datetime, timedelta
 import uuid
-import sqlite3
-import json
+import zipfile
+import numpy as np
 import pandas as pd
-from icalendar import Calendar, Event
 import pytz
 
+from modules.cycle_calendar import get_cycle_calendar, DEFAULT_TRACK_NAME
+from modules.track_codes import decode_track_data, get_day_schema
+from modules.query_profiler import open_connection
+from modules.instrumentation import instrumented
+
+ICAL_PRODID = '-//Clinical Track Hub Calendar Converter//EN'
+
+GOOGLE_CSV_HEADER = [
+    "Subject", "Start Date", "Start Time", "End Date", "End Time",
+    "All Day Event", "Description", "Location", "Private"
+]
+
+
+
+def _fiscal_calendar():
+    """Shared cycle calendar for the fiscal year these exports cover"""
+    return get_cycle_calendar(DEFAULT_TRACK_NAME)
+
+
+def _fiscal_bounds():
+    """Fiscal year (start, end) as datetimes"""
+    calendar = _fiscal_calendar()
+    return (datetime.combine(calendar.fiscal_start, datetime.min.time()),
+            datetime.combine(calendar.fiscal_end, datetime.min.time()))
+
 
 def get_database_path():
     """
@@ -31,7 +59,7 @@ def extract_staff_names_from_db():
     Returns:
         list: List of staff names sorted alphabetically
     """
-    conn = sqlite3.connect(get_database_path())
+    conn = open_connection(get_database_path())
     
     try:
         cursor = conn.cursor()
@@ -56,24 +84,19 @@ def extract_dates_from_db():
     Returns:
         tuple: (pattern_start_date, list of dates for 6-week pattern)
     """
-    # Sept 28, 2025 corresponds to Sun B 3, which is day 15 of the 42-day pattern
-    # (A1=days 1-7, A2=days 8-14, B3=days 15-21, B4=days 22-28, C5=days 29-35, C6=days 36-42)
+    # Sept 28, 2025 corresponds to Sun B 3, so the cycle containing it starts on
+    # Sun A 1 two weeks earlier
+    calendar = _fiscal_calendar()
+    fiscal_start, _ = _fiscal_bounds()
+    pattern_start = datetime.combine(calendar.cycle_start_on_or_before(fiscal_start), datetime.min.time())
     
-    # To create the full pattern starting from Sun A 1, we need to calculate backwards
-    fiscal_start = datetime(2025, 9, 28)  # This is Sun B 3 (pattern day 15)
-    
-    # Sun B 3 is the 15th day of the pattern (index 14, since we start counting from 0)
-    # So Sun A 1 (pattern day 1) would be 14 days before Sept 28
-    pattern_start = fiscal_start - timedelta(days=14)  # This gives us Sun A 1
-    
-    # Generate 42 days (6 weeks) for the complete pattern starting from Sun A 1
-    dates = []
-    for i in range(42):
-        dates.append(pattern_start + timedelta(days=i))
+    # 42 days (6 weeks) for the complete pattern starting from Sun A 1
+    dates = [pattern_start + timedelta(days=i) for i in range(len(calendar.day_keys))]
     
     return pattern_start, dates
 
 
+@instrumented
 def extract_schedule_from_db(staff_names, dates):
     """
     Extract the schedule data for each staff member from the tracks table.
@@ -87,7 +110,7 @@ def extract_schedule_from_db(staff_names, dates):
     Returns:
         dict: Dictionary mapping staff names to their schedules
     """
-    conn = sqlite3.connect(get_database_path())
+    conn = open_connection(get_database_path())
     
     try:
         # Create pattern day names based on your 6-week structure
@@ -104,29 +127,31 @@ def extract_schedule_from_db(staff_names, dates):
             for day in days_of_week:
                 pattern_day_names.append(f"{day} {letter} {number}")
         
+        # One query for every active track; the first row per staff is the latest
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT staff_name, track_name, track_data FROM tracks 
+            WHERE is_active = 1 
+            ORDER BY staff_name, submission_date DESC
+        """)
+        latest_tracks = {}
+        for staff, track_name, track_data_str in cursor.fetchall():
+            latest_tracks.setdefault(staff, (track_name, track_data_str))
+        
         schedule_data = {}
         
         for staff in staff_names:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT track_data FROM tracks 
-                WHERE staff_name = ? AND is_active = 1 
-                ORDER BY submission_date DESC 
-                LIMIT 1
-            """, (staff,))
-            
-            result = cursor.fetchone()
+            track_name, track_data_str = latest_tracks.get(staff, (None, None))
             
-            if result is None:
+            if track_data_str is None:
                 # If staff not found, create empty schedule
                 schedule = [""] * 42
             else:
-                track_data_str = result[0]
                 schedule = []
                 
                 try:
-                    # Parse the track_data JSON
-                    track_data = json.loads(track_data_str)
+                    # Parse the stored track (code bytes or legacy JSON)
+                    track_data = decode_track_data(track_data_str, get_day_schema(cursor, track_name))
                     
                     # Extract shifts for each pattern day in the correct order
                     for pattern_day in pattern_day_names:
@@ -155,34 +180,14 @@ def extract_schedule_from_db(staff_names, dates):
         conn.close()
 
 
-def generate_google_calendar(staff_name, schedule, start_date, end_date):
+def _iter_schedule_shift_days(schedule, end_date):
     """
-    Generate a Google Calendar CSV file for a staff member.
-    
-    Args:
-        staff_name: Name of the staff member
-        schedule: List of (date, shift) tuples for the staff member (6-week pattern starting Sun A 1)
-        start_date: Start date of the 6-week pattern (calculated Sun A 1)
-        end_date: End date for the repeated schedule (Sept 26, 2026)
-    
-    Returns:
-        tuple: (CSV file as string, filename)
+    Walk the fiscal year and yield (date, shift) for every day with a shift,
+    reading the 42-day (date, shift) schedule that starts on Sun A 1.
     """
-    # Create a CSV file in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header row for Google Calendar import
-    writer.writerow([
-        "Subject", "Start Date", "Start Time", "End Date", "End Time", 
-        "All Day Event", "Description", "Location", "Private"
-    ])
-    
     # Fiscal year starts Sept 28, 2025 (Sun B 3, which is day 15 of the pattern)
-    fiscal_year_start = datetime(2025, 9, 28)
-    
-    # Calculate offset: Sept 28 is Sun B 3 = day 15 (index 14) of the 42-day pattern
-    fiscal_offset = 14  # Sun B 3 is the 15th day (index 14) of the pattern
+    fiscal_year_start, _ = _fiscal_bounds()
+    fiscal_offset = _fiscal_calendar().index_for_date(fiscal_year_start)
     
     # 6-week pattern length
     schedule_length = len(schedule)  # Should be 42 days
@@ -195,32 +200,130 @@ def generate_google_calendar(staff_name, schedule, start_date, end_date):
         pattern_day = (fiscal_offset + days_from_fiscal_start) % schedule_length
         
         # Get the shift for this pattern day
-        if pattern_day < len(schedule):
-            pattern_date, shift = schedule[pattern_day]
-            
-            if shift and shift.strip():  # Skip empty shifts
-                # Format the date for Google Calendar
-                date_str = current_date.strftime("%m/%d/%Y")
-                
-                # Write the event to CSV as an all-day event
-                writer.writerow([
-                    shift,                     # Subject (shift code, e.g., "D" or "N")
-                    date_str,                  # Start Date
-                    "",                        # Start Time (empty for all-day events)
-                    date_str,                  # End Date
-                    "",                        # End Time (empty for all-day events)
-                    "True",                    # All Day Event
-                    f"{staff_name} Shift",     # Description
-                    "",                        # Location (empty as per request)
-                    "True"                     # Private
-                ])
+        pattern_date, shift = schedule[pattern_day]
+        
+        if shift and shift.strip():  # Skip empty shifts
+            yield current_date.date(), shift
         
         # Move to next day
         current_date += timedelta(days=1)
+
+
+def _ical_text(value):
+    """Escape a TEXT property value (RFC 5545 3.3.11)."""
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _ical_line(content):
+    """Fold a content line at 75 octets and terminate it with CRLF (RFC 5545 3.1)."""
+    encoded = content.encode('utf-8')
+    if len(encoded) <= 75:
+        return content + '\r\n'
+    
+    lines = []
+    current = ''
+    current_len = 0
+    limit = 75
+    for char in content:
+        char_len = len(char.encode('utf-8'))
+        if current_len + char_len > limit:
+            lines.append(current)
+            current = ' '
+            current_len = 1
+            limit = 75
+        current += char
+        current_len += char_len
+    lines.append(current)
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def _write_ical_events(out, staff_name, shift_days, summary_prefix=''):
+    """
+    Stream one all-day VEVENT per (date, shift) into a text buffer.
+    
+    Args:
+        out: Text buffer (e.g. io.StringIO) positioned inside a VCALENDAR
+        staff_name: Name of the staff member
+        shift_days: Iterable of (date, shift) pairs
+        summary_prefix: Prepended to the shift code (used by combined feeds)
+    """
+    description = _ical_line(f"DESCRIPTION:{_ical_text(f'{staff_name} Shift')}")
+    for event_date, shift in shift_days:
+        out.write('BEGIN:VEVENT\r\n')
+        out.write(_ical_line(f"SUMMARY:{_ical_text(summary_prefix + shift)}"))
+        out.write(f"DTSTART;VALUE=DATE:{event_date.strftime('%Y%m%d')}\r\n")
+        # End date is exclusive in iCal
+        out.write(f"DTEND;VALUE=DATE:{(event_date + timedelta(days=1)).strftime('%Y%m%d')}\r\n")
+        out.write(f"UID:{uuid.uuid4()}\r\n")
+        out.write(description)
+        out.write('X-APPLE-TRAVEL-ADVISORY-BEHAVIOR:AUTOMATIC\r\n')
+        out.write('X-MICROSOFT-CDO-ALLDAYEVENT:TRUE\r\n')
+        out.write('END:VEVENT\r\n')
+
+
+def _begin_ical(out):
+    out.write('BEGIN:VCALENDAR\r\n')
+    out.write('VERSION:2.0\r\n')
+    out.write(_ical_line(f"PRODID:{ICAL_PRODID}"))
+
+
+def _end_ical(out):
+    out.write('END:VCALENDAR\r\n')
+
+
+def _write_google_rows(writer, staff_name, shift_days, subject_prefix=''):
+    """
+    Stream one all-day Google Calendar CSV row per (date, shift).
+    
+    Args:
+        writer: csv.writer over the output buffer
+        staff_name: Name of the staff member
+        shift_days: Iterable of (date, shift) pairs
+        subject_prefix: Prepended to the shift code (used by combined feeds)
+    """
+    for event_date, shift in shift_days:
+        # Format the date for Google Calendar
+        date_str = event_date.strftime("%m/%d/%Y")
+        
+        # Write the event to CSV as an all-day event
+        writer.writerow([
+            subject_prefix + shift,    # Subject (shift code, e.g., "D" or "N")
+            date_str,                  # Start Date
+            "",                        # Start Time (empty for all-day events)
+            date_str,                  # End Date
+            "",                        # End Time (empty for all-day events)
+            "True",                    # All Day Event
+            f"{staff_name} Shift",     # Description
+            "",                        # Location (empty as per request)
+            "True"                     # Private
+        ])
+
+
+def generate_google_calendar(staff_name, schedule, start_date, end_date):
+    """
+    Generate a Google Calendar CSV file for a staff member.
+    
+    Args:
+        staff_name: Name of the staff member
+        schedule: List of (date, shift) tuples for the staff member (6-week pattern starting Sun A 1)
+        start_date: Start date of the 6-week pattern (calculated Sun A 1)
+        end_date: End date for the repeated schedule (Sept 26, 2026)
+    
+    Returns:
+        tuple: (CSV file as string, filename)
+    """
+    # Create a CSV file in memory
+    output = io.StringIO()
+    writer = csv.writer(output)
+    
+    # Write header row for Google Calendar import
+    writer.writerow(GOOGLE_CSV_HEADER)
+    _write_google_rows(writer, staff_name, _iter_schedule_shift_days(schedule, end_date))
     
     # Get the CSV content and create filename
     csv_content = output.getvalue()
-    filename = f"{staff_name}_schedule_{fiscal_year_start.strftime('%Y%m%d')}.csv"
+    filename = f"{staff_name}_schedule_{_fiscal_calendar().fiscal_start.strftime('%Y%m%d')}.csv"
     
     return csv_content, filename
 
@@ -238,61 +341,14 @@ def generate_ical_calendar(staff_name, schedule, start_date, end_date):
     Returns:
         tuple: (iCal file as string, filename)
     """
-    # Create a calendar
-    cal = Calendar()
-    cal.add('prodid', '-//Clinical Track Hub Calendar Converter//EN')
-    cal.add('version', '2.0')
-    
-    # Fiscal year starts Sept 28, 2025 (Sun B 3, which is day 15 of the pattern)
-    fiscal_year_start = datetime(2025, 9, 28)
-    
-    # Calculate offset: Sept 28 is Sun B 3 = day 15 (index 14) of the 42-day pattern
-    fiscal_offset = 14  # Sun B 3 is the 15th day (index 14) of the pattern
-    
-    # 6-week pattern length
-    schedule_length = len(schedule)  # Should be 42 days
-    
-    current_date = fiscal_year_start
-    
-    while current_date <= end_date:
-        # Calculate which day in the 6-week pattern we're on
-        days_from_fiscal_start = (current_date - fiscal_year_start).days
-        pattern_day = (fiscal_offset + days_from_fiscal_start) % schedule_length
-        
-        # Get the shift for this pattern day
-        if pattern_day < len(schedule):
-            pattern_date, shift = schedule[pattern_day]
-            
-            if shift and shift.strip():  # Skip empty shifts
-                # Create an event
-                event = Event()
-                event.add('summary', shift)  # Just the shift code (e.g., "D" or "N")
-                
-                # Set as an all-day event
-                from datetime import date as date_type
-                event_date = date_type(current_date.year, current_date.month, current_date.day)
-                event.add('dtstart', event_date)
-                event.add('dtend', event_date + timedelta(days=1))  # End date is exclusive in iCal
-                
-                # Set as an all-day event
-                event.add('X-MICROSOFT-CDO-ALLDAYEVENT', 'TRUE')
-                event.add('X-APPLE-TRAVEL-ADVISORY-BEHAVIOR', 'AUTOMATIC')
-                
-                # Add description
-                event.add('description', f"{staff_name} Shift")
-                
-                # Add a unique ID
-                event.add('uid', str(uuid.uuid4()))
-                
-                # Add the event to the calendar
-                cal.add_component(event)
-        
-        # Move to next day
-        current_date += timedelta(days=1)
+    output = io.StringIO()
+    _begin_ical(output)
+    _write_ical_events(output, staff_name, _iter_schedule_shift_days(schedule, end_date))
+    _end_ical(output)
     
     # Get the iCal content and create filename
-    ical_content = cal.to_ical().decode('utf-8')
-    filename = f"{staff_name}_schedule_{fiscal_year_start.strftime('%Y%m%d')}.ics"
+    ical_content = output.getvalue()
+    filename = f"{staff_name}_schedule_{_fiscal_calendar().fiscal_start.strftime('%Y%m%d')}.ics"
     
     return ical_content, filename
 
@@ -330,19 +386,7 @@ def get_pattern_day_name(day_index):
     Returns:
         str: Pattern day name
     """
-    days_of_week = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
-    week_letters = ["A", "A", "B", "B", "C", "C"]  # 2 weeks each of A, B, C
-    week_numbers = [1, 2, 3, 4, 5, 6]
-    
-    week_index = day_index // 7  # Which week (0-5)
-    day_of_week_index = day_index % 7  # Which day of the week (0-6)
-    
-    if week_index < len(week_letters):
-        letter = week_letters[week_index]
-        number = week_numbers[week_index]
-        return f"{days_of_week[day_of_week_index]} {letter} {number}"
-    else:
-        return f"Day {day_index + 1}"
+    return _fiscal_calendar().label_for_index(day_index)
 
 
 def get_fiscal_year_info():
@@ -355,18 +399,19 @@ def get_fiscal_year_info():
         dict: Information about the fiscal year and pattern
     """
     # Calculate the true pattern start (Sun A 1)
-    fiscal_start = datetime(2025, 9, 28)  # Sun B 3
-    pattern_start = fiscal_start - timedelta(days=14)  # Sun A 1 (14 days earlier)
-    fiscal_year_end = datetime(2026, 9, 26)
+    calendar = _fiscal_calendar()
+    fiscal_start, fiscal_year_end = _fiscal_bounds()  # Sun B 3 .. Sat A 2
+    fiscal_offset = calendar.index_for_date(fiscal_start)
+    pattern_start = fiscal_start - timedelta(days=fiscal_offset)  # Sun A 1
     
     return {
         "pattern_start": pattern_start,
         "pattern_start_name": "Sun A 1",
         "fiscal_year_start": fiscal_start,
-        "fiscal_year_start_name": "Sun B 3",
+        "fiscal_year_start_name": calendar.label_for_index(fiscal_offset),
         "fiscal_year_end": fiscal_year_end,
-        "fiscal_offset": 14,  # Sept 28 is day 15 (index 14) of the pattern
-        "pattern_length": 42
+        "fiscal_offset": fiscal_offset,  # Sept 28 is day 15 (index 14) of the pattern
+        "pattern_length": len(calendar.day_keys)
     }
 
 
@@ -441,6 +486,7 @@ def get_all_staff_schedules():
         return {}
 
 
+@instrumented
 def generate_calendar_for_staff(staff_name, calendar_format="google"):
     """
     Generate a calendar file for a specific staff member.
@@ -461,8 +507,7 @@ def generate_calendar_for_staff(staff_name, calendar_format="google"):
         schedule = schedule_data[staff_name]
         
         # Set date range
-        start_date = datetime(2025, 9, 28)
-        end_date = datetime(2026, 9, 26)
+        start_date, end_date = _fiscal_bounds()
         
         if calendar_format.lower() == "google":
             return generate_google_calendar(staff_name, schedule, start_date, end_date)
@@ -474,3 +519,95 @@ def generate_calendar_for_staff(staff_name, calendar_format="google"):
     except Exception as e:
         print(f"Error generating calendar for {staff_name}: {e}")
         return None, None
+
+
+def iter_all_staff_shift_days(staff_names=None):
+    """
+    Yield (staff_name, [(date, shift), ...]) for every active track.
+    
+    Uses the cached fiscal-year projection (one query for all active tracks, one
+    NumPy tiling of the 42-day pattern onto the fiscal year), so no per-staff
+    query or date walk is needed.
+    
+    Args:
+        staff_names: Optional subset of staff names (defaults to all active tracks)
+    """
+    from modules.fiscal_year import FiscalYearDisplay
+    
+    projection = FiscalYearDisplay(get_database_path()).get_projection()
+    if staff_names is None:
+        staff_names = projection.staff
+    else:
+        staff_names = [name for name in staff_names if name in projection.staff_index]
+    
+    dates = projection.dates_in(slice(None))
+    labels = projection.code_labels
+    # Codes whose label is blank/whitespace are "off" days, same as the per-staff path
+    working = np.array([bool(str(label).strip()) for label in labels])
+    
+    for staff_name in staff_names:
+        codes = projection.codes[projection.staff_index[staff_name]]
+        days = np.flatnonzero(working[codes])
+        yield staff_name, [(dates[i], labels[codes[i]]) for i in days]
+
+
+@instrumented
+def generate_all_staff_calendars(calendar_format="ical", bundle="zip", staff_names=None):
+    """
+    Generate calendars for every staff member with an active track in one pass.
+    
+    Args:
+        calendar_format: Either "google" for CSV or "ical" for ICS
+        bundle: "zip" for one file per staff member, or "combined" for a single feed
+            whose event titles are prefixed with the staff name
+        staff_names: Optional subset of staff names
+    
+    Returns:
+        tuple: (file content as bytes, filename, staff count) or (None, None, 0) if error
+    """
+    try:
+        calendar_format = calendar_format.lower()
+        if calendar_format not in ("google", "ical"):
+            return None, None, 0
+        
+        extension = "csv" if calendar_format == "google" else "ics"
+        fiscal_stamp = _fiscal_calendar().fiscal_start.strftime('%Y%m%d')
+        staff_count = 0
+        
+        if bundle == "combined":
+            output = io.StringIO()
+            if calendar_format == "google":
+                writer = csv.writer(output)
+                writer.writerow(GOOGLE_CSV_HEADER)
+                for staff_name, shift_days in iter_all_staff_shift_days(staff_names):
+                    _write_google_rows(writer, staff_name, shift_days, subject_prefix=f"{staff_name} - ")
+                    staff_count += 1
+            else:
+                _begin_ical(output)
+                for staff_name, shift_days in iter_all_staff_shift_days(staff_names):
+                    _write_ical_events(output, staff_name, shift_days, summary_prefix=f"{staff_name} - ")
+                    staff_count += 1
+                _end_ical(output)
+            
+            return output.getvalue().encode('utf-8'), f"all_staff_schedule_{fiscal_stamp}.{extension}", staff_count
+        
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for staff_name, shift_days in iter_all_staff_shift_days(staff_names):
+                output = io.StringIO()
+                if calendar_format == "google":
+                    writer = csv.writer(output)
+                    writer.writerow(GOOGLE_CSV_HEADER)
+                    _write_google_rows(writer, staff_name, shift_days)
+                else:
+                    _begin_ical(output)
+                    _write_ical_events(output, staff_name, shift_days)
+                    _end_ical(output)
+                zf.writestr(f"{staff_name}_schedule_{fiscal_stamp}.{extension}", output.getvalue())
+                staff_count += 1
+        
+        return buffer.getvalue(), f"all_staff_calendars_{extension}_{fiscal_stamp}.zip", staff_count
+        
+    except Exception as e:
+        print(f"Error generating all staff calendars: {e}")
+        return None, None, 0
@@ -0,0 +1,223 @@
+# modules/capacity_engine.py
+"""
+Vectorized staffing capacity for the 42-day pattern.
+
+A track's caps (track_configs) and day-of-week overrides (track_weekday_capacity)
+are resolved once per config version into a read-only 42 x 2 x 2 array indexed
+[day_index, shift, role] with SHIFT_CODES = ('D', 'N') and ROLES = ('nurse', 'medic').
+Live counts from the materialized day_staffing_counts table (see
+modules/staffing_counts.py) come back in the same shape, so remaining slots for
+every day, shift and role are one array subtraction.
+
+The config version is a cheap stamp (the config row's modified_date and the
+overrides' count/latest modified_date) plus an in-process generation that the
+db_utils config writers bump, so a cached array is never served stale.
+"""
+
+import sqlite3
+import threading
+import numpy as np
+
+from modules.cycle_calendar import DAYS_OF_WEEK, PATTERN_LENGTH
+
+SHIFT_CODES = ('D', 'N')
+ROLES = ('nurse', 'medic')
+
+# [shift, role] -> capacity field name
+CAP_FIELDS = (
+    ('max_day_nurses', 'max_day_medics'),
+    ('max_night_nurses', 'max_night_medics'),
+)
+
+_WEEKDAY_OF_INDEX = np.arange(PATTERN_LENGTH) % 7
+
+# track_name -> (version stamp, caps array)
+_capacity_cache = {}
+_capacity_lock = threading.Lock()
+_generation = 0
+
+
+def invalidate_capacity_cache(track_name=None):
+    """Drop cached caps after a config or override write (all tracks if None)"""
+    global _generation
+    with _capacity_lock:
+        _generation += 1
+        if track_name is None:
+            _capacity_cache.clear()
+        else:
+            _capacity_cache.pop(track_name, None)
+
+
+def _capacity_version(cursor, track_name):
+    cursor.execute(
+        "SELECT modified_date, use_weekday_capacity FROM track_configs WHERE track_name = ?",
+        (track_name,)
+    )
+    config_stamp = cursor.fetchone()
+    cursor.execute(
+        "SELECT COUNT(*), MAX(modified_date) FROM track_weekday_capacity WHERE track_name = ?",
+        (track_name,)
+    )
+    return (_generation, config_stamp, cursor.fetchone())
+
+
+def capacity_array_from_weekday_caps(weekday_caps):
+    """
+    Expand {weekday: {max_day_nurses, ...}} (get_track_capacity_by_weekday) to 42 days
+
+    Returns:
+        ndarray: int array of shape (42, 2, 2) indexed [day_index, shift, role]
+    """
+    weekday_table = np.zeros((7, len(SHIFT_CODES), len(ROLES)), dtype=np.int64)
+    for weekday_index, weekday in enumerate(DAYS_OF_WEEK):
+        caps = weekday_caps.get(weekday, {})
+        for shift_index, fields in enumerate(CAP_FIELDS):
+            for role_index, field in enumerate(fields):
+                weekday_table[weekday_index, shift_index, role_index] = caps.get(field) or 0
+    return weekday_table[_WEEKDAY_OF_INDEX]
+
+
+def max_possible_shifts(nurse_n, medic_n, dual_n, senior_n):
+    """
+    Largest number of complete Nurse+Medic crews that day's bidders could staff.
+
+    Dual-credentialed staff (already counted in nurse_n) can flex to the medic
+    side; this tries every split and keeps the best pairing, then caps the
+    result at how many no-matrix/senior staff bid that day. Direct translation
+    of the LET() formula in rows 99/104 of the FY26 Track Analysis workbook.
+    """
+    best = max(min(nurse_n - x, medic_n + x) for x in range(dual_n + 1))
+    return max(0, min(senior_n, best))
+
+
+def get_capacity_array(track_name):
+    """
+    Caps for every pattern day of a track, rebuilt only when its config version changes
+
+    Args:
+        track_name (str): track_configs.track_name
+
+    Returns:
+        ndarray: Read-only int array of shape (42, 2, 2) indexed [day_index, shift, role]
+    """
+    from modules.db_utils import get_db_connection, get_track_capacity_by_weekday
+
+    try:
+        version = _capacity_version(get_db_connection().cursor(), track_name)
+    except sqlite3.Error as e:
+        # Tables not created yet - build without caching
+        print(f"Error reading capacity version for {track_name}: {str(e)}")
+        version = None
+    cached = _capacity_cache.get(track_name)
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+
+    caps = capacity_array_from_weekday_caps(get_track_capacity_by_weekday(track_name))
+    caps.flags.writeable = False
+    if version is not None:
+        with _capacity_lock:
+            _capacity_cache[track_name] = (version, caps)
+    return caps
+
+
+def get_staffing_count_array(bid_track_name=None, preferences_df=None, staff_col_prefs=None,
+                             role_col=None, staffing_counts=None):
+    """
+    Live nurse/medic counts for every pattern day from day_staffing_counts
+
+    Dual-role tracks count as nurses. Tracks saved without a role are resolved
+    through the preferences file when one is given (see db_utils.get_shift_role_counts).
+
+    Args:
+        bid_track_name (str, optional): Count this cycle's submitted bids instead of the active roster
+        preferences_df (DataFrame, optional): Staff preferences for resolving unrecorded roles
+        staff_col_prefs (str, optional): Staff column in preferences_df
+        role_col (str, optional): Role column in preferences_df
+        staffing_counts (dict, optional): Result of get_day_staffing_counts() to reuse
+
+    Returns:
+        ndarray: int array of shape (42, 2, 2) indexed [day_index, shift, role]
+    """
+    from modules.db_utils import get_day_staffing_counts, get_shift_role_counts
+    from modules.cycle_calendar import DAY_KEYS
+
+    if staffing_counts is None:
+        staffing_counts = get_day_staffing_counts(bid_track_name)
+
+    counts = np.zeros((PATTERN_LENGTH, len(SHIFT_CODES), len(ROLES)), dtype=np.int64)
+    for (day_index, shift_code), role_counts in staffing_counts.items():
+        if shift_code not in SHIFT_CODES or not 0 <= day_index < PATTERN_LENGTH:
+            continue
+        shift_index = SHIFT_CODES.index(shift_code)
+        if role_counts.get('') and preferences_df is not None:
+            counts[day_index, shift_index] = get_shift_role_counts(
+                DAY_KEYS[day_index], shift_code, preferences_df, staff_col_prefs, role_col,
+                bid_track_name=bid_track_name, staffing_counts=staffing_counts
+            )
+        else:
+            counts[day_index, shift_index] = (
+                role_counts.get('nurse', 0) + role_counts.get('dual', 0),
+                role_counts.get('medic', 0),
+            )
+    return counts
+
+
+class RemainingSlots:
+    """Caps, live counts and remaining slots for all 42 days of one track"""
+
+    __slots__ = ('track_name', 'caps', 'counts', 'remaining')
+
+    def __init__(self, track_name, caps, counts):
+        self.track_name = track_name
+        self.caps = caps
+        self.counts = counts
+        self.remaining = caps - counts
+
+    @property
+    def needed(self):
+        """Bool array [day_index, shift, role]: True where the role is still short"""
+        return self.remaining > 0
+
+    def staffing_analysis(self, day_index, shift_code):
+        """
+        The staffing_analysis dict track modification uses for one day/shift
+
+        Returns:
+            dict: current/max counts and needs for nurses and medics
+        """
+        shift_index = SHIFT_CODES.index(shift_code)
+        nurses, medics = (int(v) for v in self.counts[day_index, shift_index])
+        max_nurses, max_medics = (int(v) for v in self.caps[day_index, shift_index])
+        nurse_needs, medic_needs = (int(v) for v in self.remaining[day_index, shift_index])
+        return {
+            'current_nurses': nurses,
+            'current_medics': medics,
+            'max_nurses': max_nurses,
+            'max_medics': max_medics,
+            'nurse_needs': nurse_needs,
+            'medic_needs': medic_needs,
+            'nurses_needed': nurse_needs > 0,
+            'medics_needed': medic_needs > 0
+        }
+
+
+def get_remaining_slots(track_name, bid_track_name=None, preferences_df=None,
+                        staff_col_prefs=None, role_col=None, staffing_counts=None):
+    """
+    Remaining nurse/medic slots on every day and shift, in one call
+
+    Args:
+        track_name (str): Track config whose caps apply
+        bid_track_name (str, optional): Count this cycle's submitted bids instead of the active roster
+        preferences_df (DataFrame, optional): Staff preferences for resolving unrecorded roles
+        staff_col_prefs (str, optional): Staff column in preferences_df
+        role_col (str, optional): Role column in preferences_df
+        staffing_counts (dict, optional): Result of get_day_staffing_counts() to reuse
+
+    Returns:
+        RemainingSlots: caps, counts and remaining arrays of shape (42, 2, 2)
+    """
+    caps = get_capacity_array(track_name)
+    counts = get_staffing_count_array(bid_track_name, preferences_df, staff_col_prefs,
+                                      role_col, staffing_counts)
+    return RemainingSlots(track_name, caps, counts)
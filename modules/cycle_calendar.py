@@ -0,0 +1,232 @@
+# modules/cycle_calendar.py
+"""
+Shared 42-day cycle calendar.
+
+Every track uses the same 6-week pattern ("Sun A 1" .. "Sat C 6"), three
+14-day pay-period blocks (A, B, C) repeating continuously from PATTERN_ANCHOR.
+A CycleCalendar precomputes everything modules used to re-derive per call:
+the ordered day keys, index <-> label <-> calendar date arrays, weekday and
+weekend masks, pay-period and week boundaries, and the fiscal-year date axis
+for one track_configs row. Calendars are built once per track name and shared
+through get_cycle_calendar().
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+import numpy as np
+from modules.query_profiler import open_connection
+
+DAYS_OF_WEEK = ("Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat")
+BLOCK_LETTERS = ("A", "B", "C")
+PATTERN_LENGTH = 42
+PAY_PERIOD_LENGTH = 14
+PATTERN_ANCHOR = date(2025, 9, 14)  # Sun A 1
+
+DEFAULT_TRACK_NAME = 'FY26'
+DEFAULT_FISCAL_YEAR = 2026
+
+# "Sun A 1", "Mon A 1", ... "Sat C 6"
+DAY_KEYS = tuple(
+    f"{DAYS_OF_WEEK[i % 7]} {BLOCK_LETTERS[i // PAY_PERIOD_LENGTH]} {i // 7 + 1}"
+    for i in range(PATTERN_LENGTH)
+)
+DAY_INDEX = {key: i for i, key in enumerate(DAY_KEYS)}
+
+_FISCAL_YEAR_RE = re.compile(r'FY\s*(\d{2}|\d{4})', re.IGNORECASE)
+
+
+def fiscal_year_for_track(track_name):
+    """
+    Fiscal year a track name refers to ("FY26" -> 2026)
+
+    Returns:
+        int or None: Four-digit fiscal year, or None if the name has no FY number
+    """
+    match = _FISCAL_YEAR_RE.search(str(track_name or ''))
+    if not match:
+        return None
+    year = int(match.group(1))
+    return year + 2000 if year < 100 else year
+
+
+def fiscal_year_bounds(fiscal_year):
+    """
+    First and last day of a fiscal year: 52 weeks starting on the Sunday on or
+    before October 1 of the previous calendar year (FY26 = 9/28/2025 - 9/26/2026)
+
+    Returns:
+        tuple: (start date, end date)
+    """
+    oct_first = date(fiscal_year - 1, 10, 1)
+    start = oct_first - timedelta(days=(oct_first.weekday() + 1) % 7)
+    return start, start + timedelta(days=363)
+
+
+def _as_date(value):
+    """Accept date, datetime, numpy datetime64 or 'MM/DD/YYYY' strings"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, np.datetime64):
+        return value.astype('datetime64[D]').astype(date)
+    return datetime.strptime(value, '%m/%d/%Y').date()
+
+
+class CycleCalendar:
+    """
+    Precomputed day schema and calendar mapping for one track
+
+    Pattern arrays have PATTERN_LENGTH entries (one per day key); fiscal-year
+    arrays have one entry per calendar day from fiscal_start to fiscal_end.
+    """
+
+    def __init__(self, track_name=DEFAULT_TRACK_NAME, fiscal_year=None, pattern_anchor=PATTERN_ANCHOR):
+        self.track_name = track_name
+        self.fiscal_year = fiscal_year or fiscal_year_for_track(track_name) or DEFAULT_FISCAL_YEAR
+        self.pattern_anchor = pattern_anchor
+        self.fiscal_start, self.fiscal_end = fiscal_year_bounds(self.fiscal_year)
+
+        # Pattern axis (42 days)
+        self.day_keys = DAY_KEYS
+        self.day_index = DAY_INDEX
+        index = np.arange(PATTERN_LENGTH)
+        self.weekday = index % 7                        # 0 = Sun ... 6 = Sat
+        self.week_number = index // 7 + 1               # 1 - 6
+        self.block_index = index // PAY_PERIOD_LENGTH   # 0 - 2, also the pay period
+        self.weekday_names = np.array(DAYS_OF_WEEK, dtype=object)[self.weekday]
+        self.block_letters = np.array(BLOCK_LETTERS, dtype=object)[self.block_index]
+        self.week_start_mask = self.weekday == 0
+        self.week_end_mask = self.weekday == 6
+        self.pay_period_start_mask = (index % PAY_PERIOD_LENGTH) == 0
+        self.pay_period_end_mask = (index % PAY_PERIOD_LENGTH) == PAY_PERIOD_LENGTH - 1
+        # Fri/Sat/Sun - the days weekend groups are built from
+        self.weekend_mask = np.isin(self.weekday, (0, 5, 6))
+
+        # Fiscal-year axis
+        anchor = np.datetime64(pattern_anchor, 'D')
+        self.dates = np.arange(np.datetime64(self.fiscal_start, 'D'),
+                               np.datetime64(self.fiscal_end, 'D') + 1)
+        self.pattern_index = (self.dates - anchor).astype(np.int64) % PATTERN_LENGTH
+        self.date_labels = np.array(DAY_KEYS, dtype=object)[self.pattern_index]
+        self.date_pay_period_end_mask = self.pay_period_end_mask[self.pattern_index]
+
+        # Day key -> every fiscal-year date that falls on it
+        self._dates_by_index = [self.dates[self.pattern_index == i] for i in range(PATTERN_LENGTH)]
+
+        # Calendars are shared by every session, so the arrays are read-only
+        for value in list(vars(self).values()) + self._dates_by_index:
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+    def __repr__(self):
+        return f"CycleCalendar({self.track_name!r}, {self.fiscal_start} - {self.fiscal_end})"
+
+    @property
+    def day_count(self):
+        return len(self.dates)
+
+    def weekday_mask(self, weekday_name):
+        """Pattern-axis mask for one weekday ('Sun' ... 'Sat')"""
+        return self.weekday == DAYS_OF_WEEK.index(weekday_name)
+
+    def index_for_date(self, value):
+        """Pattern index (0-41) of a calendar date"""
+        return (_as_date(value) - self.pattern_anchor).days % PATTERN_LENGTH
+
+    def label_for_date(self, value):
+        """Day key ("Sun A 1") of a calendar date"""
+        return DAY_KEYS[self.index_for_date(value)]
+
+    def label_for_index(self, day_index):
+        """Day key for a pattern index, or "Day N" outside the 42-day pattern"""
+        if 0 <= day_index < PATTERN_LENGTH:
+            return DAY_KEYS[day_index]
+        return f"Day {day_index + 1}"
+
+    def dates_for_label(self, day_key):
+        """Every fiscal-year date (datetime64[D] array) that falls on a day key"""
+        return self._dates_by_index[DAY_INDEX[day_key]]
+
+    def is_pay_period_end(self, value):
+        return bool(self.pay_period_end_mask[self.index_for_date(value)])
+
+    def cycle_start_on_or_before(self, value):
+        """Date of the Sun A 1 that starts the cycle containing value"""
+        value = _as_date(value)
+        return value - timedelta(days=self.index_for_date(value))
+
+    def cycle_dates(self, cycle_start):
+        """The 42 calendar dates of the cycle starting at cycle_start, in day-key order"""
+        cycle_start = _as_date(cycle_start)
+        return [cycle_start + timedelta(days=i) for i in range(PATTERN_LENGTH)]
+
+    def block_ranges(self, until=None):
+        """
+        Successive 42-day cycles (Sun A 1 to Sat C 6), from the first one starting
+        on or after fiscal_start through the one containing `until`
+
+        Args:
+            until (date, optional): Last date to cover (defaults to fiscal_end)
+
+        Returns:
+            list[tuple[date, date]]: (cycle_start, cycle_end) pairs, in order
+        """
+        until = _as_date(until) if until is not None else self.fiscal_end
+        offset = (PATTERN_LENGTH - self.index_for_date(self.fiscal_start)) % PATTERN_LENGTH
+        current = self.fiscal_start + timedelta(days=offset)
+        ranges = []
+        while True:
+            end = current + timedelta(days=PATTERN_LENGTH - 1)
+            ranges.append((current, end))
+            if end >= until:
+                break
+            current = end + timedelta(days=1)
+        return ranges
+
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+
+def _active_track_name(db_path):
+    try:
+        conn = open_connection(db_path)
+        try:
+            row = conn.execute("SELECT track_name FROM track_configs WHERE is_active = 1 LIMIT 1").fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else DEFAULT_TRACK_NAME
+    except sqlite3.Error:
+        return DEFAULT_TRACK_NAME
+
+
+def get_cycle_calendar(track=None, db_path='data/medflight_tracks.db'):
+    """
+    Shared CycleCalendar for a track, built once per track name
+
+    Args:
+        track (str or dict, optional): Track name or track_configs row; defaults
+            to the active track
+        db_path (str): Database used to resolve the active track
+
+    Returns:
+        CycleCalendar: Shared, read-only calendar
+    """
+    if isinstance(track, dict):
+        track_name = track.get('track_name') or DEFAULT_TRACK_NAME
+    elif track:
+        track_name = track
+    else:
+        track_name = _active_track_name(db_path)
+
+    calendar = _calendars.get(track_name)
+    if calendar is None:
+        with _calendars_lock:
+            calendar = _calendars.get(track_name)
+            if calendar is None:
+                calendar = CycleCalendar(track_name)
+                _calendars[track_name] = calendar
+    return calendar
@@ -13,12 +13,47 @@ import streamlit as st
 import threading
 import pytz
 
+from modules.staffing_counts import (
+    ensure_day_staffing_table,
+    rebuild_day_staffing_counts,
+    check_day_staffing_counts,
+    staffing_state,
+    staffing_state_for_ids,
+    apply_staffing_change,
+    query_day_staffing,
+    unassigned_role_staff,
+    day_index_for,
+)
+from modules.capacity_engine import invalidate_capacity_cache
+from modules.post_commit_jobs import ensure_post_commit_jobs_table, enqueue_job, dispatch_jobs
+from modules.track_codes import (
+    ensure_day_schema_column,
+    migrate_track_data,
+    encode_track_data,
+    decode_track_data,
+    get_day_schema,
+    invalidate_day_schema_cache,
+    DEFAULT_SCHEMA,
+)
+from modules.track_history_store import (
+    ensure_track_history_columns,
+    migrate_track_history,
+    append_track_history,
+    TrackHistoryReader,
+)
+from modules.query_cache import ensure_data_versions, versioned_cache
+from modules.instrumentation import instrument_module
+from modules.query_profiler import open_connection
+
 # Eastern timezone for user-facing timestamps
 _eastern_tz = pytz.timezone('America/New_York')
 
 # Dictionary to store thread-local connections
 thread_local_connections = {}
 
+# id() of connections whose database initialize_database() has already set up
+_initialized_connections = set()
+
 def get_db_connection():
     """
     Get a SQLite database connection for the current thread
@@ -37,7 +72,7 @@ def get_db_connection():
     os.makedirs('data', exist_ok=True)
     
     # Create a new connection for this thread
-    conn = sqlite3.connect('data/medflight_tracks.db')
+    conn = open_connection('data/medflight_tracks.db')
     
     # Store it in our thread-local dictionary
     thread_local_connections[thread_id] = conn
@@ -56,6 +91,7 @@ def close_all_connections():
     
     # Clear the dictionary
     thread_local_connections = {}
+    _initialized_connections.clear()
 
 def verify_database_integrity():
     """
@@ -100,24 +136,28 @@ def verify_database_integrity():
             print(f"Missing columns in tracks table: {missing_columns}")
             return False
         
-        # Test data integrity - check for corrupted JSON in track_data
-        cursor.execute("SELECT id, staff_name, track_data FROM tracks WHERE is_active = 1")
+        # Test data integrity - check for corrupted JSON / code bytes in track_data
+        cursor.execute("SELECT id, staff_name, track_name, track_data FROM tracks WHERE is_active = 1")
         tracks = cursor.fetchall()
         
-        for track_id, staff_name, track_data in tracks:
+        for track_id, staff_name, track_name, track_data in tracks:
             try:
-                json.loads(track_data)
-            except json.JSONDecodeError:
-                print(f"Corrupted JSON data found for track ID {track_id} (staff: {staff_name})")
+                decode_track_data(track_data, get_day_schema(cursor, track_name))
+            except (ValueError, TypeError):
+                print(f"Corrupted track data found for track ID {track_id} (staff: {staff_name})")
                 return False
         
-        # Test write capability
-        test_timestamp = datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("INSERT INTO track_history (track_id, staff_name, track_data, submission_date, status) VALUES (?, ?, ?, ?, ?)",
-                      (0, "INTEGRITY_TEST", "{}", test_timestamp, "integrity_check"))
+        # Test write capability - taking the write lock proves the database is
+        # writable without inserting and deleting a probe row
+        if conn.in_transaction:
+            conn.commit()
+        cursor.execute("BEGIN IMMEDIATE")
         
-        # Remove the test record
-        cursor.execute("DELETE FROM track_history WHERE staff_name = 'INTEGRITY_TEST' AND status = 'integrity_check'")
+        # Materialized staffing counts must match the tracks they summarize
+        staffing_drift = check_day_staffing_counts(cursor)
+        if staffing_drift:
+            print(f"day_staffing_counts had {len(staffing_drift)} stale row(s) - rebuilt")
+            rebuild_day_staffing_counts(cursor)
         
         conn.commit()
         
@@ -125,6 +165,9 @@ def verify_database_integrity():
         
     except Exception as e:
         print(f"Database integrity check failed: {str(e)}")
+        # Don't keep holding the write lock taken by the check
+        if threading.get_ident() in thread_local_connections:
+            thread_local_connections[threading.get_ident()].rollback()
         return False
 
 def initialize_database():
@@ -172,6 +215,8 @@ def initialize_database():
             track_data TEXT NOT NULL,
             submission_date TEXT NOT NULL,
             status TEXT NOT NULL,
+            notes TEXT,
+            encoding TEXT,
             FOREIGN KEY (track_id) REFERENCES tracks(id)
         )
         ''')
@@ -379,11 +424,35 @@ def initialize_database():
                     night_klwm = COALESCE(night_klwm, 1),
                     night_kbed = COALESCE(night_kbed, 2),
                     night_kpym = COALESCE(night_kpym, 2)
-                WHERE track_name = 'FY26'
+                WHERE track_name = 'FY26' AND (
+                    max_day_nurses IS NULL OR max_day_medics IS NULL OR max_night_nurses IS NULL OR max_night_medics IS NULL OR
+                    day_vehicles IS NULL OR night_vehicles IS NULL OR day_leave_slots IS NULL OR night_leave_slots IS NULL OR
+                    min_day_staff IS NULL OR min_night_staff IS NULL OR day_kmht IS NULL OR day_klwm IS NULL OR
+                    day_kbed IS NULL OR day_1b9 IS NULL OR day_kpym IS NULL OR night_klwm IS NULL OR
+                    night_kbed IS NULL OR night_kpym IS NULL)
             ''')
 
         # Backfill track_name on any existing rows that are still NULL
         cursor.execute("UPDATE tracks SET track_name = 'FY26' WHERE track_name IS NULL")
+        backfilled_tracks = cursor.rowcount
+
+        # Materialized per-day staffing counts (see modules/staffing_counts.py);
+        # filled from the existing tracks the first time the table is created
+        if ensure_day_staffing_table(cursor) or backfilled_tracks > 0:
+            rebuild_day_staffing_counts(cursor)
+
+        # Background work recorded by writers in their own transaction (see modules/post_commit_jobs.py)
+        ensure_post_commit_jobs_table(cursor)
+
+        # Delta-encoded history (see modules/track_history_store.py); rows written
+        # before the encoding column existed are re-encoded once
+        if ensure_track_history_columns(cursor):
+            migrate_track_history(cursor)
+
+        # Compact track_data (see modules/track_codes.py): each cycle's day schema
+        # lives in track_configs; existing JSON tracks are re-encoded once
+        if ensure_day_schema_column(cursor):
+            migrate_track_data(cursor)
 
         # NEW: Create summer_leave_requests table for vacation time selections
         cursor.execute('''
@@ -398,6 +467,9 @@ def initialize_database():
             status TEXT DEFAULT 'active'
         )
         ''')
+        # Serves the per-week capacity check of reserve_summer_leave_week
+        cursor.execute("""CREATE INDEX IF NOT EXISTS idx_summer_leave_week_role
+                          ON summer_leave_requests (week_start_date, role, status)""")
 
         # NEW: Create summer_leave_config table for LT_OPEN status per user
         cursor.execute('''
@@ -452,6 +524,10 @@ def initialize_database():
         if 'trigger_type' not in bpl_columns:
             cursor.execute("ALTER TABLE bid_progression_log ADD COLUMN trigger_type TEXT DEFAULT 'auto'")
 
+        # Per-table version counters bumped by triggers; cached reads are keyed
+        # on them (see modules/query_cache.py)
+        ensure_data_versions(cursor)
+
         # Commit changes
         conn.commit()
         
@@ -589,17 +665,18 @@ def save_track_to_db(staff_name, track_data, is_new=False, track_name=None):
             # Enhanced format with metadata
             actual_track_data = track_data['track_data']
             metadata = track_data['staff_metadata']
-            track_json = json.dumps(actual_track_data)
         else:
             # Legacy format - just track data
             actual_track_data = track_data
             metadata = {}
-            track_json = json.dumps(actual_track_data)
         
         # Resolve track_name: default to the active track config
         if not track_name:
             active_cfg = get_active_track_config()
             track_name = active_cfg['track_name'] if active_cfg else 'FY26'
+        
+        # Code bytes when the track fits the cycle's day schema, JSON otherwise
+        track_json = encode_track_data(actual_track_data, get_day_schema(cursor, track_name))
 
         # Get current date and time
         submission_date = datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S")
@@ -610,6 +687,7 @@ def save_track_to_db(staff_name, track_data, is_new=False, track_name=None):
             (staff_name, track_name)
         )
         existing_track = cursor.fetchone()
+        staffing_before = staffing_state_for_ids(cursor, [existing_track[0] if existing_track else None])
         
         if existing_track and not is_new:
             # Update existing track
@@ -618,10 +696,7 @@ def save_track_to_db(staff_name, track_data, is_new=False, track_name=None):
             new_version = current_version + 1
             
             # First, add entry to track_history
-            cursor.execute(
-                "INSERT INTO track_history (track_id, staff_name, track_data, submission_date, status) VALUES (?, ?, ?, ?, ?)",
-                (track_id, staff_name, track_json, submission_date, "updated")
-            )
+            append_track_history(cursor, track_id, staff_name, actual_track_data, submission_date, "updated")
             
             # Then update the main tracks table with new version number and metadata
             if metadata:
@@ -671,10 +746,7 @@ def save_track_to_db(staff_name, track_data, is_new=False, track_name=None):
                 )
                 
                 # Add entry to track_history for deactivation
-                cursor.execute(
-                    "INSERT INTO track_history (track_id, staff_name, track_data, submission_date, status) VALUES (?, ?, ?, ?, ?)",
-                    (track_id, staff_name, "{}", submission_date, "deactivated")
-                )
+                append_track_history(cursor, track_id, staff_name, "{}", submission_date, "deactivated")
             
             # Insert new track with metadata if available
             if metadata:
@@ -707,15 +779,16 @@ def save_track_to_db(staff_name, track_data, is_new=False, track_name=None):
             track_id = cursor.lastrowid
             
             # Add entry to track_history
-            cursor.execute(
-                "INSERT INTO track_history (track_id, staff_name, track_data, submission_date, status) VALUES (?, ?, ?, ?, ?)",
-                (track_id, staff_name, track_json, submission_date, "created")
-            )
+            append_track_history(cursor, track_id, staff_name, actual_track_data, submission_date, "created")
             
             message = f"New track saved for {staff_name}"
             if metadata.get('effective_role'):
                 message += f" (role: {metadata.get('effective_role')})"
         
+        # Keep the per-day staffing counts in step, in the same transaction
+        affected_ids = [existing_track[0] if existing_track else None, track_id]
+        apply_staffing_change(cursor, staffing_before, staffing_state_for_ids(cursor, set(affected_ids)))
+        
         # Commit changes
         conn.commit()
         
@@ -749,7 +822,7 @@ def get_track_from_db(staff_name, track_name=None):
 
         if track_name:
             cursor.execute("""
-                SELECT id, track_data, submission_date, is_approved, version,
+                SELECT id, track_name, track_data, submission_date, is_approved, version,
                        original_role, effective_role, track_source, has_preassignments, preassignment_count
                 FROM tracks
                 WHERE staff_name = ? AND track_name = ?
@@ -757,7 +830,7 @@ def get_track_from_db(staff_name, track_name=None):
             """, (staff_name, track_name))
         else:
             cursor.execute("""
-                SELECT id, track_data, submission_date, is_approved, version,
+                SELECT id, track_name, track_data, submission_date, is_approved, version,
                        original_role, effective_role, track_source, has_preassignments, preassignment_count
                 FROM tracks
                 WHERE staff_name = ? AND is_active = 1
@@ -765,11 +838,11 @@ def get_track_from_db(staff_name, track_name=None):
         result = cursor.fetchone()
         
         if result:
-            track_id, track_json, submission_date, is_approved, version, original_role, effective_role, track_source, has_preassignments, preassignment_count = result
+            track_id, row_track_name, track_json, submission_date, is_approved, version, original_role, effective_role, track_source, has_preassignments, preassignment_count = result
             
-            # Convert JSON string back to dictionary
+            # Code bytes are decoded with the cycle's schema; legacy JSON is parsed as before
             try:
-                track_data = json.loads(track_json)
+                track_data = decode_track_data(track_json, get_day_schema(cursor, row_track_name))
                 
                 # Return enhanced track data with metadata
                 return (True, {
@@ -798,6 +871,7 @@ def get_track_from_db(staff_name, track_name=None):
         print(error_message)
         return (False, error_message)
 
+@versioned_cache('tracks', 'track_configs', cache_if=lambda result: result[0])
 def get_all_active_tracks():
     """
     Get all active tracks from the database for staffing analysis
@@ -816,7 +890,7 @@ def get_all_active_tracks():
         
         # Query for all active tracks with metadata
         cursor.execute("""
-            SELECT staff_name, track_data, submission_date, version,
+            SELECT staff_name, track_name, track_data, submission_date, version,
                    original_role, effective_role, track_source, has_preassignments, preassignment_count
             FROM tracks 
             WHERE is_active = 1 
@@ -828,11 +902,11 @@ def get_all_active_tracks():
             # Format results with enhanced metadata
             tracks = []
             for row in results:
-                staff_name, track_json, submission_date, version, original_role, effective_role, track_source, has_preassignments, preassignment_count = row
+                staff_name, row_track_name, track_json, submission_date, version, original_role, effective_role, track_source, has_preassignments, preassignment_count = row
                 
-                # Convert JSON string back to dictionary
+                # Code bytes are decoded with the cycle's schema; legacy JSON is parsed as before
                 try:
-                    track_data = json.loads(track_json)
+                    track_data = decode_track_data(track_json, get_day_schema(cursor, row_track_name))
                     tracks.append({
                         'staff_name': staff_name,
                         'track_data': track_data,
@@ -860,10 +934,90 @@ def get_all_active_tracks():
         print(error_message)
         return (False, error_message)
 
+def ensure_database_initialized():
+    """
+    Run initialize_database() once per connection, for read paths hit on every rerun
+    
+    Returns:
+        bool: True if the schema is in place, False otherwise
+    """
+    conn = get_db_connection()
+    if id(conn) in _initialized_connections:
+        return True
+    if not initialize_database():
+        return False
+    _initialized_connections.add(id(conn))
+    return True
+
+def get_day_staffing_counts(bid_track_name=None):
+    """
+    Per-day staffing counts from the materialized day_staffing_counts table
+    
+    Args:
+        bid_track_name (str, optional): Count the submitted bids of this bidding
+            cycle instead of the active roster
+        
+    Returns:
+        dict: (day_index, shift_code) -> {role: count}; role is the track's stored
+            effective_role, '' for tracks saved without one
+    """
+    try:
+        ensure_database_initialized()
+        conn = get_db_connection()
+        return query_day_staffing(conn.cursor(), bid_track_name)
+    except Exception as e:
+        print(f"Error getting day staffing counts: {str(e)}")
+        return {}
+
+def get_shift_role_counts(day, shift_type, preferences_df, staff_col_prefs, role_col,
+                          bid_track_name=None, staffing_counts=None):
+    """
+    Nurses and medics on a day/shift, read from the materialized staffing counts
+    
+    Tracks count under their stored effective role (dual counts as nurse). Tracks
+    saved without a role fall back to the staff member's role in the preferences file.
+    
+    Args:
+        day (str): The day to check
+        shift_type (str): "D" for day or "N" for night
+        preferences_df (DataFrame): Staff preferences data for role lookup
+        staff_col_prefs (str): Column name for staff in preferences
+        role_col (str): Column name for role in preferences
+        bid_track_name (str, optional): Count bids for this cycle instead of the active roster
+        staffing_counts (dict, optional): Result of get_day_staffing_counts() to reuse
+        
+    Returns:
+        tuple: (nurse_count, medic_count)
+    """
+    day_index = day_index_for(day)
+    if day_index is None:
+        return 0, 0
+    
+    if staffing_counts is None:
+        staffing_counts = get_day_staffing_counts(bid_track_name)
+    role_counts = staffing_counts.get((day_index, shift_type), {})
+    
+    nurse_count = role_counts.get('nurse', 0) + role_counts.get('dual', 0)
+    medic_count = role_counts.get('medic', 0)
+    
+    if role_counts.get(''):
+        # Tracks without a stored role: look the staff member up in the preferences file
+        cursor = get_db_connection().cursor()
+        for staff_name in unassigned_role_staff(cursor, day, shift_type, bid_track_name):
+            staff_info = preferences_df[preferences_df[staff_col_prefs] == staff_name]
+            if not staff_info.empty:
+                staff_role = staff_info.iloc[0][role_col]
+                if staff_role in ["nurse", "dual"]:
+                    nurse_count += 1
+                elif staff_role == "medic":
+                    medic_count += 1
+    
+    return nurse_count, medic_count
+
 def get_database_staff_count_by_role(day, shift_type, preferences_df, staff_col_prefs, role_col):
     """
     Get count of staff assigned to a specific day and shift type from the database
-    UPDATED: Enhanced to use effective role metadata when available
+    UPDATED: Reads the materialized day_staffing_counts table instead of scanning tracks
     
     Args:
         day (str): The day to check
@@ -876,42 +1030,9 @@ def get_database_staff_count_by_role(day, shift_type, preferences_df, staff_col_
         dict: Dictionary with nurse_count and medic_count
     """
     try:
-        # Get all active tracks
-        success, tracks_data = get_all_active_tracks()
-        if not success:
-            return {"nurse_count": 0, "medic_count": 0}
-        
-        nurse_count = 0
-        medic_count = 0
-        
-        for track in tracks_data:
-            staff_name = track['staff_name']
-            track_data = track['track_data']
-            metadata = track.get('metadata', {})
-            
-            # Check if this staff has the specified shift type on this day
-            if day in track_data and track_data[day] == shift_type:
-                # Try to use effective role from metadata first
-                effective_role = metadata.get('effective_role')
-                
-                if effective_role:
-                    # Use the stored effective role
-                    if effective_role == "nurse":
-                        nurse_count += 1
-                    elif effective_role == "medic":
-                        medic_count += 1
-                else:
-                    # Fallback to preferences lookup
-                    staff_info = preferences_df[preferences_df[staff_col_prefs] == staff_name]
-                    if not staff_info.empty:
-                        staff_role = staff_info.iloc[0][role_col]
-                        
-                        # Count based on role (treat dual as nurse)
-                        if staff_role in ["nurse", "dual"]:
-                            nurse_count += 1
-                        elif staff_role == "medic":
-                            medic_count += 1
-        
+        nurse_count, medic_count = get_shift_role_counts(
+            day, shift_type, preferences_df, staff_col_prefs, role_col
+        )
         return {"nurse_count": nurse_count, "medic_count": medic_count}
         
     except Exception as e:
@@ -1081,7 +1202,7 @@ def get_track_history_from_db(staff_name, limit=10):
         # Query database for staff member's track history with role info
         cursor.execute(
             """
-            SELECT h.id, t.id, h.track_data, h.submission_date, h.status, t.version, t.is_active,
+            SELECT h.id, t.id, h.encoding, h.track_data, h.submission_date, h.status, t.version, t.is_active,
                    t.original_role, t.effective_role, t.track_source, t.has_preassignments, t.preassignment_count
             FROM track_history h
             JOIN tracks t ON h.track_id = t.id
@@ -1096,13 +1217,16 @@ def get_track_history_from_db(staff_name, limit=10):
         if results:
             # Format results with metadata
             history = []
+            reader = TrackHistoryReader(conn.cursor())
             for row in results:
-                history_id, track_id, track_json, submission_date, status, version, is_active, original_role, effective_role, track_source, has_preassignments, preassignment_count = row
+                history_id, track_id, encoding, payload, submission_date, status, version, is_active, original_role, effective_role, track_source, has_preassignments, preassignment_count = row
                 
-                # Convert JSON string back to dictionary
+                # Rebuild the track as of this entry from its keyframe/delta chain
                 try:
-                    track_data = json.loads(track_json)
-                except:
+                    track_data = reader.decode(history_id, track_id, encoding, payload)
+                except Exception:
+                    track_data = {}
+                if not isinstance(track_data, dict):
                     track_data = {}
                 
                 history.append({
@@ -1156,7 +1280,7 @@ def check_database_connection():
                 return (False, "Failed to initialize database")
         
         # Try to connect to the database
-        conn = sqlite3.connect(db_path)
+        conn = open_connection(db_path)
         cursor = conn.cursor()
         
         # Check if tracks table exists
@@ -1227,6 +1351,8 @@ def cleanup_inactive_tracks():
             return (True, "No inactive tracks to clean up")
         
         # Delete old inactive tracks
+        stale_where = "is_active = 0 AND datetime(submission_date) < datetime('now', '-30 days')"
+        staffing_before = staffing_state(cursor, stale_where)
         cursor.execute(
             """
             DELETE FROM tracks 
@@ -1234,6 +1360,7 @@ def cleanup_inactive_tracks():
             AND datetime(submission_date) < datetime('now', '-30 days')
             """
         )
+        apply_staffing_change(cursor, staffing_before, {})
         
         # Commit changes
         conn.commit()
@@ -1467,6 +1594,7 @@ def get_location_preferences_from_db(staff_name):
         print(error_message)
         return (False, None)
 
+@versioned_cache('user_location_preferences', cache_if=lambda result: result[0])
 def get_all_location_preferences():
     """
     Get all active location preferences from the database
@@ -1726,47 +1854,124 @@ def cancel_summer_leave_selection(staff_name):
         print(error_msg)
         return (False, error_msg)
 
-def get_week_selections_by_role(week_start_date, role):
+# Roles whose weekly caps count shifts (others count people)
+SUMMER_LEAVE_SHIFT_BASED_ROLES = ('NURSE', 'MEDIC')
+
+
+def reserve_summer_leave_week(staff_name, role, week_start_date, week_end_date, cap, shifts_used=None):
     """
-    Get total shifts used or person count for a specific week and role
+    Take a summer leave week only if it still has room under the role's cap
 
-    For NURSE/MEDIC: Returns sum of shifts_used (shift-based caps)
-    For other roles: Returns count of people (person-based caps)
+    The capacity check and the write are one conditional INSERT inside an
+    IMMEDIATE transaction, so two people racing for the last slot can't both
+    get it. The staff member's own earlier selection doesn't count against the cap.
 
     Args:
+        staff_name (str): Name of staff member
+        role (str): Staff member's role
         week_start_date (str): Start date of week (YYYY-MM-DD)
-        role (str): Role to filter by
+        week_end_date (str): End date of week (YYYY-MM-DD)
+        cap (int): Weekly cap for the role (shifts for NURSE/MEDIC, people otherwise)
+        shifts_used (int): Number of shifts being used (NURSE/MEDIC)
 
     Returns:
-        int: Total shifts used (NURSE/MEDIC) or person count (others) for this week and role
+        tuple: (success, message)
     """
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        if conn.in_transaction:
+            conn.commit()
+        cursor.execute("BEGIN IMMEDIATE")
 
-        # Shift-based counting for NURSE/MEDIC
-        if role in ['NURSE', 'MEDIC']:
-            cursor.execute("""
-                SELECT SUM(shifts_used) FROM summer_leave_requests
-                WHERE week_start_date = ? AND role = ? AND status = 'active'
-            """, (week_start_date, role))
+        current_date = datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S")
+        shift_based = role in SUMMER_LEAVE_SHIFT_BASED_ROLES
 
-            result = cursor.fetchone()
-            return result[0] if result and result[0] is not None else 0
-        else:
-            # Person-based counting for CCEMT, AMT, etc.
-            cursor.execute("""
-                SELECT COUNT(*) FROM summer_leave_requests
-                WHERE week_start_date = ? AND role = ? AND status = 'active'
-            """, (week_start_date, role))
+        # The SELECT's WHERE is the cap check: no row is produced when the week is full
+        cursor.execute("""
+            INSERT INTO summer_leave_requests
+            (staff_name, role, week_start_date, week_end_date, selection_date, status, shifts_used)
+            SELECT ?, ?, ?, ?, ?, 'active', ?
+            WHERE (
+                SELECT CASE WHEN ? THEN COALESCE(SUM(shifts_used), 0) + COALESCE(?, 0) ELSE COUNT(*) + 1 END
+                FROM summer_leave_requests
+                WHERE week_start_date = ? AND role = ? AND status = 'active' AND staff_name != ?
+            ) <= ?
+            ON CONFLICT(staff_name) DO UPDATE SET
+                role = excluded.role,
+                week_start_date = excluded.week_start_date,
+                week_end_date = excluded.week_end_date,
+                modified_date = excluded.selection_date,
+                status = 'active',
+                shifts_used = excluded.shifts_used
+        """, (staff_name, role, week_start_date, week_end_date, current_date, shifts_used,
+              shift_based, shifts_used, week_start_date, role, staff_name, cap))
+        reserved = cursor.rowcount > 0
 
-            result = cursor.fetchone()
-            return result[0] if result else 0
+        conn.commit()
+        if not reserved:
+            return (False, "This week is full and cannot be selected. Please choose a different week.")
+        return (True, f"Saved leave selection for {staff_name}")
 
     except Exception as e:
-        print(f"Error getting week selections: {str(e)}")
+        if threading.get_ident() in thread_local_connections:
+            thread_local_connections[threading.get_ident()].rollback()
+        error_msg = f"Error reserving summer leave week: {str(e)}"
+        print(error_msg)
+        return (False, error_msg)
+
+@versioned_cache('summer_leave_requests', cache_if=lambda result: result[0])
+def get_summer_leave_usage_grid():
+    """
+    Get usage of every summer week for every role in one query
+
+    For NURSE/MEDIC the usage is the sum of shifts_used (shift-based caps),
+    for other roles it is the number of people (person-based caps).
+
+    Returns:
+        tuple: (success, dict (week_start_date, role) -> usage or error_message)
+    """
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT week_start_date, role, COALESCE(SUM(shifts_used), 0), COUNT(*)
+            FROM summer_leave_requests
+            WHERE status = 'active'
+            GROUP BY week_start_date, role
+        """)
+
+        grid = {}
+        for week_start_date, role, shifts, people in cursor.fetchall():
+            grid[(week_start_date, role)] = shifts if role in SUMMER_LEAVE_SHIFT_BASED_ROLES else people
+        return (True, grid)
+
+    except Exception as e:
+        error_msg = f"Error getting summer leave usage: {str(e)}"
+        print(error_msg)
+        return (False, error_msg)
+
+def get_week_selections_by_role(week_start_date, role):
+    """
+    Get total shifts used or person count for a specific week and role
+
+    For NURSE/MEDIC: Returns sum of shifts_used (shift-based caps)
+    For other roles: Returns count of people (person-based caps)
+
+    Args:
+        week_start_date (str): Start date of week (YYYY-MM-DD)
+        role (str): Role to filter by
+
+    Returns:
+        int: Total shifts used (NURSE/MEDIC) or person count (others) for this week and role
+    """
+    success, grid = get_summer_leave_usage_grid()
+    if not success:
         return 0
+    return grid.get((week_start_date, role), 0)
 
+@versioned_cache('summer_leave_requests', cache_if=bool)
 def get_all_summer_leave_selections():
     """
     Get all active summer leave selections for admin view
@@ -1888,6 +2093,7 @@ def get_track_config_by_name(track_name):
         return None
 
 
+@versioned_cache('track_configs', cache_if=bool)
 def get_all_track_configs():
     """Return all track_config rows."""
     try:
@@ -1926,16 +2132,18 @@ def create_track_config(track_name, max_day_nurses=11, max_day_medics=11,
              min_day_staff, min_night_staff,
              day_kmht, day_klwm, day_kbed, day_1b9, day_kpym,
              night_klwm, night_kbed, night_kpym,
-             created_date, modified_date)
-            VALUES (?, 0, 0, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             day_schema, created_date, modified_date)
+            VALUES (?, 0, 0, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (track_name, max_day_nurses, max_day_medics,
               max_night_nurses, max_night_medics,
               day_vehicles, night_vehicles, day_leave_slots, night_leave_slots,
               min_day_staff, min_night_staff,
               day_kmht, day_klwm, day_kbed, day_1b9, day_kpym,
               night_klwm, night_kbed, night_kpym,
-              now, now))
+              DEFAULT_SCHEMA.to_json(), now, now))
         conn.commit()
+        invalidate_capacity_cache(track_name)
+        invalidate_day_schema_cache()
         return True, f"Track config '{track_name}' created successfully"
     except sqlite3.IntegrityError:
         return False, f"Track config '{track_name}' already exists"
@@ -1964,6 +2172,7 @@ def update_track_config(track_name, **kwargs):
         values = list(updates.values()) + [track_name]
         cursor.execute(f"UPDATE track_configs SET {set_clause} WHERE track_name = ?", values)
         conn.commit()
+        invalidate_capacity_cache(track_name)
         return True, f"Track config '{track_name}' updated"
     except Exception as e:
         return False, f"Error updating track config: {e}"
@@ -2053,6 +2262,7 @@ def set_weekday_capacity_override(track_name, weekday, max_day_nurses, max_day_m
         ''', (track_name, weekday, max_day_nurses, max_day_medics,
               max_night_nurses, max_night_medics, now))
         conn.commit()
+        invalidate_capacity_cache(track_name)
         return True, f"Saved {weekday} capacity for '{track_name}'"
     except Exception as e:
         return False, f"Error saving weekday capacity override: {e}"
@@ -2131,6 +2341,8 @@ def promote_bid_to_active(bid_track_name):
         # Find current active track config
         cursor.execute("SELECT track_name FROM track_configs WHERE is_active = 1")
         active_row = cursor.fetchone()
+        promoted_names = (active_row[0] if active_row else bid_track_name, bid_track_name)
+        staffing_before = staffing_state(cursor, "track_name IN (?, ?)", promoted_names)
         if active_row:
             old_active = active_row[0]
             # Deactivate old active config
@@ -2144,6 +2356,8 @@ def promote_bid_to_active(bid_track_name):
                           WHERE track_name = ?""", (now, bid_track_name))
         # Activate all tracks in the bid group
         cursor.execute("UPDATE tracks SET is_active = 1 WHERE track_name = ?", (bid_track_name,))
+        apply_staffing_change(cursor, staffing_before,
+                              staffing_state(cursor, "track_name IN (?, ?)", promoted_names))
 
         conn.commit()
         return True, f"'{bid_track_name}' is now the active track"
@@ -2151,12 +2365,31 @@ def promote_bid_to_active(bid_track_name):
         return False, f"Error promoting bid track: {e}"
 
 
-def save_bid_track_to_db(staff_name, track_data, track_name, metadata=None):
-    """Save a bid track for a staff member under a specific track_name."""
+def save_bid_track_to_db(staff_name, track_data, track_name, metadata=None,
+                         expected_version=None, post_commit_jobs=None):
+    """
+    Save a bid track for a staff member under a specific track_name.
+
+    expected_version: bid version the caller started editing from (0 = no bid yet).
+        When given, the save only goes through if the stored bid is still at that
+        version, so a concurrent submission can't be silently overwritten.
+    post_commit_jobs: list of (job_type, payload) recorded in the same transaction
+        and run in the background after commit (see modules/post_commit_jobs.py);
+        each payload gets track_id and version added.
+
+    Returns:
+        tuple: (success, message, track_id) - on a version conflict success is False
+        and track_id is None
+    """
     try:
         initialize_database()
         conn = get_db_connection()
         cursor = conn.cursor()
+        if conn.in_transaction:
+            conn.commit()
+        # Take the write lock before reading the current version, so the version
+        # check and the write are one atomic step across sessions
+        cursor.execute("BEGIN IMMEDIATE")
 
         if isinstance(track_data, dict) and 'track_data' in track_data and 'staff_metadata' in track_data:
             actual_track_data = track_data['track_data']
@@ -2165,7 +2398,7 @@ def save_bid_track_to_db(staff_name, track_data, track_name, metadata=None):
             actual_track_data = track_data
             meta = metadata or {}
 
-        track_json = json.dumps(actual_track_data)
+        track_json = encode_track_data(actual_track_data, get_day_schema(cursor, track_name))
         submission_date = datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S")
 
         # Check for existing bid by this staff for this track_name
@@ -2173,14 +2406,19 @@ def save_bid_track_to_db(staff_name, track_data, track_name, metadata=None):
                           WHERE staff_name = ? AND track_name = ? AND is_active = 0""",
                        (staff_name, track_name))
         existing = cursor.fetchone()
+        current_version = existing[1] if existing else 0
+        if expected_version is not None and current_version != expected_version:
+            conn.rollback()
+            if existing:
+                return False, (f"Bid for {staff_name} was changed by another submission (now version "
+                               f"{current_version}) since you started editing - reload it and try again"), None
+            return False, f"Bid for {staff_name} was removed since you started editing - reload it and try again", None
+        staffing_before = staffing_state_for_ids(cursor, [existing[0] if existing else None])
 
         if existing:
             track_id = existing[0]
             new_version = existing[1] + 1
-            cursor.execute("""INSERT INTO track_history
-                (track_id, staff_name, track_data, submission_date, status)
-                VALUES (?, ?, ?, ?, ?)""",
-                (track_id, staff_name, track_json, submission_date, "bid_updated"))
+            append_track_history(cursor, track_id, staff_name, actual_track_data, submission_date, "bid_updated")
             cursor.execute("""UPDATE tracks SET
                 track_data = ?, submission_date = ?, version = ?,
                 original_role = ?, effective_role = ?, track_source = ?,
@@ -2204,15 +2442,24 @@ def save_bid_track_to_db(staff_name, track_data, track_name, metadata=None):
                 1 if meta.get('has_preassignments') else 0,
                 meta.get('preassignment_count', 0)))
             track_id = cursor.lastrowid
-            cursor.execute("""INSERT INTO track_history
-                (track_id, staff_name, track_data, submission_date, status)
-                VALUES (?, ?, ?, ?, ?)""",
-                (track_id, staff_name, track_json, submission_date, "bid_created"))
+            new_version = 1
+            append_track_history(cursor, track_id, staff_name, actual_track_data, submission_date, "bid_created")
             message = f"Bid saved for {staff_name}"
 
+        apply_staffing_change(cursor, staffing_before, staffing_state_for_ids(cursor, [track_id]))
+        job_ids = [
+            enqueue_job(cursor, job_type, {**payload, 'track_id': track_id, 'version': new_version},
+                        job_key=f"bid:{track_name}:{staff_name}")
+            for job_type, payload in (post_commit_jobs or [])
+        ]
         conn.commit()
+        dispatch_jobs(job_ids)
         return True, message, track_id
     except Exception as e:
+        try:
+            get_db_connection().rollback()
+        except Exception:
+            pass
         return False, f"Error saving bid: {e}", None
 
 
@@ -2230,7 +2477,7 @@ def get_bid_track_from_db(staff_name, track_name):
                        (staff_name, track_name))
         result = cursor.fetchone()
         if result:
-            track_data = json.loads(result[1])
+            track_data = decode_track_data(result[1], get_day_schema(cursor, track_name))
             return True, {
                 'track_id': result[0],
                 'track_data': track_data,
@@ -2306,6 +2553,7 @@ def delete_bid_draft(staff_name, track_name):
         return False, f"Error deleting saved progress: {e}"
 
 
+@versioned_cache('tracks', 'track_configs', cache_if=lambda result: result[0])
 def get_all_bid_tracks(track_name):
     """Get all submitted bids for a given track_name."""
     try:
@@ -2320,9 +2568,10 @@ def get_all_bid_tracks(track_name):
         results = cursor.fetchall()
         if results:
             tracks = []
+            schema = get_day_schema(cursor, track_name)
             for row in results:
                 try:
-                    td = json.loads(row[1])
+                    td = decode_track_data(row[1], schema)
                     tracks.append({
                         'staff_name': row[0],
                         'track_data': td,
@@ -2336,7 +2585,7 @@ def get_all_bid_tracks(track_name):
                             'preassignment_count': row[8],
                         }
                     })
-                except json.JSONDecodeError:
+                except ValueError:
                     continue
             return True, tracks
         return False, "No bids found"
@@ -2364,12 +2613,16 @@ def delete_track_config(track_name):
         cursor.execute("SELECT id FROM tracks WHERE track_name = ?", (track_name,))
         track_ids = [r[0] for r in cursor.fetchall()]
         if track_ids:
+            staffing_before = staffing_state(cursor, "track_name = ?", (track_name,))
             placeholders = ",".join("?" * len(track_ids))
             cursor.execute(f"DELETE FROM track_history WHERE track_id IN ({placeholders})", track_ids)
             cursor.execute("DELETE FROM tracks WHERE track_name = ?", (track_name,))
+            apply_staffing_change(cursor, staffing_before, {})
         cursor.execute("DELETE FROM track_weekday_capacity WHERE track_name = ?", (track_name,))
         cursor.execute("DELETE FROM track_configs WHERE track_name = ?", (track_name,))
         conn.commit()
+        invalidate_capacity_cache(track_name)
+        invalidate_day_schema_cache()
         deleted_bids = len(track_ids)
         return True, f"Deleted track config '{track_name}' and {deleted_bids} associated bid(s)"
     except Exception as e:
@@ -2388,8 +2641,10 @@ def delete_bid(staff_name, track_name):
         if not row:
             return False, f"No bid found for {staff_name} in {track_name}"
         track_id = row[0]
+        staffing_before = staffing_state_for_ids(cursor, [track_id])
         cursor.execute("DELETE FROM track_history WHERE track_id = ?", (track_id,))
         cursor.execute("DELETE FROM tracks WHERE id = ?", (track_id,))
+        apply_staffing_change(cursor, staffing_before, {})
         conn.commit()
         return True, f"Deleted bid for {staff_name} in {track_name}"
     except Exception as e:
@@ -2406,9 +2661,11 @@ def wipe_all_bids(track_name):
         track_ids = [r[0] for r in cursor.fetchall()]
         if not track_ids:
             return True, f"No bids to delete for {track_name}"
+        staffing_before = staffing_state(cursor, "track_name = ? AND is_active = 0", (track_name,))
         placeholders = ",".join("?" * len(track_ids))
         cursor.execute(f"DELETE FROM track_history WHERE track_id IN ({placeholders})", track_ids)
         cursor.execute("DELETE FROM tracks WHERE track_name = ? AND is_active = 0", (track_name,))
+        apply_staffing_change(cursor, staffing_before, {})
         conn.commit()
         return True, f"Wiped {len(track_ids)} bid(s) for {track_name}"
     except Exception as e:
@@ -2542,6 +2799,7 @@ def get_all_bid_access_configs(track_name):
         return {}
 
 
+@versioned_cache('track_bid_access', cache_if=bool)
 def get_all_bid_access_details(track_name):
     """
     Get all bidding access configs for a track, including when access was opened
@@ -2643,6 +2901,9 @@ def get_bid_progression_log(track_name, limit=100):
         return []
 
 
+# Per-rerun timings of every public reader/writer (see modules/instrumentation.py)
+instrument_module(globals(), exclude=('get_db_connection', 'close_all_connections', 'ensure_database_initialized'))
+
 # Clean up connections when the module is unloaded
 import atexit
 atexit.register(close_all_connections)
\ No newline at end of file
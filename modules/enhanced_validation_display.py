@@ -7,6 +7,7 @@ Provides comprehensive visualization of all validation rules including weekend g
 import streamlit as st
 import pandas as pd
 from .enhanced_track_validator import validate_track_comprehensive, format_validation_summary, get_validation_recommendations
+from .weekend_group_validator import get_weekend_group_highlighting_info
 
 def display_comprehensive_validation(track_data, days, shifts_per_pay_period, night_minimum, weekend_minimum=0, preassignments=None, weekend_group=None, requirements_df=None, staff_name=None):
     """
@@ -346,115 +347,3 @@ def create_validation_summary_card(validation_result):
         <p style="margin: 0;">{message}</p>
     </div>
     """, unsafe_allow_html=True)
-
-def get_weekend_group_highlighting_info(weekend_group, days):
-    """
-    Get information about which days should be highlighted for weekend group requirements
-    
-    Args:
-        weekend_group (str): Weekend group (A, B, C, D, E)
-        days (list): List of schedule days
-        
-    Returns:
-        dict: Information about weekend highlighting
-    """
-    if not weekend_group:
-        return {'highlight_days': [], 'weekend_group': None}
-    
-    try:
-        # Use inline function to avoid import issues
-        highlight_days = get_weekend_days_for_highlighting_inline(weekend_group, days)
-        
-        return {
-            'highlight_days': highlight_days,
-            'weekend_group': weekend_group,
-            'highlight_color': '#fff3cd',  # Light yellow
-            'highlight_info': f"Weekend Group {weekend_group} required days"
-        }
-    except Exception as e:
-        return {'highlight_days': [], 'weekend_group': weekend_group, 'error': str(e)}
-
-def get_weekend_days_for_highlighting_inline(weekend_group, days):
-    """
-    Get weekend days that should be highlighted for a specific weekend group
-    """
-    if not weekend_group:
-        return []
-    
-    # Weekend group definitions
-    WEEKEND_GROUPS = {
-        'A': {
-            'periods': [
-                ['Fri C 6', 'Sat C 6', 'Sun A 1'],  # Period 1
-                ['Fri A 2', 'Sat A 2', 'Sun B 3'],  # Period 2
-                ['Fri B 4', 'Sat B 4', 'Sun C 5']   # Period 3
-            ]
-        },
-        'B': {
-            'periods': [
-                ['Fri A 1', 'Sat A 1', 'Sun A 2'],  # Period 1
-                ['Fri B 3', 'Sat B 3', 'Sun B 4'],  # Period 2
-                ['Fri C 5', 'Sat C 5', 'Sun C 6']   # Period 3
-            ]
-        },
-        'C': {
-            'periods': [
-                ['Fri C 6', 'Sat C 6', 'Sun A 1'],  # Period 1
-                ['Fri B 3', 'Sat B 3', 'Sun B 4']   # Period 2
-            ]
-        },
-        'D': {
-            'periods': [
-                ['Fri A 1', 'Sat A 1', 'Sun A 2'],  # Period 1
-                ['Fri B 4', 'Sat B 4', 'Sun C 5']   # Period 2
-            ]
-        },
-        'E': {
-            'periods': [
-                ['Fri A 2', 'Sat A 2', 'Sun B 3'],  # Period 1
-                ['Fri C 5', 'Sat C 5', 'Sun C 6']   # Period 2
-            ]
-        }
-    }
-    
-    if weekend_group not in WEEKEND_GROUPS:
-        return []
-    
-    # Get all weekend days for the group
-    all_weekend_days = []
-    for period in WEEKEND_GROUPS[weekend_group]['periods']:
-        all_weekend_days.extend(period)
-    
-    # Map to actual schedule days
-    highlight_days = []
-    for weekend_day in all_weekend_days:
-        schedule_day = map_weekend_day_to_schedule_day_inline(weekend_day, days)
-        if schedule_day:
-            highlight_days.append(schedule_day)
-    
-    return highlight_days
-
-def map_weekend_day_to_schedule_day_inline(weekend_day, days):
-    """
-    Map a weekend group day (e.g., 'Fri A 1') to actual schedule day
-    """
-    # Parse the weekend day format
-    parts = weekend_day.split()
-    if len(parts) != 3:
-        return None
-    
-    day_name, block, week = parts
-    
-    # Find matching day in schedule
-    for schedule_day in days:
-        schedule_parts = schedule_day.split()
-        if len(schedule_parts) >= 1:
-            schedule_day_name = schedule_parts[0]
-            
-            # Check if day names match (Fri, Sat, Sun)
-            if schedule_day_name == day_name:
-                # Check if it contains the block and week
-                if block in schedule_day and week in schedule_day:
-                    return schedule_day
-    
-    return None
\ No newline at end of file
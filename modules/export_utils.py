@@ -6,16 +6,139 @@ UPDATED to include staff role information in exports
 
 import pandas as pd
 import streamlit as st
-import sqlite3
 import json
 import os
 import io
+import zlib
+import xlsxwriter
 from datetime import datetime
 
+from modules.track_history_store import TrackHistoryReader, history_payload_keys, DELTA
+from modules.track_codes import decode_track_data, get_day_schema
+from modules.query_profiler import open_connection
+from modules.instrumentation import instrumented
+
+# Shift / role colors shared by every streaming export (one format object per workbook)
+SHIFT_FILL_COLORS = {'D': '#CCE5FF', 'N': '#E6CCFF', 'AT': '#CCFFCC'}
+ROLE_FILL_COLORS = {'Nurse': '#FFF0F0', 'Medic': '#F0F0FF'}
+
+def open_streaming_workbook(output):
+    """
+    Open an xlsxwriter workbook in constant_memory mode that writes into `output`.
+
+    Rows are flushed to disk as soon as the next row starts, so memory stays flat
+    regardless of roster size or date range. Every sheet must therefore be written
+    top to bottom, one row at a time.
+
+    Args:
+        output (BytesIO): Buffer the finished .xlsx is written into on close()
+
+    Returns:
+        xlsxwriter.Workbook: Open workbook
+    """
+    return xlsxwriter.Workbook(output, {'constant_memory': True, 'strings_to_numbers': False})
+
+def build_shared_formats(workbook):
+    """
+    Create the format objects shared across all sheets of a streaming export.
+
+    Args:
+        workbook (xlsxwriter.Workbook): Workbook the formats belong to
+
+    Returns:
+        dict: 'header', 'bold', 'center', 'shift' (code -> format) and
+        'role' (role -> format)
+    """
+    return {
+        'header': workbook.add_format({'bold': True, 'border': 1}),
+        'bold': workbook.add_format({'bold': True}),
+        'center': workbook.add_format({'align': 'center'}),
+        'shift': {
+            code: workbook.add_format({'bg_color': color, 'align': 'center'})
+            for code, color in SHIFT_FILL_COLORS.items()
+        },
+        'role': {
+            role: workbook.add_format({'bg_color': color})
+            for role, color in ROLE_FILL_COLORS.items()
+        },
+    }
+
+def _cell_value(value):
+    """Map NaN/NaT to an empty cell; xlsxwriter rejects NaN numbers."""
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value
+
+def write_dataframe_sheet(workbook, sheet_name, df, formats):
+    """
+    Stream a small DataFrame (summary tables) into its own sheet, row by row.
+
+    Args:
+        workbook (xlsxwriter.Workbook): Open streaming workbook
+        sheet_name (str): Sheet title
+        df (DataFrame): Data to write
+        formats (dict): Result of build_shared_formats()
+    """
+    worksheet = workbook.add_worksheet(sheet_name[:31])
+    worksheet.write_row(0, 0, list(df.columns), formats['header'])
+    for row_idx, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        for col_idx, value in enumerate(row):
+            worksheet.write(row_idx, col_idx, _cell_value(value))
+    return worksheet
+
+def _collect_track_keys(cursor, query):
+    """
+    First pass over a track_data query: ordered union of every day key. The header
+    row has to be written before any data in constant_memory mode, so the columns
+    must be known up front. Only the key lists are kept, not the parsed tracks.
+    The query selects (track_name, track_data); code-byte rows contribute their
+    cycle's day schema without being decoded.
+    """
+    keys = {}
+    for track_name, track_value in cursor.execute(query):
+        if isinstance(track_value, bytes):
+            keys.update(dict.fromkeys(get_day_schema(cursor, track_name).days))
+            continue
+        try:
+            keys.update(dict.fromkeys(json.loads(track_value)))
+        except (json.JSONDecodeError, TypeError):
+            continue
+    return list(keys)
+
+def _collect_history_keys(cursor):
+    """
+    _collect_track_keys() for track_history, whose rows may be keyframes or deltas.
+    Full-state rows are scanned first so the column order follows whole tracks;
+    days only ever introduced by a delta are appended after them.
+    """
+    keys, delta_keys = {}, {}
+    for encoding, payload in cursor.execute(
+            "SELECT encoding, track_data FROM track_history ORDER BY staff_name, submission_date DESC"):
+        try:
+            row_keys = history_payload_keys(encoding, payload)
+        except (ValueError, TypeError, zlib.error):
+            continue
+        (delta_keys if encoding == DELTA else keys).update(dict.fromkeys(row_keys))
+    keys.update(delta_keys)
+    return list(keys)
+
+def _write_track_row(worksheet, row_idx, meta, meta_columns, track_data, day_columns):
+    """Write one metadata + 42-day row; day keys win over same-named metadata, as before."""
+    for col_idx, key in enumerate(meta_columns):
+        value = track_data[key] if key in track_data else meta[key]
+        worksheet.write(row_idx, col_idx, _cell_value(value))
+    for col_idx, day in enumerate(day_columns, start=len(meta_columns)):
+        worksheet.write(row_idx, col_idx, _cell_value(track_data.get(day)))
+
+@instrumented
 def export_tracks_to_excel():
     """
     Export all tracks from the database to an Excel file
     UPDATED: Enhanced to include role metadata in exports
+    UPDATED: Streams rows from the cursor into a constant_memory xlsxwriter workbook
     
     Returns:
         bytes: Excel file as bytes if successful, None otherwise
@@ -28,11 +151,12 @@ def export_tracks_to_excel():
             return None
             
         # Connect to database
-        conn = sqlite3.connect(db_path)
+        conn = open_connection(db_path)
+        cursor = conn.cursor()
         
         # Enhanced query to include role metadata
         query = """
-        SELECT t.id, t.staff_name, t.track_data, t.submission_date, t.is_approved, 
+        SELECT t.id, t.staff_name, t.track_name, t.track_data, t.submission_date, t.is_approved, 
                t.approved_by, t.approval_date, t.version, t.original_role, t.effective_role,
                t.track_source, t.has_preassignments, t.preassignment_count
         FROM tracks t
@@ -40,72 +164,75 @@ def export_tracks_to_excel():
         ORDER BY t.staff_name, t.submission_date DESC
         """
         
-        # Load data into DataFrame
-        tracks_df = pd.read_sql_query(query, conn)
+        day_keys = _collect_track_keys(
+            cursor, "SELECT track_name, track_data FROM tracks WHERE is_active = 1 ORDER BY staff_name, submission_date DESC"
+        )
         
-        # Close connection
-        conn.close()
+        meta_columns = [
+            'Staff Name', 'Original Role', 'Effective Role', 'Track Source', 'Submission Date',
+            'Version', 'Approved', 'Approved By', 'Approval Date', 'Has Preassignments',
+            'Preassignment Count'
+        ]
+        # Day keys that collide with a metadata column overwrite it, as the dict merge did
+        day_columns = [key for key in day_keys if key not in meta_columns]
         
-        if tracks_df.empty:
-            st.warning("No tracks found in database.")
-            return None
-            
-        # Vectorize simple column transformations before the JSON-parsing loop
-        tracks_df = tracks_df.assign(
-            approved_str=tracks_df['is_approved'].map({1: 'Yes', 0: 'No'}).fillna('No'),
-            approved_by=tracks_df['approved_by'].fillna('N/A'),
-            approval_date=tracks_df['approval_date'].fillna('N/A'),
-            original_role=tracks_df['original_role'].fillna('Unknown'),
-            effective_role=tracks_df['effective_role'].fillna('Unknown'),
-            track_source=tracks_df['track_source'].fillna('Unknown'),
-            has_preassignments_str=tracks_df['has_preassignments'].map({1: 'Yes', 0: 'No'}).fillna('No'),
-            preassignment_count=tracks_df['preassignment_count'].fillna(0),
-        )
-
-        # JSON parsing still requires per-row work; itertuples avoids Series copy overhead
-        processed_rows = []
-        for row in tracks_df.itertuples(index=False):
+        output = io.BytesIO()
+        workbook = open_streaming_workbook(output)
+        formats = build_shared_formats(workbook)
+        worksheet = workbook.add_worksheet('Tracks')
+        worksheet.write_row(0, 0, meta_columns + day_columns, formats['header'])
+        
+        # Only the small metadata columns are retained for the summary sheets
+        summary_rows = []
+        row_idx = 1
+        for (track_id, staff_name, track_name, track_data_str, submission_date, is_approved, approved_by,
+             approval_date, version, original_role, effective_role, track_source,
+             has_preassignments, preassignment_count) in cursor.execute(query):
             try:
-                track_data = json.loads(row.track_data)
-                processed_rows.append({
-                    'Staff Name': row.staff_name,
-                    'Original Role': row.original_role,
-                    'Effective Role': row.effective_role,
-                    'Track Source': row.track_source,
-                    'Submission Date': row.submission_date,
-                    'Version': row.version,
-                    'Approved': row.approved_str,
-                    'Approved By': row.approved_by,
-                    'Approval Date': row.approval_date,
-                    'Has Preassignments': row.has_preassignments_str,
-                    'Preassignment Count': row.preassignment_count,
-                    **track_data
-                })
-            except json.JSONDecodeError:
-                st.error(f"Error parsing track data for {row.staff_name}")
+                track_data = decode_track_data(track_data_str, get_day_schema(cursor, track_name))
+            except ValueError:
+                st.error(f"Error parsing track data for {staff_name}")
                 continue
+            
+            meta = {
+                'Staff Name': staff_name,
+                'Original Role': original_role if original_role is not None else 'Unknown',
+                'Effective Role': effective_role if effective_role is not None else 'Unknown',
+                'Track Source': track_source if track_source is not None else 'Unknown',
+                'Submission Date': submission_date,
+                'Version': version,
+                'Approved': 'Yes' if is_approved == 1 else 'No',
+                'Approved By': approved_by if approved_by is not None else 'N/A',
+                'Approval Date': approval_date if approval_date is not None else 'N/A',
+                'Has Preassignments': 'Yes' if has_preassignments == 1 else 'No',
+                'Preassignment Count': preassignment_count if preassignment_count is not None else 0,
+            }
+            _write_track_row(worksheet, row_idx, meta, meta_columns, track_data, day_columns)
+            
+            summary_rows.append({key: meta[key] for key in (
+                'Original Role', 'Effective Role', 'Track Source',
+                'Has Preassignments', 'Preassignment Count'
+            )})
+            row_idx += 1
+        
+        conn.close()
         
-        if not processed_rows:
-            st.warning("No valid track data found.")
+        if not summary_rows:
+            workbook.close()
+            st.warning("No tracks found in database.")
             return None
-            
-        # Create DataFrame from processed rows
-        export_df = pd.DataFrame(processed_rows)
         
-        # Create Excel file in memory with multiple sheets
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Main tracks sheet
-            export_df.to_excel(writer, sheet_name='Tracks', index=False)
-            
-            # Role distribution summary sheet
-            role_summary = create_role_summary(export_df)
-            role_summary.to_excel(writer, sheet_name='Role Summary', index=False)
-            
-            # Track source summary sheet
-            source_summary = create_track_source_summary(export_df)
-            source_summary.to_excel(writer, sheet_name='Track Source Summary', index=False)
-            
+        worksheet.freeze_panes(1, 1)
+        
+        summary_df = pd.DataFrame(summary_rows)
+        
+        # Role distribution summary sheet
+        write_dataframe_sheet(workbook, 'Role Summary', create_role_summary(summary_df), formats)
+        
+        # Track source summary sheet
+        write_dataframe_sheet(workbook, 'Track Source Summary', create_track_source_summary(summary_df), formats)
+        
+        workbook.close()
         return output.getvalue()
         
     except Exception as e:
@@ -316,10 +443,12 @@ def create_track_source_summary(tracks_df):
         print(f"Error creating track source summary: {str(e)}")
         return pd.DataFrame()
 
+@instrumented
 def export_track_history_to_excel():
     """
     Export track history from the database to an Excel file
     UPDATED: Enhanced to include role metadata in history export
+    UPDATED: Streams rows from the cursor into a constant_memory xlsxwriter workbook
     
     Returns:
         bytes: Excel file as bytes if successful, None otherwise
@@ -332,74 +461,78 @@ def export_track_history_to_excel():
             return None
             
         # Connect to database
-        conn = sqlite3.connect(db_path)
+        conn = open_connection(db_path)
+        cursor = conn.cursor()
         
         # Enhanced query to include role metadata in history
         query = """
-        SELECT h.id, h.track_id, h.staff_name, h.track_data, h.submission_date, h.status,
+        SELECT h.id, h.track_id, h.staff_name, h.encoding, h.track_data, h.submission_date, h.status,
                t.original_role, t.effective_role, t.track_source, t.has_preassignments, t.preassignment_count
         FROM track_history h
         LEFT JOIN tracks t ON h.track_id = t.id
         ORDER BY h.staff_name, h.submission_date DESC
         """
         
-        # Load data into DataFrame
-        history_df = pd.read_sql_query(query, conn)
+        day_keys = _collect_history_keys(cursor)
         
-        # Close connection
-        conn.close()
+        meta_columns = [
+            'Staff Name', 'Track ID', 'Submission Date', 'Status', 'Original Role',
+            'Effective Role', 'Track Source', 'Has Preassignments', 'Preassignment Count'
+        ]
+        day_columns = [key for key in day_keys if key not in meta_columns]
         
-        if history_df.empty:
-            st.warning("No track history found in database.")
-            return None
-            
-        # Vectorize simple column transformations before the JSON-parsing loop
-        history_df = history_df.assign(
-            original_role=history_df['original_role'].fillna('Unknown'),
-            effective_role=history_df['effective_role'].fillna('Unknown'),
-            track_source=history_df['track_source'].fillna('Unknown'),
-            has_preassignments_str=history_df['has_preassignments'].map({1: 'Yes', 0: 'No'}).fillna('No'),
-            preassignment_count=history_df['preassignment_count'].fillna(0),
-        )
-
-        processed_rows = []
-        for row in history_df.itertuples(index=False):
+        output = io.BytesIO()
+        workbook = open_streaming_workbook(output)
+        formats = build_shared_formats(workbook)
+        worksheet = workbook.add_worksheet('Track History')
+        worksheet.write_row(0, 0, meta_columns + day_columns, formats['header'])
+        
+        # Delta rows are rebuilt from their track's keyframe; the reader caches the
+        # replayed chain, so each keyframe group is loaded once
+        reader = TrackHistoryReader(conn.cursor())
+        
+        row_idx = 1
+        for (history_id, track_id, staff_name, encoding, payload, submission_date, status,
+             original_role, effective_role, track_source, has_preassignments,
+             preassignment_count) in cursor.execute(query):
             try:
-                track_data = json.loads(row.track_data)
-                processed_rows.append({
-                    'Staff Name': row.staff_name,
-                    'Track ID': row.track_id,
-                    'Submission Date': row.submission_date,
-                    'Status': row.status,
-                    'Original Role': row.original_role,
-                    'Effective Role': row.effective_role,
-                    'Track Source': row.track_source,
-                    'Has Preassignments': row.has_preassignments_str,
-                    'Preassignment Count': row.preassignment_count,
-                    **track_data
-                })
-            except json.JSONDecodeError:
-                st.error(f"Error parsing track history for {row.staff_name}")
+                track_data = reader.decode(history_id, track_id, encoding, payload)
+            except (ValueError, TypeError, zlib.error):
+                track_data = None
+            if not isinstance(track_data, dict):
+                st.error(f"Error parsing track history for {staff_name}")
                 continue
+            
+            meta = {
+                'Staff Name': staff_name,
+                'Track ID': track_id,
+                'Submission Date': submission_date,
+                'Status': status,
+                'Original Role': original_role if original_role is not None else 'Unknown',
+                'Effective Role': effective_role if effective_role is not None else 'Unknown',
+                'Track Source': track_source if track_source is not None else 'Unknown',
+                'Has Preassignments': 'Yes' if has_preassignments == 1 else 'No',
+                'Preassignment Count': preassignment_count if preassignment_count is not None else 0,
+            }
+            _write_track_row(worksheet, row_idx, meta, meta_columns, track_data, day_columns)
+            row_idx += 1
+        
+        conn.close()
         
-        if not processed_rows:
-            st.warning("No valid track history found.")
+        if row_idx == 1:
+            workbook.close()
+            st.warning("No track history found in database.")
             return None
-            
-        # Create DataFrame from processed rows
-        export_df = pd.DataFrame(processed_rows)
         
-        # Create Excel file in memory
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            export_df.to_excel(writer, sheet_name='Track History', index=False)
-            
+        worksheet.freeze_panes(1, 1)
+        workbook.close()
         return output.getvalue()
         
     except Exception as e:
         st.error(f"Error exporting track history: {str(e)}")
         return None
 
+@instrumented
 def export_role_analytics_to_excel():
     """
     NEW: Export comprehensive role analytics to Excel
@@ -415,7 +548,7 @@ def export_role_analytics_to_excel():
             return None
             
         # Connect to database
-        conn = sqlite3.connect(db_path)
+        conn = open_connection(db_path)
         
         # Get role distribution by track source
         role_source_query = """
@@ -439,12 +572,15 @@ def export_role_analytics_to_excel():
             staff_name,
             original_role,
             effective_role,
+            track_name,
             track_data
         FROM tracks 
         WHERE is_active = 1
         """
         
         shifts_df = pd.read_sql_query(shifts_by_role_query, conn)
+        schema_cursor = conn.cursor()
+        schemas = {name: get_day_schema(schema_cursor, name) for name in shifts_df['track_name'].unique()}
         
         # Close connection
         conn.close()
@@ -454,7 +590,7 @@ def export_role_analytics_to_excel():
         
         for row in shifts_df.itertuples(index=False):
             try:
-                track_data = json.loads(row.track_data)
+                track_data = decode_track_data(row.track_data, schemas.get(row.track_name))
                 values = list(track_data.values())
                 day_count = values.count('D')
                 night_count = values.count('N')
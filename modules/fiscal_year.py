@@ -5,32 +5,131 @@ To be integrated with existing app.py
 Place this file in your project root or modules/ directory
 UPDATED: Added staff member filtering functionality alongside role filtering
 UPDATED: Added Master Tracks tab and Version tab to Excel export
+UPDATED: Added FiscalYearProjection - the 42-day pattern tiled onto the fiscal year
+         once per active track version, shared by the monthly views, workload
+         summary and Excel export
 """
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import sqlite3
 from datetime import datetime, timedelta
-import os
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-from openpyxl.utils import get_column_letter
-from openpyxl.comments import Comment
-import base64
-import json
+import io
 import pytz
 
+from modules.export_utils import open_streaming_workbook, build_shared_formats
+from modules.cycle_calendar import get_cycle_calendar, DEFAULT_TRACK_NAME
+from modules.track_codes import decode_track_data, get_day_schema
+from modules.query_profiler import open_connection
+from modules.instrumentation import instrumented
+
 _eastern_tz = pytz.timezone('America/New_York')
 
+# db_path -> (active track version key, FiscalYearProjection)
+_PROJECTION_CACHE = {}
+
+
+class FiscalYearProjection:
+    """
+    Every staff member's 42-day pattern mapped onto the fiscal year calendar.
+
+    The tiling is a single NumPy gather: each calendar day gets its pattern index
+    ((date - pattern_start) % 42), and the staff x 42 pattern code matrix is indexed
+    with it to give a staff x days code array. Shift labels are stored once in
+    code_labels; the arrays only hold small integer codes.
+    """
+    
+    def __init__(self, fiscal_year_display, tracks_data):
+        fy = fiscal_year_display
+        calendar = fy.calendar
+        
+        # Date axis, pattern index and pay-period ends come precomputed from the
+        # shared cycle calendar (pay periods end on Sat A 2 / Sat B 4 / Sat C 6)
+        self.start = fy.fiscal_year_start
+        self.dates = calendar.dates
+        self.pattern_index = calendar.pattern_index
+        self.pattern_days = list(calendar.day_keys)
+        self.pay_period_mask = calendar.date_pay_period_end_mask
+        holiday_dates = np.array(
+            [np.datetime64(d.date(), 'D') for d in fy.holidays], dtype='datetime64[D]'
+        )
+        self.holiday_mask = np.isin(self.dates, holiday_dates)
+        self.holiday_names = np.array([''] * len(self.dates), dtype=object)
+        for holiday, name in fy.holidays.items():
+            offset = (holiday - fy.fiscal_year_start).days
+            if 0 <= offset < len(self.dates):
+                self.holiday_names[offset] = name
+        
+        self.staff = sorted(tracks_data.keys())
+        self.staff_index = {name: row for row, name in enumerate(self.staff)}
+        
+        # Code 0 is always "off" ('')
+        labels = {'': 0}
+        pattern_codes = np.zeros((len(self.staff) + 1, fy.pattern_length), dtype=np.uint16)
+        for row, staff_name in enumerate(self.staff):
+            track = tracks_data[staff_name]
+            for col, pattern_day in enumerate(self.pattern_days):
+                shift = track.get(pattern_day) or ''
+                pattern_codes[row, col] = labels.setdefault(shift, len(labels))
+        
+        # The extra last row stays all-off for staff that aren't in the projection
+        self.pattern_codes = pattern_codes
+        self.code_labels = np.array(list(labels), dtype=object)
+        self.codes = pattern_codes[:, self.pattern_index]
+    
+    @property
+    def day_count(self):
+        return len(self.dates)
+    
+    def day_slice(self, start, end):
+        """Slice of the day axis covering start..end (datetimes, inclusive)"""
+        return slice((start - self.start).days, (end - self.start).days + 1)
+    
+    def dates_in(self, day_slice):
+        """datetime.date objects for a slice of the day axis"""
+        return self.dates[day_slice].astype(object)
+    
+    def _rows(self, staff_names):
+        missing = len(self.staff)
+        return np.array([self.staff_index.get(name, missing) for name in staff_names], dtype=np.int64)
+    
+    def shift_grid(self, staff_names, day_slice=slice(None)):
+        """staff_names x days array of shift labels ('' = off)"""
+        return self.code_labels[self.codes[self._rows(staff_names), day_slice]]
+    
+    def pattern_grid(self, staff_names):
+        """staff_names x 42 array of shift labels in pattern order"""
+        return self.code_labels[self.pattern_codes[self._rows(staff_names)]]
+    
+    def shift_counts(self, staff_names, shifts, day_slice=slice(None)):
+        """
+        Count each shift label per staff member over a slice of the fiscal year.
+        
+        Returns:
+            dict: shift label -> int array aligned with staff_names
+        """
+        codes = self.codes[self._rows(staff_names), day_slice]
+        label_ids = {label: idx for idx, label in enumerate(self.code_labels)}
+        counts = {}
+        for shift in shifts:
+            if shift in label_ids:
+                counts[shift] = np.count_nonzero(codes == label_ids[shift], axis=1)
+            else:
+                counts[shift] = np.zeros(len(staff_names), dtype=np.int64)
+        return counts
+
+
 class FiscalYearDisplay:
     """Fiscal Year display component for integration with existing app"""
     
     def __init__(self, tracks_db_path='data/medflight_tracks.db'):
         self.db_path = tracks_db_path
-        self.fiscal_year_start = datetime(2025, 9, 28)
-        self.fiscal_year_end = datetime(2026, 9, 26)
-        self.pattern_start = datetime(2025, 9, 14)  # Sun A 1
-        self.pattern_length = 42  # 6 weeks
+        self.calendar = get_cycle_calendar(DEFAULT_TRACK_NAME)
+        self.fiscal_year_start = datetime.combine(self.calendar.fiscal_start, datetime.min.time())
+        self.fiscal_year_end = datetime.combine(self.calendar.fiscal_end, datetime.min.time())
+        self.pattern_start = datetime.combine(self.calendar.pattern_anchor, datetime.min.time())  # Sun A 1
+        self.pattern_length = len(self.calendar.day_keys)  # 6 weeks
         
         # US Holidays
         self.holidays = {
@@ -67,12 +166,12 @@ class FiscalYearDisplay:
         staff_roles = {}
         
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = open_connection(self.db_path)
             cursor = conn.cursor()
             
             # Get the latest active tracks for each staff member with role information
             cursor.execute("""
-                SELECT staff_name, track_data, effective_role, submission_date
+                SELECT staff_name, track_name, track_data, effective_role, submission_date
                 FROM tracks
                 WHERE is_active = 1
                 ORDER BY staff_name, submission_date DESC
@@ -81,12 +180,12 @@ class FiscalYearDisplay:
             results = cursor.fetchall()
             processed_staff = set()
             
-            for staff_name, track_data_str, effective_role, submission_date in results:
+            for staff_name, track_name, track_data_str, effective_role, submission_date in results:
                 # Only take the latest entry for each staff member
                 if staff_name not in processed_staff:
                     try:
-                        # Parse the JSON track data
-                        track_data = json.loads(track_data_str)
+                        # Parse the stored track (code bytes or legacy JSON)
+                        track_data = decode_track_data(track_data_str, get_day_schema(cursor, track_name))
                         tracks_data[staff_name] = track_data
                         
                         # Use the effective_role from database, with fallback
@@ -95,7 +194,7 @@ class FiscalYearDisplay:
                         
                         processed_staff.add(staff_name)
                         
-                    except json.JSONDecodeError:
+                    except ValueError:
                         st.warning(f"Error parsing track data for {staff_name}")
                         continue
             
@@ -111,6 +210,41 @@ class FiscalYearDisplay:
         
         return tracks_data, staff_roles
     
+    def _active_track_version(self):
+        """Fingerprint of the active tracks (ids + versions); changes on any submit/edit/toggle"""
+        conn = open_connection(self.db_path)
+        try:
+            row = conn.execute("""
+                SELECT COUNT(*), GROUP_CONCAT(id || ':' || version)
+                FROM (SELECT id, version FROM tracks WHERE is_active = 1 ORDER BY id)
+            """).fetchone()
+        finally:
+            conn.close()
+        return row
+    
+    def get_projection(self):
+        """
+        Fiscal-year projection of every active track, rebuilt only when the active
+        track version changes.
+        
+        Returns:
+            FiscalYearProjection: Cached projection (staff x days codes + masks)
+        """
+        try:
+            version_key = self._active_track_version()
+        except sqlite3.Error:
+            version_key = None
+        
+        cached = _PROJECTION_CACHE.get(self.db_path)
+        if version_key is not None and cached and cached[0] == version_key:
+            return cached[1]
+        
+        tracks_data, _ = self.load_tracks_from_db()
+        projection = FiscalYearProjection(self, tracks_data)
+        if version_key is not None:
+            _PROJECTION_CACHE[self.db_path] = (version_key, projection)
+        return projection
+    
     def normalize_role(self, role):
         """Normalize role names for consistent display"""
         if not role:
@@ -129,31 +263,11 @@ class FiscalYearDisplay:
     
     def get_pattern_day_name(self, date):
         """Get the pattern day name for a given date"""
-        if isinstance(date, str):
-            date = datetime.strptime(date, '%m/%d/%Y')
-        
-        days_since_start = (date - self.pattern_start).days
-        pattern_day_index = days_since_start % self.pattern_length
-        
-        week_index = pattern_day_index // 7
-        day_index = pattern_day_index % 7
-        
-        days_of_week = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
-        week_letters = ["A", "A", "B", "B", "C", "C"]
-        week_numbers = [1, 2, 3, 4, 5, 6]
-        
-        if week_index < 6:
-            day_name = days_of_week[day_index]
-            week_letter = week_letters[week_index]
-            week_number = week_numbers[week_index]
-            return f"{day_name} {week_letter} {week_number}"
-        
-        return f"Day {pattern_day_index + 1}"
+        return self.calendar.label_for_date(date)
     
     def is_pay_period_end(self, date):
         """Check if date is end of pay period"""
-        pattern_day = self.get_pattern_day_name(date)
-        return 'Sat' in pattern_day and any(f' {n}' in pattern_day for n in ['2', '4', '6'])
+        return self.calendar.is_pay_period_end(date)
     
     def get_fiscal_year_months(self):
         """Get list of months in fiscal year"""
@@ -499,23 +613,26 @@ class FiscalYearDisplay:
             st.info(f"No staff found matching the selected filters.")
             return
         
-        # Build date columns
+        # Build date columns from the fiscal-year projection
+        projection = self.get_projection()
+        month_days = projection.day_slice(month_info['start'], month_info['end'])
+        holiday_flags = projection.holiday_mask[month_days]
+        pay_period_flags = projection.pay_period_mask[month_days]
+        holiday_names = projection.holiday_names[month_days]
+        
         dates = []
-        current_date = month_info['start']
-        while current_date <= month_info['end']:
+        for date, is_holiday, is_pay_period_end, holiday_name in zip(
+            projection.dates_in(month_days), holiday_flags, pay_period_flags, holiday_names
+        ):
             dates.append({
-                'date': current_date,
-                'day': current_date.day,
-                'weekday': current_date.strftime('%a'),
-                'pattern_day': self.get_pattern_day_name(current_date),
-                'is_holiday': current_date in self.holidays,
-                'holiday_name': self.holidays.get(current_date, ''),
-                'is_pay_period_end': self.is_pay_period_end(current_date)
+                'day': date.day,
+                'weekday': date.strftime('%a'),
+                'is_holiday': bool(is_holiday),
+                'holiday_name': holiday_name,
+                'is_pay_period_end': bool(is_pay_period_end)
             })
-            current_date += timedelta(days=1)
         
         # Build DataFrame
-        data = []
         columns = ['Staff', 'Role']
         
         for date_info in dates:
@@ -529,18 +646,12 @@ class FiscalYearDisplay:
         # Sort staff for consistent display
         filtered_staff.sort()
         
-        for staff_name in filtered_staff:
-            row = [staff_name, staff_roles.get(staff_name, 'Unknown')]
-            
-            for date_info in dates:
-                pattern_day = date_info['pattern_day']
-                shift = tracks_data.get(staff_name, {}).get(pattern_day, '')
-                row.append(shift)
-            
-            data.append(row)
+        data = projection.shift_grid(filtered_staff, month_days)
         
-        if data:
-            df = pd.DataFrame(data, columns=columns)
+        if len(data):
+            df = pd.DataFrame(data, columns=columns[2:])
+            df.insert(0, 'Role', [staff_roles.get(staff_name, 'Unknown') for staff_name in filtered_staff])
+            df.insert(0, 'Staff', filtered_staff)
             
             # Apply styling
             def style_shifts(val):
@@ -601,29 +712,47 @@ class FiscalYearDisplay:
     
     def export_and_download(self, tracks_data, staff_roles, role_filter=None, staff_filter=None):
         """Generate and provide download for Excel export with filtering support"""
-        file_path, message = self.export_to_excel(role_filter, staff_filter)
+        excel_data, message = self.export_to_excel(role_filter, staff_filter)
         
-        if file_path and os.path.exists(file_path):
+        if excel_data:
             try:
-                with open(file_path, "rb") as f:
-                    excel_data = f.read()
-                
-                b64 = base64.b64encode(excel_data).decode()
-                href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="FY2026_Tracks_Filtered.xlsx">Click here to download Excel file</a>'
-                
                 st.success(f"✅ {message}")
-                st.markdown(href, unsafe_allow_html=True)
-                
-                # Cleanup
-                os.remove(file_path)
+                st.download_button(
+                    label="📥 Download Excel file",
+                    data=excel_data,
+                    file_name=self.get_export_filename(role_filter, staff_filter),
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
                 
             except Exception as e:
                 st.error(f"❌ Error preparing download: {str(e)}")
         else:
             st.error(f"❌ {message}")
     
+    def get_export_filename(self, role_filter=None, staff_filter=None):
+        """Build the export filename, including filter info when applicable"""
+        filename_suffix = ""
+        if role_filter and role_filter != 'All Roles':
+            filename_suffix += f"_{role_filter}"
+        if staff_filter and staff_filter != 'All Staff':
+            if staff_filter == 'Selected Staff':
+                filename_suffix += "_CustomSelection"
+            else:
+                filename_suffix += f"_{staff_filter.replace(' ', '_')}"
+        
+        return f'FY2026_Tracks_Export{filename_suffix}_{datetime.now(_eastern_tz).strftime("%Y%m%d_%H%M%S")}.xlsx'
+    
+    @instrumented
     def export_to_excel(self, role_filter=None, staff_filter=None):
-        """Export fiscal year to Excel with role and staff filtering, Master Tracks tab, and Version tab"""
+        """
+        Export fiscal year to Excel with role and staff filtering, Master Tracks tab, and Version tab.
+        Streams every sheet row by row through a constant_memory xlsxwriter workbook with
+        shared formats, so memory stays flat as the roster and date range grow.
+        
+        Returns:
+            tuple: (xlsx bytes or None, status message)
+        """
         tracks_data, staff_roles = self.load_tracks_from_db()
         
         if not tracks_data:
@@ -643,11 +772,9 @@ class FiscalYearDisplay:
             staff_roles = {staff: staff_roles[staff] for staff in filtered_staff if staff in staff_roles}
         
         try:
-            wb = Workbook()
-            
-            # Remove default sheet
-            if 'Sheet' in wb.sheetnames:
-                wb.remove(wb['Sheet'])
+            output = io.BytesIO()
+            wb = open_streaming_workbook(output)
+            formats = build_shared_formats(wb)
             
             # Store creation timestamp in Eastern Time
             eastern = pytz.timezone('US/Eastern')
@@ -655,208 +782,124 @@ class FiscalYearDisplay:
             # Format with timezone abbreviation (EST or EDT)
             creation_timestamp = now_eastern.strftime("%Y-%m-%d %H:%M:%S %Z")
             
-            # Define styles
-            header_font = Font(bold=True, size=12)
-            role_font = Font(bold=True, size=10)
-            holiday_fill = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")
-            pay_period_fill = PatternFill(start_color="E6F7FF", end_color="E6F7FF", fill_type="solid")
-            
-            shift_fills = {
-                'D': PatternFill(start_color="CCE5FF", end_color="CCE5FF", fill_type="solid"),
-                'N': PatternFill(start_color="E6CCFF", end_color="E6CCFF", fill_type="solid"),
-                'AT': PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
+            # Define styles once; every cell references one of these
+            header_format = wb.add_format({'bold': True, 'font_size': 12})
+            pattern_header_format = wb.add_format({'bold': True, 'font_size': 12, 'align': 'center', 'rotation': 90})
+            date_header_formats = {
+                # (is_holiday, is_pay_period_end, bold)
+                (True, False, True): wb.add_format({'bold': True, 'font_size': 12, 'bg_color': '#FFFF99'}),
+                (True, False, False): wb.add_format({'bg_color': '#FFFF99'}),
+                (False, True, True): wb.add_format({'bold': True, 'font_size': 12, 'bg_color': '#E6F7FF'}),
+                (False, True, False): wb.add_format({'bg_color': '#E6F7FF'}),
+                (False, False, True): header_format,
+                (False, False, False): None,
             }
+            shift_formats = formats['shift']
+            role_formats = formats['role']
+            center_format = formats['center']
             
-            role_fills = {
-                'Nurse': PatternFill(start_color="FFF0F0", end_color="FFF0F0", fill_type="solid"),
-                'Medic': PatternFill(start_color="F0F0FF", end_color="F0F0FF", fill_type="solid")
-            }
+            def write_staff_rows(ws, first_row, staff_names, shift_grid):
+                for row_idx, (staff_name, shifts) in enumerate(zip(staff_names, shift_grid), start=first_row):
+                    role = staff_roles.get(staff_name, 'Unknown')
+                    role_format = role_formats.get(role)
+                    ws.write(row_idx, 0, staff_name, role_format)
+                    ws.write(row_idx, 1, role, role_format)
+                    
+                    for col_idx, shift in enumerate(shifts, start=2):
+                        ws.write(row_idx, col_idx, shift, shift_formats.get(shift, center_format))
+            
+            projection = self.get_projection()
+            
+            # Sort staff by role then name
+            sorted_staff = sorted(tracks_data.keys(), key=lambda x: (staff_roles.get(x, 'Unknown'), x))
             
             # ========================================
             # TAB 1: MASTER TRACKS (42-Day Pattern)
             # ========================================
-            master_ws = wb.create_sheet(title="Master Tracks", index=0)
-            
-            # Generate 42 pattern days
-            pattern_days = []
-            days_of_week = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
-            week_letters = ["A", "A", "B", "B", "C", "C"]
-            week_numbers = [1, 2, 3, 4, 5, 6]
+            master_ws = wb.add_worksheet("Master Tracks")
+            pattern_days = projection.pattern_days
             
-            for week_idx in range(6):
-                for day_idx in range(7):
-                    pattern_day = f"{days_of_week[day_idx]} {week_letters[week_idx]} {week_numbers[week_idx]}"
-                    pattern_days.append(pattern_day)
+            # Column widths and freeze panes
+            master_ws.set_column(0, 0, 18)
+            master_ws.set_column(1, 1, 12)
+            master_ws.set_column(2, len(pattern_days) + 1, 4)
+            master_ws.freeze_panes(1, 2)
             
             # Headers for Master Tracks
-            master_ws['A1'] = 'Staff Name'
-            master_ws['B1'] = 'Role'
-            master_ws['A1'].font = header_font
-            master_ws['B1'].font = header_font
-            
-            # Pattern day headers
-            for col_idx, pattern_day in enumerate(pattern_days, start=3):
-                cell = master_ws.cell(row=1, column=col_idx, value=pattern_day)
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', text_rotation=90)
-                master_ws.column_dimensions[get_column_letter(col_idx)].width = 4
-            
-            # Sort staff by role then name
-            sorted_staff = sorted(tracks_data.keys(), key=lambda x: (staff_roles.get(x, 'Unknown'), x))
+            master_ws.write(0, 0, 'Staff Name', header_format)
+            master_ws.write(0, 1, 'Role', header_format)
+            master_ws.write_row(0, 2, pattern_days, pattern_header_format)
             
             # Populate Master Tracks data
-            row_idx = 2
-            for staff_name in sorted_staff:
-                role = staff_roles.get(staff_name, 'Unknown')
-                
-                # Staff name and role
-                name_cell = master_ws.cell(row=row_idx, column=1, value=staff_name)
-                role_cell = master_ws.cell(row=row_idx, column=2, value=role)
-                
-                # Apply role-based background color
-                if role in role_fills:
-                    name_cell.fill = role_fills[role]
-                    role_cell.fill = role_fills[role]
-                
-                # Fill in shifts for each pattern day
-                for col_idx, pattern_day in enumerate(pattern_days, start=3):
-                    shift = tracks_data.get(staff_name, {}).get(pattern_day, '')
-                    cell = master_ws.cell(row=row_idx, column=col_idx, value=shift)
-                    
-                    # Apply shift-based styling
-                    if shift in shift_fills:
-                        cell.fill = shift_fills[shift]
-                    
-                    cell.alignment = Alignment(horizontal='center')
-                
-                row_idx += 1
-            
-            # Freeze panes for Master Tracks
-            master_ws.freeze_panes = 'C2'
-            
-            # Set column widths
-            master_ws.column_dimensions['A'].width = 18
-            master_ws.column_dimensions['B'].width = 12
+            write_staff_rows(master_ws, 1, sorted_staff, projection.pattern_grid(sorted_staff))
             
             fiscal_months = self.get_fiscal_year_months()
             
+            # Staff data on monthly sheets - sort by role then name
+            sorted_staff = sorted(tracks_data.keys(), key=lambda x: (staff_roles.get(x, ''), x))
+            
             # ========================================
             # MONTHLY SHEETS
             # ========================================
             # Create sheet for each month
             for month_info in fiscal_months:
                 month_name = month_info['name'].replace(' ', '_')
-                ws = wb.create_sheet(title=month_name[:31])
-                
-                # Headers
-                ws['A1'] = 'Staff Name'
-                ws['B1'] = 'Role'
-                ws['A1'].font = header_font
-                ws['B1'].font = header_font
-                
-                # Date columns
-                col_idx = 3
-                current_date = month_info['start']
-                date_cols = []
+                ws = wb.add_worksheet(month_name[:31])
                 
-                while current_date <= month_info['end']:
-                    # Day of week
-                    ws.cell(row=1, column=col_idx, value=current_date.strftime('%a')).font = header_font
-                    # Day number
-                    ws.cell(row=2, column=col_idx, value=current_date.day).font = header_font
-                    
-                    # Pattern day
-                    pattern_day = self.get_pattern_day_name(current_date)
-                    pattern_parts = pattern_day.split()
-                    if len(pattern_parts) >= 3:
-                        ws.cell(row=3, column=col_idx, value=f"{pattern_parts[1]} {pattern_parts[2]}")
-                    
-                    # Mark holidays
-                    if current_date in self.holidays:
-                        for row_num in range(1, 4):
-                            ws.cell(row=row_num, column=col_idx).fill = holiday_fill
-                            ws.cell(row=row_num, column=col_idx).comment = Comment(
-                                self.holidays[current_date], "System"
-                            )
-                    
-                    # Mark pay period ends
-                    if self.is_pay_period_end(current_date):
-                        for row_num in range(1, 4):
-                            cell = ws.cell(row=row_num, column=col_idx)
-                            if cell.fill.start_color.rgb != holiday_fill.start_color.rgb:
-                                cell.fill = pay_period_fill
-                    
-                    date_cols.append((current_date, pattern_day))
-                    col_idx += 1
-                    current_date += timedelta(days=1)
+                # Date columns come straight off the projection
+                month_days = projection.day_slice(month_info['start'], month_info['end'])
+                month_dates = projection.dates_in(month_days)
+                holiday_flags = projection.holiday_mask[month_days]
+                # Holiday fill takes precedence over pay period fill
+                pay_period_flags = projection.pay_period_mask[month_days] & ~holiday_flags
+                holiday_names = projection.holiday_names[month_days]
+                pattern_labels = [pattern_days[i] for i in projection.pattern_index[month_days]]
                 
-                # Staff data - sort by role then name
-                sorted_staff = sorted(tracks_data.keys(), key=lambda x: (staff_roles.get(x, ''), x))
+                # Column widths and freeze panes
+                ws.set_column(0, 0, 18)
+                ws.set_column(1, 1, 12)
+                ws.set_column(2, len(month_dates) + 1, 6)
+                ws.freeze_panes(3, 2)
                 
-                row_idx = 4
-                for staff_name in sorted_staff:
-                    role = staff_roles.get(staff_name, 'Unknown')
-                    
-                    # Staff name and role
-                    name_cell = ws.cell(row=row_idx, column=1, value=staff_name)
-                    role_cell = ws.cell(row=row_idx, column=2, value=role)
-                    
-                    # Apply role-based background color
-                    if role in role_fills:
-                        name_cell.fill = role_fills[role]
-                        role_cell.fill = role_fills[role]
-                    
-                    # Shift assignments
-                    for col_offset, (date, pattern_day) in enumerate(date_cols):
-                        shift = tracks_data.get(staff_name, {}).get(pattern_day, '')
-                        cell = ws.cell(row=row_idx, column=3 + col_offset, value=shift)
+                # Header rows are written one full row at a time (constant_memory)
+                ws.write(0, 0, 'Staff Name', header_format)
+                ws.write(0, 1, 'Role', header_format)
+                for row_num in range(3):
+                    for col_idx, date in enumerate(month_dates):
+                        is_holiday = bool(holiday_flags[col_idx])
+                        cell_format = date_header_formats[(is_holiday, bool(pay_period_flags[col_idx]), row_num < 2)]
                         
-                        # Apply shift-based styling
-                        if shift in shift_fills:
-                            cell.fill = shift_fills[shift]
+                        if row_num == 0:
+                            # Day of week
+                            value = date.strftime('%a')
+                        elif row_num == 1:
+                            # Day number
+                            value = date.day
+                        else:
+                            # Pattern day
+                            pattern_parts = pattern_labels[col_idx].split()
+                            value = f"{pattern_parts[1]} {pattern_parts[2]}" if len(pattern_parts) >= 3 else None
                         
-                        cell.alignment = Alignment(horizontal='center')
-                    
-                    row_idx += 1
-                
-                # Freeze panes
-                ws.freeze_panes = 'C4'
+                        if value is None:
+                            ws.write_blank(row_num, col_idx + 2, None, cell_format)
+                        else:
+                            ws.write(row_num, col_idx + 2, value, cell_format)
+                        
+                        # Mark holidays
+                        if is_holiday:
+                            ws.write_comment(row_num, col_idx + 2, holiday_names[col_idx], {'author': 'System'})
                 
-                # Column widths
-                ws.column_dimensions['A'].width = 18
-                ws.column_dimensions['B'].width = 12
-                for col in range(3, col_idx):
-                    ws.column_dimensions[get_column_letter(col)].width = 6
+                write_staff_rows(ws, 3, sorted_staff, projection.shift_grid(sorted_staff, month_days))
             
             # ========================================
             # LAST TAB: VERSION
             # ========================================
-            version_ws = wb.create_sheet(title="Version")
-            version_ws['A1'] = f"Created: {creation_timestamp}"
-            version_ws['A1'].font = Font(bold=True, size=11)
-            version_ws.column_dimensions['A'].width = 30
-            
-            # Save to temp file
-            export_dir = 'exports'
-            os.makedirs(export_dir, exist_ok=True)
-            
-            # Include filter info in filename if applicable
-            filename_suffix = ""
-            if role_filter and role_filter != 'All Roles':
-                filename_suffix += f"_{role_filter}"
-            if staff_filter and staff_filter != 'All Staff':
-                if staff_filter == 'Selected Staff':
-                    filename_suffix += "_CustomSelection"
-                else:
-                    filename_suffix += f"_{staff_filter.replace(' ', '_')}"
-            
-            temp_file = os.path.join(
-                export_dir, 
-                f'FY2026_Tracks_Export{filename_suffix}_{datetime.now(_eastern_tz).strftime("%Y%m%d_%H%M%S")}.xlsx'
-            )
-            wb.save(temp_file)
+            version_ws = wb.add_worksheet("Version")
+            version_ws.set_column(0, 0, 30)
+            version_ws.write(0, 0, f"Created: {creation_timestamp}", wb.add_format({'bold': True, 'font_size': 11}))
             
-            return temp_file, "Export successful"
+            wb.close()
+            return output.getvalue(), "Export successful"
             
         except Exception as e:
             return None, f"Export failed: {str(e)}"
@@ -952,35 +995,36 @@ def add_fiscal_year_export_to_admin(admin_authenticated=False):
 def get_staff_workload_summary(tracks_data, staff_roles, fiscal_year_display):
     """
     Utility function to analyze staff workload across the fiscal year
+    Counts come from the cached FiscalYearProjection (every calendar day of the year)
     """
     if not tracks_data:
         return {}
     
-    workload_summary = {}
-    fiscal_months = fiscal_year_display.get_fiscal_year_months()
+    staff_names = list(tracks_data.keys())
+    projection = fiscal_year_display.get_projection()
+    if any(staff_name not in projection.staff_index for staff_name in staff_names):
+        # Caller passed tracks that aren't the active set - project them directly
+        projection = FiscalYearProjection(fiscal_year_display, tracks_data)
     
-    for staff_name, track_data in tracks_data.items():
-        role = staff_roles.get(staff_name, 'Unknown')
-        
-        # Count shifts by type
-        shift_counts = {'D': 0, 'N': 0, 'AT': 0, 'Off': 0}
-        
-        for pattern_day, shift in track_data.items():
-            if shift in shift_counts:
-                shift_counts[shift] += 1
-            else:
-                shift_counts['Off'] += 1
-        
-        total_shifts = shift_counts['D'] + shift_counts['N'] + shift_counts['AT']
+    # Count shifts by type
+    counts = projection.shift_counts(staff_names, ('D', 'N', 'AT'))
+    total_days = projection.day_count
+    
+    workload_summary = {}
+    for idx, staff_name in enumerate(staff_names):
+        day_shifts = int(counts['D'][idx])
+        night_shifts = int(counts['N'][idx])
+        admin_time = int(counts['AT'][idx])
+        total_shifts = day_shifts + night_shifts + admin_time
         
         workload_summary[staff_name] = {
-            'role': role,
-            'day_shifts': shift_counts['D'],
-            'night_shifts': shift_counts['N'],
-            'admin_time': shift_counts['AT'],
-            'off_days': shift_counts['Off'],
+            'role': staff_roles.get(staff_name, 'Unknown'),
+            'day_shifts': day_shifts,
+            'night_shifts': night_shifts,
+            'admin_time': admin_time,
+            'off_days': total_days - total_shifts,
             'total_working_days': total_shifts,
-            'workload_percentage': round((total_shifts / len(track_data)) * 100, 1) if track_data else 0
+            'workload_percentage': round((total_shifts / total_days) * 100, 1) if total_days else 0
         }
     
     return workload_summary
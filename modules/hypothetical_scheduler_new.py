@@ -6,11 +6,15 @@ Now displays the ranking within the specific role group (nurses vs medics) rathe
 
 import streamlit as st
 import pandas as pd
-import json
-import sqlite3
+import numpy as np
 import os
+from bisect import bisect_right
 from .shift_definitions import day_shifts, night_shifts
 from .db_utils import get_db_connection
+from .track_codes import load_track_matrix, DEFAULT_SCHEMA
+from .staffing_counts import day_index_for
+from .instrumentation import instrumented
+from .query_profiler import open_connection
 
 # Historical fixed shift-to-base slot counts, used as a fallback when a track
 # config has no explicit override on file. KMHT and 1B9 have no night presence.
@@ -51,6 +55,7 @@ def _build_available_slots(shift_type, base_shift_counts):
     return available_slots, slot_to_base
 
 
+@instrumented
 def _load_all_base_preferences():
     """Return {staff_name: row_dict} for every staff member with base preferences."""
     from .db_utils import get_all_location_preferences
@@ -178,6 +183,7 @@ def get_staff_shift_preferences(staff_name, preferences_df, staff_col_prefs, shi
     except:
         return {}
 
+@instrumented
 def get_staff_on_shift_from_database(day, shift_type, preferences_df, staff_col_prefs, role_col, bid_track_name=None):
     """
     FIXED: Get staff assigned to a specific day and shift type from database
@@ -203,43 +209,23 @@ def get_staff_on_shift_from_database(day, shift_type, preferences_df, staff_col_
         if not os.path.exists(db_path):
             return []
 
-        conn = sqlite3.connect(db_path)
+        conn = open_connection(db_path)
         cursor = conn.cursor()
 
+        # Tracks come back as a (staff x day) matrix of code bytes - no JSON decoding
         if bid_track_name:
-            cursor.execute("""
-                SELECT staff_name, track_data
-                FROM tracks
-                WHERE track_name = ? AND is_active = 0
-            """, (bid_track_name,))
+            staff_names, matrix = load_track_matrix(cursor, "track_name = ? AND is_active = 0", (bid_track_name,))
         else:
-            cursor.execute("""
-                SELECT staff_name, track_data
-                FROM tracks
-                WHERE is_active = 1
-            """)
-
-        results = cursor.fetchall()
+            staff_names, matrix = load_track_matrix(cursor, "is_active = 1")
         conn.close()
         
-        staff_on_shift = []
-        for staff_name, track_json in results:
-            try:
-                track_data = json.loads(track_json)
-                
-                # FIXED: Generate proper day name variations
-                day_variants = generate_day_name_variants(day)
-                
-                # Check each variant
-                for day_variant in day_variants:
-                    if day_variant in track_data and track_data[day_variant] == shift_type:
-                        staff_on_shift.append(staff_name)
-                        break  # Found a match, no need to check other variants
-                        
-            except:
-                continue
+        # Any accepted day spelling ("Mon A 1", "Mon A1", "MonA1") maps to one column
+        day_index = day_index_for(day)
+        code = DEFAULT_SCHEMA.code_for(shift_type)
+        if day_index is None or code is None:
+            return []
         
-        return staff_on_shift
+        return [staff_names[i] for i in np.flatnonzero(matrix[:, day_index] == code)]
     except:
         return []
 
@@ -345,6 +331,7 @@ def get_staff_role_for_counting(staff_name, preferences_df, staff_col_prefs, rol
     except:
         return "nurse"
 
+@instrumented
 def simulate_full_shift_roster(
     day, shift_type, role_bucket, preferences_df, staff_col_prefs, role_col, seniority_col,
     all_base_prefs=None, bid_track_name=None, base_shift_counts=None
@@ -410,6 +397,7 @@ def simulate_full_shift_roster(
     return assigned
 
 
+@instrumented
 def calculate_hypothetical_assignment(
     selected_staff, day, shift_type, preferences_df, current_tracks_df,
     staff_col_prefs, staff_col_tracks, role_col, seniority_col, use_database_logic,
@@ -608,6 +596,7 @@ def calculate_hypothetical_assignment(
         'total_competitors': len(staff_with_seniority)
     }
 
+@instrumented
 def generate_hypothetical_schedule_new(
     selected_staff, preferences_df, current_tracks_df, days,
     staff_col_prefs, staff_col_tracks, role_col, seniority_col,
@@ -689,6 +678,393 @@ def generate_hypothetical_schedule_new(
         'use_database_logic': use_database_logic
     }
 
+
+# ──────────────────────────────────────────────
+# Roster-wide mode: every staff member's hypothetical schedule in one pass
+# ──────────────────────────────────────────────
+
+ROSTER_SCHEDULE_CACHE_SIZE = 4
+_roster_schedule_cache = {}
+
+
+def _roster_lookups(preferences_df, staff_col_prefs, role_col, seniority_col):
+    """
+    First-row role and seniority per staff name, with the same fallbacks as
+    get_staff_role_for_counting ('nurse') and get_staff_seniority_rank (999)
+    """
+    roles = {}
+    seniority = {}
+    try:
+        names = preferences_df[staff_col_prefs].tolist()
+        raw_roles = preferences_df[role_col].tolist()
+        raw_seniority = preferences_df[seniority_col].tolist()
+    except Exception:
+        return roles, seniority
+    for name, role, rank in zip(names, raw_roles, raw_seniority):
+        if name in roles:
+            continue
+        roles[name] = "nurse" if role == "dual" else role
+        try:
+            seniority[name] = int(rank)
+        except Exception:
+            seniority[name] = 999
+    return roles, seniority
+
+
+def _roster_role_rankings(staff_names, preferences_df, staff_col_prefs, role_col, seniority_col):
+    """get_staff_role_based_ranking for every staff member, one sort per role group"""
+    rankings = {}
+    try:
+        frame = preferences_df[[staff_col_prefs, role_col, seniority_col]]
+        effective_roles = frame[role_col].apply(lambda r: "nurse" if r == "dual" else r)
+        first_rows = frame.drop_duplicates(subset=[staff_col_prefs], keep='first')
+        groups = {}
+        for effective_role in effective_roles.dropna().unique():
+            group = frame[effective_roles == effective_role]
+            ordered = sorted(
+                zip(group[staff_col_prefs].tolist(), group[seniority_col].astype(int).tolist()),
+                key=lambda x: x[1]
+            )
+            first_rank = {}
+            for i, (name, _) in enumerate(ordered):
+                first_rank.setdefault(name, i + 1)
+            groups[effective_role] = (first_rank, len(ordered))
+        for name, role, rank in zip(first_rows[staff_col_prefs], first_rows[role_col], first_rows[seniority_col]):
+            effective_role = "nurse" if role == "dual" else role
+            first_rank, total = groups.get(effective_role, ({}, 0))
+            rankings[name] = {
+                'overall_rank': int(rank),
+                'role_rank': first_rank.get(name, 999),
+                'role': role,
+                'effective_role': effective_role,
+                'total_in_role': total,
+            }
+    except Exception:
+        # Non-numeric seniority somewhere: fall back to the per-staff calculation
+        rankings = {}
+    for name in staff_names:
+        if name not in rankings:
+            rankings[name] = get_staff_role_based_ranking(
+                name, preferences_df, staff_col_prefs, role_col, seniority_col
+            )
+    return rankings
+
+
+def _pick_slot(staff_base_data, available_shifts, shift_to_base, location_key, max_rank):
+    """
+    The slot a staff member takes from the remaining ones, by the same rule as
+    calculate_hypothetical_assignment
+
+    Returns:
+        tuple: (slot, preference_rank, kind) with kind 'preferred', 'unavailable' or 'no_prefs'
+    """
+    if staff_base_data is None:
+        return available_shifts[0], None, 'no_prefs'
+    locations = staff_base_data.get(location_key, {})
+    shift_scores = {
+        shift: (max_rank + 1 - locations[shift_to_base[shift]])
+        for shift in available_shifts
+        if shift_to_base.get(shift) in locations and locations.get(shift_to_base.get(shift)) is not None
+    }
+    if shift_scores:
+        shift_name = max(shift_scores.items(), key=lambda x: x[1])[0]
+        return shift_name, locations.get(shift_to_base.get(shift_name, shift_name)), 'preferred'
+    return available_shifts[0], None, 'unavailable'
+
+
+def _roster_shift_outcome(staff, role_bucket, shift_type, position, total, max_shifts,
+                          available, all_base_prefs, shift_to_base, location_key, max_rank, ranking):
+    """One staff member's calculate_hypothetical_assignment result from the shared competition"""
+    common = {
+        'role_ranking_info': ranking,
+        'competition_rank': position + 1,
+        'total_competitors': total,
+    }
+    if total > max_shifts and position >= max_shifts:
+        return {
+            'assignment': None,
+            'reason': (
+                f"No shift available — {total} {role_bucket}s "
+                f"compete for {max_shifts} {shift_type} shifts, you rank #{position + 1}"
+            ),
+            'preference_score': None,
+            'no_preference_data': all_base_prefs.get(staff) is None,
+            **common,
+        }
+    if not available:
+        return {
+            'assignment': None,
+            'reason': (
+                f"No shifts remaining — all {max_shifts} {shift_type} shifts "
+                f"assigned to more senior {role_bucket}s"
+            ),
+            'preference_score': None,
+            'no_preference_data': False,
+            **common,
+        }
+
+    shift_name, preference_rank, kind = _pick_slot(
+        all_base_prefs.get(staff), available, shift_to_base, location_key, max_rank
+    )
+    base_short = shift_to_base.get(shift_name, shift_name)
+    role_rank = f"role rank: {ranking['role_rank']}/{ranking['total_in_role']}"
+    if kind == 'preferred':
+        reason = f"Assigned to {base_short} ({shift_name}, Rank {preference_rank}, {role_rank})"
+    elif kind == 'unavailable':
+        reason = f"Assigned to {base_short} ({shift_name}, preferred bases unavailable, {role_rank})"
+    else:
+        reason = f"Assigned to {base_short} ({shift_name}, no base preferences set, {role_rank})"
+    return {
+        'assignment': base_short,
+        'reason': reason,
+        'preference_score': preference_rank,
+        'no_preference_data': kind == 'no_prefs',
+        **common,
+    }
+
+
+def _roster_competition(staff_names, competitors, shift_type, role_of, seniority_of, rankings,
+                        all_base_prefs, base_shift_counts):
+    """
+    Run one (day, shift) seniority competition per role bucket and read every
+    staff member's outcome off it
+
+    A staff member already on the shift gets their place in the competition.
+    One who isn't would be inserted after everyone at least as senior; the
+    more senior competitors pick exactly as before, so their result is the
+    pick from the slots those competitors leave.
+
+    Returns:
+        dict: staff_name -> calculate_hypothetical_assignment-style result
+    """
+    available_shifts, shift_to_base = _build_available_slots(shift_type, base_shift_counts)
+    max_shifts = len(available_shifts)
+    location_key = 'day_locations' if shift_type == 'day' else 'night_locations'
+    max_rank = 5 if shift_type == 'day' else 3
+
+    by_bucket = {}
+    for staff in competitors:
+        by_bucket.setdefault(role_of.get(staff, "nurse"), []).append(staff)
+
+    outcomes = {}
+    buckets = {}
+    for staff in staff_names:
+        role_bucket = role_of.get(staff, "nurse")
+        if role_bucket != role_bucket:
+            # A missing role never compares equal, so the single-staff simulation finds no competitors
+            outcomes[staff] = {
+                'assignment': None, 'reason': "Assignment calculation error", 'preference_score': None,
+                'no_preference_data': False, 'role_ranking_info': rankings[staff],
+                'competition_rank': 999, 'total_competitors': 0,
+            }
+            continue
+        buckets.setdefault(role_bucket, []).append(staff)
+
+    for role_bucket, targets in buckets.items():
+        ordered = sorted(by_bucket.get(role_bucket, []), key=lambda s: seniority_of.get(s, 999))
+        ranks = [seniority_of.get(s, 999) for s in ordered]
+
+        # Remaining slots before each competitor picks (index len(ordered) = after everyone)
+        remaining = list(available_shifts)
+        available_before = []
+        last_index = {}
+        first_index = {}
+        for i, staff in enumerate(ordered):
+            available_before.append(list(remaining))
+            first_index.setdefault(staff, i)
+            last_index[staff] = i
+            if remaining:
+                shift_name, _, _ = _pick_slot(all_base_prefs.get(staff), remaining, shift_to_base,
+                                              location_key, max_rank)
+                remaining.remove(shift_name)
+        available_before.append(list(remaining))
+
+        for staff in targets:
+            if staff in first_index:
+                position = first_index[staff]
+                total = len(ordered)
+                available = available_before[last_index[staff]]
+            else:
+                position = bisect_right(ranks, seniority_of.get(staff, 999))
+                total = len(ordered) + 1
+                available = available_before[position]
+            outcomes[staff] = _roster_shift_outcome(
+                staff, role_bucket, shift_type, position, total, max_shifts, available,
+                all_base_prefs, shift_to_base, location_key, max_rank, rankings[staff]
+            )
+    return outcomes
+
+
+def _roster_competitors(days, use_database_logic, current_tracks_df, staff_col_tracks, bid_track_name):
+    """
+    {(day, 'D'/'N'): [staff on that shift]} for every day, from one track load
+
+    Same sources and order as get_staff_on_shift_from_database/_from_excel.
+    """
+    competitors = {}
+    if use_database_logic:
+        staff_names, matrix = [], None
+        try:
+            db_path = 'data/medflight_tracks.db'
+            if os.path.exists(db_path):
+                conn = open_connection(db_path)
+                cursor = conn.cursor()
+                if bid_track_name:
+                    staff_names, matrix = load_track_matrix(cursor, "track_name = ? AND is_active = 0", (bid_track_name,))
+                else:
+                    staff_names, matrix = load_track_matrix(cursor, "is_active = 1")
+                conn.close()
+        except Exception:
+            matrix = None
+        for day in days:
+            day_index = day_index_for(day)
+            for code in ('D', 'N'):
+                if matrix is None or day_index is None:
+                    competitors[(day, code)] = []
+                    continue
+                code_byte = DEFAULT_SCHEMA.code_for(code)
+                competitors[(day, code)] = [staff_names[i] for i in np.flatnonzero(matrix[:, day_index] == code_byte)]
+    else:
+        for day in days:
+            for code in ('D', 'N'):
+                competitors[(day, code)] = get_staff_on_shift_from_excel(day, code, current_tracks_df, staff_col_tracks)
+    return competitors
+
+
+def _roster_snapshot_key(preferences_df, current_tracks_df, days, staff_col_prefs, staff_col_tracks, role_col,
+                         seniority_col, bid_track_name, effective_track_name, use_database_logic, staff_names):
+    """Cache key for one bid snapshot, or None if it can't be versioned right now"""
+    from .query_cache import get_table_versions
+    from .track_modification_core import _preferences_fingerprint
+
+    versions = get_table_versions('tracks', 'track_configs', 'user_location_preferences')
+    if versions is None:
+        return None, None
+    preferences_fingerprint = _preferences_fingerprint(preferences_df, staff_col_prefs)
+    tracks_fingerprint = None
+    if not use_database_logic:
+        tracks_fingerprint = _preferences_fingerprint(current_tracks_df, staff_col_tracks)
+        if tracks_fingerprint is None:
+            return None, None
+    if preferences_fingerprint is None:
+        return None, None
+    key = (tuple(days), staff_col_prefs, staff_col_tracks, role_col, seniority_col, bid_track_name,
+           effective_track_name, use_database_logic, tuple(staff_names), preferences_fingerprint, tracks_fingerprint)
+    return key, versions
+
+
+@instrumented
+def generate_roster_hypothetical_schedules(
+    preferences_df, current_tracks_df, days,
+    staff_col_prefs, staff_col_tracks, role_col, seniority_col,
+    bid_track_name=None, staff_names=None, use_database_logic=None
+):
+    """
+    generate_hypothetical_schedule_new() for every staff member in one call.
+
+    Runs the seniority competition once per (day, shift, role bucket) and
+    records every participant's outcome, instead of one full simulation per
+    staff member per day and shift. Each staff member's result is identical
+    to what generate_hypothetical_schedule_new() returns for them.
+
+    Results are cached per bid snapshot: the tracks/track_configs/base
+    preference versions plus the content of the preferences (and, for Excel
+    logic, current tracks) frame.
+
+    Args:
+        staff_names (list, optional): Staff to compute (defaults to everyone in preferences_df)
+        use_database_logic (bool, optional): Defaults to the session's track source, as the single-staff mode
+
+    Returns:
+        dict: staff_name -> {'day_assignments', 'night_assignments', 'assignment_details',
+            'role_ranking_info', 'use_database_logic'}
+    """
+    from .query_cache import clone_result
+    from .db_utils import get_active_track_config, get_base_shift_counts
+
+    if use_database_logic is None:
+        use_database_logic = st.session_state.get('track_source', "Annual Rebid") == "Annual Rebid"
+    if staff_names is None:
+        staff_names = list(dict.fromkeys(preferences_df[staff_col_prefs].dropna().tolist()))
+    else:
+        staff_names = list(dict.fromkeys(staff_names))
+
+    effective_track_name = bid_track_name
+    if not effective_track_name:
+        active_cfg = get_active_track_config()
+        effective_track_name = active_cfg['track_name'] if active_cfg else 'FY26'
+
+    key, versions = _roster_snapshot_key(
+        preferences_df, current_tracks_df, days, staff_col_prefs, staff_col_tracks, role_col, seniority_col,
+        bid_track_name, effective_track_name, use_database_logic, staff_names
+    )
+    cached = _roster_schedule_cache.get(key) if key is not None else None
+    if cached is not None and cached[0] == versions:
+        return clone_result(cached[1])
+
+    all_base_prefs = _load_all_base_preferences()
+    base_shift_counts = get_base_shift_counts(effective_track_name)
+    role_of, seniority_of = _roster_lookups(preferences_df, staff_col_prefs, role_col, seniority_col)
+    rankings = _roster_role_rankings(staff_names, preferences_df, staff_col_prefs, role_col, seniority_col)
+    competitors = _roster_competitors(days, use_database_logic, current_tracks_df, staff_col_tracks, bid_track_name)
+
+    schedules = {
+        staff: {
+            'day_assignments': {},
+            'night_assignments': {},
+            'assignment_details': {},
+            'role_ranking_info': rankings[staff],
+            'use_database_logic': use_database_logic,
+        }
+        for staff in staff_names
+    }
+    for day in days:
+        day_outcomes = _roster_competition(staff_names, competitors[(day, 'D')], 'day', role_of, seniority_of,
+                                           rankings, all_base_prefs, base_shift_counts)
+        night_outcomes = _roster_competition(staff_names, competitors[(day, 'N')], 'night', role_of, seniority_of,
+                                             rankings, all_base_prefs, base_shift_counts)
+        for staff in staff_names:
+            schedule = schedules[staff]
+            schedule['day_assignments'][day] = day_outcomes[staff]['assignment']
+            schedule['night_assignments'][day] = night_outcomes[staff]['assignment']
+            schedule['assignment_details'][day] = {'day': day_outcomes[staff], 'night': night_outcomes[staff]}
+
+    if key is not None:
+        _roster_schedule_cache.pop(key, None)
+        _roster_schedule_cache[key] = (versions, clone_result(schedules))
+        while len(_roster_schedule_cache) > ROSTER_SCHEDULE_CACHE_SIZE:
+            _roster_schedule_cache.pop(next(iter(_roster_schedule_cache)))
+    return schedules
+
+
+def build_roster_hypothetical_table(schedules, days):
+    """
+    Wide staff x day table of roster-wide hypothetical results: each cell is
+    "D: BASE / N: BASE" with "—" where no shift would be available
+
+    Args:
+        schedules (dict): Result of generate_roster_hypothetical_schedules()
+        days (list): Day columns
+
+    Returns:
+        DataFrame: One row per staff member (Staff, Role, Role Rank, then the days)
+    """
+    rows = []
+    for staff, schedule in schedules.items():
+        ranking = schedule.get('role_ranking_info', {})
+        row = {
+            'Staff': staff,
+            'Role': str(ranking.get('role', '')).title(),
+            'Role Rank': f"{ranking.get('role_rank')}/{ranking.get('total_in_role')}",
+        }
+        for day in days:
+            day_base = schedule['day_assignments'].get(day) or '—'
+            night_base = schedule['night_assignments'].get(day) or '—'
+            row[day] = f"D: {day_base} / N: {night_base}"
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
 def display_hypothetical_results_new(results, selected_staff, days):
     """
     Display hypothetical scheduler results with enhanced formatting
@@ -0,0 +1,406 @@
+# modules/instrumentation.py
+"""
+Per-rerun timing instrumentation.
+
+Hot-path functions are wrapped with @instrumented (or instrument_class() /
+instrument_module() for whole classes and modules). While a session has
+recording turned on, every wrapped call made from its script thread is
+counted with its wall time and the SQL statements it ran; while no thread
+is recording the wrapper costs one truth test of a module dict. SQL statements are counted by
+a sqlite trace callback set by instrument_connection() on the shared
+connections (db_utils.get_db_connection, UnifiedDatabase.connect).
+
+app.py calls begin_rerun() at the top of every rerun and
+render_timing_panel() at the end; the panel (admins only) shows the slowest
+operations of the rerun and a short history, and can append every rerun to
+a rolling log file (TIMING_LOG_PATH). Setting CREWOPS_TIMINGS=1 records every
+session without the panel toggle, CREWOPS_TIMINGS_LOG=1 writes the log for
+every session (e.g. for load runs).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+import pytz
+
+_eastern_tz = pytz.timezone('America/New_York')
+
+TIMING_LOG_PATH = 'logs/rerun_timings.log'
+TIMING_LOG_MAX_BYTES = 2 * 1024 * 1024
+TIMING_LOG_BACKUPS = 5
+TIMING_HISTORY_SIZE = 10
+PANEL_TOP_OPERATIONS = 25
+
+# thread ident -> RerunRecorder of the rerun running on that thread
+_recorders = {}
+_log_lock = threading.Lock()
+_logger = None
+
+
+def _env_flag(name):
+    return os.environ.get(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class RerunRecorder:
+    """Call counts, wall time and SQL statements of the operations run during one rerun"""
+
+    def __init__(self, label=''):
+        self.label = label
+        self.started_at = datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S")
+        self._start = time.perf_counter()
+        self.wall_ms = None
+        self.sql_statements = 0
+        self.connections = 0
+        # name -> [calls, total_ms, self_ms, max_ms, sql]
+        self.operations = {}
+        # [name, start, child_ms, sql]
+        self._stack = []
+
+    def enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0, 0])
+
+    def exit(self):
+        name, start, child_ms, sql = self._stack.pop()
+        elapsed = (time.perf_counter() - start) * 1000
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = [0, 0.0, 0.0, 0.0, 0]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] += elapsed - child_ms
+        stats[3] = max(stats[3], elapsed)
+        stats[4] += sql
+        if self._stack:
+            # Time and statements are inclusive: the caller's totals contain its callees'
+            parent = self._stack[-1]
+            parent[2] += elapsed
+            parent[3] += sql
+
+    def statement(self):
+        self.sql_statements += 1
+        if self._stack:
+            self._stack[-1][3] += 1
+
+    def finish(self):
+        """Stop the clock (idempotent) and unwind operations left open by st.stop()/st.rerun()"""
+        while self._stack:
+            self.exit()
+        if self.wall_ms is None:
+            self.wall_ms = (time.perf_counter() - self._start) * 1000
+        return self
+
+    def top_operations(self, limit=PANEL_TOP_OPERATIONS, sort_by='total_ms'):
+        """
+        Returns:
+            list: Operation dicts (name, calls, total_ms, self_ms, max_ms, sql), slowest first
+        """
+        rows = [
+            {'name': name, 'calls': calls, 'total_ms': round(total, 2), 'self_ms': round(own, 2),
+             'max_ms': round(longest, 2), 'sql': sql}
+            for name, (calls, total, own, longest, sql) in self.operations.items()
+        ]
+        rows.sort(key=lambda row: row[sort_by], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def summary(self, limit=10):
+        wall_ms = self.wall_ms if self.wall_ms is not None else (time.perf_counter() - self._start) * 1000
+        return {
+            'started_at': self.started_at,
+            'label': self.label,
+            'wall_ms': round(wall_ms, 2),
+            'calls': sum(stats[0] for stats in self.operations.values()),
+            'sql_statements': self.sql_statements,
+            'connections': self.connections,
+            'top': self.top_operations(limit),
+        }
+
+
+def current_recorder():
+    """The recorder of the rerun running on this thread, or None when not recording"""
+    return _recorders.get(threading.get_ident())
+
+
+def start_recording(label=''):
+    """Record instrumented calls made from this thread until stop_recording()"""
+    recorder = RerunRecorder(label)
+    _recorders[threading.get_ident()] = recorder
+    return recorder
+
+
+def stop_recording():
+    """
+    Returns:
+        RerunRecorder or None: The finished recorder of this thread
+    """
+    recorder = _recorders.pop(threading.get_ident(), None)
+    return recorder.finish() if recorder is not None else None
+
+
+def _discard_recorder(recorder):
+    """Forget a recorder whose rerun thread ended without stop_recording() (st.stop/st.rerun)"""
+    live_threads = {thread.ident for thread in threading.enumerate()}
+    for thread_id, active in list(_recorders.items()):
+        # Also drops recorders of sessions that went away mid-rerun
+        if active is recorder or thread_id not in live_threads:
+            _recorders.pop(thread_id, None)
+
+
+def _wrap(func, name):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _recorders:
+            return func(*args, **kwargs)
+        recorder = _recorders.get(threading.get_ident())
+        if recorder is None:
+            return func(*args, **kwargs)
+        recorder.enter(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            recorder.exit()
+
+    wrapper.__instrumented__ = name
+    return wrapper
+
+
+def instrumented(func=None, name=None):
+    """
+    Decorator recording a function's calls, time and SQL statements
+
+    Usable bare (@instrumented) or with an explicit name (@instrumented(name='...')).
+    Defaults to "module.function" without the package prefix.
+    """
+    def decorator(target):
+        if getattr(target, '__instrumented__', None):
+            return target
+        return _wrap(target, name or f"{target.__module__.rsplit('.', 1)[-1]}.{target.__qualname__}")
+
+    return decorator(func) if func is not None else decorator
+
+
+def instrument_class(cls=None, include_private=False, exclude=()):
+    """
+    Class decorator instrumenting every method defined on the class
+
+    Args:
+        include_private (bool): Also wrap _underscore methods (dunder methods never are)
+        exclude (tuple): Method names to leave alone
+    """
+    def decorator(target):
+        for attr, value in list(vars(target).items()):
+            if attr.startswith('__') or attr in exclude or not callable(value):
+                continue
+            if attr.startswith('_') and not include_private:
+                continue
+            if isinstance(value, (staticmethod, classmethod)):
+                continue
+            setattr(target, attr, instrumented(value, name=f"{target.__name__}.{attr}"))
+        return target
+
+    return decorator(cls) if cls is not None else decorator
+
+
+def instrument_module(namespace, exclude=()):
+    """
+    Instrument the public functions defined in a module; call at the end of the module
+    with globals()
+
+    Functions imported from elsewhere are left alone. Modules that imported a
+    function before this ran keep the unwrapped one.
+    """
+    module_name = namespace['__name__']
+    short_name = module_name.rsplit('.', 1)[-1]
+    for attr, value in list(namespace.items()):
+        if attr.startswith('_') or attr in exclude or not callable(value) or isinstance(value, type):
+            continue
+        if getattr(value, '__module__', None) != module_name:
+            continue
+        namespace[attr] = instrumented(value, name=f"{short_name}.{attr}")
+
+
+@contextmanager
+def timed(name):
+    """Record a block like an instrumented call: `with timed('fiscal_year.build_grid'): ...`"""
+    recorder = _recorders.get(threading.get_ident()) if _recorders else None
+    if recorder is None:
+        yield
+        return
+    recorder.enter(name)
+    try:
+        yield
+    finally:
+        recorder.exit()
+
+
+def _trace_statement(statement):
+    recorder = _recorders.get(threading.get_ident()) if _recorders else None
+    if recorder is not None:
+        recorder.statement()
+
+
+def instrument_connection(conn):
+    """Count the statements run on a sqlite3 connection against the current rerun"""
+    conn.set_trace_callback(_trace_statement)
+    recorder = current_recorder()
+    if recorder is not None:
+        recorder.connections += 1
+    return conn
+
+
+def _timing_logger():
+    global _logger
+    with _log_lock:
+        if _logger is None:
+            os.makedirs(os.path.dirname(TIMING_LOG_PATH), exist_ok=True)
+            logger = logging.getLogger('crewops.rerun_timings')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(TIMING_LOG_PATH, maxBytes=TIMING_LOG_MAX_BYTES,
+                                          backupCount=TIMING_LOG_BACKUPS)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+
+def log_rerun(recorder):
+    """Append a finished rerun to the rolling timing log as one JSON line"""
+    try:
+        _timing_logger().info(json.dumps(recorder.summary()))
+    except Exception as e:
+        print(f"Error writing rerun timing log: {str(e)}")
+
+
+def _close_rerun(session_state):
+    recorder = session_state.get('_timing_recorder')
+    if recorder is None or session_state.get('_timing_recorder_logged'):
+        return
+    _discard_recorder(recorder)
+    recorder.finish()
+    history = session_state.setdefault('_timing_history', [])
+    history.append(recorder.summary(limit=5))
+    del history[:-TIMING_HISTORY_SIZE]
+    if session_state.get('instrumentation_log') or _env_flag('CREWOPS_TIMINGS_LOG'):
+        log_rerun(recorder)
+    session_state['_timing_recorder_logged'] = True
+
+
+def begin_rerun(label=''):
+    """
+    Start recording this rerun if the session has timings turned on; call at the top of app.py
+
+    A rerun cut short by st.stop()/st.rerun() never reaches the panel, so it
+    is closed here instead.
+    """
+    import streamlit as st
+
+    _close_rerun(st.session_state)
+    if st.session_state.get('instrumentation_enabled') or _env_flag('CREWOPS_TIMINGS'):
+        recorder = start_recording(label)
+    else:
+        _recorders.pop(threading.get_ident(), None)
+        recorder = None
+    st.session_state['_timing_recorder'] = recorder
+    st.session_state['_timing_recorder_logged'] = False
+    return recorder
+
+
+def _is_admin(session_state):
+    if session_state.get('admin_authenticated'):
+        return True
+    training_admin = session_state.get('training_admin_access')
+    try:
+        return bool(training_admin and training_admin.is_admin_authenticated())
+    except Exception:
+        return False
+
+
+def render_timing_panel():
+    """Sidebar panel with the slowest operations of this rerun (admins only); call at the end of app.py"""
+    import streamlit as st
+    import pandas as pd
+
+    recorder = stop_recording()
+    if recorder is not None:
+        _close_rerun(st.session_state)
+    if not _is_admin(st.session_state):
+        return
+
+    with st.sidebar:
+        with st.expander("⏱️ Rerun Timings", expanded=False):
+            st.checkbox("Record timings for this session", key='instrumentation_enabled',
+                        help="Counts calls, wall time and SQL statements of instrumented functions on every rerun")
+            st.checkbox(f"Append reruns to {TIMING_LOG_PATH}", key='instrumentation_log')
+            _render_query_profile()
+
+            if recorder is None:
+                st.caption("Turn recording on and interact with the page to see timings.")
+                return
+
+            summary = recorder.summary()
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Rerun", f"{summary['wall_ms']:.0f} ms")
+            c2.metric("Calls", summary['calls'])
+            c3.metric("SQL", summary['sql_statements'])
+            st.caption(f"{summary['connections']} connections opened")
+
+            sort_by = st.radio("Sort by", ['total_ms', 'self_ms', 'calls', 'sql'], horizontal=True,
+                               key='instrumentation_sort')
+            rows = recorder.top_operations(sort_by=sort_by)
+            if rows:
+                st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+            else:
+                st.caption("No instrumented calls in this rerun.")
+
+            history = st.session_state.get('_timing_history', [])
+            if len(history) > 1:
+                st.markdown("**Recent reruns**")
+                st.dataframe(pd.DataFrame([
+                    {'started_at': run['started_at'], 'label': run['label'], 'wall_ms': run['wall_ms'],
+                     'calls': run['calls'], 'sql': run['sql_statements'],
+                     'slowest': run['top'][0]['name'] if run['top'] else ''}
+                    for run in reversed(history)
+                ]), hide_index=True, use_container_width=True)
+
+
+def _render_query_profile():
+    """Top statements from modules.query_profiler (process-wide, every session)"""
+    import streamlit as st
+    import pandas as pd
+    from modules.query_profiler import (
+        is_query_profiling_enabled, set_query_profiling, get_query_report, reset_query_stats,
+        SLOW_QUERY_MS, SLOW_QUERY_LOG_PATH
+    )
+
+    profiling = st.checkbox("Profile SQL statements (all sessions)", value=is_query_profiling_enabled(),
+                            help=f"Statements over {SLOW_QUERY_MS:.0f} ms are written to {SLOW_QUERY_LOG_PATH} "
+                                 "with their query plan")
+    if profiling != is_query_profiling_enabled():
+        set_query_profiling(profiling)
+    if not profiling:
+        return
+
+    report = get_query_report(limit=15)
+    if not report:
+        st.caption("No statements profiled yet.")
+        return
+    st.markdown("**Top queries by total time**")
+    st.dataframe(pd.DataFrame([
+        {'sql': row['sql'][:200], 'calls': row['calls'], 'total_ms': row['total_ms'], 'avg_ms': row['avg_ms'],
+         'max_ms': row['max_ms'], 'rows': row['rows'], 'slow': row['slow_calls'],
+         'callers': ", ".join(f"{caller} x{count}" for caller, count in row['top_callers'])}
+        for row in report
+    ]), hide_index=True, use_container_width=True)
+    planned = [row for row in report if row['plan']]
+    if planned:
+        choice = st.selectbox("Query plan of a slow statement", range(len(planned)),
+                              format_func=lambda i: planned[i]['sql'][:120], key='query_plan_choice')
+        st.code("\n".join(planned[choice]['plan']))
+    if st.button("Reset query statistics", key='reset_query_stats'):
+        reset_query_stats()
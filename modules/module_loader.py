@@ -0,0 +1,226 @@
+# modules/module_loader.py
+"""
+Lazy subsystem loading and import-time profiling for app.py.
+
+app.py only imports what the login and landing pages need at top level. Each
+module tile on the landing page registers the subsystems it depends on in
+TILE_MODULES; they are imported (and timed) the first time that tile is opened
+in this process, so a cold start never pays for PDF, charting or Excel
+libraries the user doesn't touch.
+
+Run `python -m modules.module_loader` to print the cold import cost of every
+registered subsystem, each measured in a fresh interpreter.
+"""
+
+import importlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Subsystems each landing-page tile needs, imported in order when it is selected
+TILE_MODULES = {
+    'clinical_track_hub': [
+        'modules.calendar_export',
+        'modules.fiscal_year',
+        'modules.pdf_generator',
+        'modules.export_utils',
+        'modules.admin_export',
+        'modules.app_helper',
+        'modules.track_management',
+        'modules.track_display',
+        'modules.track_swap',
+        'modules.preference_editor',
+        'modules.enhanced_track_validator',
+        'modules.enhanced_validation_display',
+        'modules.column_mapper',
+    ],
+    'track_bidding': [
+        'modules.track_bidding',
+    ],
+    'training_events': [
+        'training_modules.unified_database',
+        'training_modules.shared_data',
+        'training_modules.enrollment_manager',
+        'training_modules.ui_components',
+        'training_modules.class_display_components',
+        'training_modules.enrollment_session_components',
+        'training_modules.admin_access',
+        'training_modules.admin_excel_functions',
+    ],
+    'shift_location_preferences': [
+        'modules.preference_editor',
+    ],
+    'summer_leave': [
+        'modules.summer_leave',
+        'training_modules.shared_data',
+    ],
+}
+
+# Modules app.py still imports eagerly for the login and landing pages
+STARTUP_MODULES = [
+    'streamlit',
+    'pandas',
+    'modules.db_utils',
+    'modules.security',
+    'modules.enhanced_landing',
+]
+
+# module name -> {'module', 'tile', 'seconds', 'error'}; one entry per first import
+_import_timings = {}
+_timings_lock = threading.Lock()
+
+
+def is_module_available(module_name):
+    """
+    Check whether a module can be found without importing it. For a dotted
+    name the parent package is imported, so pass top-level packages here.
+
+    Args:
+        module_name (str): Dotted module name
+
+    Returns:
+        bool: True if the module's spec can be resolved
+    """
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def load_module(module_name, tile=None):
+    """
+    Import a module, recording how long the first import in this process took
+
+    Args:
+        module_name (str): Dotted module name
+        tile (str, optional): Landing-page tile that triggered the import
+
+    Returns:
+        module: The imported module (raises ImportError on failure)
+    """
+    already_loaded = module_name in sys.modules
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(module_name)
+        error = None
+    except ImportError as e:
+        module = None
+        error = str(e)
+    elapsed = time.perf_counter() - start
+
+    if not already_loaded:
+        with _timings_lock:
+            _import_timings.setdefault(module_name, {
+                'module': module_name,
+                'tile': tile,
+                'seconds': elapsed,
+                'error': error,
+            })
+
+    if module is None:
+        raise ImportError(error)
+    return module
+
+
+def load_tile_modules(tile):
+    """
+    Import every subsystem registered for a landing-page tile
+
+    Args:
+        tile (str): Key of the selected module (st.session_state.selected_module)
+
+    Returns:
+        tuple: (success, error message or None)
+    """
+    for module_name in TILE_MODULES.get(tile, []):
+        try:
+            load_module(module_name, tile)
+        except ImportError as e:
+            print(f"Could not load {module_name} for {tile}: {e}")
+            return False, f"{module_name}: {str(e)}"
+    return True, None
+
+
+def get_import_timings():
+    """
+    Returns:
+        list: Import timing records for this process, slowest first
+    """
+    with _timings_lock:
+        records = [dict(record) for record in _import_timings.values()]
+    return sorted(records, key=lambda r: r['seconds'], reverse=True)
+
+
+def _cold_import_seconds(module_name, baseline):
+    """Time one import in a fresh interpreter after the baseline modules are loaded"""
+    script = (
+        "import importlib, json, time\n"
+        f"for name in {baseline!r}:\n"
+        "    importlib.import_module(name)\n"
+        "start = time.perf_counter()\n"
+        f"importlib.import_module({module_name!r})\n"
+        "print(json.dumps(time.perf_counter() - start))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', script],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()
+        return None, error[-1] if error else 'import failed'
+    return json.loads(result.stdout.strip().splitlines()[-1]), None
+
+
+def profile_startup_imports(modules=None):
+    """
+    Measure the cold import cost of each subsystem in a fresh interpreter
+
+    Streamlit and pandas are preloaded in every run so each figure is the cost
+    the subsystem adds on top of what the landing page already pays.
+
+    Args:
+        modules (list, optional): Module names to profile (defaults to every
+            startup module and every registered tile subsystem)
+
+    Returns:
+        list: Dicts with module, tiles, seconds and error, slowest first
+    """
+    if modules is None:
+        modules = list(STARTUP_MODULES)
+        for tile_modules in TILE_MODULES.values():
+            modules.extend(m for m in tile_modules if m not in modules)
+
+    baseline = ['streamlit', 'pandas']
+    results = []
+    for module_name in modules:
+        if module_name in baseline:
+            seconds, error = _cold_import_seconds(module_name, [])
+        else:
+            seconds, error = _cold_import_seconds(module_name, baseline)
+        tiles = [tile for tile, names in TILE_MODULES.items() if module_name in names]
+        if module_name in STARTUP_MODULES:
+            tiles.insert(0, 'startup')
+        results.append({
+            'module': module_name,
+            'tiles': tiles,
+            'seconds': seconds,
+            'error': error,
+        })
+    return sorted(results, key=lambda r: r['seconds'] or 0, reverse=True)
+
+
+if __name__ == '__main__':
+    report = profile_startup_imports()
+    startup_total = sum(r['seconds'] or 0 for r in report if 'startup' in r['tiles'])
+    print(f"{'module':45} {'ms':>9}  tiles")
+    for record in report:
+        cost = f"{record['seconds'] * 1000:9.1f}" if record['seconds'] is not None else '   failed'
+        print(f"{record['module']:45} {cost}  {', '.join(record['tiles'])}")
+        if record['error']:
+            print(f"    {record['error']}")
+    print(f"\nLanding page imports: {startup_total * 1000:.1f} ms")
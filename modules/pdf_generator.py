@@ -9,6 +9,7 @@ from fpdf import FPDF  # fpdf2 package uses 'fpdf' as the module name
 import pandas as pd
 from datetime import datetime
 import pytz
+from modules.instrumentation import instrumented
 
 _eastern_tz = pytz.timezone('America/New_York')
 
@@ -219,6 +220,7 @@ def count_shifts_by_pay_period_comprehensive(track_data, days_list, preassignmen
     
     return shifts_by_pay_period
 
+@instrumented
 def generate_schedule_pdf(staff_name, track_data, days, shifts_per_pay_period=0, night_minimum=0, weekend_minimum=0, preassignments=None):
     """
     Generate a PDF with the staff schedule
@@ -568,6 +570,7 @@ def _build_requirement_rows(shifts_by_pay_period, shifts_per_pay_period, night_c
     return rows
 
 
+@instrumented
 def generate_bid_summary_pdf(staff_name, track_data, days, track_name, version, submission_date,
                               shifts_per_pay_period=0, night_minimum=0, weekend_minimum=0,
                               preassignments=None, validation_result=None, weekend_group=None):
@@ -772,6 +775,7 @@ def generate_bid_summary_pdf(staff_name, track_data, days, track_name, version,
     return pdf_bytes, filename
 
 
+@instrumented
 def generate_hypothetical_schedule_pdf(staff_name, shift_track, base_track, days,
                                         track_name, version, submission_date):
     """
@@ -0,0 +1,328 @@
+# modules/post_commit_jobs.py
+"""
+Durable post-commit job queue.
+
+Work that follows a committed write but shouldn't hold up the person who made it
+(backups, PDFs, notification emails, bid progression) is recorded as a row in
+post_commit_jobs by enqueue_job(), inside the same transaction as the write - so
+a job exists exactly when its write committed. A small pool of worker threads
+runs the jobs in the background, started by the first enqueue_job() in the process:
+
+- handlers are registered per job_type with register_job_handler()
+- committed jobs are handed to the pool through a bounded queue; when it is full
+  (backpressure) the job just stays 'pending' in the table and a later sweep
+  picks it up, so submitters never wait on the pool
+- a job is claimed with a conditional UPDATE, so it runs once even when several
+  processes share the database; failures are retried up to MAX_ATTEMPTS with the
+  error recorded, and rows left 'running' by a process that died are re-queued
+  after STALE_AFTER_SECONDS
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+import pytz
+from modules.query_profiler import open_connection
+
+_eastern_tz = pytz.timezone('America/New_York')
+
+DB_PATH = 'data/medflight_tracks.db'
+
+JOB_WORKERS = 3
+JOB_QUEUE_SIZE = 50
+MAX_ATTEMPTS = 3
+SWEEP_INTERVAL_SECONDS = 30
+STALE_AFTER_SECONDS = 600
+
+_handlers = {}
+
+
+def _now():
+    return datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def ensure_post_commit_jobs_table(cursor):
+    """Create the post_commit_jobs table and its indexes if needed"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS post_commit_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_type TEXT NOT NULL,
+        job_key TEXT,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        result TEXT,
+        error TEXT,
+        created_date TEXT NOT NULL,
+        started_date TEXT,
+        finished_date TEXT
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_post_commit_jobs_status ON post_commit_jobs (status, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_post_commit_jobs_key ON post_commit_jobs (job_key)")
+
+
+def enqueue_job(cursor, job_type, payload, job_key=None):
+    """
+    Record a job inside the caller's transaction; call dispatch_jobs() after commit
+
+    Args:
+        cursor: Cursor inside the writer's transaction (caller commits)
+        job_type (str): Registered handler name
+        payload (dict): JSON-serializable handler arguments
+        job_key (str, optional): Lookup key for reading results back (e.g. "bid:FY27:Smith")
+
+    Returns:
+        int: Job id
+    """
+    if job_type not in _handlers:
+        print(f"Warning: no handler registered for post-commit job type '{job_type}' in this process")
+    cursor.execute(
+        "INSERT INTO post_commit_jobs (job_type, job_key, payload, created_date) VALUES (?, ?, ?, ?)",
+        (job_type, job_key, json.dumps(payload), _now())
+    )
+    _pool.start()
+    return cursor.lastrowid
+
+
+def register_job_handler(job_type, handler):
+    """
+    Register the function that runs one job_type
+
+    Args:
+        job_type (str): Job type name used with enqueue_job()
+        handler (callable): Takes the payload dict, returns a JSON-serializable result
+    """
+    _handlers[job_type] = handler
+
+
+def dispatch_jobs(job_ids):
+    """
+    Hand freshly committed jobs to the worker pool without blocking
+
+    Returns:
+        int: Number of jobs queued now (the rest wait for the next sweep)
+    """
+    _pool.start()
+    return sum(1 for job_id in job_ids if _pool.offer(job_id))
+
+
+def _row_to_job(row):
+    job_id, job_type, job_key, payload, status, attempts, result, error, created, started, finished = row
+    return {
+        'id': job_id,
+        'job_type': job_type,
+        'job_key': job_key,
+        'payload': json.loads(payload),
+        'status': status,
+        'attempts': attempts,
+        'result': json.loads(result) if result else None,
+        'error': error,
+        'created_date': created,
+        'started_date': started,
+        'finished_date': finished,
+    }
+
+
+_JOB_COLUMNS = ("id, job_type, job_key, payload, status, attempts, result, error, "
+                "created_date, started_date, finished_date")
+
+
+def get_jobs(job_ids=None, job_key=None):
+    """
+    Read job status and results back
+
+    Args:
+        job_ids (list, optional): Specific jobs to fetch
+        job_key (str, optional): All jobs recorded under this key
+
+    Returns:
+        list: Job dicts, newest first
+    """
+    try:
+        conn = open_connection(DB_PATH, timeout=30)
+        try:
+            if job_ids:
+                placeholders = ",".join("?" * len(job_ids))
+                rows = conn.execute(
+                    f"SELECT {_JOB_COLUMNS} FROM post_commit_jobs WHERE id IN ({placeholders}) ORDER BY id DESC",
+                    list(job_ids)
+                ).fetchall()
+            elif job_key:
+                rows = conn.execute(
+                    f"SELECT {_JOB_COLUMNS} FROM post_commit_jobs WHERE job_key = ? ORDER BY id DESC",
+                    (job_key,)
+                ).fetchall()
+            else:
+                return []
+        finally:
+            conn.close()
+        return [_row_to_job(row) for row in rows]
+    except sqlite3.Error as e:
+        print(f"Error reading post-commit jobs: {str(e)}")
+        return []
+
+
+def get_job_queue_stats():
+    """
+    Returns:
+        dict: Job counts by status plus the in-memory queue depth
+    """
+    stats = {'queued_in_memory': _pool.depth()}
+    try:
+        conn = open_connection(DB_PATH, timeout=30)
+        try:
+            for status, count in conn.execute(
+                    "SELECT status, COUNT(*) FROM post_commit_jobs GROUP BY status").fetchall():
+                stats[status] = count
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Error reading post-commit job stats: {str(e)}")
+    return stats
+
+
+class _JobWorkerPool:
+    """Fixed pool of daemon threads fed by a bounded queue of job ids"""
+
+    def __init__(self, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE):
+        self._workers = workers
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._last_sweep = 0.0
+
+    def start(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self._workers:
+                thread = threading.Thread(target=self._run, daemon=True,
+                                          name=f'post-commit-worker-{len(self._threads)}')
+                thread.start()
+                self._threads.append(thread)
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def offer(self, job_id):
+        """Queue a job id unless it is already queued or the queue is full"""
+        with self._lock:
+            if job_id in self._queued:
+                return True
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                return False
+            self._queued.add(job_id)
+            return True
+
+    def wait_idle(self, timeout=None):
+        """Block until the in-memory queue is drained (jobs left pending by backpressure excluded)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _run(self):
+        conn = open_connection(DB_PATH, timeout=30)
+        while True:
+            try:
+                job_id = self._queue.get(timeout=SWEEP_INTERVAL_SECONDS)
+            except queue.Empty:
+                self._sweep(conn)
+                continue
+            with self._lock:
+                self._queued.discard(job_id)
+            try:
+                self._run_job(conn, job_id)
+            except Exception as e:
+                print(f"Post-commit job {job_id} crashed the worker loop: {str(e)}")
+            finally:
+                self._queue.task_done()
+            if self._queue.empty():
+                self._sweep(conn)
+
+    def _sweep(self, conn):
+        """Queue pending jobs left behind by backpressure, retries or a dead process"""
+        with self._lock:
+            # An empty sweep is not repeated for a second, so an idle pool doesn't spin
+            if time.monotonic() - self._last_sweep < 1.0:
+                return
+        job_types = list(_handlers)
+        if not job_types:
+            return
+        try:
+            stale_before = (datetime.now(_eastern_tz) - timedelta(seconds=STALE_AFTER_SECONDS)).strftime("%Y-%m-%d %H:%M:%S")
+            conn.execute(
+                "UPDATE post_commit_jobs SET status = 'pending' WHERE status = 'running' AND started_date < ?",
+                (stale_before,)
+            )
+            conn.commit()
+            placeholders = ",".join("?" * len(job_types))
+            rows = conn.execute(
+                f"SELECT id FROM post_commit_jobs WHERE status = 'pending' AND job_type IN ({placeholders}) "
+                "ORDER BY id LIMIT ?",
+                job_types + [JOB_QUEUE_SIZE]
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error sweeping post-commit jobs: {str(e)}")
+            rows = []
+        if not rows:
+            with self._lock:
+                self._last_sweep = time.monotonic()
+            return
+        for (job_id,) in rows:
+            if not self.offer(job_id):
+                break
+
+    def _run_job(self, conn, job_id):
+        row = conn.execute(
+            "SELECT job_type, payload, attempts FROM post_commit_jobs WHERE id = ? AND status = 'pending'",
+            (job_id,)
+        ).fetchone()
+        if not row or row[0] not in _handlers:
+            return
+        job_type, payload, attempts = row
+
+        claimed = conn.execute(
+            "UPDATE post_commit_jobs SET status = 'running', attempts = attempts + 1, started_date = ? "
+            "WHERE id = ? AND status = 'pending'",
+            (_now(), job_id)
+        ).rowcount
+        conn.commit()
+        if not claimed:
+            return
+
+        try:
+            result = _handlers[job_type](json.loads(payload))
+            conn.execute(
+                "UPDATE post_commit_jobs SET status = 'done', result = ?, error = NULL, finished_date = ? WHERE id = ?",
+                (json.dumps(result), _now(), job_id)
+            )
+        except Exception as e:
+            status = 'pending' if attempts + 1 < MAX_ATTEMPTS else 'failed'
+            print(f"Post-commit job {job_id} ({job_type}) failed: {str(e)}")
+            conn.execute(
+                "UPDATE post_commit_jobs SET status = ?, error = ?, finished_date = ? WHERE id = ?",
+                (status, str(e), _now(), job_id)
+            )
+        conn.commit()
+
+
+_pool = _JobWorkerPool()
+
+
+def wait_for_jobs(timeout=None):
+    """
+    Block until every job handed to this process's pool has run
+
+    Returns:
+        bool: False if the timeout expired first
+    """
+    return _pool.wait_idle(timeout)
@@ -22,6 +22,7 @@ from .db_utils import (
     get_location_preferences_from_db
 )
 from .email_notifications import send_location_preference_notification
+from .query_cache import ensure_data_versions, versioned_cache
 
 def initialize_preference_tables():
     """
@@ -72,6 +73,9 @@ def initialize_preference_tables():
             source TEXT NOT NULL
         )
         ''')
+
+        # Version triggers so cached override reads see every save
+        ensure_data_versions(cursor)
         
         # Commit changes
         conn.commit()
@@ -143,6 +147,47 @@ def get_current_preferences(staff_name):
         file_prefs = get_file_preferences(staff_name)
         return file_prefs, 'file' if file_prefs else 'none'
 
+@versioned_cache('user_preferences', 'user_boolean_preferences', cache_if=lambda result: result[0])
+def get_all_preference_overrides():
+    """
+    Get every staff member's database preferences as one wide frame
+
+    Same data get_current_preferences returns for a single 'database' staff
+    member, for everyone at once: one row per staff member with any active
+    shift or boolean preference, one column per preference name, NaN where
+    the staff member has no database value. Boolean preferences win over a
+    shift preference of the same name.
+
+    Returns:
+        tuple: (success, DataFrame indexed by staff name or error_message)
+    """
+    try:
+        # Initialize preference tables if needed
+        initialize_preference_tables()
+
+        conn = get_db_connection()
+        shift_prefs = pd.read_sql_query("""
+            SELECT staff_name, shift_name AS preference_name, preference_score AS preference_value
+            FROM user_preferences
+            WHERE is_active = 1
+        """, conn)
+        boolean_prefs = pd.read_sql_query("""
+            SELECT staff_name, preference_name, preference_value
+            FROM user_boolean_preferences
+            WHERE is_active = 1
+        """, conn)
+
+        long_prefs = pd.concat([shift_prefs.astype(object), boolean_prefs.astype(object)], ignore_index=True)
+        long_prefs = long_prefs.drop_duplicates(['staff_name', 'preference_name'], keep='last')
+        overrides = long_prefs.pivot(index='staff_name', columns='preference_name', values='preference_value')
+        overrides.columns.name = None
+        return (True, overrides)
+
+    except Exception as e:
+        error_message = f"Error getting all preference overrides: {str(e)}"
+        print(error_message)
+        return (False, error_message)
+
 def get_current_boolean_preferences(staff_name):
     """
     Get current boolean preferences for a staff member
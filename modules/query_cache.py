@@ -0,0 +1,214 @@
+# modules/query_cache.py
+"""
+Versioned result cache for db_utils read functions.
+
+Every cached table has a row in data_versions whose version is bumped by
+AFTER INSERT/UPDATE/DELETE triggers, so every writer - db_utils, the admin
+editors, raw sqlite3 connections, other processes sharing the file - is
+covered without calling anything. A cached read records the versions of the
+tables it depends on and is reused until any of them changes; the check is
+one indexed SELECT instead of the query plus decoding.
+
+Results are shared by every session, so callers get a copy (clone_result)
+and the cached value itself is never handed out. The cache is a bounded LRU
+with hit/miss/stale/eviction counters (get_query_cache_stats()).
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import wraps
+import pandas as pd
+
+
+QUERY_CACHE_SIZE = 128
+
+# Tables whose writes invalidate cached reads
+VERSIONED_TABLES = (
+    'tracks',
+    'track_configs',
+    'user_location_preferences',
+    'summer_leave_requests',
+    'track_bid_access',
+    'user_preferences',
+    'user_boolean_preferences',
+)
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'uncached': 0}
+_function_stats = {}
+_MISSING = object()
+
+
+def ensure_data_versions(cursor):
+    """
+    Create data_versions and the version-bump triggers on every VERSIONED_TABLES table
+
+    Tables that don't exist yet (e.g. the preference tables before
+    initialize_preference_tables() runs) are skipped and stay uncached until
+    this is called again after they are created.
+    """
+    placeholders = ",".join("?" * len(VERSIONED_TABLES))
+    cursor.execute(f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+                   VERSIONED_TABLES)
+    existing = {row[0] for row in cursor.fetchall()}
+    tables = [table for table in VERSIONED_TABLES if table in existing]
+    trigger_names = [f"trg_{table}_version_{event}" for table in tables
+                     for event in ('insert', 'update', 'delete')]
+    if not trigger_names:
+        return
+    placeholders = ",".join("?" * len(trigger_names))
+    cursor.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})",
+                   trigger_names)
+    if cursor.fetchone()[0] == len(trigger_names):
+        return
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS data_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''')
+    for table in tables:
+        cursor.execute("INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)", (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';
+            END
+            ''')
+
+
+def get_table_versions(*tables):
+    """
+    Current version counters of `tables`, for callers keeping their own derived caches
+
+    Returns:
+        tuple or None: One version per table, or None when any of them can't be
+            versioned right now (no triggers yet, or this connection has
+            uncommitted writes)
+    """
+    from modules.db_utils import get_db_connection
+
+    conn = get_db_connection()
+    if conn.in_transaction:
+        # Uncommitted writes on this connection could be rolled back after
+        # their version was stamped on a cached result
+        return None
+    placeholders = ",".join("?" * len(tables))
+    try:
+        rows = conn.execute(
+            f"SELECT table_name, version FROM data_versions WHERE table_name IN ({placeholders})",
+            tables
+        ).fetchall()
+    except sqlite3.Error:
+        # data_versions not created yet
+        return None
+    versions = dict(rows)
+    if len(versions) != len(tables):
+        return None
+    return tuple(versions[table] for table in tables)
+
+
+_ATOMIC_TYPES = (str, int, float, bool, type(None), bytes)
+
+
+def clone_result(value):
+    """Copy a cached result so callers can't modify the shared value"""
+    kind = type(value)
+    if kind is dict:
+        return {key: item if type(item) in _ATOMIC_TYPES else clone_result(item)
+                for key, item in value.items()}
+    if kind is list:
+        return [item if type(item) in _ATOMIC_TYPES else clone_result(item) for item in value]
+    if kind is tuple:
+        return tuple(item if type(item) in _ATOMIC_TYPES else clone_result(item) for item in value)
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    return value
+
+
+def _count(name, outcome):
+    _stats[outcome] += 1
+    per_function = _function_stats.setdefault(name, {'hits': 0, 'misses': 0, 'stale': 0, 'uncached': 0})
+    if outcome in per_function:
+        per_function[outcome] += 1
+
+
+def versioned_cache(*tables, cache_if=None):
+    """
+    Cache a read function's results until any of `tables` is written
+
+    Args:
+        tables (str): VERSIONED_TABLES entries the function reads
+        cache_if (callable, optional): Only cache results for which this returns True
+            (e.g. skip (False, error) tuples)
+    """
+    for table in tables:
+        if table not in VERSIONED_TABLES:
+            raise ValueError(f"{table} has no version triggers (add it to VERSIONED_TABLES)")
+
+    def decorator(func):
+        name = func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            versions = get_table_versions(*tables)
+            if versions is None:
+                with _lock:
+                    _count(name, 'uncached')
+                return func(*args, **kwargs)
+
+            key = (name, args, tuple(sorted(kwargs.items())))
+            with _lock:
+                entry = _cache.get(key)
+                if entry is not None and entry[0] == versions:
+                    _cache.move_to_end(key)
+                    _count(name, 'hits')
+                    result = entry[1]
+                else:
+                    _count(name, 'stale' if entry is not None else 'misses')
+                    result = _MISSING
+            if result is not _MISSING:
+                return clone_result(result)
+
+            # Versions were read before the query, so a write racing with it
+            # can only make the stored result newer than its stamp, never older
+            result = func(*args, **kwargs)
+            if cache_if is None or cache_if(result):
+                with _lock:
+                    _cache[key] = (versions, clone_result(result))
+                    _cache.move_to_end(key)
+                    while len(_cache) > QUERY_CACHE_SIZE:
+                        _cache.popitem(last=False)
+                        _stats['evictions'] += 1
+            return result
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
+
+
+def clear_query_cache():
+    """Drop every cached result (counters are kept)"""
+    with _lock:
+        _cache.clear()
+
+
+def get_query_cache_stats():
+    """
+    Returns:
+        dict: hits, misses, stale, evictions, uncached, entries, capacity, hit_rate
+            and a per-function breakdown
+    """
+    with _lock:
+        stats = dict(_stats)
+        stats['entries'] = len(_cache)
+        stats['capacity'] = QUERY_CACHE_SIZE
+        lookups = stats['hits'] + stats['misses'] + stats['stale']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['functions'] = {name: dict(counts) for name, counts in _function_stats.items()}
+    return stats
@@ -0,0 +1,383 @@
+# modules/query_profiler.py
+"""
+SQL profiler for the shared SQLite database.
+
+open_connection() is the connection factory for data/medflight_tracks.db: it
+returns a ProfiledConnection whose cursors time every statement (execute
+plus the fetches that read its rows), count the rows and note which module
+and function issued it. Statements are aggregated by normalized text -
+literals and IN lists replaced by placeholders - so the same query built by
+string concatenation in a loop shows up as one row with its call count.
+
+Statements slower than SLOW_QUERY_MS get their EXPLAIN QUERY PLAN captured
+(once per normalized statement) and are appended as JSON lines to a rotating
+slow-query log. get_query_report() aggregates the top queries by total time;
+`python -m modules.query_profiler` does the same for a slow-query log file.
+
+Rows are counted as they are fetched with fetchone/fetchmany/fetchall (rows
+read by iterating the cursor directly aren't counted).
+
+Profiling is off by default (one flag test per statement); turn it on with
+set_query_profiling(True) (the admin timing panel has a toggle) or
+CREWOPS_SQL_PROFILE=1.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+import pytz
+
+from modules.instrumentation import instrument_connection
+
+_eastern_tz = pytz.timezone('America/New_York')
+
+DB_PATH = 'data/medflight_tracks.db'
+SLOW_QUERY_MS = float(os.environ.get('CREWOPS_SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG_PATH = 'logs/slow_queries.log'
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+MAX_TRACKED_STATEMENTS = 2000
+
+_enabled = os.environ.get('CREWOPS_SQL_PROFILE', '').strip().lower() in ('1', 'true', 'yes', 'on')
+_stats = {}
+_stats_lock = threading.Lock()
+_log_lock = threading.Lock()
+_slow_logger = None
+
+# Frames from these modules are skipped when looking for the statement's caller
+_INFRASTRUCTURE_MODULES = ('modules.query_profiler', 'sqlite3', 'pandas', 'sqlalchemy', 'contextlib')
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+",
+                          re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def set_query_profiling(enabled):
+    """Turn statement profiling on or off for every connection in this process"""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_query_profiling_enabled():
+    return _enabled
+
+
+def normalize_sql(sql):
+    """
+    Statement text with literals replaced by ? and IN/VALUES lists collapsed,
+    so queries that differ only in their values aggregate together
+    """
+    text = _STRING_LITERAL.sub('?', sql)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _IN_LIST.sub('IN (?...)', text)
+    text = _VALUES_LIST.sub(r'VALUES \1...', text)
+    return _WHITESPACE.sub(' ', text).strip().rstrip(';')
+
+
+def _caller():
+    """module.function of the first frame outside the database plumbing"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(_INFRASTRUCTURE_MODULES):
+            return f"{module.rsplit('.', 1)[-1]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+def _explain(connection, sql, parameters):
+    """EXPLAIN QUERY PLAN lines for a statement, or None if it can't be explained"""
+    if not sql.lstrip()[:7].upper().startswith(_EXPLAINABLE):
+        return None
+    try:
+        # A plain cursor, so the EXPLAIN itself isn't profiled
+        cursor = sqlite3.Cursor(connection)
+        rows = sqlite3.Cursor.execute(cursor, f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        return None
+    depth = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depth[node_id] = depth.get(parent_id, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+
+def _slow_query_logger():
+    global _slow_logger
+    with _log_lock:
+        if _slow_logger is None:
+            os.makedirs(os.path.dirname(SLOW_QUERY_LOG_PATH), exist_ok=True)
+            logger = logging.getLogger('crewops.slow_queries')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(SLOW_QUERY_LOG_PATH, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                                          backupCount=SLOW_QUERY_LOG_BACKUPS)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            _slow_logger = logger
+    return _slow_logger
+
+
+class _Statement:
+    """One executed statement; fetches keep adding to its time and rows"""
+
+    __slots__ = ('key', 'sql', 'parameters', 'caller', 'elapsed_ms', 'rows', 'connection', 'slow_logged')
+
+    def __init__(self, key, sql, parameters, caller, connection):
+        self.key = key
+        self.sql = sql
+        self.parameters = parameters
+        self.caller = caller
+        self.connection = connection
+        self.elapsed_ms = 0.0
+        self.rows = 0
+        self.slow_logged = False
+
+
+def _record(statement, elapsed_ms, rows, new_call=False):
+    """Add a statement's execute or fetch to the aggregate and log it if it turned slow"""
+    statement.elapsed_ms += elapsed_ms
+    statement.rows += rows
+    capture_plan = False
+    with _stats_lock:
+        stats = _stats.get(statement.key)
+        if stats is None:
+            if len(_stats) >= MAX_TRACKED_STATEMENTS:
+                return
+            stats = _stats[statement.key] = {
+                'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'slow_calls': 0,
+                'callers': Counter(), 'plan': None, 'example': statement.sql[:500],
+            }
+        if new_call:
+            stats['calls'] += 1
+            stats['callers'][statement.caller] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['rows'] += rows
+        stats['max_ms'] = max(stats['max_ms'], statement.elapsed_ms)
+        is_slow = statement.elapsed_ms >= SLOW_QUERY_MS and not statement.slow_logged
+        if is_slow:
+            statement.slow_logged = True
+            stats['slow_calls'] += 1
+            capture_plan = stats['plan'] is None
+            if capture_plan:
+                stats['plan'] = []
+    if not is_slow:
+        return
+
+    plan = None
+    if capture_plan:
+        plan = _explain(statement.connection, statement.sql, statement.parameters) or []
+        with _stats_lock:
+            stats['plan'] = plan
+    try:
+        _slow_query_logger().info(json.dumps({
+            'timestamp': datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S"),
+            'duration_ms': round(statement.elapsed_ms, 2),
+            'rows': statement.rows,
+            'caller': statement.caller,
+            'sql': statement.key,
+            'plan': plan if plan is not None else stats['plan'],
+        }))
+    except Exception as e:
+        print(f"Error writing slow query log: {str(e)}")
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that times statements and the fetches reading their rows while profiling is on"""
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._statement = None
+
+    def _start(self, sql, parameters, run):
+        if not _enabled:
+            self._statement = None
+            return run()
+        caller = _caller()
+        start = time.perf_counter()
+        try:
+            return run()
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._statement = _Statement(normalize_sql(sql), sql, parameters, caller, self.connection)
+            rows = self.rowcount if self.rowcount > 0 else 0
+            _record(self._statement, elapsed_ms, rows, new_call=True)
+
+    def execute(self, sql, parameters=()):
+        return self._start(sql, parameters, lambda: super(ProfiledCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        if _enabled and not isinstance(seq_of_parameters, (list, tuple)):
+            seq_of_parameters = list(seq_of_parameters)
+        first = seq_of_parameters[0] if _enabled and seq_of_parameters else ()
+        return self._start(sql, first,
+                           lambda: super(ProfiledCursor, self).executemany(sql, seq_of_parameters))
+
+    def executescript(self, sql_script):
+        return self._start(sql_script, (), lambda: super(ProfiledCursor, self).executescript(sql_script))
+
+    def _fetched(self, start, rows):
+        if self._statement is not None:
+            _record(self._statement, (time.perf_counter() - start) * 1000, rows)
+
+    def fetchone(self):
+        if self._statement is None:
+            return super().fetchone()
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size=None):
+        if self._statement is None:
+            return super().fetchmany(self.arraysize if size is None else size)
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        if self._statement is None:
+            return super().fetchall()
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors (including conn.execute shortcuts) are ProfiledCursors"""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def open_connection(db_path=DB_PATH, **kwargs):
+    """
+    Open a connection to the shared database through the profiler
+
+    Args:
+        db_path (str): Database file
+        kwargs: Passed to sqlite3.connect (timeout, check_same_thread, ...)
+
+    Returns:
+        ProfiledConnection: Also counted by the per-rerun instrumentation
+    """
+    return instrument_connection(sqlite3.connect(db_path, factory=ProfiledConnection, **kwargs))
+
+
+def reset_query_stats():
+    """Drop the aggregated statement statistics"""
+    with _stats_lock:
+        _stats.clear()
+
+
+def get_query_report(limit=20, sort_by='total_ms'):
+    """
+    Top statements aggregated by normalized text
+
+    Args:
+        limit (int): Number of statements to return (None for all)
+        sort_by (str): total_ms, calls, max_ms, avg_ms or rows
+
+    Returns:
+        list: Dicts with sql, calls, total_ms, avg_ms, max_ms, rows, slow_calls,
+            top_callers and the captured plan (None if it never ran slow)
+    """
+    with _stats_lock:
+        report = [
+            {
+                'sql': key,
+                'calls': stats['calls'],
+                'total_ms': round(stats['total_ms'], 2),
+                'avg_ms': round(stats['total_ms'] / stats['calls'], 3) if stats['calls'] else 0.0,
+                'max_ms': round(stats['max_ms'], 2),
+                'rows': stats['rows'],
+                'slow_calls': stats['slow_calls'],
+                'top_callers': stats['callers'].most_common(3),
+                'plan': list(stats['plan']) if stats['plan'] else None,
+            }
+            for key, stats in _stats.items()
+        ]
+    report.sort(key=lambda row: row[sort_by], reverse=True)
+    return report[:limit] if limit else report
+
+
+def summarize_slow_log(path=SLOW_QUERY_LOG_PATH, limit=20):
+    """
+    Aggregate a slow-query log file by statement, slowest total first
+
+    Returns:
+        list: Dicts with sql, calls, total_ms, avg_ms, max_ms, rows, top_callers, plan
+    """
+    totals = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                stats = totals.setdefault(entry['sql'], {
+                    'sql': entry['sql'], 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                    'callers': Counter(), 'plan': None,
+                })
+                stats['calls'] += 1
+                stats['total_ms'] += entry['duration_ms']
+                stats['max_ms'] = max(stats['max_ms'], entry['duration_ms'])
+                stats['rows'] += entry.get('rows', 0)
+                stats['callers'][entry.get('caller', 'unknown')] += 1
+                stats['plan'] = entry.get('plan') or stats['plan']
+    except FileNotFoundError:
+        return []
+
+    report = []
+    for stats in totals.values():
+        callers = stats.pop('callers')
+        stats['total_ms'] = round(stats['total_ms'], 2)
+        stats['avg_ms'] = round(stats['total_ms'] / stats['calls'], 3)
+        stats['top_callers'] = callers.most_common(3)
+        report.append(stats)
+    report.sort(key=lambda row: row['total_ms'], reverse=True)
+    return report[:limit]
+
+
+def format_query_report(report):
+    """Plain-text rendering of get_query_report()/summarize_slow_log() rows"""
+    lines = []
+    for rank, row in enumerate(report, start=1):
+        callers = ", ".join(f"{caller} x{count}" for caller, count in row['top_callers'])
+        lines.append(f"{rank:>3}. {row['total_ms']:>10.1f} ms total  {row['calls']:>6} calls  "
+                     f"{row['avg_ms']:>8.2f} ms avg  {row['max_ms']:>8.1f} ms max  {row['rows']:>8} rows")
+        lines.append(f"     {row['sql'][:300]}")
+        lines.append(f"     from: {callers}")
+        for plan_line in row.get('plan') or []:
+            lines.append(f"       {plan_line}")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    log_path = sys.argv[1] if len(sys.argv) > 1 else SLOW_QUERY_LOG_PATH
+    print(format_query_report(summarize_slow_log(log_path)) or f"No slow queries in {log_path}")
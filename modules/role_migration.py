@@ -6,12 +6,13 @@ Populates missing role metadata for existing tracks in the database
 
 import sqlite3
 import pandas as pd
-import json
 import streamlit as st
 import os
 from datetime import datetime
 import pytz
 from .db_utils import initialize_database, get_db_connection
+from .staffing_counts import rebuild_day_staffing_counts
+from .track_codes import decode_track_data, get_day_schema
 
 _eastern_tz = pytz.timezone('America/New_York')
 
@@ -106,7 +107,7 @@ def migrate_role_data(preferences_df, staff_col_prefs, role_col, dry_run=True):
         
         # Find tracks that need role data migration
         cursor.execute("""
-            SELECT id, staff_name, track_data, submission_date, original_role, effective_role, track_source
+            SELECT id, staff_name, track_name, track_data, submission_date, original_role, effective_role, track_source
             FROM tracks 
             WHERE original_role IS NULL OR effective_role IS NULL OR track_source IS NULL
             ORDER BY staff_name, submission_date
@@ -120,12 +121,12 @@ def migrate_role_data(preferences_df, staff_col_prefs, role_col, dry_run=True):
             return results
         
         # Process each track
-        for track_id, staff_name, track_json, submission_date, current_original_role, current_effective_role, current_track_source in tracks_to_update:
+        for track_id, staff_name, track_name, track_json, submission_date, current_original_role, current_effective_role, current_track_source in tracks_to_update:
             try:
                 # Parse track data for preassignment analysis
                 try:
-                    track_data = json.loads(track_json) if track_json else {}
-                except json.JSONDecodeError:
+                    track_data = decode_track_data(track_json, get_day_schema(cursor, track_name)) if track_json else {}
+                except ValueError:
                     track_data = {}
                 
                 # Look up staff in preferences
@@ -188,6 +189,8 @@ def migrate_role_data(preferences_df, staff_col_prefs, role_col, dry_run=True):
         
         # Commit changes if not dry run
         if not dry_run:
+            # effective_role changed for any number of tracks - recount by role
+            rebuild_day_staffing_counts(cursor)
             conn.commit()
             results['message'] = f"Successfully migrated role data for {results['updated_tracks']} tracks."
         else:
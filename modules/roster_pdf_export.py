@@ -0,0 +1,231 @@
+# modules/roster_pdf_export.py
+"""
+Bulk roster PDF packets — renders a PDF for every active track, or every bid
+submitted for a track_name, across a process pool and streams the results into
+a single zip (one PDF per staff member) or one merged PDF.
+
+The parent process builds a plain-dict snapshot of tracks, requirements and
+preassignments once; each worker receives it a single time through the pool
+initializer and only gets a staff name per task. Nothing in the worker path
+touches Streamlit or the database.
+"""
+
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import pytz
+
+from modules.pdf_generator import generate_schedule_pdf, generate_bid_summary_pdf
+from modules.enhanced_track_validator import validate_track_comprehensive
+from modules.instrumentation import instrumented
+
+# pypdf is only needed for the "merged PDF" output; zip packets work without it.
+try:
+    from pypdf import PdfWriter, PdfReader
+    PDF_MERGE_AVAILABLE = True
+except ImportError:
+    PDF_MERGE_AVAILABLE = False
+
+_eastern_tz = pytz.timezone('America/New_York')
+
+# Read-only snapshot handed to each worker once by _init_worker
+_WORKER_SNAPSHOT = None
+
+
+@instrumented
+def build_roster_snapshot(mode, track_name=None):
+    """
+    Collect everything the workers need into one picklable dict.
+
+    Args:
+        mode (str): 'active' for every active track, or 'bids' for every bid
+            submitted under track_name
+        track_name (str, optional): Bid track/cycle name (required for 'bids')
+
+    Returns:
+        tuple: (snapshot or None, error message or None)
+    """
+    from modules.db_utils import get_all_active_tracks, get_all_bid_tracks, get_active_track_config
+    from modules.track_bidding import _load_bidding_data_files, _load_requirements_map
+    from modules.track_management.preassignment import get_staff_preassignments
+
+    if mode == 'bids':
+        if not track_name:
+            return None, "Select a track cycle to export bids for."
+        ok, tracks = get_all_bid_tracks(track_name)
+    elif mode == 'active':
+        active_cfg = get_active_track_config()
+        track_name = active_cfg['track_name'] if active_cfg else 'FY26'
+        ok, tracks = get_all_active_tracks()
+    else:
+        return None, f"Unknown export mode: {mode}"
+
+    if not ok or not tracks:
+        return None, f"No tracks found for {track_name}."
+
+    ctx, ctx_error = _load_bidding_data_files()
+    if ctx is None:
+        return None, ctx_error
+
+    days = list(ctx['days'])
+    requirements_map = _load_requirements_map(ctx['requirements_df'])
+    preassignment_df = ctx['preassignment_df']
+
+    entries = []
+    requirements = {}
+    preassignments = {}
+    for track in tracks:
+        name = track['staff_name']
+        entries.append({
+            'staff_name': name,
+            'track_data': dict(track['track_data']),
+            'version': track.get('version', 1),
+            'submission_date': track.get('submission_date') or '',
+        })
+        req = requirements_map.get(name, {})
+        requirements[name] = {
+            'shifts_per_pay_period': req.get('shifts_per_pay_period') or 0,
+            'night_minimum': req.get('night_minimum') or 0,
+            'weekend_minimum': req.get('weekend_minimum') or 0,
+            'weekend_group': req.get('weekend_group'),
+        }
+        preassignments[name] = dict(get_staff_preassignments(name, preassignment_df, days))
+
+    return {
+        'mode': mode,
+        'track_name': track_name,
+        'days': days,
+        'entries': entries,
+        'requirements': requirements,
+        'preassignments': preassignments,
+    }, None
+
+
+def _init_worker(snapshot):
+    """Process pool initializer: keep the shared snapshot for every task in this worker."""
+    global _WORKER_SNAPSHOT
+    _WORKER_SNAPSHOT = snapshot
+
+
+def _render_entry(index):
+    """
+    Render the PDF for snapshot entry `index` using the worker's snapshot.
+
+    Returns:
+        tuple: (staff_name, filename or None, pdf_bytes or None, error or None)
+    """
+    return _render_from_snapshot(_WORKER_SNAPSHOT, index)
+
+
+def _render_from_snapshot(snapshot, index):
+    """Render one entry of a snapshot. Shared by the pool workers and the serial fallback."""
+    entry = snapshot['entries'][index]
+    staff_name = entry['staff_name']
+    days = snapshot['days']
+    req = snapshot['requirements'].get(staff_name, {})
+    preassignments = snapshot['preassignments'].get(staff_name) or None
+
+    try:
+        if snapshot['mode'] == 'bids':
+            validation_result = validate_track_comprehensive(
+                entry['track_data'], req.get('shifts_per_pay_period', 0), req.get('night_minimum', 0),
+                req.get('weekend_minimum', 0), preassignments, days, req.get('weekend_group'),
+                staff_name=staff_name
+            )
+            pdf_bytes, filename = generate_bid_summary_pdf(
+                staff_name, entry['track_data'], days, snapshot['track_name'],
+                entry['version'], entry['submission_date'],
+                req.get('shifts_per_pay_period', 0), req.get('night_minimum', 0),
+                req.get('weekend_minimum', 0), preassignments, validation_result,
+                req.get('weekend_group')
+            )
+        else:
+            pdf_bytes, filename = generate_schedule_pdf(
+                staff_name, entry['track_data'], days,
+                req.get('shifts_per_pay_period', 0), req.get('night_minimum', 0),
+                req.get('weekend_minimum', 0), preassignments
+            )
+        return staff_name, filename, pdf_bytes, None
+    except Exception as e:
+        return staff_name, None, None, str(e)
+
+
+def _iter_rendered(snapshot, max_workers=None):
+    """
+    Yield rendered entries in roster order. Uses a process pool when more than one
+    worker is available, falling back to in-process rendering if the pool can't be
+    started (e.g. restricted hosts).
+    """
+    count = len(snapshot['entries'])
+    workers = max_workers or os.cpu_count() or 1
+    workers = max(1, min(workers, count))
+    rendered = 0
+
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(snapshot,)) as executor:
+                chunksize = max(1, count // (workers * 4))
+                for result in executor.map(_render_entry, range(count), chunksize=chunksize):
+                    rendered += 1
+                    yield result
+            return
+        except (OSError, RuntimeError) as e:
+            # BrokenProcessPool is a RuntimeError; pick up where the pool stopped
+            print(f"Process pool unavailable, rendering roster PDFs serially: {e}")
+
+    for index in range(rendered, count):
+        yield _render_from_snapshot(snapshot, index)
+
+
+@instrumented
+def generate_roster_pdf_packet(snapshot, output='zip', max_workers=None, progress_callback=None):
+    """
+    Render every entry in a roster snapshot and stream the PDFs into one packet.
+
+    Args:
+        snapshot (dict): Result of build_roster_snapshot()
+        output (str): 'zip' for one PDF per staff member, or 'merged' for a single PDF
+            (requires pypdf; falls back to zip when it isn't installed)
+        max_workers (int, optional): Process pool size (defaults to all cores)
+        progress_callback (callable, optional): Called as progress_callback(done, total)
+
+    Returns:
+        tuple: (packet_bytes, filename, errors) — errors is a list of
+        (staff_name, message) for entries that failed to render
+    """
+    if output == 'merged' and not PDF_MERGE_AVAILABLE:
+        output = 'zip'
+
+    total = len(snapshot['entries'])
+    errors = []
+    buffer = io.BytesIO()
+    timestamp = datetime.now(_eastern_tz).strftime('%Y%m%d%H%M%S')
+    label = 'bids' if snapshot['mode'] == 'bids' else 'schedules'
+    safe_track = ''.join(c if c.isalnum() else '_' for c in str(snapshot['track_name']))
+
+    if output == 'merged':
+        writer = PdfWriter()
+        for done, (staff_name, filename, pdf_bytes, error) in enumerate(_iter_rendered(snapshot, max_workers), 1):
+            if error:
+                errors.append((staff_name, error))
+            else:
+                writer.append(PdfReader(io.BytesIO(pdf_bytes)))
+            if progress_callback:
+                progress_callback(done, total)
+        writer.write(buffer)
+        packet_name = f"{safe_track}_{label}_packet_{timestamp}.pdf"
+    else:
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for done, (staff_name, filename, pdf_bytes, error) in enumerate(_iter_rendered(snapshot, max_workers), 1):
+                if error:
+                    errors.append((staff_name, error))
+                else:
+                    zf.writestr(filename, pdf_bytes)
+                if progress_callback:
+                    progress_callback(done, total)
+        packet_name = f"{safe_track}_{label}_packet_{timestamp}.zip"
+
+    return buffer.getvalue(), packet_name, errors
@@ -75,4 +75,272 @@ def load_sample_data():
     current_tracks_df = pd.DataFrame(current_tracks_data)
     requirements_df = pd.DataFrame(requirements_data)
     
-    return preferences_df, current_tracks_df, requirements_df
\ No newline at end of file
+    return preferences_df, current_tracks_df, requirements_df
+
+# ---------------------------------------------------------------------------
+# Synthetic rosters for load testing and benchmarks (see modules/benchmark_suite.py)
+# ---------------------------------------------------------------------------
+
+DEFAULT_ROLE_MIX = {'nurse': 0.45, 'medic': 0.45, 'dual': 0.10}
+SYNTHETIC_DAY_SHIFTS = ['D7B', 'GR', 'D11B', 'FW', 'D9L', 'LG', 'D7P', 'PG', 'D11M', 'MG']
+SYNTHETIC_NIGHT_SHIFTS = ['N7B', 'NG', 'N9L', 'N7P', 'NP']
+SYNTHETIC_DAY_LOCATIONS = ['KMHT', 'KLWM', 'KBED', '1B9', 'KPYM']
+SYNTHETIC_NIGHT_LOCATIONS = ['KLWM', 'KBED', 'KPYM']
+
+
+def _synthetic_track(rng, day_keys, shifts_per_pay_period, night_share, at_share=0.05):
+    """One 42-day track: shifts_per_pay_period shifts in each 14-day block"""
+    track = {day: '' for day in day_keys}
+    for block_start in range(0, len(day_keys), 14):
+        block = list(range(block_start, min(block_start + 14, len(day_keys))))
+        worked = rng.choice(block, size=min(shifts_per_pay_period, len(block)), replace=False)
+        for day_index in worked:
+            roll = rng.random()
+            if roll < at_share:
+                track[day_keys[day_index]] = 'AT'
+            elif roll < at_share + night_share:
+                track[day_keys[day_index]] = 'N'
+            else:
+                track[day_keys[day_index]] = 'D'
+    return track
+
+
+def _mutate_track(rng, track, changes):
+    """Copy of a track with `changes` days swapped to another value"""
+    mutated = dict(track)
+    days = list(mutated)
+    for day in rng.choice(days, size=min(changes, len(days)), replace=False):
+        mutated[day] = rng.choice(['', 'D', 'N', 'AT'], p=[0.45, 0.35, 0.15, 0.05])
+    return mutated
+
+
+def generate_synthetic_roster(n_staff=300, role_mix=None, bids_per_cycle=None, history_years=3,
+                              versions_per_year=4, n_classes=20, class_dates=8, seed=0):
+    """
+    Generate a reproducible production-scale roster
+
+    Args:
+        n_staff (int): Number of staff members
+        role_mix (dict, optional): role -> share (defaults to DEFAULT_ROLE_MIX)
+        bids_per_cycle (int, optional): Staff who submitted a bid for the next cycle (default 80% of staff)
+        history_years (int): Years of track history per staff member
+        versions_per_year (int): Track revisions per staff member per year
+        n_classes (int): Training classes in the training workbook
+        class_dates (int): Offered dates per class (max 14)
+        seed (int): Random seed
+
+    Returns:
+        dict: preferences_df, requirements_df, current_tracks_df, tracks, bids, history,
+            location_preferences, classes and the generation parameters
+    """
+    from modules.cycle_calendar import DAY_KEYS
+
+    rng = np.random.default_rng(seed)
+    role_mix = role_mix or DEFAULT_ROLE_MIX
+    if bids_per_cycle is None:
+        bids_per_cycle = int(n_staff * 0.8)
+    day_keys = list(DAY_KEYS)
+
+    staff_names = [f"Synthetic{i:04d}" for i in range(1, n_staff + 1)]
+    roles = rng.choice(list(role_mix), size=n_staff, p=np.array(list(role_mix.values())) / sum(role_mix.values()))
+    seniority = rng.permutation(n_staff) + 1
+    shifts_per_pay_period = rng.choice([4, 5, 6, 7], size=n_staff, p=[0.1, 0.2, 0.4, 0.3])
+    night_share = rng.choice([0.0, 0.2, 0.35, 0.6], size=n_staff)
+
+    # Preferences file: shift ranks 0-9 within day and night, like Preferences v6.xlsx
+    preferences = {
+        'STAFF NAME': staff_names,
+        'ROLE': roles,
+        'No Matrix': (rng.random(n_staff) < 0.3).astype(int),
+        'Seniority': seniority,
+        'Reduced Rest OK': (rng.random(n_staff) < 0.5).astype(int),
+    }
+    day_ranks = np.argsort(rng.random((n_staff, len(SYNTHETIC_DAY_SHIFTS))), axis=1).astype(float)
+    night_ranks = np.argsort(rng.random((n_staff, len(SYNTHETIC_NIGHT_SHIFTS))), axis=1).astype(float)
+    for column, shift in enumerate(SYNTHETIC_DAY_SHIFTS):
+        preferences[shift] = day_ranks[:, column]
+    for column, shift in enumerate(SYNTHETIC_NIGHT_SHIFTS):
+        preferences[shift] = night_ranks[:, column]
+    preferences['N to D Flex'] = rng.choice(['Yes', 'No', 'Maybe'], size=n_staff)
+    preferences_df = pd.DataFrame(preferences)
+
+    requirements_df = pd.DataFrame({
+        'STAFF NAME': staff_names,
+        'SHIFTS PER PAY PERIOD': shifts_per_pay_period,
+        'NIGHT MINIMUM': np.where(night_share > 0, 2, 0),
+        'WEEKEND MINIMUM': 5,
+        'WEEKEND GROUP': rng.choice(list('ABCDE'), size=n_staff),
+        'EMAIL': [f"{name.lower()}@example.org" for name in staff_names],
+    })
+
+    tracks = {
+        name: _synthetic_track(rng, day_keys, int(shifts_per_pay_period[i]), float(night_share[i]))
+        for i, name in enumerate(staff_names)
+    }
+    current_tracks_df = pd.DataFrame([{'STAFF NAME': name, **track} for name, track in tracks.items()])
+
+    bidders = rng.choice(staff_names, size=min(bids_per_cycle, n_staff), replace=False)
+    bids = {name: _mutate_track(rng, tracks[name], 8) for name in sorted(bidders)}
+
+    # History: versions_per_year revisions per year, oldest first, ending at the current track
+    now = datetime.now(_eastern_tz).replace(tzinfo=None)
+    history = []
+    revisions = history_years * versions_per_year
+    for name in staff_names:
+        track = tracks[name]
+        versions = [track]
+        for _ in range(revisions - 1):
+            versions.append(_mutate_track(rng, versions[-1], 4))
+        for step, version in enumerate(reversed(versions)):
+            submitted = now - timedelta(days=365 * history_years * (revisions - step) / revisions)
+            history.append((name, version, submitted.strftime("%Y-%m-%d %H:%M:%S"), 'updated' if step else 'created'))
+
+    location_preferences = {}
+    for name in staff_names:
+        day_order = rng.permutation(len(SYNTHETIC_DAY_LOCATIONS)) + 1
+        night_order = rng.permutation(len(SYNTHETIC_NIGHT_LOCATIONS)) + 1
+        location_preferences[name] = {
+            'day_locations': dict(zip(SYNTHETIC_DAY_LOCATIONS, day_order.tolist())),
+            'night_locations': dict(zip(SYNTHETIC_NIGHT_LOCATIONS, night_order.tolist())),
+            'zip_code': f"0{rng.integers(1000, 3999)}",
+            'reduced_rest_ok': bool(preferences['Reduced Rest OK'][staff_names.index(name)]),
+            'n_to_d_flex': str(preferences['N to D Flex'][staff_names.index(name)]),
+        }
+
+    # Training classes spread over the next few months
+    classes = []
+    first_class_day = datetime(now.year, now.month, 1) + timedelta(days=31)
+    for i in range(n_classes):
+        offsets = sorted(rng.choice(120, size=min(class_dates, 14), replace=False))
+        classes.append({
+            'class_name': f"Class {i + 1:03d}",
+            'dates': [first_class_day + timedelta(days=int(offset)) for offset in offsets],
+            'students_per_class': int(rng.choice([8, 12, 21])),
+            'instructors_per_day': int(rng.integers(0, 3)),
+            'assigned_share': float(rng.uniform(0.2, 0.9)),
+        })
+
+    return {
+        'params': {
+            'n_staff': n_staff, 'role_mix': role_mix, 'bids_per_cycle': len(bids),
+            'history_years': history_years, 'versions_per_year': versions_per_year,
+            'n_classes': n_classes, 'class_dates': class_dates, 'seed': seed,
+        },
+        'preferences_df': preferences_df,
+        'requirements_df': requirements_df,
+        'current_tracks_df': current_tracks_df,
+        'tracks': tracks,
+        'bids': bids,
+        'history': history,
+        'location_preferences': location_preferences,
+        'classes': classes,
+    }
+
+
+def write_synthetic_database(roster, active_track_name='FY26', bid_track_name='FY27'):
+    """
+    Load a generated roster into the database at data/medflight_tracks.db
+    (relative to the working directory) through the regular db_utils writers
+
+    Args:
+        roster (dict): Result of generate_synthetic_roster()
+        active_track_name (str): Track config the current tracks are saved under
+        bid_track_name (str): Track config the bids are saved under
+
+    Returns:
+        tuple: (success, message)
+    """
+    from modules.db_utils import (
+        initialize_database, get_db_connection, create_track_config, get_all_track_configs,
+        save_track_to_db, save_bid_track_to_db, save_location_preferences_to_db,
+    )
+    from modules.track_history_store import append_track_history
+
+    try:
+        initialize_database()
+        if bid_track_name not in [config['track_name'] for config in get_all_track_configs()]:
+            create_track_config(bid_track_name)
+
+        roles = dict(zip(roster['preferences_df']['STAFF NAME'], roster['preferences_df']['ROLE']))
+        for name, track in roster['tracks'].items():
+            metadata = {'original_role': roles[name], 'effective_role': roles[name], 'track_source': 'Annual Rebid'}
+            success, message, _ = save_track_to_db(name, {'track_data': track, 'staff_metadata': metadata},
+                                                   is_new=True, track_name=active_track_name)
+            if not success:
+                return (False, message)
+
+        # The generated history runs from its own 'created' row to the current track, so it
+        # replaces the 'created' row save_track_to_db just stamped with today's date; written
+        # oldest first (and before the bids), history ids follow the submission dates
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT staff_name, id FROM tracks WHERE track_name = ? AND is_active = 1", (active_track_name,))
+        track_ids = dict(cursor.fetchall())
+        cursor.executemany("DELETE FROM track_history WHERE track_id = ?",
+                           [(track_ids[name],) for name in roster['tracks']])
+        for name, track, submitted, status in sorted(roster['history'], key=lambda row: row[2]):
+            append_track_history(cursor, track_ids[name], name, track, submitted, status)
+        conn.commit()
+
+        for name, track in roster['bids'].items():
+            metadata = {'original_role': roles[name], 'effective_role': roles[name], 'track_source': 'Annual Rebid'}
+            result = save_bid_track_to_db(name, track, bid_track_name, metadata)
+            if not result[0]:
+                return (False, result[1])
+        for name, prefs in roster['location_preferences'].items():
+            success, message = save_location_preferences_to_db(
+                name, prefs['day_locations'], prefs['night_locations'], prefs['zip_code'],
+                prefs['reduced_rest_ok'], prefs['n_to_d_flex']
+            )
+            if not success:
+                return (False, message)
+
+        return (True, f"Loaded {len(roster['tracks'])} tracks, {len(roster['bids'])} bids and "
+                      f"{len(roster['history'])} history rows")
+
+    except Exception as e:
+        error_message = f"Error writing synthetic database: {str(e)}"
+        print(error_message)
+        return (False, error_message)
+
+
+def write_training_workbook(roster, path):
+    """
+    Write a training roster workbook in the layout training_modules.excel_handler reads:
+    a Class_Enrollment sheet (staff x class assignment checkboxes) and one sheet per class
+
+    Args:
+        roster (dict): Result of generate_synthetic_roster()
+        path (str): Output .xlsx path
+    """
+    from openpyxl import Workbook
+
+    rng = np.random.default_rng(roster['params']['seed'] + 1)
+    workbook = Workbook()
+    enrollment = workbook.active
+    enrollment.title = 'Class_Enrollment'
+    class_names = [training_class['class_name'] for training_class in roster['classes']]
+    enrollment.append(['STAFF NAME', 'Role', 'MGMT', 'DUAL', 'Educator AT'] + class_names)
+
+    preferences_df = roster['preferences_df']
+    for name, role in zip(preferences_df['STAFF NAME'], preferences_df['ROLE']):
+        assigned = [bool(rng.random() < training_class['assigned_share']) for training_class in roster['classes']]
+        enrollment.append([name, str(role).upper(), False, role == 'dual', bool(rng.random() < 0.1)] + assigned)
+
+    for training_class in roster['classes']:
+        sheet = workbook.create_sheet(training_class['class_name'][:31])
+        for row, class_date in enumerate(training_class['dates'], start=1):
+            sheet.cell(row=row, column=2, value=class_date)
+            sheet.cell(row=row, column=3, value=False)
+            sheet.cell(row=row, column=4, value=bool(row % 2))
+            sheet.cell(row=row, column=5, value='KBED')
+        sheet.cell(row=2, column=6, value=False)
+        sheet.cell(row=16, column=2, value=training_class['students_per_class'])
+        sheet.cell(row=17, column=2, value=False)
+        sheet.cell(row=18, column=2, value=1)
+        sheet.cell(row=19, column=2, value=False)
+        sheet.cell(row=20, column=2, value='08:00')
+        sheet.cell(row=21, column=2, value='16:00')
+        sheet.cell(row=28, column=2, value=training_class['instructors_per_day'])
+
+    workbook.save(path)
@@ -0,0 +1,458 @@
+# modules/scenario_runner.py
+"""
+What-if scenarios for a bid cycle's caps, day-of-week limits and base shift
+counts, evaluated side by side against the bids submitted so far.
+
+A scenario is a plain dict of changes to the track config:
+
+    {'name': 'More night medics',
+     'caps': {'max_night_medics': 6},                     # flat Bid Caps
+     'weekday_caps': {'Sat': {'max_day_nurses': 9}},      # day-of-week limits
+     'base_shift_counts': {'KBED': {'night': 3}}}         # base shift slots
+
+Anything a scenario doesn't set keeps the cycle's current value, so
+{'name': 'Current config'} is the baseline.
+
+The parent process builds one read-only snapshot of the bids, roles,
+seniority and base preferences (build_scenario_snapshot()); each pool worker
+receives it once through the pool initializer and then only gets scenario
+dicts. Nothing in the worker path touches Streamlit or the database.
+
+Each scenario reports what the Bid Analysis tab shows (bids vs. caps,
+maximum achievable crews) and what each bidder's hypothetical schedule
+would be: bidders over a day's cap (by seniority within their role) are
+dropped for that day, and the rest compete for that scenario's base slots
+the same way generate_roster_hypothetical_schedules() runs it.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from modules.capacity_engine import SHIFT_CODES, ROLES, capacity_array_from_weekday_caps, max_possible_shifts
+from modules.cycle_calendar import DAYS_OF_WEEK
+from modules.instrumentation import instrumented
+
+# Editable fields, in the order the Track Configs tab shows them
+SCENARIO_CAP_FIELDS = ('max_day_nurses', 'max_day_medics', 'max_night_nurses', 'max_night_medics')
+SCENARIO_BASE_SLOTS = (
+    ('KMHT', 'day'), ('KLWM', 'day'), ('KBED', 'day'), ('1B9', 'day'), ('KPYM', 'day'),
+    ('KLWM', 'night'), ('KBED', 'night'), ('KPYM', 'night'),
+)
+
+# Editor column -> scenario field, for scenarios_from_table()
+CAP_COLUMNS = {
+    'Day Nurses': 'max_day_nurses',
+    'Day Medics': 'max_day_medics',
+    'Night Nurses': 'max_night_nurses',
+    'Night Medics': 'max_night_medics',
+}
+BASE_COLUMNS = {f"{base} {shift.title()}": (base, shift) for base, shift in SCENARIO_BASE_SLOTS}
+
+# Read-only snapshot handed to each worker once by _init_worker
+_WORKER_SNAPSHOT = None
+
+
+@instrumented
+def build_scenario_snapshot(track_name, ctx=None):
+    """
+    Collect everything scenario evaluation needs into one picklable dict.
+
+    Args:
+        track_name (str): Track cycle whose submitted bids and config are the baseline
+        ctx (dict, optional): _load_bidding_data_files() result to reuse
+
+    Returns:
+        tuple: (snapshot or None, error message or None)
+    """
+    from modules.db_utils import (
+        get_all_bid_tracks, get_track_capacity, get_weekday_capacity_overrides, get_base_shift_counts
+    )
+    from modules.staffing_counts import day_index_for
+    from modules.track_bidding import (
+        _load_bidding_data_files, _compute_bid_day_stats, _bid_role_and_senior, _bidding_role_bucket
+    )
+    from modules.hypothetical_scheduler_new import (
+        _load_all_base_preferences, _roster_lookups, _roster_role_rankings
+    )
+
+    if not track_name:
+        return None, "Select a track cycle to run scenarios against."
+    if ctx is None:
+        ctx, ctx_error = _load_bidding_data_files()
+        if ctx is None:
+            return None, ctx_error
+
+    ok, bids = get_all_bid_tracks(track_name)
+    if not ok or not bids:
+        return None, f"No bids submitted yet for {track_name}."
+
+    days = list(ctx['days'])
+    preferences_df = ctx['preferences_df']
+    bidders = list(dict.fromkeys(b['staff_name'] for b in bids))
+    _, seniority_of = _roster_lookups(
+        preferences_df, ctx['staff_col_prefs'], ctx['role_col'], ctx['seniority_col'])
+    # Roles the bids count under, the same ones day_stats uses
+    bid_roles = {b['staff_name']: _bid_role_and_senior(b, ctx['role_mapping'], ctx['no_matrix_mapping'])[0]
+                 for b in bids}
+    all_base_prefs = _load_all_base_preferences()
+
+    capacity = get_track_capacity(track_name)
+    return {
+        'track_name': track_name,
+        'days': days,
+        'day_indices': [day_index_for(day) for day in days],
+        'shifts': {
+            b['staff_name']: {day: code for day, code in (b['track_data'] or {}).items() if code in SHIFT_CODES}
+            for b in bids
+        },
+        'bid_roles': bid_roles,
+        'day_stats': _compute_bid_day_stats(days, bids, ctx['role_mapping'], ctx['no_matrix_mapping']),
+        'role_of': {name: _bidding_role_bucket(bid_roles[name]) for name in bidders},
+        'seniority_of': {name: seniority_of.get(name, 999) for name in bidders},
+        'rankings': _roster_role_rankings(
+            bidders, preferences_df, ctx['staff_col_prefs'], ctx['role_col'], ctx['seniority_col']),
+        'base_prefs': {name: all_base_prefs[name] for name in bidders if name in all_base_prefs},
+        'flat_caps': {field: capacity[field] for field in SCENARIO_CAP_FIELDS},
+        'use_weekday_capacity': bool(capacity.get('use_weekday_capacity')),
+        'weekday_overrides': get_weekday_capacity_overrides(track_name),
+        'base_shift_counts': {base: dict(counts) for base, counts in get_base_shift_counts(track_name).items()},
+    }, None
+
+
+def _non_negative_int(value, label):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{label} must be a whole number (got {value!r})")
+    if number < 0:
+        raise ValueError(f"{label} can't be negative")
+    return number
+
+
+def resolve_scenario(snapshot, scenario):
+    """
+    Apply a scenario's changes to the snapshot's config
+
+    Same resolution as get_track_capacity_by_weekday(): day-of-week limits
+    replace the flat caps field by field, and setting any in a scenario turns
+    them on for it.
+
+    Returns:
+        tuple: (caps array of shape (42, 2, 2), {base: {'day': N, 'night': N}})
+
+    Raises:
+        ValueError: On an unknown field, base or weekday, or a negative/non-integer value
+    """
+    flat = dict(snapshot['flat_caps'])
+    for field, value in (scenario.get('caps') or {}).items():
+        if field not in SCENARIO_CAP_FIELDS:
+            raise ValueError(f"Unknown cap field: {field}")
+        flat[field] = _non_negative_int(value, field)
+
+    use_weekday = snapshot['use_weekday_capacity']
+    # Limits saved while day-of-week limits were switched off don't apply, so
+    # a scenario that switches them on starts from its own changes only
+    overrides = {wd: dict(fields) for wd, fields in snapshot['weekday_overrides'].items()} if use_weekday else {}
+    for weekday, fields in (scenario.get('weekday_caps') or {}).items():
+        if weekday not in DAYS_OF_WEEK:
+            raise ValueError(f"Unknown weekday: {weekday}")
+        for field, value in fields.items():
+            if field not in SCENARIO_CAP_FIELDS:
+                raise ValueError(f"Unknown cap field: {field}")
+            overrides.setdefault(weekday, {})[field] = _non_negative_int(value, f"{weekday} {field}")
+            use_weekday = True
+
+    weekday_caps = {wd: dict(flat) for wd in DAYS_OF_WEEK}
+    if use_weekday:
+        for weekday, fields in overrides.items():
+            for field, value in fields.items():
+                if value is not None and weekday in weekday_caps:
+                    weekday_caps[weekday][field] = value
+
+    base_shift_counts = {base: dict(counts) for base, counts in snapshot['base_shift_counts'].items()}
+    valid_slots = set(SCENARIO_BASE_SLOTS)
+    for base, counts in (scenario.get('base_shift_counts') or {}).items():
+        for shift, value in counts.items():
+            if (base, shift) not in valid_slots:
+                raise ValueError(f"{base} has no {shift} shifts")
+            base_shift_counts.setdefault(base, {'day': 0, 'night': 0})[shift] = _non_negative_int(
+                value, f"{base} {shift} shifts")
+
+    return capacity_array_from_weekday_caps(weekday_caps), base_shift_counts
+
+
+def _scenario_day_caps(snapshot, caps):
+    """Caps per bid day (rows in snapshot['days'] order); days outside the pattern get 0"""
+    day_caps = np.zeros((len(snapshot['days']), len(SHIFT_CODES), len(ROLES)), dtype=np.int64)
+    for row, day_index in enumerate(snapshot['day_indices']):
+        if day_index is not None:
+            day_caps[row] = caps[day_index]
+    return day_caps
+
+
+def _accepted_bidders(snapshot, day, shift_code, shift_index, day_caps_row):
+    """
+    Bidders on one day/shift who fit under that day's caps, most senior first
+    within each role, and how many were over the cap
+
+    Returns:
+        tuple: (accepted staff list, over-cap staff list)
+    """
+    role_of = snapshot['role_of']
+    seniority_of = snapshot['seniority_of']
+    on_shift = [name for name, shifts in snapshot['shifts'].items() if shifts.get(day) == shift_code]
+    accepted, over_cap = [], []
+    for role_index, role in enumerate(ROLES):
+        same_role = sorted(
+            (name for name in on_shift if role_of.get(name, "nurse") == role),
+            key=lambda name: seniority_of.get(name, 999)
+        )
+        cap = int(day_caps_row[shift_index, role_index])
+        accepted.extend(same_role[:cap])
+        over_cap.extend(same_role[cap:])
+    return accepted, over_cap
+
+
+def evaluate_scenario(snapshot, scenario):
+    """
+    Coverage, unfilled slots, maximum crews and per-staff outcomes for one scenario
+
+    Args:
+        snapshot (dict): Result of build_scenario_snapshot()
+        scenario (dict): Scenario changes (see module docstring)
+
+    Returns:
+        dict: name, error (None on success), summary metrics, per-day rows and per-staff rows
+    """
+    from modules.hypothetical_scheduler_new import _roster_competition, _build_available_slots
+
+    name = scenario.get('name') or 'Scenario'
+    try:
+        caps, base_shift_counts = resolve_scenario(snapshot, scenario)
+    except ValueError as e:
+        return {'name': name, 'error': str(e)}
+
+    days = snapshot['days']
+    day_caps = _scenario_day_caps(snapshot, caps)
+    day_stats = snapshot['day_stats']
+    seats = {shift: len(_build_available_slots(shift, base_shift_counts)[0]) for shift in ('day', 'night')}
+
+    staff = {
+        staff_name: {'working_days': 0, 'base_days': 0, 'no_seat_days': 0, 'over_cap_days': 0,
+                     'first_choice_days': 0, 'preference_ranks': []}
+        for staff_name in snapshot['shifts']
+    }
+    day_rows = []
+    unfilled_seats = 0
+    for row, day in enumerate(days):
+        stats = day_stats.iloc[row]
+        day_row = {'Day': day}
+        for shift_index, (period, shift_code) in enumerate((('day', 'D'), ('night', 'N'))):
+            nurse_cap, medic_cap = (int(v) for v in day_caps[row, shift_index])
+            # Bid counts and max crews as the Bid Analysis tab computes them
+            nurse_bids, medic_bids = int(stats[f'{period}_nurse']), int(stats[f'{period}_medic'])
+            crews = max_possible_shifts(nurse_bids, medic_bids, int(stats[f'{period}_dual']),
+                                        int(stats[f'{period}_senior']))
+            crews = min(crews, nurse_cap, medic_cap, seats[period])
+
+            accepted, over_cap = _accepted_bidders(snapshot, day, shift_code, shift_index, day_caps[row])
+            outcomes = _roster_competition(
+                accepted, accepted, period, snapshot['role_of'], snapshot['seniority_of'],
+                snapshot['rankings'], snapshot['base_prefs'], base_shift_counts
+            )
+            for staff_name in over_cap:
+                staff[staff_name]['working_days'] += 1
+                staff[staff_name]['over_cap_days'] += 1
+            seated = {role: 0 for role in ROLES}
+            for staff_name, outcome in outcomes.items():
+                record = staff[staff_name]
+                record['working_days'] += 1
+                if outcome['assignment'] is None:
+                    record['no_seat_days'] += 1
+                    continue
+                role = snapshot['role_of'].get(staff_name, "nurse")
+                seated[role] = seated.get(role, 0) + 1
+                record['base_days'] += 1
+                if outcome['preference_score'] is not None:
+                    record['preference_ranks'].append(outcome['preference_score'])
+                    if outcome['preference_score'] == 1:
+                        record['first_choice_days'] += 1
+            unfilled_seats += sum(max(seats[period] - seated[role], 0) for role in ROLES)
+
+            label = period.title()
+            day_row.update({
+                f'{label} Nurse Bids': nurse_bids,
+                f'{label} Nurse Cap': nurse_cap,
+                f'{label} Medic Bids': medic_bids,
+                f'{label} Medic Cap': medic_cap,
+                f'{label} Unfilled': max(nurse_cap - nurse_bids, 0) + max(medic_cap - medic_bids, 0),
+                f'{label} Over Cap': len(over_cap),
+                f'{label} Max Crews': crews,
+            })
+        day_rows.append(day_row)
+
+    day_table = pd.DataFrame(day_rows)
+    cap_total = int(day_caps.sum())
+    bids = np.stack([
+        day_stats[[f'{period}_nurse', f'{period}_medic']].to_numpy(dtype=np.int64)
+        for period in ('day', 'night')
+    ], axis=1) if len(day_stats) else np.zeros_like(day_caps)
+    covered = int(np.minimum(bids, day_caps).sum())
+
+    staff_rows = []
+    for staff_name, record in staff.items():
+        ranks = record.pop('preference_ranks')
+        ranking = snapshot['rankings'].get(staff_name, {})
+        staff_rows.append({
+            'Staff': staff_name,
+            'Role': str(snapshot['bid_roles'].get(staff_name, '')).title(),
+            'Role Rank': ranking.get('role_rank'),
+            'Working Days': record['working_days'],
+            'Base Days': record['base_days'],
+            'No Seat Days': record['no_seat_days'],
+            'Over Cap Days': record['over_cap_days'],
+            'First Choice Days': record['first_choice_days'],
+            'Avg Preference Rank': round(sum(ranks) / len(ranks), 2) if ranks else None,
+        })
+    staff_table = pd.DataFrame(staff_rows)
+
+    working = int(staff_table['Working Days'].sum()) if not staff_table.empty else 0
+    based = int(staff_table['Base Days'].sum()) if not staff_table.empty else 0
+    summary = {
+        'Cap Slots': cap_total,
+        'Bid Coverage %': round(100 * covered / cap_total, 1) if cap_total else 0.0,
+        'Unfilled Cap Slots': int(day_table[['Day Unfilled', 'Night Unfilled']].to_numpy().sum()),
+        'Bids Over Cap': int(day_table[['Day Over Cap', 'Night Over Cap']].to_numpy().sum()),
+        'Base Slots': (seats['day'] + seats['night']) * len(ROLES) * len(days),
+        'Unfilled Base Slots': unfilled_seats,
+        'Max Day Crews': int(day_table['Day Max Crews'].sum()),
+        'Max Night Crews': int(day_table['Night Max Crews'].sum()),
+        'Fewest Day Crews': int(day_table['Day Max Crews'].min()) if len(day_table) else 0,
+        'Fewest Night Crews': int(day_table['Night Max Crews'].min()) if len(day_table) else 0,
+        'Bid Shifts With a Base %': round(100 * based / working, 1) if working else 0.0,
+        'Staff With a Base Every Shift': int(
+            ((staff_table['Base Days'] == staff_table['Working Days']) & (staff_table['Working Days'] > 0)).sum()
+        ) if not staff_table.empty else 0,
+        'First Choice Base Shifts': int(staff_table['First Choice Days'].sum()) if not staff_table.empty else 0,
+    }
+    return {'name': name, 'error': None, 'summary': summary, 'days': day_table, 'staff': staff_table}
+
+
+def _init_worker(snapshot):
+    """Process pool initializer: keep the shared snapshot for every task in this worker."""
+    global _WORKER_SNAPSHOT
+    _WORKER_SNAPSHOT = snapshot
+
+
+def _evaluate_in_worker(scenario):
+    return evaluate_scenario(_WORKER_SNAPSHOT, scenario)
+
+
+@instrumented
+def run_scenarios(snapshot, scenarios, max_workers=None, progress_callback=None):
+    """
+    Evaluate every scenario against one snapshot, across a process pool
+
+    Falls back to evaluating in-process when there's one scenario, one core,
+    or the pool can't be started (e.g. restricted hosts).
+
+    Args:
+        snapshot (dict): Result of build_scenario_snapshot()
+        scenarios (list): Scenario dicts (see module docstring)
+        max_workers (int, optional): Process pool size (defaults to all cores)
+        progress_callback (callable, optional): Called as progress_callback(done, total)
+
+    Returns:
+        list: evaluate_scenario() results, in the order given
+    """
+    total = len(scenarios)
+    workers = max_workers or os.cpu_count() or 1
+    workers = max(1, min(workers, total))
+    results = []
+
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(snapshot,)) as executor:
+                for result in executor.map(_evaluate_in_worker, scenarios):
+                    results.append(result)
+                    if progress_callback:
+                        progress_callback(len(results), total)
+            return results
+        except (OSError, RuntimeError) as e:
+            # BrokenProcessPool is a RuntimeError; pick up where the pool stopped
+            print(f"Process pool unavailable, evaluating scenarios serially: {e}")
+
+    for scenario in scenarios[len(results):]:
+        results.append(evaluate_scenario(snapshot, scenario))
+        if progress_callback:
+            progress_callback(len(results), total)
+    return results
+
+
+def scenarios_from_table(table):
+    """
+    Scenario dicts from the What-If editor table
+
+    Each row is one scenario change: blank cells keep the current value, and a
+    Weekday other than "All" turns the cap columns into that weekday's
+    day-of-week limits. Rows sharing a Scenario name are merged, so a
+    scenario can change several weekdays.
+
+    Returns:
+        tuple: (list of scenario dicts, list of error messages)
+    """
+    scenarios = {}
+    errors = []
+    for _, row in table.iterrows():
+        name = row.get('Scenario')
+        if pd.isna(name) or not str(name).strip():
+            continue
+        name = str(name).strip()
+        scenario = scenarios.setdefault(name, {'name': name, 'caps': {}, 'weekday_caps': {}, 'base_shift_counts': {}})
+        weekday = row.get('Weekday')
+        weekday = 'All' if pd.isna(weekday) or not str(weekday).strip() else str(weekday).strip()
+        if weekday != 'All' and weekday not in DAYS_OF_WEEK:
+            errors.append(f"{name}: unknown weekday {weekday}")
+            continue
+        for column, field in CAP_COLUMNS.items():
+            value = row.get(column)
+            if value is None or pd.isna(value):
+                continue
+            if weekday == 'All':
+                scenario['caps'][field] = value
+            else:
+                scenario['weekday_caps'].setdefault(weekday, {})[field] = value
+        for column, (base, shift) in BASE_COLUMNS.items():
+            value = row.get(column)
+            if value is None or pd.isna(value):
+                continue
+            scenario['base_shift_counts'].setdefault(base, {})[shift] = value
+    return list(scenarios.values()), errors
+
+
+def compare_scenarios(results):
+    """
+    Side-by-side tables for a run
+
+    Returns:
+        tuple: (summary DataFrame with one column per scenario,
+            {staff metric: DataFrame of Staff x scenario})
+    """
+    evaluated = [r for r in results if not r.get('error')]
+    if not evaluated:
+        return pd.DataFrame(), {}
+    # Metrics as rows: object columns so counts stay integers next to the percentages
+    summary = pd.DataFrame({r['name']: pd.Series(r['summary'], dtype=object) for r in evaluated})
+
+    staff_metrics = {}
+    first = evaluated[0]['staff']
+    if not first.empty:
+        for metric in ('Base Days', 'No Seat Days', 'Over Cap Days', 'First Choice Days', 'Avg Preference Rank'):
+            table = first[['Staff', 'Role', 'Role Rank', 'Working Days']].copy()
+            for r in evaluated:
+                table[r['name']] = r['staff'].set_index('Staff')[metric].reindex(table['Staff']).to_numpy()
+            staff_metrics[metric] = table
+    return summary, staff_metrics
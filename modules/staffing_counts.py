@@ -0,0 +1,267 @@
+# modules/staffing_counts.py
+"""
+Materialized per-day staffing counts.
+
+day_staffing_counts holds, for every (track_name, is_active) pool, how many
+tracks have each shift code on each of the 42 pattern days, split by the role
+stored with the track (tracks.effective_role, '' when none was recorded). It
+is maintained inside the same transaction as every write to `tracks`, so
+capacity and "needed" checks read a handful of indexed rows instead of
+JSON-decoding the whole roster.
+
+Writers take a staffing_state() of the rows they are about to touch, make
+their change, then call apply_staffing_change() before committing. Anything
+that rewrites `tracks` wholesale calls rebuild_day_staffing_counts() instead.
+
+Run `python -m modules.staffing_counts` to rebuild the table from `tracks`
+(add --check to only report drift).
+"""
+
+import re
+from collections import Counter
+
+from modules.cycle_calendar import DAY_INDEX
+from modules.track_codes import decode_track_data, get_day_schema
+from modules.query_profiler import open_connection
+
+DB_PATH = 'data/medflight_tracks.db'
+
+# Same day-name formats the hypothetical scheduler accepts ("Mon A 1", "Mon A1", "MonA1")
+_DAY_KEY_RE = re.compile(r'^(\w{3})\s*([ABC])\s*(\d+)$')
+
+
+def day_index_for(day):
+    """
+    Pattern index (0-41) of a day label in any of the accepted formats
+
+    Returns:
+        int or None: Index, or None if the label isn't a pattern day
+    """
+    index = DAY_INDEX.get(day)
+    if index is not None:
+        return index
+    match = _DAY_KEY_RE.match(day or '')
+    if not match:
+        return None
+    return DAY_INDEX.get(" ".join(match.groups()))
+
+
+def ensure_day_staffing_table(cursor):
+    """
+    Create day_staffing_counts if needed
+
+    Returns:
+        bool: True if the table was just created (and still needs a rebuild)
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'day_staffing_counts'")
+    if cursor.fetchone():
+        return False
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS day_staffing_counts (
+        track_name TEXT NOT NULL,
+        is_active INTEGER NOT NULL,
+        day_index INTEGER NOT NULL,
+        shift_code TEXT NOT NULL,
+        role TEXT NOT NULL,
+        staff_count INTEGER NOT NULL,
+        PRIMARY KEY (track_name, is_active, day_index, shift_code, role)
+    ) WITHOUT ROWID
+    ''')
+    return True
+
+
+def _track_keys(track_name, is_active, track_json, role, schema=None):
+    """(track_name, is_active, day_index, shift_code, role) once per worked day of one track"""
+    try:
+        if isinstance(track_json, (str, bytes)):
+            track_data = decode_track_data(track_json, schema)
+        else:
+            track_data = track_json or {}
+    except (TypeError, ValueError):
+        return set()
+    if not isinstance(track_data, dict):
+        return set()
+
+    keys = set()
+    for day, code in track_data.items():
+        if not code:
+            continue
+        day_index = day_index_for(day)
+        if day_index is not None:
+            # A set, so a track holding several spellings of one day counts once
+            keys.add((track_name, is_active, day_index, code, role or ''))
+    return keys
+
+
+def staffing_state(cursor, where_sql='1 = 1', params=()):
+    """
+    Staffing contribution of the tracks matching a WHERE clause
+
+    Args:
+        cursor: Cursor inside the writer's transaction
+        where_sql (str): Condition on `tracks` selecting the rows about to change
+        params (tuple): Parameters for where_sql
+
+    Returns:
+        Counter: (track_name, is_active, day_index, shift_code, role) -> count
+    """
+    cursor.execute(
+        "SELECT COALESCE(track_name, ''), COALESCE(is_active, -1), track_data, effective_role "
+        f"FROM tracks WHERE {where_sql}",
+        tuple(params)
+    )
+    state = Counter()
+    for track_name, is_active, track_json, role in cursor.fetchall():
+        schema = get_day_schema(cursor, track_name) if isinstance(track_json, bytes) else None
+        state.update(_track_keys(track_name, is_active, track_json, role, schema))
+    return state
+
+
+def staffing_state_for_ids(cursor, track_ids):
+    """staffing_state() of specific tracks rows"""
+    track_ids = [track_id for track_id in track_ids if track_id is not None]
+    if not track_ids:
+        return Counter()
+    placeholders = ",".join("?" * len(track_ids))
+    return staffing_state(cursor, f"id IN ({placeholders})", track_ids)
+
+
+def apply_staffing_change(cursor, before, after):
+    """
+    Apply the difference between two staffing_state() results to day_staffing_counts
+
+    Args:
+        cursor: Cursor inside the writer's transaction (caller commits)
+        before (Counter): State of the affected rows before the write
+        after (Counter): State of the same rows after the write
+    """
+    delta = Counter(after)
+    delta.subtract(before)
+    changes = [key + (count,) for key, count in delta.items() if count]
+    if not changes:
+        return
+    cursor.executemany('''
+        INSERT INTO day_staffing_counts (track_name, is_active, day_index, shift_code, role, staff_count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (track_name, is_active, day_index, shift_code, role)
+        DO UPDATE SET staff_count = staff_count + excluded.staff_count
+    ''', changes)
+    emptied = [change[:5] for change in changes if change[5] < 0]
+    if emptied:
+        cursor.executemany('''
+            DELETE FROM day_staffing_counts
+            WHERE track_name = ? AND is_active = ? AND day_index = ? AND shift_code = ? AND role = ?
+              AND staff_count <= 0
+        ''', emptied)
+
+
+def rebuild_day_staffing_counts(cursor, track_name=None):
+    """
+    Recompute day_staffing_counts from `tracks` (all pools, or one track_name)
+
+    Args:
+        cursor: Cursor inside the caller's transaction (caller commits)
+        track_name (str, optional): Only rebuild this track_name's pools
+
+    Returns:
+        int: Number of count rows written
+    """
+    ensure_day_staffing_table(cursor)
+    if track_name is None:
+        cursor.execute("DELETE FROM day_staffing_counts")
+        state = staffing_state(cursor)
+    else:
+        cursor.execute("DELETE FROM day_staffing_counts WHERE track_name = ?", (track_name,))
+        state = staffing_state(cursor, "track_name = ?", (track_name,))
+    apply_staffing_change(cursor, Counter(), state)
+    return len(state)
+
+
+def check_day_staffing_counts(cursor):
+    """
+    Compare day_staffing_counts with a fresh recompute from `tracks`
+
+    Returns:
+        list: (key, stored count, expected count) for every row that differs
+    """
+    ensure_day_staffing_table(cursor)
+    cursor.execute(
+        "SELECT track_name, is_active, day_index, shift_code, role, staff_count FROM day_staffing_counts"
+    )
+    stored = {row[:5]: row[5] for row in cursor.fetchall()}
+    expected = staffing_state(cursor)
+    return [
+        (key, stored.get(key, 0), expected.get(key, 0))
+        for key in sorted(set(stored) | set(expected), key=str)
+        if stored.get(key, 0) != expected.get(key, 0)
+    ]
+
+
+def query_day_staffing(cursor, bid_track_name=None):
+    """
+    Counts for one pool: the active roster (is_active = 1, any track_name), or the
+    submitted bids of a bidding cycle (track_name = bid_track_name, is_active = 0)
+
+    Returns:
+        dict: (day_index, shift_code) -> {role: count}
+    """
+    if bid_track_name:
+        cursor.execute('''
+            SELECT day_index, shift_code, role, SUM(staff_count) FROM day_staffing_counts
+            WHERE track_name = ? AND is_active = 0
+            GROUP BY day_index, shift_code, role
+        ''', (bid_track_name,))
+    else:
+        cursor.execute('''
+            SELECT day_index, shift_code, role, SUM(staff_count) FROM day_staffing_counts
+            WHERE is_active = 1
+            GROUP BY day_index, shift_code, role
+        ''')
+    counts = {}
+    for day_index, shift_code, role, count in cursor.fetchall():
+        counts.setdefault((day_index, shift_code), {})[role] = count
+    return counts
+
+
+def unassigned_role_staff(cursor, day, shift_code, bid_track_name=None):
+    """
+    Names of staff on a shift whose track has no stored role (counted under '')
+
+    Returns:
+        list: Staff names, for resolving their role from the preferences file
+    """
+    day_index = day_index_for(day)
+    if bid_track_name:
+        cursor.execute('''
+            SELECT staff_name, track_name, track_data FROM tracks
+            WHERE track_name = ? AND is_active = 0 AND COALESCE(effective_role, '') = ''
+        ''', (bid_track_name,))
+    else:
+        cursor.execute('''
+            SELECT staff_name, track_name, track_data FROM tracks
+            WHERE is_active = 1 AND COALESCE(effective_role, '') = ''
+        ''')
+    names = []
+    for staff_name, track_name, track_json in cursor.fetchall():
+        schema = get_day_schema(cursor, track_name) if isinstance(track_json, bytes) else None
+        if any(key[2] == day_index and key[3] == shift_code
+               for key in _track_keys(None, None, track_json, '', schema)):
+            names.append(staff_name)
+    return names
+
+
+if __name__ == '__main__':
+    import sys
+
+    conn = open_connection(DB_PATH)
+    cur = conn.cursor()
+    if '--check' in sys.argv[1:]:
+        drift = check_day_staffing_counts(cur)
+        for key, stored_count, expected_count in drift:
+            print(f"{key}: stored {stored_count}, expected {expected_count}")
+        print("day_staffing_counts is up to date" if not drift else f"{len(drift)} count row(s) out of date")
+    else:
+        written = rebuild_day_staffing_counts(cur)
+        conn.commit()
+        print(f"Rebuilt day_staffing_counts: {written} count rows")
+    conn.close()
@@ -3,6 +3,7 @@
 import streamlit as st
 from datetime import datetime, timedelta
 import pandas as pd
+import numpy as np
 import sqlite3
 import os
 from openpyxl import load_workbook
@@ -13,9 +14,12 @@ from modules.db_utils import (
     save_summer_leave_selection,
     cancel_summer_leave_selection,
     get_week_selections_by_role,
+    get_summer_leave_usage_grid,
+    reserve_summer_leave_week,
     get_all_summer_leave_selections,
     get_all_summer_leave_configs,
-    get_db_connection
+    get_db_connection,
+    SUMMER_LEAVE_SHIFT_BASED_ROLES
 )
 from training_modules.training_email_notifications import send_summer_leave_notification
 
@@ -35,7 +39,7 @@ ROLE_CAPS = {
 }
 
 # Roles that use shift-based caps (others use person-based caps)
-SHIFT_BASED_ROLES = {'NURSE', 'MEDIC'}
+SHIFT_BASED_ROLES = set(SUMMER_LEAVE_SHIFT_BASED_ROLES)
 
 # Cache for staff shifts and roles
 _staff_shifts_cache = None
@@ -285,7 +289,69 @@ def get_summer_weeks(role=None):
 
     return weeks
 
-def get_staff_track_schedule(staff_name, role, track_manager):
+class SummerScheduleProjection:
+    """
+    Staff x day matrix of shift codes and raw codes over a date range
+
+    Built in one vectorized step by TrainingTrackManager.project_schedule from
+    the 42-day tracks and 28-day CCEMT patterns; the week views and the LT
+    report grid read their cells from it instead of looking up each
+    staff member and date separately.
+    """
+
+    def __init__(self, staff_names, start_date, end_date, track_manager):
+        self.staff_names = list(staff_names)
+        self.row_of = {name: row for row, name in enumerate(self.staff_names)}
+        self.start_date = datetime(start_date.year, start_date.month, start_date.day)
+        day_count = max((datetime(end_date.year, end_date.month, end_date.day) - self.start_date).days + 1, 0)
+        self.dates = [self.start_date + timedelta(days=i) for i in range(day_count)]
+        self.shifts, self.raw = track_manager.project_schedule(self.staff_names, self.dates)
+
+    def column_of(self, date):
+        """Column index of a date (may fall outside the projected range)"""
+        return (datetime(date.year, date.month, date.day) - self.start_date).days
+
+    def lt_display_codes(self, role_mapping):
+        """
+        LT display code for every cell
+
+        For CCEMT: 'LT-{raw_code}' (e.g., 'LT-PG'). For all others: 'LT-D' or
+        'LT-N' based on the shift prefix. '' when no shift is scheduled.
+
+        Args:
+            role_mapping (dict): Dictionary mapping staff names to roles
+
+        Returns:
+            ndarray: object array shaped like self.shifts
+        """
+        shifts = self.shifts.astype(str)
+        raw = self.raw.astype(str)
+        shift_codes = np.where(np.char.startswith(shifts, 'D'), 'LT-D',
+                               np.where(np.char.startswith(shifts, 'N'), 'LT-N', ''))
+        raw_codes = np.where(raw != '', np.char.add('LT-', raw), '')
+        is_ccemt = np.array([role_mapping.get(name) == 'CCEMT' for name in self.staff_names], dtype=bool)
+        return np.where(is_ccemt[:, None], raw_codes, shift_codes).astype(object)
+
+
+def project_summer_schedule(staff_names, track_manager, start_date=None, end_date=None):
+    """
+    Project staff schedules over the summer leave period (or another date range)
+
+    Args:
+        staff_names (list): Staff members to project
+        track_manager: TrainingTrackManager instance
+        start_date (date, optional): First day (defaults to the earliest summer start)
+        end_date (date, optional): Last day (defaults to SUMMER_END_DATE)
+
+    Returns:
+        SummerScheduleProjection: Shift and raw code matrices
+    """
+    start_date = start_date or min(SUMMER_START_DATE, CCEMT_START_DATE)
+    end_date = end_date or SUMMER_END_DATE
+    return SummerScheduleProjection(staff_names, start_date, end_date, track_manager)
+
+
+def get_staff_track_schedule(staff_name, role, track_manager, projection=None):
     """
     Get track schedule for a staff member during summer period
 
@@ -293,6 +359,7 @@ def get_staff_track_schedule(staff_name, role, track_manager):
         staff_name (str): Name of staff member
         role (str): Staff member's role
         track_manager: TrainingTrackManager instance
+        projection (SummerScheduleProjection, optional): Projection that includes this staff member
 
     Returns:
         dict: Dictionary mapping week to daily schedule
@@ -301,26 +368,26 @@ def get_staff_track_schedule(staff_name, role, track_manager):
         return None
 
     weeks = get_summer_weeks(role)
+    if projection is None or staff_name not in projection.row_of:
+        projection = project_summer_schedule([staff_name], track_manager,
+                                             datetime.strptime(weeks[0][0], '%Y-%m-%d'),
+                                             datetime.strptime(weeks[-1][1], '%Y-%m-%d'))
+    shifts = projection.shifts[projection.row_of[staff_name]]
     schedule_by_week = {}
 
     for week_start_str, week_end_str, display_str in weeks:
         week_start = datetime.strptime(week_start_str, '%Y-%m-%d')
-        week_end = datetime.strptime(week_end_str, '%Y-%m-%d')
+        first = projection.column_of(week_start)
+        week_length = (datetime.strptime(week_end_str, '%Y-%m-%d') - week_start).days + 1
 
         # Get daily schedule for this week
-        daily_schedule = []
-        current_day = week_start
-
-        while current_day <= week_end:
-            # Format date as MM/DD/YYYY for track_manager
-            shift = track_manager.get_staff_shift(staff_name, current_day.strftime('%m/%d/%Y'))
-            daily_schedule.append({
-                'date': current_day.strftime('%a %m/%d'),
-                'shift': shift if shift else 'Off'
-            })
-            current_day += timedelta(days=1)
-
-        schedule_by_week[display_str] = daily_schedule
+        schedule_by_week[display_str] = [
+            {
+                'date': (week_start + timedelta(days=offset)).strftime('%a %m/%d'),
+                'shift': shifts[first + offset] or 'Off'
+            }
+            for offset in range(week_length)
+        ]
 
     return schedule_by_week
 
@@ -467,9 +534,14 @@ def display_user_interface(staff_name, role, excel_handler, track_manager):
     week_availability = {}  # Track availability for each week
     week_shift_info = {}  # Track shift usage info for each week
 
+    # Usage of every week for every role, from one query
+    grid_loaded, usage_grid = get_summer_leave_usage_grid()
+    if not grid_loaded:
+        usage_grid = {}
+
     for week_start_str, week_end_str, display_str in weeks:
         # Check availability for this week (shifts for NURSE/MEDIC, people for others)
-        count_used = get_week_selections_by_role(week_start_str, role)
+        count_used = usage_grid.get((week_start_str, role), 0)
         cap = ROLE_CAPS.get(role, 2)
 
         count_remaining = cap - count_used
@@ -559,7 +631,10 @@ def display_user_interface(staff_name, role, excel_handler, track_manager):
 
             # Submit button
             if st.button("✅ Submit My Selection", type="primary"):
-                success, message = save_summer_leave_selection(staff_name, role, week_start_str, week_end_str, selected_shifts)
+                # Capacity is re-checked atomically - someone may have taken the last slot since the page loaded
+                success, message = reserve_summer_leave_week(
+                    staff_name, role, week_start_str, week_end_str, ROLE_CAPS.get(role, 2), selected_shifts
+                )
                 if success:
                     st.success(f"✅ {message}")
 
@@ -597,40 +672,6 @@ def display_user_interface(staff_name, role, excel_handler, track_manager):
             # Show schedule without any week highlighted
             display_track_schedule(schedule_by_week, None, week_availability, week_shift_info)
 
-def _get_lt_display_code(staff_name, role, date, track_manager):
-    """
-    Get the LT display code for a staff member on a given date.
-
-    For CCEMT: returns 'LT-{raw_code}' (e.g., 'LT-PG', 'LT-NP').
-    For all others: returns 'LT-D' or 'LT-N' based on the shift prefix.
-    Returns empty string if no shift is scheduled that day.
-
-    Args:
-        staff_name (str): Staff member name
-        role (str): Staff member role
-        date (datetime): The date to look up
-        track_manager: TrainingTrackManager instance
-
-    Returns:
-        str: Display code like 'LT-D', 'LT-N', 'LT-PG', etc., or ''
-    """
-    if not track_manager:
-        return ""
-
-    if role == 'CCEMT':
-        raw_shift = track_manager.get_staff_raw_shift(staff_name, date)
-        return f"LT-{raw_shift}" if raw_shift else ""
-    else:
-        shift = track_manager.get_staff_shift(staff_name, date.strftime('%m/%d/%Y'))
-        if not shift:
-            return ""
-        if shift.startswith('D'):
-            return "LT-D"
-        elif shift.startswith('N'):
-            return "LT-N"
-        return ""
-
-
 def display_lt_schedule_report(staff_list, role_mapping, track_manager):
     """
     Display the LT Schedule report tab.
@@ -681,66 +722,70 @@ def display_lt_schedule_report(staff_list, role_mapping, track_manager):
             dates.append(current)
             current += timedelta(days=1)
 
+        # One projection covers the report range and every leave window in it
+        staff_sorted = sorted(staff_list)
+        windows = {}
+        for staff_name in staff_sorted:
+            selection = selections_lookup.get(staff_name)
+            if selection:
+                windows[staff_name] = (datetime.strptime(selection['week_start_date'], '%Y-%m-%d'),
+                                       datetime.strptime(selection['week_end_date'], '%Y-%m-%d'))
+        projection_start = min([dates[0]] + [window[0] for window in windows.values()])
+        projection_end = max([dates[-1]] + [window[1] for window in windows.values()])
+        lt_codes = np.empty((0, 0), dtype=object)
+        if track_manager:
+            projection = project_summer_schedule(staff_sorted, track_manager, projection_start, projection_end)
+            lt_codes = projection.lt_display_codes(role_mapping)
+        else:
+            projection = None
+        date_columns = [(date.strftime('%m/%d'), (date - projection_start).days) for date in dates]
+
         # Build report rows
         report_rows = []
         partial_notes = {}  # staff_name -> col_label of first window date (for Excel comment)
-        for staff_name in sorted(staff_list):
+        for row_index, staff_name in enumerate(staff_sorted):
             role = role_mapping.get(staff_name, 'Unknown')
             selection = selections_lookup.get(staff_name)
 
             row = {'Staff Name': staff_name, 'Role': role}
 
-            if selection:
-                leave_start = datetime.strptime(selection['week_start_date'], '%Y-%m-%d')
-                leave_end = datetime.strptime(selection['week_end_date'], '%Y-%m-%d')
-                shifts_used = selection.get('shifts_used')
+            if staff_name not in windows:
+                for col_label, _ in date_columns:
+                    row[col_label] = ""
+                report_rows.append(row)
+                continue
+
+            leave_start, leave_end = windows[staff_name]
+            shifts_used = selection.get('shifts_used')
+            window_first = (leave_start - projection_start).days
+            window_last = (leave_end - projection_start).days
+            if projection is not None:
+                window_codes = lt_codes[row_index, window_first:window_last + 1]
             else:
-                leave_start = None
-                leave_end = None
-                shifts_used = None
+                window_codes = np.full(max(window_last - window_first + 1, 0), "", dtype=object)
 
             # For NURSE/MEDIC with a partial week selection, only the first
             # `shifts_used` scheduled shifts (in date order) across the full
             # leave window are LT. The remainder are regular shifts (blank).
-            lt_dates = None
+            scheduled = window_codes != ""
+            is_lt = scheduled
             is_partial_week = False
-            if selection and role in SHIFT_BASED_ROLES and shifts_used is not None:
-                lt_dates = set()
-                count = 0
-                check = leave_start
-                while check <= leave_end and count < shifts_used:
-                    if _get_lt_display_code(staff_name, role, check, track_manager):
-                        lt_dates.add(check)
-                        count += 1
-                    check += timedelta(days=1)
-
-                # Detect partial: any scheduled shift in the window not in lt_dates
-                check = leave_start
-                while check <= leave_end:
-                    if check not in lt_dates and _get_lt_display_code(staff_name, role, check, track_manager):
-                        is_partial_week = True
-                        break
-                    check += timedelta(days=1)
+            if role in SHIFT_BASED_ROLES and shifts_used is not None:
+                is_lt = scheduled & (np.cumsum(scheduled) <= shifts_used)
+                # Partial: a scheduled shift in the window that isn't LT
+                is_partial_week = bool(scheduled.sum() > is_lt.sum())
 
             # First date in the report range that falls within the leave window
             # (used to place the partial-week Excel comment)
-            first_window_col = None
             if is_partial_week:
                 for date in dates:
                     if leave_start <= date <= leave_end:
-                        first_window_col = date.strftime('%m/%d')
+                        partial_notes[staff_name] = date.strftime('%m/%d')
                         break
 
-            if is_partial_week and first_window_col:
-                partial_notes[staff_name] = first_window_col
-
-            for date in dates:
-                col_label = date.strftime('%m/%d')
-                if leave_start and leave_end and leave_start <= date <= leave_end:
-                    if lt_dates is not None and date not in lt_dates:
-                        row[col_label] = ""
-                    else:
-                        row[col_label] = _get_lt_display_code(staff_name, role, date, track_manager)
+            for col_label, column in date_columns:
+                if window_first <= column <= window_last and is_lt[column - window_first]:
+                    row[col_label] = window_codes[column - window_first]
                 else:
                     row[col_label] = ""
 
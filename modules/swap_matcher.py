@@ -0,0 +1,293 @@
+# modules/swap_matcher.py
+"""
+Swap-partner matching over the active roster.
+
+Every active track goes into inverted indexes once: (day, shift) -> the staff
+working it, day -> the staff off that day, and role -> its staff, each as an
+int bitset over the roster. A request ("give away these days, pick up those")
+is answered by intersecting bitsets instead of scanning every pair of tracks:
+
+- a partner must be off on every day the requester gives away, and work a
+  shift on every day the requester picks up
+- a shift that changes hands between roles must fit under the day's remaining
+  capacity for the receiving role (same-role swaps never change the counts)
+
+Only the staff left after that go through validate_track_comprehensive(),
+with the swap applied to both tracks; the requester's side is validated once
+per distinct outcome.
+"""
+
+import time
+
+from modules.capacity_engine import SHIFT_CODES, ROLES
+from modules.enhanced_track_validator import validate_track_comprehensive
+from modules.instrumentation import instrumented
+from modules.staffing_counts import day_index_for
+from modules.weekend_group_validator import normalize_weekend_group
+
+WORKED_CODES = ('D', 'N', 'AT')
+
+# Stamp of the roster the cached index was built from, and the index
+_swap_index_cache = {}
+
+
+def _role_key(role):
+    """Capacity role for a stored/preferences role (dual counts as nurse)"""
+    return "medic" if str(role or "").strip().lower() == "medic" else "nurse"
+
+
+class SwapIndex:
+    """Inverted indexes of a roster's tracks by day, shift and role"""
+
+    def __init__(self, tracks, roles, days):
+        """
+        Args:
+            tracks (dict): Staff name -> {day: shift code}
+            roles (dict): Staff name -> role ('nurse', 'medic' or 'dual')
+            days (list): Schedule days
+        """
+        self.days = list(days)
+        self.staff = sorted(tracks)
+        self.position = {name: i for i, name in enumerate(self.staff)}
+        self.tracks = {name: {day: tracks[name].get(day, "") or "" for day in self.days} for name in self.staff}
+        self.roles = {name: _role_key(roles.get(name)) for name in self.staff}
+        self.all_bits = (1 << len(self.staff)) - 1
+
+        self.working = {(day, code): 0 for day in self.days for code in SHIFT_CODES}
+        self.off = {day: 0 for day in self.days}
+        self.role_bits = {role: 0 for role in ROLES}
+        for name, i in self.position.items():
+            bit = 1 << i
+            self.role_bits[self.roles[name]] |= bit
+            for day, code in self.tracks[name].items():
+                if code in SHIFT_CODES:
+                    self.working[(day, code)] |= bit
+                elif code not in WORKED_CODES:
+                    self.off[day] |= bit
+
+    def members(self, bits):
+        """Staff names in a bitset, in roster order"""
+        names = []
+        while bits:
+            low = bits & -bits
+            names.append(self.staff[low.bit_length() - 1])
+            bits ^= low
+        return names
+
+    def candidate_bits(self, requester, give_days, pick_up_days, pick_up_shift=None, remaining=None):
+        """
+        Bitset of staff a swap could work with, before validation
+
+        Args:
+            requester (str): Staff member asking for the swap
+            give_days (list): Days the requester works and wants to give away
+            pick_up_days (list): Days the requester is off and wants to work
+            pick_up_shift (str, optional): 'D' or 'N' to only pick up that shift
+            remaining (ndarray, optional): RemainingSlots.remaining, [day_index, shift, role]
+
+        Returns:
+            int: Candidate bitset (requester excluded)
+        """
+        requester_track = self.tracks[requester]
+        requester_role = self.roles[requester]
+        same_role = self.role_bits[requester_role]
+
+        def has_room(day, code, role):
+            if remaining is None:
+                return True
+            day_index = day_index_for(day)
+            return day_index is None or remaining[day_index, SHIFT_CODES.index(code), ROLES.index(role)] > 0
+
+        bits = self.all_bits & ~(1 << self.position[requester])
+        for day in give_days:
+            code = requester_track[day]
+            receivers = same_role
+            for role in ROLES:
+                if role != requester_role and has_room(day, code, role):
+                    receivers |= self.role_bits[role]
+            bits &= self.off[day] & receivers
+        for day in pick_up_days:
+            codes = (pick_up_shift,) if pick_up_shift else SHIFT_CODES
+            givers = 0
+            for code in codes:
+                # The requester joins this shift; a partner of another role leaves it
+                allowed = self.all_bits if has_room(day, code, requester_role) else same_role
+                givers |= self.working[(day, code)] & allowed
+            bits &= givers
+        return bits
+
+
+def _roster_stamp(active_tracks, days):
+    return (tuple(days), tuple((t['staff_name'], t.get('version'), t.get('submission_date')) for t in active_tracks))
+
+
+@instrumented
+def build_swap_index(days, preferences_df=None, staff_col_prefs=None, role_col=None, active_tracks=None):
+    """
+    Index the active roster, reusing the last index while the roster is unchanged
+
+    Tracks count under their stored effective role; tracks saved without one
+    fall back to the preferences file.
+
+    Args:
+        days (list): Schedule days
+        preferences_df (DataFrame, optional): Staff preferences for unrecorded roles
+        staff_col_prefs (str, optional): Staff column in preferences_df
+        role_col (str, optional): Role column in preferences_df
+        active_tracks (list, optional): get_all_active_tracks() result to reuse
+
+    Returns:
+        tuple: (SwapIndex or None, error message or None)
+    """
+    if active_tracks is None:
+        from modules.db_utils import get_all_active_tracks
+        ok, active_tracks = get_all_active_tracks()
+        if not ok:
+            return None, active_tracks
+
+    stamp = _roster_stamp(active_tracks, days)
+    cached = _swap_index_cache.get('index')
+    if cached is not None and cached[0] == stamp:
+        return cached[1], None
+
+    preference_roles = {}
+    if preferences_df is not None and staff_col_prefs and role_col:
+        preference_roles = dict(zip(preferences_df[staff_col_prefs], preferences_df[role_col]))
+    tracks, roles = {}, {}
+    for track in active_tracks:
+        name = track['staff_name']
+        track_data = track['track_data'] or {}
+        tracks[name] = {day: track_data.get(day, "") for day in days}
+        roles[name] = (track.get('metadata') or {}).get('effective_role') or preference_roles.get(name)
+
+    index = SwapIndex(tracks, roles, days)
+    _swap_index_cache['index'] = (stamp, index)
+    return index, None
+
+
+def _requirements_lookup(requirements_df):
+    """
+    Staff name -> (shifts per pay period, night minimum, weekend minimum, weekend group)
+    from Requirements.xlsx columns in their usual order
+    """
+    lookup = {}
+    if requirements_df is None or requirements_df.empty or len(requirements_df.columns) < 4:
+        return lookup
+
+    def as_int(value):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return 0
+
+    has_group = len(requirements_df.columns) >= 5
+    for row in requirements_df.itertuples(index=False):
+        name = str(row[0]).strip()
+        lookup[name] = (
+            as_int(row[1]), as_int(row[2]), as_int(row[3]),
+            normalize_weekend_group(row[4]) if has_group else None,
+        )
+    return lookup
+
+
+def _validation_issues(result):
+    return [issue for key, check in result.items() if key != 'overall_valid' for issue in check.get('issues', [])]
+
+
+@instrumented
+def find_swap_partners(index, requester, give_days=(), pick_up_days=(), pick_up_shift=None,
+                       requirements_df=None, preassignment_df=None, remaining=None):
+    """
+    Every staff member a requested swap would work with
+
+    Args:
+        index (SwapIndex): Roster index (see build_swap_index())
+        requester (str): Staff member asking for the swap
+        give_days (list): Days the requester works and wants to give away
+        pick_up_days (list): Days the requester is off and wants to work
+        pick_up_shift (str, optional): 'D' or 'N' to only pick up that shift
+        requirements_df (DataFrame, optional): Requirements for validating both tracks
+        preassignment_df (DataFrame or dict, optional): Preassignments for both tracks
+        remaining (ndarray, optional): RemainingSlots.remaining for the capacity check
+
+    Returns:
+        dict: matches (list of {'staff', 'role', 'takes', 'gives'}: the shifts the
+            partner takes from and gives to the requester), candidates (count
+            validated), requester_issues, message and elapsed_ms
+    """
+    from modules.track_management.preassignment import get_staff_preassignments
+
+    started = time.perf_counter()
+    result = {'matches': [], 'candidates': 0, 'requester_issues': [], 'message': '', 'elapsed_ms': 0.0}
+
+    def finish(message=''):
+        result['message'] = message
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    give_days, pick_up_days = list(give_days), list(pick_up_days)
+    if requester not in index.position:
+        return finish(f"{requester} has no active track.")
+    if not give_days and not pick_up_days:
+        return finish("Choose at least one day to give away or pick up.")
+    if set(give_days) & set(pick_up_days):
+        return finish("A day can't be both given away and picked up.")
+
+    requester_track = index.tracks[requester]
+    requester_pre = get_staff_preassignments(requester, preassignment_df, index.days)
+    for day in give_days:
+        if requester_track.get(day) not in SHIFT_CODES:
+            return finish(f"You aren't working a D or N shift on {day}.")
+        if day in requester_pre:
+            return finish(f"{day} is a preassignment and can't be swapped.")
+    for day in pick_up_days:
+        if requester_track.get(day) in WORKED_CODES or day in requester_pre:
+            return finish(f"You're already scheduled on {day}.")
+
+    bits = index.candidate_bits(requester, give_days, pick_up_days, pick_up_shift, remaining)
+    if not bits:
+        return finish("No one is off on every day you're giving away and working every day you're "
+                      "picking up, within capacity.")
+    requirements = _requirements_lookup(requirements_df)
+
+    def validate(name, track, preassignments):
+        shifts_per_pay_period, night_minimum, weekend_minimum, weekend_group = requirements.get(name, (0, 0, 0, None))
+        return validate_track_comprehensive(
+            track, shifts_per_pay_period, night_minimum, weekend_minimum,
+            preassignments, index.days, weekend_group
+        )
+
+    # The requester's new track only depends on which shifts they pick up
+    requester_outcomes = {}
+    for name in index.members(bits):
+        partner_track = index.tracks[name]
+        partner_pre = get_staff_preassignments(name, preassignment_df, index.days)
+        if any(day in partner_pre for day in give_days + pick_up_days):
+            continue
+        takes = {day: requester_track[day] for day in give_days}
+        gives = {day: partner_track[day] for day in pick_up_days}
+
+        outcome = tuple(gives[day] for day in pick_up_days)
+        if outcome not in requester_outcomes:
+            new_requester = dict(requester_track)
+            new_requester.update({day: "" for day in give_days})
+            new_requester.update(gives)
+            check = validate(requester, new_requester, requester_pre)
+            requester_outcomes[outcome] = check['overall_valid']
+            if not check['overall_valid'] and not result['requester_issues']:
+                result['requester_issues'] = _validation_issues(check)
+        if not requester_outcomes[outcome]:
+            continue
+
+        result['candidates'] += 1
+        new_partner = dict(partner_track)
+        new_partner.update(takes)
+        new_partner.update({day: "" for day in pick_up_days})
+        if validate(name, new_partner, partner_pre)['overall_valid']:
+            result['matches'].append({'staff': name, 'role': index.roles[name], 'takes': takes, 'gives': gives})
+
+    if result['matches']:
+        return finish()
+    if requester_outcomes and not any(requester_outcomes.values()):
+        return finish("This swap would leave your own track invalid.")
+    return finish("No one's track stays valid with this swap.")
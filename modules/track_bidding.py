@@ -7,8 +7,9 @@ bid access, add/update/remove bids on staff members' behalf, promote to active.
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import altair as alt
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 import pytz
 import json
 
@@ -46,6 +47,12 @@ from modules.db_utils import (
     get_bid_progression_log,
 )
 from modules.security import check_admin_access
+from modules.post_commit_jobs import register_job_handler, get_jobs
+# Importing backup_utils registers the backup job's handler in this process
+from modules.backup_utils import BACKUP_JOB_TYPE
+from modules.cycle_calendar import get_cycle_calendar, DAY_INDEX
+from modules.capacity_engine import get_capacity_array, max_possible_shifts, ROLES as CAPACITY_ROLES
+from modules.staffing_counts import day_index_for
 from modules.shift_definitions import day_shifts, night_shifts
 
 
@@ -53,6 +60,10 @@ from modules.shift_definitions import day_shifts, night_shifts
 # Shared data loading (staff roster + Excel files used by the bidding editor)
 # ──────────────────────────────────────────────
 
+# (path, mtime) -> day columns read from that version of the preassignments file
+_preassignment_day_columns_cache = {}
+
+
 def _get_preassignment_day_columns(path):
     """
     Read the ordered list of day-pattern columns (e.g. "Sun A 1" ... "Sat C 6")
@@ -61,7 +72,14 @@ def _get_preassignment_day_columns(path):
     Read independently of load_preassignments() (which may collapse the file into
     a plain dict when duplicate staff names are present) so the day schema is
     always derived directly from the file's own columns, never from Tracks.xlsx.
+    The header is only re-read when the file changes.
     """
+    import os
+    cache_key = (path, os.path.getmtime(path))
+    cached = _preassignment_day_columns_cache.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
     header_df = pd.read_excel(path, nrows=0)
     cols = list(header_df.columns)
     staff_col = cols[0]
@@ -69,7 +87,14 @@ def _get_preassignment_day_columns(path):
         if isinstance(col, str) and "name" in col.lower() and "staff" in col.lower():
             staff_col = col
             break
-    return [c for c in cols if c != staff_col]
+    day_columns = [c for c in cols if c != staff_col]
+    unknown = [c for c in day_columns if c not in DAY_INDEX]
+    if unknown:
+        print(f"Preassignment columns not in the 42-day cycle: {unknown}")
+
+    _preassignment_day_columns_cache.clear()
+    _preassignment_day_columns_cache[cache_key] = tuple(day_columns)
+    return day_columns
 
 
 def _load_bidding_data_files():
@@ -427,19 +452,6 @@ def _bid_role_and_senior(bid, role_mapping, no_matrix_mapping):
     return role, is_senior
 
 
-def _max_possible_shifts(nurse_n, medic_n, dual_n, senior_n):
-    """
-    Largest number of complete Nurse+Medic crews that day's bidders could staff.
-
-    Dual-credentialed staff (already counted in nurse_n) can flex to the medic
-    side; this tries every split and keeps the best pairing, then caps the
-    result at how many no-matrix/senior staff bid that day. Direct translation
-    of the LET() formula in rows 99/104 of the FY26 Track Analysis workbook.
-    """
-    best = max(min(nurse_n - x, medic_n + x) for x in range(dual_n + 1))
-    return max(0, min(senior_n, best))
-
-
 def _compute_bid_day_stats(days, bids, role_mapping, no_matrix_mapping):
     """One row per bid day with Nurse/Medic/Dual/Senior counts and Max Shifts, Day and Night."""
     resolved = [(_bid_role_and_senior(b, role_mapping, no_matrix_mapping), b) for b in bids]
@@ -464,7 +476,7 @@ def _compute_bid_day_stats(days, bids, role_mapping, no_matrix_mapping):
             counts[f'{period}_medic'] = medic
             counts[f'{period}_dual'] = dual
             counts[f'{period}_senior'] = senior
-            counts[f'{period}_max_shifts'] = _max_possible_shifts(nurse, medic, dual, senior)
+            counts[f'{period}_max_shifts'] = max_possible_shifts(nurse, medic, dual, senior)
         rows.append(counts)
     return pd.DataFrame(rows)
 
@@ -543,7 +555,7 @@ def _build_demand_vs_cap_chart(day_stats, period, role):
 
 
 def _build_max_shifts_chart(day_stats):
-    """Max achievable Day/Night crews (see _max_possible_shifts) across the 42 days."""
+    """Max achievable Day/Night crews (see max_possible_shifts) across the 42 days."""
     long_df = day_stats.melt(id_vars=['day_label'], value_vars=['day_max_shifts', 'night_max_shifts'],
                               var_name='Period', value_name='Max Crews')
     long_df['Period'] = long_df['Period'].map({'day_max_shifts': 'Day', 'night_max_shifts': 'Night'})
@@ -618,12 +630,15 @@ def _render_bid_analysis_tab(config_names, default_track_index):
     st.caption("Figures below reflect submitted bids only, and will shift as more staff submit.")
 
     day_stats = _compute_bid_day_stats(days, bids, role_mapping, no_matrix_mapping)
-    weekday_caps = get_track_capacity_by_weekday(analysis_track)
-    for period, cap_key_prefix in (('day', 'max_day_'), ('night', 'max_night_')):
-        for role in ('nurse', 'medic'):
-            # get_track_capacity_by_weekday() keys are plural: max_day_nurses/max_day_medics/...
-            day_stats[f'{period}_cap_{role}'] = day_stats['weekday'].map(
-                lambda w: weekday_caps.get(w, {}).get(f'{cap_key_prefix}{role}s', 0))
+    # Caps for all 42 days (weekday overrides applied) from the capacity engine
+    capacity = get_capacity_array(analysis_track)
+    pattern_index = day_stats['day_label'].map(day_index_for)
+    known = pattern_index.notna().to_numpy()
+    for shift_index, period in enumerate(('day', 'night')):
+        for role_index, role in enumerate(CAPACITY_ROLES):
+            caps = np.zeros(len(day_stats), dtype=int)
+            caps[known] = capacity[pattern_index[known].astype(int), shift_index, role_index]
+            day_stats[f'{period}_cap_{role}'] = caps
 
     st.markdown("#### Where Staff Are Bidding")
     st.caption("One row per staff member (nurses A–Z, then medics A–Z), one column per bid day.")
@@ -658,17 +673,21 @@ def _compute_bid_roster_table(analysis_track, ctx, bids):
     One row per submitted bid: Staff/Role/Seniority, then one column per bid day
     holding "D (BASE)" / "N (BASE)" / "AT" / "" (empty for non-working days).
 
-    Expected base reuses calculate_hypothetical_assignment — the same seniority
-    competition simulation shown to a bidder for their own hypothetical schedule —
-    scored against this cycle's submitted bids (bid_track_name=analysis_track), so
-    the base shown here always matches what the bidder saw when they picked that day.
+    Expected base comes from generate_roster_hypothetical_schedules — the same
+    seniority competition simulation shown to a bidder for their own hypothetical
+    schedule, run once per day/shift for every bidder — scored against this
+    cycle's submitted bids (bid_track_name=analysis_track), so the base shown here
+    always matches what the bidder saw when they picked that day.
     """
-    from modules.hypothetical_scheduler_new import calculate_hypothetical_assignment, _load_all_base_preferences
-    from modules.db_utils import get_base_shift_counts
+    from modules.hypothetical_scheduler_new import generate_roster_hypothetical_schedules
 
     days = ctx['days']
-    all_base_prefs = _load_all_base_preferences()
-    base_shift_counts = get_base_shift_counts(analysis_track)
+    schedules = generate_roster_hypothetical_schedules(
+        ctx['preferences_df'], ctx['current_tracks_df'], days,
+        ctx['staff_col_prefs'], ctx['staff_col_tracks'], ctx['role_col'], ctx['seniority_col'],
+        bid_track_name=analysis_track, staff_names=[b['staff_name'] for b in bids],
+        use_database_logic=True,
+    )
 
     rows = []
     for b in bids:
@@ -681,17 +700,11 @@ def _compute_bid_roster_table(analysis_track, ctx, bids):
             '_role_bucket': _bidding_role_bucket(raw_role),
             'Seniority': ctx['seniority_mapping'].get(name),
         }
+        details = schedules[name]['assignment_details']
         for day in days:
             code = track_data.get(day)
             if code in ('D', 'N'):
-                result = calculate_hypothetical_assignment(
-                    name, day, 'day' if code == 'D' else 'night',
-                    ctx['preferences_df'], ctx['current_tracks_df'],
-                    ctx['staff_col_prefs'], ctx['staff_col_tracks'], ctx['role_col'], ctx['seniority_col'],
-                    use_database_logic=True, all_base_prefs=all_base_prefs,
-                    bid_track_name=analysis_track, base_shift_counts=base_shift_counts,
-                )
-                base = result.get('assignment')
+                base = details[day]['day' if code == 'D' else 'night']['assignment']
                 row[day] = f"{code} ({base})" if base else code
             elif code == 'AT':
                 row[day] = 'AT'
@@ -868,6 +881,42 @@ def _render_bid_roster_tab(config_names, default_track_index):
                 st.markdown(f"#### Block {block_letter}")
                 _render_bid_roster_block_table(sub, block_days)
 
+    _render_roster_hypotheticals(roster_track, ctx)
+
+
+def _render_roster_hypotheticals(roster_track, ctx):
+    """
+    Every staff member's hypothetical schedule against this cycle's bids, in one
+    table: what each of them would get on a day or night shift, whether or not
+    they have bid yet.
+    """
+    from modules.hypothetical_scheduler_new import (
+        generate_roster_hypothetical_schedules, build_roster_hypothetical_table
+    )
+
+    with st.expander("Hypothetical Schedules — All Staff", expanded=False):
+        st.caption("The base each staff member would get if they worked a day (D) or night (N) shift, "
+                   "competing by seniority against the bids submitted so far. \"—\" means no shift "
+                   "would be available.")
+        days = ctx['days']
+        with st.spinner("Computing hypothetical schedules..."):
+            schedules = generate_roster_hypothetical_schedules(
+                ctx['preferences_df'], ctx['current_tracks_df'], days,
+                ctx['staff_col_prefs'], ctx['staff_col_tracks'], ctx['role_col'], ctx['seniority_col'],
+                bid_track_name=roster_track, use_database_logic=True,
+            )
+        table = build_roster_hypothetical_table(schedules, days)
+        if table.empty:
+            st.info("No staff in the preferences file.")
+            return
+        st.dataframe(table, use_container_width=True, hide_index=True)
+        st.download_button(
+            "📥 Download Hypothetical Schedules (CSV)",
+            data=table.to_csv(index=False).encode('utf-8'),
+            file_name=f"hypothetical_schedules_{roster_track}.csv",
+            mime="text/csv", key="roster_hypotheticals_download"
+        )
+
 
 # ──────────────────────────────────────────────
 # Base Analysis: per-base, per-slot fill status across the 42-day cycle
@@ -1075,6 +1124,167 @@ def _render_base_analysis_tab(config_names, default_track_index):
         _render_base_analysis_block_table(filtered, block_days)
 
 
+# ──────────────────────────────────────────────
+# PDF Packets: whole-roster schedule / bid summary PDFs in one download
+# ──────────────────────────────────────────────
+
+def _render_pdf_packet_tab(config_names, default_track_index):
+    """Export every active schedule, or every bid for a track cycle, as one zip or merged PDF."""
+    from modules.roster_pdf_export import (
+        build_roster_snapshot, generate_roster_pdf_packet, PDF_MERGE_AVAILABLE
+    )
+
+    st.markdown("### PDF Packets")
+    st.caption("Renders one PDF per staff member across all server cores and bundles them into a "
+               "single download, instead of generating each PDF from the staff member's own page.")
+
+    source = st.radio(
+        "Export:", ["All active schedules", "All bids for a track cycle"],
+        horizontal=True, key="packet_source")
+
+    packet_track = None
+    if source == "All bids for a track cycle":
+        if not config_names:
+            st.info("No track cycles exist yet. Create one in the Track Configs tab.")
+            return
+        packet_track = st.selectbox(
+            "Track Cycle:", config_names, index=default_track_index, key="packet_track_select")
+
+    output_options = ["Zip (one PDF per staff member)"]
+    if PDF_MERGE_AVAILABLE:
+        output_options.append("Single merged PDF")
+    output_label = st.radio("Format:", output_options, horizontal=True, key="packet_output")
+    if not PDF_MERGE_AVAILABLE:
+        st.caption("Install `pypdf` to enable the single merged PDF option.")
+
+    if st.button("🖨️ Build PDF Packet", key="build_packet_btn", type="primary", use_container_width=True):
+        mode = 'bids' if packet_track else 'active'
+        snapshot, error = build_roster_snapshot(mode, packet_track)
+        if snapshot is None:
+            st.error(error)
+            return
+
+        progress = st.progress(0.0, text=f"Rendering {len(snapshot['entries'])} PDFs...")
+
+        def _on_progress(done, total):
+            progress.progress(done / total, text=f"Rendered {done} of {total} PDFs...")
+
+        packet_bytes, packet_name, errors = generate_roster_pdf_packet(
+            snapshot, output='merged' if output_label == "Single merged PDF" else 'zip',
+            progress_callback=_on_progress
+        )
+        progress.empty()
+        st.session_state['pdf_packet_result'] = (packet_bytes, packet_name, errors,
+                                                 len(snapshot['entries']))
+
+    if 'pdf_packet_result' in st.session_state:
+        packet_bytes, packet_name, errors, total = st.session_state['pdf_packet_result']
+        st.success(f"Packet ready: {total - len(errors)} of {total} PDFs rendered.")
+        if errors:
+            with st.expander(f"⚠️ {len(errors)} PDF(s) failed to render"):
+                for staff_name, message in errors:
+                    st.markdown(f"- **{staff_name}**: {message}")
+        st.download_button(
+            "📥 Download PDF Packet", data=packet_bytes, file_name=packet_name,
+            mime="application/pdf" if packet_name.endswith('.pdf') else "application/zip",
+            use_container_width=True, key="download_packet_btn"
+        )
+
+
+# ──────────────────────────────────────────────
+# What-If Scenarios: compare candidate caps / base shift counts side by side
+# ──────────────────────────────────────────────
+
+def _render_scenario_tab(config_names, default_track_index):
+    """Evaluate many candidate track configs against the submitted bids at once, across all server cores."""
+    from modules.scenario_runner import (
+        build_scenario_snapshot, run_scenarios, scenarios_from_table, compare_scenarios,
+        CAP_COLUMNS, BASE_COLUMNS
+    )
+    from modules.cycle_calendar import DAYS_OF_WEEK
+
+    st.markdown("### What-If Scenarios")
+    st.caption("Try several Bid Caps, Day-of-Week Limits and Base Shift Counts against the bids submitted "
+               "so far, without saving anything. One row per change: blank cells keep the cycle's current "
+               "value, a Weekday other than \"All\" makes the caps that weekday's limits, and rows with the "
+               "same Scenario name are combined. The current config is always included for comparison.")
+
+    if not config_names:
+        st.info("No track cycles exist yet. Create one in the Track Configs tab.")
+        return
+
+    scenario_track = st.selectbox(
+        "Track Cycle:", config_names, index=default_track_index, key="scenario_track_select")
+
+    columns = ['Scenario', 'Weekday'] + list(CAP_COLUMNS) + list(BASE_COLUMNS)
+    starter = pd.DataFrame([{column: None for column in columns}])
+    starter['Scenario'] = "Scenario 1"
+    starter['Weekday'] = "All"
+    column_config = {
+        'Scenario': st.column_config.TextColumn(required=True),
+        'Weekday': st.column_config.SelectboxColumn(options=["All"] + list(DAYS_OF_WEEK), default="All"),
+    }
+    for column in CAP_COLUMNS:
+        column_config[column] = st.column_config.NumberColumn(min_value=0, max_value=50, step=1)
+    for column in BASE_COLUMNS:
+        column_config[column] = st.column_config.NumberColumn(min_value=0, max_value=20, step=1)
+    edited = st.data_editor(
+        starter, num_rows="dynamic", hide_index=True, use_container_width=True,
+        key=f"scenario_editor_{scenario_track}", column_config=column_config
+    )
+
+    if st.button("🧪 Run Scenarios", key="run_scenarios_btn", type="primary", use_container_width=True):
+        scenarios, errors = scenarios_from_table(edited)
+        for error in errors:
+            st.warning(error)
+        snapshot, error = build_scenario_snapshot(scenario_track)
+        if snapshot is None:
+            st.error(error)
+            return
+        scenarios = [{'name': 'Current config'}] + [s for s in scenarios if s['name'] != 'Current config']
+
+        progress = st.progress(0.0, text=f"Evaluating {len(scenarios)} scenarios...")
+
+        def _on_progress(done, total):
+            progress.progress(done / total, text=f"Evaluated {done} of {total} scenarios...")
+
+        results = run_scenarios(snapshot, scenarios, progress_callback=_on_progress)
+        progress.empty()
+        st.session_state['scenario_results'] = (scenario_track, results)
+
+    stored = st.session_state.get('scenario_results')
+    if not stored or stored[0] != scenario_track:
+        return
+    results = stored[1]
+
+    for result in results:
+        if result.get('error'):
+            st.error(f"{result['name']}: {result['error']}")
+    summary, staff_metrics = compare_scenarios(results)
+    if summary.empty:
+        return
+
+    st.markdown("#### Side by Side")
+    st.dataframe(summary, use_container_width=True)
+    st.download_button(
+        "📥 Download Comparison (CSV)", data=summary.to_csv().encode('utf-8'),
+        file_name=f"scenarios_{scenario_track}.csv", mime="text/csv", key="download_scenarios_btn"
+    )
+
+    evaluated = [r for r in results if not r.get('error')]
+    st.markdown("#### By Day")
+    day_metric = st.selectbox(
+        "Metric:", [c for c in evaluated[0]['days'].columns if c != 'Day'], key="scenario_day_metric")
+    by_day = pd.DataFrame({r['name']: r['days'][day_metric].to_numpy() for r in evaluated},
+                          index=evaluated[0]['days']['Day'])
+    st.dataframe(by_day.T, use_container_width=True)
+
+    st.markdown("#### By Staff")
+    staff_metric = st.selectbox("Metric:", list(staff_metrics), key="scenario_staff_metric")
+    if staff_metric:
+        st.dataframe(staff_metrics[staff_metric], use_container_width=True, hide_index=True)
+
+
 # ──────────────────────────────────────────────
 # Admin mode toggle (small sidebar gate) + full-page admin dashboard
 # ──────────────────────────────────────────────
@@ -1113,9 +1323,9 @@ def display_bidding_admin_interface():
         if bid_cfg and bid_cfg['track_name'] in config_names else 0
     )
 
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9 = st.tabs([
         "📊 Overview", "🛠️ Track Configs", "👥 Manage Bid Access", "➕ Add/Remove Selection", "📈 Bid Analysis",
-        "📋 Bid Roster", "🏢 Base Analysis"
+        "📋 Bid Roster", "🏢 Base Analysis", "🖨️ PDF Packets", "🧪 What-If Scenarios"
     ])
 
     # ── Tab 1: Overview ──
@@ -1678,6 +1888,14 @@ def display_bidding_admin_interface():
     with tab7:
         _render_base_analysis_tab(config_names, default_track_index)
 
+    # ── Tab 8: PDF Packets ──
+    with tab8:
+        _render_pdf_packet_tab(config_names, default_track_index)
+
+    # ── Tab 9: What-If Scenarios ──
+    with tab9:
+        _render_scenario_tab(config_names, default_track_index)
+
 
 # ──────────────────────────────────────────────
 # Main bidding page (staff-facing)
@@ -2143,6 +2361,10 @@ def _display_track_selection_tab(
 
     # Initialize track changes: existing bid > saved draft > blank — never a copy of the reference track
     if selected_staff not in st.session_state.track_changes:
+        # Bid version these edits start from; submission is rejected if it moved meanwhile
+        st.session_state[_bid_base_version_key(bid_track_name, selected_staff)] = (
+            bid_result[1]['version'] if has_bid else 0
+        )
         if has_bid:
             track_data = bid_result[1]['track_data'].copy()
         elif has_draft:
@@ -2255,7 +2477,7 @@ def _display_bid_submission(
     """
     from modules.enhanced_track_validator import validate_track_comprehensive
     from modules.pdf_generator import generate_bid_summary_pdf
-    from modules.email_notifications import send_bid_submission_notification, send_bid_summary_email
+    from modules.email_notifications import send_bid_summary_email
 
     st.subheader(f"Submit Bid for {selected_staff}")
 
@@ -2271,6 +2493,9 @@ def _display_bid_submission(
     # Shown regardless of admin/staff path or lock state, so both a staff member
     # submitting their own bid and an admin submitting on their behalf see the
     # outcome of the admin notification and the automatic bid-progression attempt.
+    # Both run as background jobs after the bid commits; refresh their status here.
+    _sync_bid_job_notices(selected_staff, bid_track_name, admin_notice_key,
+                          progression_notice_key, staff_confirmation_key)
     _notice_fn = {"success": st.success, "warning": st.warning, "info": st.info}
     if admin_notice_key in st.session_state:
         notice_type, notice_msg = st.session_state[admin_notice_key]
@@ -2411,58 +2636,43 @@ def _display_bid_submission(
                 'preassignment_count': len(preassignments) if preassignments else 0,
             }
 
-            ok, msg, tid = save_bid_track_to_db(selected_staff, track_to_save, bid_track_name, meta)
+            # The bid commit is the only thing the submitter waits for: the summary PDF,
+            # admin/staff notification, bid progression and backup are recorded in the
+            # same transaction and run by the post-commit worker pool.
+            base_version_key = _bid_base_version_key(bid_track_name, selected_staff)
+            expected_version = st.session_state.get(base_version_key)
+            if expected_version is None:
+                expected_version = existing[1]['version'] if has_existing_bid else 0
+            job_payload = {'staff_name': selected_staff, 'track_name': bid_track_name}
+            post_commit_jobs = [
+                ('bid_notification', {
+                    **job_payload,
+                    'days': list(days),
+                    'shifts_per_pay_period': int(shifts_per_pay_period),
+                    'night_minimum': int(night_minimum),
+                    'weekend_minimum': int(weekend_minimum),
+                    'preassignments': preassignments or {},
+                    'weekend_group': st.session_state.get('weekend_group'),
+                }),
+                ('bid_progression', job_payload),
+                (BACKUP_JOB_TYPE, job_payload),
+            ]
+
+            ok, msg, tid = save_bid_track_to_db(
+                selected_staff, track_to_save, bid_track_name, meta,
+                expected_version=expected_version, post_commit_jobs=post_commit_jobs
+            )
             if ok:
                 # Bid is now officially submitted — clear any saved in-progress draft
                 delete_bid_draft(selected_staff, bid_track_name)
 
-                # Notify the admin recipients with bid summary statistics (sent from the admin
-                # account), also including the submitting staff member - with their bid summary
-                # PDF attached - when their email is on file in Requirements.xlsx.
-                try:
-                    bid_result = get_bid_track_from_db(selected_staff, bid_track_name)
-                    if bid_result[0]:
-                        saved_bid = bid_result[1]
-                        weekend_group = st.session_state.get('weekend_group')
-                        validation_result = validate_track_comprehensive(
-                            saved_bid['track_data'], shifts_per_pay_period, night_minimum,
-                            weekend_minimum, preassignments, days, weekend_group,
-                            staff_name=selected_staff
-                        )
-
-                        staff_email = None
-                        req_ctx, _ = _load_bidding_data_files()
-                        if req_ctx is not None:
-                            staff_email = _load_requirements_map(req_ctx['requirements_df']).get(
-                                selected_staff, {}).get('email')
-
-                        notice_pdf_bytes, notice_pdf_filename = generate_bid_summary_pdf(
-                            selected_staff, saved_bid['track_data'], days, bid_track_name,
-                            saved_bid['version'], saved_bid['submission_date'],
-                            shifts_per_pay_period, night_minimum, weekend_minimum,
-                            preassignments, validation_result, weekend_group
-                        )
-
-                        admin_ok, admin_msg = send_bid_submission_notification(
-                            selected_staff, bid_track_name, saved_bid['track_data'],
-                            saved_bid['version'], saved_bid['submission_date'], validation_result,
-                            staff_email=staff_email, pdf_bytes=notice_pdf_bytes, pdf_filename=notice_pdf_filename
-                        )
-                        st.session_state[admin_notice_key] = ("success", admin_msg) if admin_ok else ("warning", admin_msg)
-                        st.session_state[staff_confirmation_key] = bool(staff_email) and admin_ok
-                except Exception as e:
-                    st.session_state[admin_notice_key] = ("warning", f"Admin notification failed: {e}")
-
-                # Automatic bid access & notification: hand bid access to the next
-                # staff member in seniority rank order, if the feature is turned on.
-                try:
-                    progression_result = _run_auto_bid_progression(selected_staff, bid_track_name)
-                    if progression_result:
-                        st.session_state[progression_notice_key] = progression_result
-                    else:
-                        st.session_state.pop(progression_notice_key, None)
-                except Exception as e:
-                    st.session_state[progression_notice_key] = ("warning", f"Automatic bid progression failed: {e}")
+                saved = get_bid_track_from_db(selected_staff, bid_track_name)
+                new_version = saved[1]['version'] if saved[0] else expected_version + 1
+                st.session_state[base_version_key] = new_version
+                st.session_state[_bid_jobs_version_key(bid_track_name, selected_staff)] = new_version
+                st.session_state.pop(admin_notice_key, None)
+                st.session_state.pop(progression_notice_key, None)
+                st.session_state.pop(staff_confirmation_key, None)
 
                 st.success(f"Bid saved successfully! {msg}")
                 if not is_admin:
@@ -2470,6 +2680,138 @@ def _display_bid_submission(
                 st.rerun()
             else:
                 st.error(f"Error: {msg}")
+                current = get_bid_track_from_db(selected_staff, bid_track_name)
+                current_version = current[1]['version'] if current[0] else 0
+                if current_version != expected_version:
+                    # Lost-update guard tripped: start over from the bid that's on file now
+                    st.session_state.track_changes.pop(selected_staff, None)
+                    st.session_state.pop(base_version_key, None)
+                    st.warning("Your selections were reset to the latest saved bid. "
+                               "Review them in Track Selection before submitting again.")
+
+
+def _bid_base_version_key(bid_track_name, staff_name):
+    return f'bid_base_version_{bid_track_name}_{staff_name}'
+
+
+def _bid_jobs_version_key(bid_track_name, staff_name):
+    return f'bid_jobs_version_{bid_track_name}_{staff_name}'
+
+
+def _sync_bid_job_notices(staff_name, bid_track_name, admin_notice_key,
+                          progression_notice_key, staff_confirmation_key):
+    """
+    Fill the submission notices from the post-commit jobs of this session's last
+    submission: queued/running jobs show as pending, finished ones show their result.
+    """
+    jobs_version = st.session_state.get(_bid_jobs_version_key(bid_track_name, staff_name))
+    if jobs_version is None:
+        return
+
+    latest = {}
+    for job in get_jobs(job_key=f"bid:{bid_track_name}:{staff_name}"):
+        if job['payload'].get('version') == jobs_version:
+            latest.setdefault(job['job_type'], job)
+
+    for job_type, notice_key, pending_msg in (
+        ('bid_notification', admin_notice_key, "Admin notification and bid summary email are being sent..."),
+        ('bid_progression', progression_notice_key, None),
+    ):
+        job = latest.get(job_type)
+        if job is None:
+            continue
+        if job['status'] in ('pending', 'running'):
+            if pending_msg:
+                st.session_state[notice_key] = ("info", pending_msg)
+        elif job['status'] == 'failed':
+            st.session_state[notice_key] = ("warning", f"{job_type.replace('_', ' ').capitalize()} failed: {job['error']}")
+        else:
+            result = job['result'] or {}
+            if result.get('notice'):
+                st.session_state[notice_key] = tuple(result['notice'])
+            else:
+                st.session_state.pop(notice_key, None)
+            if job_type == 'bid_notification':
+                st.session_state[staff_confirmation_key] = bool(result.get('staff_confirmation'))
+
+
+def _bid_notification_job(payload):
+    """
+    Post-commit job: build the bid summary PDF and notify the admin recipients with
+    bid summary statistics (sent from the admin account), also including the
+    submitting staff member - with their bid summary PDF attached - when their email
+    is on file in Requirements.xlsx. Skipped when the bid has moved past the
+    version the job was recorded for.
+
+    Returns:
+        dict: {'notice': (level, message) or None, 'staff_confirmation': bool}
+    """
+    from modules.enhanced_track_validator import validate_track_comprehensive
+    from modules.pdf_generator import generate_bid_summary_pdf
+    from modules.email_notifications import send_bid_submission_notification
+
+    staff_name = payload['staff_name']
+    bid_track_name = payload['track_name']
+    try:
+        bid_result = get_bid_track_from_db(staff_name, bid_track_name)
+        if not bid_result[0]:
+            return {'notice': ("warning", f"Admin notification skipped: no bid on file for {staff_name}"),
+                    'staff_confirmation': False}
+        saved_bid = bid_result[1]
+        if saved_bid['version'] != payload['version']:
+            # A later submission replaced this bid; its own job sends the notice
+            return {'notice': None, 'staff_confirmation': False}
+        validation_result = validate_track_comprehensive(
+            saved_bid['track_data'], payload['shifts_per_pay_period'], payload['night_minimum'],
+            payload['weekend_minimum'], payload['preassignments'], payload['days'], payload['weekend_group'],
+            staff_name=staff_name
+        )
+
+        staff_email = None
+        req_ctx, _ = _load_bidding_data_files()
+        if req_ctx is not None:
+            staff_email = _load_requirements_map(req_ctx['requirements_df']).get(
+                staff_name, {}).get('email')
+
+        notice_pdf_bytes, notice_pdf_filename = generate_bid_summary_pdf(
+            staff_name, saved_bid['track_data'], payload['days'], bid_track_name,
+            saved_bid['version'], saved_bid['submission_date'],
+            payload['shifts_per_pay_period'], payload['night_minimum'], payload['weekend_minimum'],
+            payload['preassignments'], validation_result, payload['weekend_group']
+        )
+
+        admin_ok, admin_msg = send_bid_submission_notification(
+            staff_name, bid_track_name, saved_bid['track_data'],
+            saved_bid['version'], saved_bid['submission_date'], validation_result,
+            staff_email=staff_email, pdf_bytes=notice_pdf_bytes, pdf_filename=notice_pdf_filename
+        )
+        return {'notice': ("success", admin_msg) if admin_ok else ("warning", admin_msg),
+                'staff_confirmation': bool(staff_email) and admin_ok}
+    except Exception as e:
+        # Not retried: part of the email may already have gone out
+        return {'notice': ("warning", f"Admin notification failed: {e}"), 'staff_confirmation': False}
+
+
+def _bid_progression_job(payload):
+    """
+    Post-commit job: automatic bid access & notification - hand bid access to the
+    next staff member in seniority rank order, if the feature is turned on.
+
+    Returns:
+        dict: {'notice': (level, message) or None}
+    """
+    try:
+        return {'notice': _run_auto_bid_progression(payload['staff_name'], payload['track_name'])}
+    except Exception as e:
+        return {'notice': ("warning", f"Automatic bid progression failed: {e}")}
+
+
+register_job_handler('bid_notification', _bid_notification_job)
+register_job_handler('bid_progression', _bid_progression_job)
+
+
+# Fiscal year the Hypothetical Schedule tab's date overlay maps onto
+HYPOTHETICAL_TRACK_NAME = 'FY27'
 
 
 def _hypothetical_date_block_options():
@@ -2481,17 +2823,8 @@ def _hypothetical_date_block_options():
     Returns:
         list[tuple[date, date]]: (block_start, block_end) pairs, in order.
     """
-    start = date(2026, 9, 27)
-    target = date(2027, 10, 1)
-    ranges = []
-    cur = start
-    while True:
-        end = cur + timedelta(days=41)
-        ranges.append((cur, end))
-        if cur <= target <= end:
-            break
-        cur = end + timedelta(days=1)
-    return ranges
+    calendar = get_cycle_calendar(HYPOTHETICAL_TRACK_NAME)
+    return calendar.block_ranges(until=date(calendar.fiscal_year, 10, 1))
 
 
 def _display_hypothetical_track_by_blocks(shift_track, base_track, days, calendar_dates=None):
@@ -2719,7 +3052,7 @@ def _display_bid_hypothetical(
     calendar_dates = None
     if dates_acknowledged:
         block_start, _ = date_block_options[date_option_labels.index(selected_date_label)]
-        calendar_dates = [block_start + timedelta(days=i) for i in range(42)]
+        calendar_dates = get_cycle_calendar(HYPOTHETICAL_TRACK_NAME).cycle_dates(block_start)
 
     # Build track-shaped dicts like Current Track's: shift_track holds the bare
     # D/N/AT for the Assignment row, base_track holds the expected base (D/N days
@@ -0,0 +1,276 @@
+# modules/track_codes.py
+"""
+Compact binary encoding for tracks.track_data.
+
+A track is 42 day keys mapped to a shift code, so instead of ~700 bytes of JSON
+("Mon A 1": "D", ...) a row can hold a 42-byte BLOB: byte i is the code for
+day i of the cycle's day schema. The schema (the ordered day keys and the
+byte -> value table) is stored once per cycle in track_configs.day_schema;
+NULL means DEFAULT_SCHEMA (DAY_KEYS with '-' = '', 'D', 'N', 'A' = 'AT').
+
+Storage is dual-format: encode_track_data() writes a BLOB when the track fits
+its schema exactly and falls back to JSON text otherwise (extra keys, values
+outside the code table), and decode_track_data() reads either into a plain
+dict. Bulk readers use load_track_matrix() to map BLOBs straight into a NumPy
+(staff x day) array of code bytes without building any dicts.
+
+Run `python -m modules.track_codes` to re-encode existing JSON rows.
+"""
+
+import json
+import sqlite3
+import threading
+import numpy as np
+
+from modules.cycle_calendar import DAY_KEYS
+
+DB_PATH = 'data/medflight_tracks.db'
+
+# code byte -> stored value
+DEFAULT_CODES = {'-': '', 'D': 'D', 'N': 'N', 'A': 'AT'}
+UNKNOWN_CODE = ord('?')
+
+
+class DaySchema:
+    """Ordered day keys plus the code table for one cycle"""
+
+    def __init__(self, days, codes):
+        self.days = tuple(days)
+        self.day_index = {day: i for i, day in enumerate(self.days)}
+        self.codes = dict(codes)
+        self._byte_of = {value: ord(code) for code, value in self.codes.items()}
+        self._value_of = [None] * 256
+        for code, value in self.codes.items():
+            self._value_of[ord(code)] = value
+
+    @classmethod
+    def from_json(cls, text):
+        schema = json.loads(text)
+        return cls(schema['days'], schema['codes'])
+
+    def to_json(self):
+        return json.dumps({'days': list(self.days), 'codes': self.codes})
+
+    def code_for(self, value):
+        """Code byte of a shift value, or None if the schema has no code for it"""
+        return self._byte_of.get(value)
+
+    def encode(self, track_data):
+        """
+        Args:
+            track_data (Mapping): Day key -> shift value
+
+        Returns:
+            bytes or None: One code byte per schema day, or None if the track
+                doesn't fit the schema exactly
+        """
+        if len(track_data) != len(self.days):
+            return None
+        codes = bytearray(len(self.days))
+        for day, value in track_data.items():
+            index = self.day_index.get(day)
+            code = self._byte_of.get(value) if isinstance(value, str) else None
+            if index is None or code is None:
+                return None
+            codes[index] = code
+        return bytes(codes)
+
+    def decode(self, codes):
+        """Code bytes back to {day: value} in schema order"""
+        if len(codes) != len(self.days):
+            raise ValueError(f"Track codes have {len(codes)} days, schema has {len(self.days)}")
+        track_data = {}
+        for day, code in zip(self.days, codes):
+            value = self._value_of[code]
+            if value is None:
+                raise ValueError(f"Unknown track code {chr(code)!r} for {day}")
+            track_data[day] = value
+        return track_data
+
+
+DEFAULT_SCHEMA = DaySchema(DAY_KEYS, DEFAULT_CODES)
+
+
+def encode_track_data(track_data, schema=DEFAULT_SCHEMA):
+    """
+    Storage value for tracks.track_data
+
+    Returns:
+        bytes or str: Code bytes if the track fits the schema, JSON text otherwise
+    """
+    codes = schema.encode(track_data)
+    if codes is not None:
+        return codes
+    return json.dumps(dict(track_data))
+
+
+def decode_track_data(value, schema=None):
+    """
+    Read a tracks.track_data value in either storage format
+
+    Args:
+        value (bytes or str): Stored value
+        schema (DaySchema, optional): Day schema of the row's cycle (default schema if None)
+
+    Returns:
+        dict: Day key -> shift value
+
+    Raises:
+        json.JSONDecodeError: Corrupted JSON text
+        ValueError: Code bytes that don't match the schema
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        schema = schema or DEFAULT_SCHEMA
+        value = bytes(value)
+        if len(value) != len(schema.days):
+            raise ValueError(f"Track codes have {len(value)} days, schema has {len(schema.days)}")
+        return schema.decode(value)
+    return json.loads(value)
+
+
+_schema_cache = {}
+_schema_lock = threading.Lock()
+
+
+def invalidate_day_schema_cache():
+    with _schema_lock:
+        _schema_cache.clear()
+
+
+def get_day_schema(cursor, track_name=None):
+    """
+    Day schema stored for a cycle in track_configs
+
+    Uses its own statement on the cursor's connection, so it is safe to call
+    while iterating that cursor.
+
+    Returns:
+        DaySchema: The cycle's schema (DEFAULT_SCHEMA if none is stored)
+    """
+    if not track_name:
+        return DEFAULT_SCHEMA
+    schema = _schema_cache.get(track_name)
+    if schema is not None:
+        return schema
+    try:
+        row = cursor.connection.execute(
+            "SELECT day_schema FROM track_configs WHERE track_name = ?", (track_name,)
+        ).fetchone()
+    except sqlite3.Error:
+        # day_schema column not migrated yet
+        return DEFAULT_SCHEMA
+    if row is None:
+        return DEFAULT_SCHEMA
+    schema = DEFAULT_SCHEMA
+    if row[0] and row[0] != DEFAULT_SCHEMA.to_json():
+        schema = DaySchema.from_json(row[0])
+    with _schema_lock:
+        _schema_cache[track_name] = schema
+    return schema
+
+
+def ensure_day_schema_column(cursor):
+    """
+    Add track_configs.day_schema and store the default schema on configs without one
+
+    Returns:
+        bool: True if the column was just added (existing tracks still need re-encoding)
+    """
+    cursor.execute("PRAGMA table_info(track_configs)")
+    added = 'day_schema' not in [column[1] for column in cursor.fetchall()]
+    if added:
+        cursor.execute("ALTER TABLE track_configs ADD COLUMN day_schema TEXT")
+    cursor.execute("UPDATE track_configs SET day_schema = ? WHERE day_schema IS NULL", (DEFAULT_SCHEMA.to_json(),))
+    return added
+
+
+def migrate_track_data(cursor):
+    """
+    Re-encode JSON track_data rows that fit their cycle's schema as code bytes
+
+    Rows that don't fit (extra keys, values outside the code table) stay JSON.
+    The caller commits.
+
+    Returns:
+        dict: rows converted, rows left as JSON, and bytes before/after
+    """
+    cursor.execute("SELECT id, track_name, track_data FROM tracks WHERE typeof(track_data) = 'text'")
+    stats = {'converted': 0, 'kept_json': 0, 'bytes_before': 0, 'bytes_after': 0}
+    updates = []
+    for track_id, track_name, track_json in cursor.fetchall():
+        try:
+            track_data = json.loads(track_json)
+        except (TypeError, ValueError):
+            stats['kept_json'] += 1
+            continue
+        codes = get_day_schema(cursor, track_name).encode(track_data) if isinstance(track_data, dict) else None
+        if codes is None:
+            stats['kept_json'] += 1
+            continue
+        updates.append((codes, track_id))
+        stats['converted'] += 1
+        stats['bytes_before'] += len(track_json)
+        stats['bytes_after'] += len(codes)
+    cursor.executemany("UPDATE tracks SET track_data = ? WHERE id = ?", updates)
+    return stats
+
+
+def _matrix_row(value, row_schema, schema):
+    """One row of code bytes in `schema` day order, whatever the stored format"""
+    from modules.staffing_counts import day_index_for
+
+    if isinstance(value, bytes) and row_schema is schema and len(value) == len(schema.days):
+        return value
+    try:
+        track_data = decode_track_data(value, row_schema)
+    except (TypeError, ValueError):
+        track_data = {}
+    codes = schema.encode(track_data) if isinstance(track_data, dict) else None
+    if codes is not None:
+        return codes
+    # Doesn't fit exactly: place what we can (alternate day spellings, unknown values as '?')
+    row = bytearray([schema.code_for('') or UNKNOWN_CODE]) * len(schema.days)
+    for day, shift in (track_data.items() if isinstance(track_data, dict) else ()):
+        index = schema.day_index.get(day)
+        if index is None:
+            index = day_index_for(day)
+        if index is not None and index < len(schema.days):
+            code = schema.code_for(shift) if isinstance(shift, str) else None
+            row[index] = code if code is not None else UNKNOWN_CODE
+    return bytes(row)
+
+
+def load_track_matrix(cursor, where_sql='is_active = 1', params=(), schema=DEFAULT_SCHEMA):
+    """
+    Load tracks straight into a (staff x day) matrix of code bytes
+
+    Args:
+        cursor: Database cursor
+        where_sql (str): Condition on `tracks` selecting the rows
+        params (tuple): Parameters for where_sql
+        schema (DaySchema): Day order / code table of the matrix
+
+    Returns:
+        tuple: (staff names, uint8 ndarray of shape (n, len(schema.days))); compare
+            columns with schema.code_for(value), e.g. matrix[:, i] == schema.code_for('N')
+    """
+    cursor.execute(f"SELECT staff_name, track_name, track_data FROM tracks WHERE {where_sql}", tuple(params))
+    rows = cursor.fetchall()
+    names = [row[0] for row in rows]
+    blob = b''.join(
+        _matrix_row(track_value, get_day_schema(cursor, track_name), schema)
+        for _, track_name, track_value in rows
+    )
+    matrix = np.frombuffer(blob, dtype=np.uint8).reshape(len(rows), len(schema.days))
+    return names, matrix
+
+
+if __name__ == '__main__':
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+    ensure_day_schema_column(cur)
+    result = migrate_track_data(cur)
+    conn.commit()
+    conn.close()
+    print(f"Re-encoded {result['converted']} tracks ({result['bytes_before']} -> {result['bytes_after']} bytes), "
+          f"{result['kept_json']} left as JSON")
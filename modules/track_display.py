@@ -17,6 +17,7 @@ ENHANCED CHANGES:
 import streamlit as st
 import pandas as pd
 from .db_utils import get_all_active_tracks
+from .cycle_calendar import DAY_KEYS
 
 def display_track_viewer():
     """
@@ -464,15 +465,7 @@ def get_ordered_day_columns():
     Return day columns in the proper order as specified in data
     Order: Sun A 1, Mon A 1, Tue A 1, ..., Sat A 1, then Sun A 2, Mon A 2, etc.
     """
-    day_order = [
-        "Sun A 1", "Mon A 1", "Tue A 1", "Wed A 1", "Thu A 1", "Fri A 1", "Sat A 1",
-        "Sun A 2", "Mon A 2", "Tue A 2", "Wed A 2", "Thu A 2", "Fri A 2", "Sat A 2",
-        "Sun B 3", "Mon B 3", "Tue B 3", "Wed B 3", "Thu B 3", "Fri B 3", "Sat B 3",
-        "Sun B 4", "Mon B 4", "Tue B 4", "Wed B 4", "Thu B 4", "Fri B 4", "Sat B 4",
-        "Sun C 5", "Mon C 5", "Tue C 5", "Wed C 5", "Thu C 5", "Fri C 5", "Sat C 5",
-        "Sun C 6", "Mon C 6", "Tue C 6", "Wed C 6", "Thu C 6", "Fri C 6", "Sat C 6"
-    ]
-    return day_order
+    return list(DAY_KEYS)
 
 def display_role_tracks_compact(selected_role, selected_staff_filter='All Staff'):
     """
@@ -697,12 +690,14 @@ def export_filtered_tracks_to_excel(selected_role='All', selected_staff_filter='
     """
     Export filtered tracks to Excel format
     Enhanced version with comprehensive filtering support
+    Streams rows through a constant_memory xlsxwriter workbook with shared formats
+    
+    Returns:
+        tuple: (xlsx bytes or None, status message)
     """
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        import tempfile
-        import os
+        import io
+        from .export_utils import open_streaming_workbook, build_shared_formats
         
         # Get filtered tracks
         tracks = get_tracks_from_database_by_filters(selected_role, selected_staff_filter)
@@ -710,62 +705,42 @@ def export_filtered_tracks_to_excel(selected_role='All', selected_staff_filter='
         if not tracks:
             return None, "No tracks match the selected filters for export."
         
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Active_Tracks"
-        
-        # Headers
-        ws['A1'] = 'Staff Name'
-        ws['B1'] = 'Role'
-        ws['A1'].font = Font(bold=True)
-        ws['B1'].font = Font(bold=True)
+        output = io.BytesIO()
+        wb = open_streaming_workbook(output)
+        formats = build_shared_formats(wb)
+        ws = wb.add_worksheet("Active_Tracks")
         
-        # Day columns
+        # Column widths
         ordered_days = get_ordered_day_columns()
-        for idx, day in enumerate(ordered_days, start=3):
-            cell = ws.cell(row=1, column=idx, value=day)
-            cell.font = Font(bold=True)
+        ws.set_column(0, 0, 20)
+        ws.set_column(1, 1, 12)
+        ws.set_column(2, len(ordered_days) + 1, 8)
         
-        # Define shift colors
-        shift_fills = {
-            'D': PatternFill(start_color="CCE5FF", end_color="CCE5FF", fill_type="solid"),
-            'N': PatternFill(start_color="E6CCFF", end_color="E6CCFF", fill_type="solid"),
-            'AT': PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
-        }
+        # Headers and day columns
+        ws.write_row(0, 0, ['Staff Name', 'Role'] + ordered_days, formats['bold'])
+        
+        shift_formats = formats['shift']
+        center_format = formats['center']
         
         # Add track data
-        for row_idx, track in enumerate(tracks, start=2):
+        for row_idx, track in enumerate(tracks, start=1):
             staff_name = track['staff_name']
             metadata = track.get('metadata', {})
             effective_role = metadata.get('effective_role', 'nurse')
             track_data = track.get('track_data', {})
             
             # Staff name and role
-            ws.cell(row=row_idx, column=1, value=staff_name)
-            ws.cell(row=row_idx, column=2, value=effective_role.title())
+            ws.write(row_idx, 0, staff_name)
+            ws.write(row_idx, 1, effective_role.title())
             
             # Shift data
-            for col_idx, day in enumerate(ordered_days, start=3):
+            for col_idx, day in enumerate(ordered_days, start=2):
                 shift = track_data.get(day, '')
-                cell = ws.cell(row=row_idx, column=col_idx, value=shift)
-                
-                # Apply styling
-                if shift in shift_fills:
-                    cell.fill = shift_fills[shift]
-                cell.alignment = Alignment(horizontal='center')
-        
-        # Auto-adjust column widths
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 12
-        for col_idx in range(3, len(ordered_days) + 3):
-            ws.column_dimensions[chr(64 + col_idx)].width = 8
+                ws.write(row_idx, col_idx, shift, shift_formats.get(shift, center_format))
         
-        # Save to temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-        wb.save(temp_file.name)
-        temp_file.close()
+        wb.close()
         
-        return temp_file.name, f"Successfully exported {len(tracks)} tracks to Excel."
+        return output.getvalue(), f"Successfully exported {len(tracks)} tracks to Excel."
     
     except Exception as e:
         return None, f"Export failed: {str(e)}"
@@ -958,22 +933,17 @@ def add_track_display_with_export_to_admin(admin_authenticated=False):
                 )
                 
                 if st.button("📥 Export to Excel", use_container_width=True):
-                    file_path, message = export_filtered_tracks_to_excel(export_role, export_staff_filter)
+                    excel_data, message = export_filtered_tracks_to_excel(export_role, export_staff_filter)
                     
-                    if file_path:
-                        import base64
-                        with open(file_path, "rb") as f:
-                            excel_data = f.read()
-                        
-                        b64 = base64.b64encode(excel_data).decode()
-                        href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="Active_Tracks_Export.xlsx">Click here to download Excel file</a>'
-                        
+                    if excel_data:
                         st.success(f"✅ {message}")
-                        st.markdown(href, unsafe_allow_html=True)
-                        
-                        # Cleanup
-                        import os
-                        os.remove(file_path)
+                        st.download_button(
+                            label="📥 Download Excel file",
+                            data=excel_data,
+                            file_name="Active_Tracks_Export.xlsx",
+                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                            use_container_width=True
+                        )
                     else:
                         st.error(f"❌ {message}")
             
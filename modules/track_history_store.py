@@ -0,0 +1,444 @@
+# modules/track_history_store.py
+"""
+Delta-encoded track_history storage.
+
+A track usually changes one or two days per edit, so storing the full 42-day
+JSON for every history row is mostly redundant. Rows are now written by
+append_track_history() in one of three encodings (track_history.encoding):
+
+- 'K' keyframe: the full track_data as zlib-compressed compact JSON (BLOB)
+- 'D' delta:    compact JSON of only the days that changed since the previous
+                row of the same track ({"Mon A 1": "N"}; null = day removed)
+- 'R' raw:      a non-track payload kept verbatim (e.g. 'rejected')
+
+Every track's chain restarts with a keyframe at least every KEYFRAME_INTERVAL
+rows, so rebuilding any version replays at most KEYFRAME_INTERVAL - 1 deltas.
+Legacy rows (encoding NULL, full JSON text) are still read as-is, and
+migrate_track_history() rewrites them into the new format.
+
+Readers go through TrackHistoryReader (or load_history_track_data), which
+decodes rows in any order and caches the decoded chain segments it replays.
+
+Run `python -m modules.track_history_store --migrate` to convert an existing
+database, or `--benchmark` to compare size and speed on synthetic multi-year
+histories.
+"""
+
+import json
+import zlib
+import random
+import sqlite3
+import time
+from collections import OrderedDict
+
+DB_PATH = 'data/medflight_tracks.db'
+
+KEYFRAME_INTERVAL = 10
+KEYFRAME = 'K'
+DELTA = 'D'
+RAW = 'R'
+
+
+def _compact_json(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+def encode_keyframe(track_data):
+    return zlib.compress(_compact_json(track_data).encode('utf-8'), 9)
+
+
+def _decode_payload(encoding, payload):
+    """Decode one row on its own: a dict for keyframes/legacy JSON, the patch for deltas, raw otherwise"""
+    if encoding == KEYFRAME:
+        return json.loads(zlib.decompress(payload).decode('utf-8'))
+    if encoding == DELTA:
+        return json.loads(payload)
+    if encoding == RAW:
+        return payload
+    # Legacy row: full JSON text, or a non-JSON marker
+    try:
+        value = json.loads(payload)
+    except (TypeError, ValueError):
+        return payload
+    return value if isinstance(value, dict) else payload
+
+
+def make_delta(previous, current):
+    """Days whose value changed from previous to current (None for removed days)"""
+    delta = {key: value for key, value in current.items() if key not in previous or previous[key] != value}
+    for key in previous:
+        if key not in current:
+            delta[key] = None
+    return delta
+
+
+def apply_delta(state, delta):
+    state = dict(state)
+    for key, value in delta.items():
+        if value is None:
+            state.pop(key, None)
+        else:
+            state[key] = value
+    return state
+
+
+def _replay(rows):
+    """
+    Decode one track's rows in id order
+
+    Args:
+        rows: (history_id, encoding, payload) tuples for a single track_id, ascending
+
+    Yields:
+        tuple: (history_id, decoded value, deltas since the last keyframe or None)
+    """
+    state = None
+    since_keyframe = None
+    for history_id, encoding, payload in rows:
+        value = _decode_payload(encoding, payload)
+        if encoding == DELTA:
+            if state is None:
+                # Chain head was deleted - the patch alone is the best we have
+                state, since_keyframe = dict(value), 0
+            else:
+                state = apply_delta(state, value)
+                since_keyframe += 1
+            yield history_id, state, since_keyframe
+        elif isinstance(value, dict):
+            state, since_keyframe = value, 0
+            yield history_id, state, since_keyframe
+        else:
+            yield history_id, value, since_keyframe
+
+
+def ensure_track_history_columns(cursor):
+    """
+    Add the notes/encoding columns and the per-track index to track_history
+
+    Returns:
+        bool: True if the encoding column was just added (legacy rows need migrating)
+    """
+    cursor.execute("PRAGMA table_info(track_history)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'notes' not in columns:
+        cursor.execute("ALTER TABLE track_history ADD COLUMN notes TEXT")
+    added = False
+    if 'encoding' not in columns:
+        cursor.execute("ALTER TABLE track_history ADD COLUMN encoding TEXT")
+        added = True
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_track_history_track ON track_history (track_id, id)")
+    return added
+
+
+def _chain_tail(cursor, track_id, keyframe_interval):
+    """Latest decoded state of a track and how many deltas follow its keyframe"""
+    cursor.execute(
+        "SELECT id, encoding, track_data FROM track_history WHERE track_id = ? ORDER BY id DESC LIMIT ?",
+        (track_id, keyframe_interval)
+    )
+    recent = cursor.fetchall()
+    # Only replay from the newest row that carries a full state
+    for start, (_, encoding, payload) in enumerate(recent):
+        if encoding == KEYFRAME or (encoding is None and isinstance(_decode_payload(None, payload), dict)):
+            break
+    else:
+        return None, None
+    state, since_keyframe = None, None
+    for _, value, count in _replay(reversed(recent[:start + 1])):
+        if isinstance(value, dict):
+            state, since_keyframe = value, count
+    return state, since_keyframe
+
+
+def encode_history_row(previous_state, since_keyframe, track_data, keyframe_interval=KEYFRAME_INTERVAL):
+    """
+    Pick the encoding for a new row given the state of the track before it
+
+    Returns:
+        tuple: (encoding, payload)
+    """
+    if not isinstance(track_data, dict):
+        return RAW, track_data
+    if previous_state is None or since_keyframe is None or since_keyframe + 1 >= keyframe_interval:
+        return KEYFRAME, encode_keyframe(track_data)
+    if any(value is None for value in track_data.values()):
+        # null marks a removed day in a delta, so explicit nulls need a keyframe
+        return KEYFRAME, encode_keyframe(track_data)
+    delta = _compact_json(make_delta(previous_state, track_data))
+    keyframe = encode_keyframe(track_data)
+    # A near-total rewrite is cheaper (and a shorter chain) as a keyframe
+    if len(delta) >= len(keyframe):
+        return KEYFRAME, keyframe
+    return DELTA, delta
+
+
+def append_track_history(cursor, track_id, staff_name, track_data, submission_date, status,
+                         notes=None, keyframe_interval=KEYFRAME_INTERVAL):
+    """
+    Insert a track_history row, delta-encoded against the track's previous row
+
+    Args:
+        cursor: Cursor inside the writer's transaction (caller commits)
+        track_id (int): tracks.id the row belongs to
+        staff_name (str): Staff member
+        track_data (dict or str): Track dict, its JSON string, or a non-track marker
+        submission_date (str): Timestamp
+        status (str): History status ('created', 'updated', 'admin_edit', ...)
+        notes (str, optional): Free-text note
+
+    Returns:
+        int: New history row id
+    """
+    if isinstance(track_data, str):
+        try:
+            parsed = json.loads(track_data)
+            if isinstance(parsed, dict):
+                track_data = parsed
+        except ValueError:
+            pass
+
+    previous_state, since_keyframe = (None, None)
+    if isinstance(track_data, dict):
+        previous_state, since_keyframe = _chain_tail(cursor, track_id, keyframe_interval)
+    encoding, payload = encode_history_row(previous_state, since_keyframe, track_data, keyframe_interval)
+
+    cursor.execute(
+        "INSERT INTO track_history (track_id, staff_name, track_data, submission_date, status, notes, encoding) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (track_id, staff_name, payload, submission_date, status, notes, encoding)
+    )
+    return cursor.lastrowid
+
+
+class TrackHistoryReader:
+    """
+    Decodes track_history rows in any order
+
+    Keyframes and legacy rows decode on their own; a delta row loads its track's
+    chain from the preceding keyframe once, and every state replayed on the way
+    is cached (LRU), so reading a track's history newest-first costs one query
+    per keyframe group.
+    """
+
+    def __init__(self, cursor, cache_size=4096):
+        self.cursor = cursor
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _remember(self, history_id, value):
+        self._cache[history_id] = value
+        self._cache.move_to_end(history_id)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def decode(self, history_id, track_id, encoding, payload):
+        """
+        Args:
+            history_id, track_id, encoding, payload: The row's id, track_id, encoding and track_data
+
+        Returns:
+            dict or str: The track_data at that row (raw payload for non-track rows)
+        """
+        if encoding != DELTA:
+            return _decode_payload(encoding, payload)
+        if history_id in self._cache:
+            self._cache.move_to_end(history_id)
+            return self._cache[history_id]
+
+        self.cursor.execute('''
+            SELECT id, encoding, track_data FROM track_history
+            WHERE track_id = ? AND id <= ?
+              AND id >= COALESCE((SELECT MAX(id) FROM track_history
+                                  WHERE track_id = ? AND id <= ? AND encoding = 'K'), 0)
+            ORDER BY id
+        ''', (track_id, history_id, track_id, history_id))
+        value = None
+        for row_id, row_value, _ in _replay(self.cursor.fetchall()):
+            self._remember(row_id, row_value)
+            if row_id == history_id:
+                value = row_value
+        return value
+
+
+def load_history_track_data(cursor, history_ids):
+    """
+    Reconstruct track_data for specific history rows
+
+    Args:
+        cursor: Database cursor
+        history_ids (list): track_history ids
+
+    Returns:
+        dict: history_id -> track_data dict (or raw payload for non-track rows)
+    """
+    history_ids = list(history_ids)
+    if not history_ids:
+        return {}
+    placeholders = ",".join("?" * len(history_ids))
+    cursor.execute(
+        f"SELECT id, track_id, encoding, track_data FROM track_history WHERE id IN ({placeholders}) ORDER BY id DESC",
+        history_ids
+    )
+    rows = cursor.fetchall()
+    reader = TrackHistoryReader(cursor)
+    return {row[0]: reader.decode(*row) for row in rows}
+
+
+def history_payload_keys(encoding, payload):
+    """Day keys a row mentions, without replaying its chain (for export headers)"""
+    value = _decode_payload(encoding, payload)
+    if not isinstance(value, dict):
+        return []
+    if encoding == DELTA:
+        return [key for key, day_value in value.items() if day_value is not None]
+    return list(value)
+
+
+def migrate_track_history(cursor, keyframe_interval=KEYFRAME_INTERVAL):
+    """
+    Re-encode legacy full-JSON history rows as keyframes and deltas
+
+    Tracks are rewritten whole (in id order) whenever any of their rows is still
+    legacy, so chains stay consistent. The caller commits.
+
+    Returns:
+        dict: rows rewritten, tracks touched, and bytes before/after
+    """
+    ensure_track_history_columns(cursor)
+    cursor.execute("SELECT DISTINCT track_id FROM track_history WHERE encoding IS NULL")
+    track_ids = [row[0] for row in cursor.fetchall()]
+
+    stats = {'tracks': len(track_ids), 'rows': 0, 'bytes_before': 0, 'bytes_after': 0}
+    for track_id in track_ids:
+        cursor.execute(
+            "SELECT id, encoding, track_data FROM track_history WHERE track_id = ? ORDER BY id",
+            (track_id,)
+        )
+        rows = cursor.fetchall()
+        state, since_keyframe = None, None
+        updates = []
+        for (history_id, value, _), (_, _, payload) in zip(_replay(rows), rows):
+            encoding, new_payload = encode_history_row(state, since_keyframe, value, keyframe_interval)
+            if encoding == KEYFRAME:
+                state, since_keyframe = value, 0
+            elif encoding == DELTA:
+                state, since_keyframe = value, since_keyframe + 1
+            updates.append((new_payload, encoding, history_id))
+            stats['bytes_before'] += len(payload) if payload is not None else 0
+            stats['bytes_after'] += len(new_payload) if new_payload is not None else 0
+        cursor.executemany("UPDATE track_history SET track_data = ?, encoding = ? WHERE id = ?", updates)
+        stats['rows'] += len(updates)
+    return stats
+
+
+def _create_benchmark_schema(cursor):
+    cursor.execute('''
+    CREATE TABLE track_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        track_id INTEGER NOT NULL,
+        staff_name TEXT NOT NULL,
+        track_data TEXT NOT NULL,
+        submission_date TEXT NOT NULL,
+        status TEXT NOT NULL,
+        notes TEXT,
+        encoding TEXT
+    )
+    ''')
+    cursor.execute("CREATE INDEX idx_track_history_track ON track_history (track_id, id)")
+
+
+def _synthetic_histories(staff_count, years, cycles_per_year, edits_per_cycle, seed):
+    """(track_id, staff_name, [track_data versions]) per staff member per cycle"""
+    from modules.cycle_calendar import DAY_KEYS
+
+    rng = random.Random(seed)
+    track_id = 0
+    for cycle in range(years * cycles_per_year):
+        for staff_index in range(staff_count):
+            track_id += 1
+            track = {day: rng.choice(['', '', 'D', 'N']) for day in DAY_KEYS}
+            versions = [dict(track)]
+            for _ in range(rng.randint(1, edits_per_cycle)):
+                for day in rng.sample(DAY_KEYS, rng.randint(1, 2)):
+                    track[day] = rng.choice(['', 'D', 'N', 'AT'])
+                versions.append(dict(track))
+            yield track_id, f"Staff {staff_index:03d}", versions
+
+
+def benchmark_track_history(staff_count=80, years=5, cycles_per_year=2, edits_per_cycle=12,
+                            keyframe_interval=KEYFRAME_INTERVAL, seed=7):
+    """
+    Compare legacy full-JSON history with keyframe/delta encoding on synthetic data
+
+    Returns:
+        dict: row count, bytes and timings for both formats
+    """
+    histories = list(_synthetic_histories(staff_count, years, cycles_per_year, edits_per_cycle, seed))
+    results = {'rows': sum(len(versions) for _, _, versions in histories)}
+
+    for label, delta_encoded in (('legacy', False), ('delta', True)):
+        conn = sqlite3.connect(':memory:')
+        cursor = conn.cursor()
+        _create_benchmark_schema(cursor)
+
+        start = time.perf_counter()
+        for track_id, staff_name, versions in histories:
+            for version in versions:
+                if delta_encoded:
+                    append_track_history(cursor, track_id, staff_name, version, '2026-01-01 00:00:00',
+                                         'updated', keyframe_interval=keyframe_interval)
+                else:
+                    cursor.execute(
+                        "INSERT INTO track_history (track_id, staff_name, track_data, submission_date, status) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (track_id, staff_name, json.dumps(version), '2026-01-01 00:00:00', 'updated')
+                    )
+        conn.commit()
+        write_seconds = time.perf_counter() - start
+
+        cursor.execute("SELECT COALESCE(SUM(LENGTH(track_data)), 0) FROM track_history")
+        payload_bytes = cursor.fetchone()[0]
+
+        # Read everything newest-first per staff member, the way the history export does
+        start = time.perf_counter()
+        reader = TrackHistoryReader(cursor)
+        decoded = {}
+        for row in cursor.execute(
+                "SELECT id, track_id, encoding, track_data FROM track_history ORDER BY staff_name, id DESC").fetchall():
+            decoded[row[0]] = reader.decode(*row)
+        read_seconds = time.perf_counter() - start
+
+        conn.close()
+        results[label] = {
+            'payload_bytes': payload_bytes,
+            'write_seconds': write_seconds,
+            'read_seconds': read_seconds,
+        }
+        results[f'{label}_decoded'] = decoded
+
+    results['identical'] = results.pop('legacy_decoded') == results.pop('delta_decoded')
+    return results
+
+
+if __name__ == '__main__':
+    import sys
+
+    if '--benchmark' in sys.argv[1:]:
+        report = benchmark_track_history()
+        print(f"{report['rows']} history rows (80 staff, 5 years, 2 cycles/year), "
+              f"keyframe every {KEYFRAME_INTERVAL} rows")
+        for label in ('legacy', 'delta'):
+            r = report[label]
+            print(f"{label:7} {r['payload_bytes'] / 1024:10.1f} KiB  write {r['write_seconds'] * 1000:8.1f} ms  "
+                  f"read {r['read_seconds'] * 1000:8.1f} ms")
+        print(f"size ratio {report['delta']['payload_bytes'] / report['legacy']['payload_bytes']:.3f}, "
+              f"reconstruction identical: {report['identical']}")
+    elif '--migrate' in sys.argv[1:]:
+        conn = sqlite3.connect(DB_PATH)
+        stats = migrate_track_history(conn.cursor())
+        conn.commit()
+        conn.close()
+        print(f"Re-encoded {stats['rows']} rows across {stats['tracks']} tracks: "
+              f"{stats['bytes_before']} -> {stats['bytes_after']} bytes")
+    else:
+        print("usage: python -m modules.track_history_store [--migrate | --benchmark]")
@@ -767,6 +767,13 @@ def modify_track_enhanced_without_validation(
         from .preassignment import display_preassignments
         display_preassignments(selected_staff, preassignments)
 
+    # Valid tracks built from the current capacity, as starting points
+    from .editor import display_track_suggestions
+    display_track_suggestions(
+        selected_staff, days, options_by_day, assignment_details, shifts_per_pay_period,
+        night_minimum, weekend_minimum, preassignments, weekend_group
+    )
+    
     # Display track modification interface WITH enhanced hypothetical scheduler display
     from .editor import display_track_modification_interface_enhanced
     display_track_modification_interface_enhanced(
@@ -8,10 +8,12 @@ import streamlit.components.v1 as components
 import pandas as pd
 from modules.enhanced_track_validator import validate_track_comprehensive
 from modules.enhanced_validation_display import display_comprehensive_validation, create_validation_summary_card, get_weekend_group_highlighting_info
+from modules.weekend_group_validator import get_schedule_day_bits
 from modules.track_modification_core import calculate_all_modification_options
 from modules.db_utils import get_track_from_db
 from modules.track_management.utils import reset_track_session_state
 from modules.track_management.preassignment import display_preassignments
+from modules.track_suggestions import suggest_tracks, suggestion_scores_from_options
 
 def modify_track_enhanced(
     selected_staff,
@@ -204,6 +206,12 @@ def modify_track_enhanced(
     st.session_state.modified_track['valid'] = is_valid
     st.session_state.track_valid = is_valid
     
+    # Valid tracks built from the current capacity, as starting points
+    display_track_suggestions(
+        selected_staff, days, options_by_day, assignment_details, shifts_per_pay_period,
+        night_minimum, weekend_minimum, preassignments, weekend_group
+    )
+    
     # Display track modification interface WITH enhanced hypothetical scheduler display
     display_track_modification_interface_enhanced(
         selected_staff, options_by_day, reference_track, days, 
@@ -230,6 +238,77 @@ def modify_track_enhanced(
         else:
             st.error("Your track does not meet all requirements. Please review the issues above and make adjustments.")
 
+def display_track_suggestions(selected_staff, days, options_by_day, assignment_details,
+                              shifts_per_pay_period, night_minimum, weekend_minimum,
+                              preassignments, weekend_group):
+    """
+    Suggested valid tracks for the staff member, each of which can be applied
+    to the editor as a starting point
+    """
+    if 'track_suggestions' not in st.session_state:
+        st.session_state.track_suggestions = {}
+    result = st.session_state.track_suggestions.get(selected_staff)
+    
+    with st.expander("✨ Suggested Tracks", expanded=result is not None):
+        st.caption(
+            "Builds complete tracks that pass every validation rule, using only shifts where your role "
+            "is still needed (or that are already on your track). Tracks that earn hypothetical bases "
+            "you rank highly, and that keep your current selections, come first."
+        )
+        
+        if st.button("Suggest Valid Tracks", key=f"suggest_tracks_{selected_staff}".replace(" ", "_")):
+            current_track = build_validation_track(selected_staff, days, preassignments)
+            shift_scores = suggestion_scores_from_options(options_by_day, assignment_details, days, current_track)
+            with st.spinner("Searching for valid tracks..."):
+                result = suggest_tracks(
+                    days, shift_scores, shifts_per_pay_period, night_minimum, weekend_minimum,
+                    preassignments=preassignments, weekend_group=weekend_group
+                )
+            st.session_state.track_suggestions[selected_staff] = result
+        
+        if result is None:
+            return
+        suggestions = result['suggestions']
+        if not suggestions:
+            st.warning(result['message'])
+            return
+        
+        search_note = "" if result['complete'] else " (best found within the time limit)"
+        st.caption(f"{len(suggestions)} suggestion(s) in {result['elapsed_ms']:.0f} ms{search_note}")
+        
+        current_track = build_validation_track(selected_staff, days, preassignments)
+        rows = []
+        for number, suggestion in enumerate(suggestions, start=1):
+            track = suggestion['track']
+            row = {
+                'Suggestion': f"#{number}",
+                'Score': suggestion['score'],
+                'Nights': suggestion['nights'],
+                'Weekend Shifts': suggestion['weekend_shifts'],
+                'Changes': sum(1 for day in days if track.get(day, "") != current_track.get(day, "")),
+            }
+            row.update({day: track.get(day, "") for day in days})
+            rows.append(row)
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        
+        apply_cols = st.columns(len(suggestions))
+        for number, (col, suggestion) in enumerate(zip(apply_cols, suggestions), start=1):
+            with col:
+                if st.button(f"Apply #{number}", key=f"apply_suggestion_{selected_staff}_{number}".replace(" ", "_")):
+                    _apply_suggested_track(selected_staff, days, suggestion['track'])
+                    st.rerun()
+
+
+def _apply_suggested_track(selected_staff, days, track):
+    """Load a suggested track into the editor, resetting the day selectors to match it"""
+    st.session_state.track_changes[selected_staff] = dict(track)
+    st.session_state.modified_track['track'] = dict(track)
+    st.session_state.modified_track['valid'] = False
+    
+    # Radios keep their own state; dropping it lets them pick up the new track
+    for day in days:
+        st.session_state.pop(f"select_{selected_staff}_{day}".replace(" ", "_").replace("/", "_"), None)
+
 def _need_indicator_style(rank, is_week_best=False):
     """
     Green background for a Day/Night Need indicator card, shaded in two tiers:
@@ -347,9 +426,11 @@ def display_track_modification_interface_enhanced(selected_staff, options_by_day
     UPDATED: Display the track modification interface with enhanced hypothetical scheduler display and fixed weekend group highlighting
     """
     
-    # Get weekend group highlighting information with FIXED mapping
-    weekend_highlight_info = get_weekend_group_highlighting_info_fixed(weekend_group, days)
+    # Get weekend group highlighting information (group day mask tested per schedule day)
+    weekend_highlight_info = get_weekend_group_highlighting_info(weekend_group, days)
     weekend_highlight_days = weekend_highlight_info.get('highlight_days', [])
+    weekend_highlight_mask = weekend_highlight_info.get('highlight_mask', 0)
+    schedule_day_bits = get_schedule_day_bits(days)
     
     # Color legend - UPDATED to include weekend group highlighting  
     legend_items = [
@@ -515,7 +596,7 @@ def display_track_modification_interface_enhanced(selected_staff, options_by_day
                 for idx, day in enumerate(week_days):
                     with radio_cols[idx + 1]:
                         is_preassigned = preassignments and day in preassignments
-                        is_weekend_group_day = day in weekend_highlight_days
+                        is_weekend_group_day = bool(schedule_day_bits.get(day, 0) & weekend_highlight_mask)
 
                         # Compact label for the radio widget only (e.g. "Sun A1" instead of
                         # "Sun A 1") so it never wraps to a second line.
@@ -931,123 +1012,6 @@ def display_track_modification_interface_enhanced(selected_staff, options_by_day
             with overview_placeholder.container():
                 _render_six_week_overview(selected_staff, days, reference_track, preassignments)
 
-def get_weekend_group_highlighting_info_fixed(weekend_group, days):
-    """
-    FIXED: Get information about which days should be highlighted for weekend group requirements
-    This version properly handles Block A highlighting
-    """
-    if not weekend_group:
-        return {'highlight_days': [], 'weekend_group': None}
-    
-    try:
-        # Use fixed function to avoid import issues
-        highlight_days = get_weekend_days_for_highlighting_fixed(weekend_group, days)
-        
-        return {
-            'highlight_days': highlight_days,
-            'weekend_group': weekend_group,
-            'highlight_color': '#fff3cd',  # Light yellow
-            'highlight_info': f"Weekend Group {weekend_group} required days"
-        }
-    except Exception as e:
-        return {'highlight_days': [], 'weekend_group': weekend_group, 'error': str(e)}
-
-def get_weekend_days_for_highlighting_fixed(weekend_group, days):
-    """
-    FIXED: Get weekend days that should be highlighted for a specific weekend group
-    This version properly handles all blocks including Block A
-    """
-    if not weekend_group:
-        return []
-    
-    # Weekend group definitions
-    WEEKEND_GROUPS = {
-        'A': {
-            'periods': [
-                ['Fri C 6', 'Sat C 6', 'Sun A 1'],  # Period 1
-                ['Fri A 2', 'Sat A 2', 'Sun B 3'],  # Period 2
-                ['Fri B 4', 'Sat B 4', 'Sun C 5']   # Period 3
-            ]
-        },
-        'B': {
-            'periods': [
-                ['Fri A 1', 'Sat A 1', 'Sun A 2'],  # Period 1
-                ['Fri B 3', 'Sat B 3', 'Sun B 4'],  # Period 2
-                ['Fri C 5', 'Sat C 5', 'Sun C 6']   # Period 3
-            ]
-        },
-        'C': {
-            'periods': [
-                ['Fri C 6', 'Sat C 6', 'Sun A 1'],  # Period 1
-                ['Fri B 3', 'Sat B 3', 'Sun B 4']   # Period 2
-            ]
-        },
-        'D': {
-            'periods': [
-                ['Fri A 1', 'Sat A 1', 'Sun A 2'],  # Period 1
-                ['Fri B 4', 'Sat B 4', 'Sun C 5']   # Period 2
-            ]
-        },
-        'E': {
-            'periods': [
-                ['Fri A 2', 'Sat A 2', 'Sun B 3'],  # Period 1
-                ['Fri C 5', 'Sat C 5', 'Sun C 6']   # Period 2
-            ]
-        }
-    }
-    
-    if weekend_group not in WEEKEND_GROUPS:
-        return []
-    
-    # Get all weekend days for the group
-    all_weekend_days = []
-    for period in WEEKEND_GROUPS[weekend_group]['periods']:
-        all_weekend_days.extend(period)
-    
-    # Map to actual schedule days with FIXED mapping logic
-    highlight_days = []
-    for weekend_day in all_weekend_days:
-        schedule_day = map_weekend_day_to_schedule_day_fixed(weekend_day, days)
-        if schedule_day:
-            highlight_days.append(schedule_day)
-    
-    return highlight_days
-
-def map_weekend_day_to_schedule_day_fixed(weekend_day, days):
-    """
-    FIXED: Map a weekend group day (e.g., 'Fri A 1') to actual schedule day
-    This version properly handles Block A and all other blocks consistently
-    """
-    # Parse the weekend day format
-    parts = weekend_day.split()
-    if len(parts) != 3:
-        return None
-    
-    day_name, block, week = parts
-    
-    # Find matching day in schedule with improved logic
-    for schedule_day in days:
-        schedule_parts = schedule_day.split()
-        if len(schedule_parts) >= 3:  # Ensure we have day, block, and week
-            schedule_day_name = schedule_parts[0]
-            schedule_block = schedule_parts[1]
-            schedule_week = schedule_parts[2]
-            
-            # Check if day names match (Fri, Sat, Sun)
-            if schedule_day_name == day_name:
-                # Check exact match first
-                if schedule_block == block and schedule_week == week:
-                    return schedule_day
-        
-        # Fallback: check if the schedule day contains both block and week
-        # This handles different formatting conventions
-        if day_name in schedule_day and block in schedule_day and week in schedule_day:
-            # Make sure it's the right day of week
-            if schedule_day.startswith(day_name):
-                return schedule_day
-    
-    return None
-
 def build_validation_track(selected_staff, days, preassignments=None):
     """Build complete track for validation"""
     # Initialize validation_track with empty values for all days
@@ -13,6 +13,10 @@ _eastern_tz = pytz.timezone('America/New_York')
 from ..track_validator import validate_track
 from ..shift_counter import count_shifts, count_shifts_by_pay_period, count_weekend_shifts_updated
 from ..db_utils import save_track_to_db, get_track_from_db
+from ..staffing_counts import staffing_state_for_ids, apply_staffing_change
+from ..track_history_store import append_track_history
+from ..track_codes import encode_track_data
+from ..query_profiler import open_connection
 from ..pdf_generator import generate_schedule_pdf
 from ..backup_utils import handle_track_submission
 from ..email_notifications import send_track_submission_notification
@@ -317,7 +321,6 @@ def save_track_to_db_enhanced(staff_name, enhanced_track_data, is_new=False):
     try:
         from ..db_utils import initialize_database
         import sqlite3
-        import json
         import os
         from datetime import datetime
         
@@ -328,7 +331,7 @@ def save_track_to_db_enhanced(staff_name, enhanced_track_data, is_new=False):
         os.makedirs('data', exist_ok=True)
         
         # Get database connection
-        conn = sqlite3.connect('data/medflight_tracks.db')
+        conn = open_connection('data/medflight_tracks.db')
         cursor = conn.cursor()
         
         # Check if tracks table needs new columns for metadata
@@ -388,8 +391,8 @@ def save_track_to_db_enhanced(staff_name, enhanced_track_data, is_new=False):
         metadata['original_role'] = original_role
         metadata['effective_role'] = effective_role
         
-        # Convert track data to JSON string
-        track_json = json.dumps(track_data)
+        # Encode track data for storage (code bytes, or JSON if it doesn't fit the day schema)
+        track_json = encode_track_data(track_data)
         
         # Get current date and time
         submission_date = datetime.now(_eastern_tz).strftime("%Y-%m-%d %H:%M:%S")
@@ -400,6 +403,7 @@ def save_track_to_db_enhanced(staff_name, enhanced_track_data, is_new=False):
             (staff_name,)
         )
         existing_track = cursor.fetchone()
+        staffing_before = staffing_state_for_ids(cursor, [existing_track[0] if existing_track else None])
         
         if existing_track and not is_new:
             # Update existing track with enhanced metadata
@@ -408,10 +412,7 @@ def save_track_to_db_enhanced(staff_name, enhanced_track_data, is_new=False):
             new_version = current_version + 1
             
             # First, add entry to track_history
-            cursor.execute(
-                "INSERT INTO track_history (track_id, staff_name, track_data, submission_date, status) VALUES (?, ?, ?, ?, ?)",
-                (track_id, staff_name, track_json, submission_date, "updated")
-            )
+            append_track_history(cursor, track_id, staff_name, track_data, submission_date, "updated")
             
             # Then update the main tracks table with new version number and metadata
             cursor.execute("""
@@ -440,6 +441,7 @@ def save_track_to_db_enhanced(staff_name, enhanced_track_data, is_new=False):
                 track_id
             ))
             
+            apply_staffing_change(cursor, staffing_before, staffing_state_for_ids(cursor, [track_id]))
             conn.commit()
             print(f"SUCCESS: Track updated for {staff_name} (version {new_version}, role: {effective_role})")
             return True, f"Track successfully updated for {staff_name} (version {new_version})", track_id
@@ -472,11 +474,10 @@ def save_track_to_db_enhanced(staff_name, enhanced_track_data, is_new=False):
             track_id = cursor.lastrowid
             
             # Add initial entry to track_history
-            cursor.execute(
-                "INSERT INTO track_history (track_id, staff_name, track_data, submission_date, status) VALUES (?, ?, ?, ?, ?)",
-                (track_id, staff_name, track_json, submission_date, "created")
-            )
+            append_track_history(cursor, track_id, staff_name, track_data, submission_date, "created")
             
+            apply_staffing_change(cursor, staffing_before,
+                                  staffing_state_for_ids(cursor, [existing_track[0] if existing_track else None, track_id]))
             conn.commit()
             print(f"SUCCESS: New track created for {staff_name} (role: {effective_role})")
             return True, f"New track successfully saved for {staff_name}", track_id
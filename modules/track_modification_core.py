@@ -4,6 +4,7 @@ Module for track modification staffing needs calculation core logic
 FIXED: Now derives all staffing information from hypothetical scheduler instead of recalculating
 """
 import pandas as pd
+import numpy as np
 import streamlit as st
 import sqlite3
 import os
@@ -15,10 +16,75 @@ from modules.staff_utils import is_special_conflict
 # Import the hypothetical scheduler
 from modules.hypothetical_scheduler_new import generate_hypothetical_schedule_new as generate_hypothetical_schedule
 
+# (staff column, file frame fingerprint, override table versions) -> merged frame
+_updated_preferences_cache = {}
+
+
+def _preferences_fingerprint(preferences_df, staff_col_prefs):
+    """Content hash of the file preferences; None if the frame can't be hashed"""
+    try:
+        row_hashes = pd.util.hash_pandas_object(preferences_df, index=True).to_numpy()
+    except (TypeError, ValueError):
+        return None
+    return (staff_col_prefs, preferences_df.shape, tuple(preferences_df.columns),
+            tuple(str(dtype) for dtype in preferences_df.dtypes), int(row_hashes.sum()),
+            int((row_hashes * np.arange(1, len(row_hashes) + 1, dtype=np.uint64)).sum()))
+
+
+def apply_preference_overrides(preferences_df, staff_col_prefs, overrides):
+    """
+    Merge database preference overrides into the file preferences, column by column
+
+    Args:
+        preferences_df (DataFrame): Original preferences DataFrame from file
+        staff_col_prefs (str): Column name for staff in preferences
+        overrides (DataFrame): get_all_preference_overrides() frame indexed by staff name
+
+    Returns:
+        DataFrame: Copy of preferences_df with every non-null override that fits its
+            column's dtype applied (values are coerced the way the file column stores them)
+    """
+    updated_preferences_df = preferences_df.copy()
+    if overrides.empty:
+        return updated_preferences_df
+
+    staff = updated_preferences_df[staff_col_prefs]
+    positions = np.flatnonzero(staff.isin(overrides.index).to_numpy())
+    if len(positions) == 0:
+        return updated_preferences_df
+    # One override row per file row, in file order (duplicate staff rows share it)
+    aligned = overrides.reindex(staff.iloc[positions])
+
+    for shift_name in overrides.columns.intersection(updated_preferences_df.columns):
+        values = aligned[shift_name]
+        col_dtype = updated_preferences_df[shift_name].dtype
+        # Boolean preferences (e.g. 'Reduced Rest OK') are stored as TEXT in
+        # SQLite ('1'), while the Excel column is int64 - coerce numeric columns
+        # and skip values that don't convert
+        if pd.api.types.is_integer_dtype(col_dtype) or pd.api.types.is_float_dtype(col_dtype):
+            numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+            valid = np.isfinite(numeric)
+            if pd.api.types.is_integer_dtype(col_dtype):
+                numeric = np.trunc(numeric)
+            new_values = numeric[valid].astype(col_dtype)
+        else:
+            valid = values.notna().to_numpy()
+            new_values = values.to_numpy()[valid]
+        if valid.any():
+            column_position = updated_preferences_df.columns.get_loc(shift_name)
+            updated_preferences_df.iloc[positions[valid], column_position] = new_values
+
+    return updated_preferences_df
+
+
 def get_all_staff_updated_preferences(preferences_df, staff_col_prefs):
     """
     Get updated preferences for ALL staff members from database where available
     This ensures the competition simulation uses everyone's most recent preferences
+
+    All database preferences are read in two queries (get_all_preference_overrides)
+    and merged column-wise; the merged frame is reused until the file frame or
+    either preference table changes.
     
     Args:
         preferences_df (DataFrame): Original preferences DataFrame from file
@@ -27,37 +93,25 @@ def get_all_staff_updated_preferences(preferences_df, staff_col_prefs):
     Returns:
         DataFrame: Updated preferences DataFrame with database preferences where available
     """
-    from modules.preference_editor import get_current_preferences
-    
-    # Create a copy of the preferences DataFrame
-    updated_preferences_df = preferences_df.copy()
-    
-    # Update preferences for ALL staff members who have database entries
-    for idx, row in preferences_df.iterrows():
-        staff_name = row[staff_col_prefs]
-        
-        # Get current preferences for this staff member
-        enhanced_preferences, preference_source = get_current_preferences(staff_name)
-        
-        if enhanced_preferences and preference_source == 'database':
-            # Update this staff member's preferences
-            for shift_name, preference_score in enhanced_preferences.items():
-                if shift_name in updated_preferences_df.columns:
-                    # Coerce value to match the column dtype before assignment.
-                    # Boolean preferences (e.g. 'Reduced Rest OK') are stored as
-                    # TEXT in SQLite, so preference_score arrives as a string like
-                    # '1', while the Excel column is int64.  Pandas 2.2+ rejects
-                    # that mismatch with "Invalid value '1' for dtype 'int64'".
-                    try:
-                        col_dtype = updated_preferences_df[shift_name].dtype
-                        if pd.api.types.is_integer_dtype(col_dtype):
-                            preference_score = int(float(preference_score))
-                        elif pd.api.types.is_float_dtype(col_dtype):
-                            preference_score = float(preference_score)
-                    except (ValueError, TypeError):
-                        continue
-                    updated_preferences_df.at[idx, shift_name] = preference_score
-    
+    from modules.preference_editor import get_all_preference_overrides
+    from modules.query_cache import get_table_versions
+
+    versions = get_table_versions('user_preferences', 'user_boolean_preferences')
+    fingerprint = _preferences_fingerprint(preferences_df, staff_col_prefs) if versions is not None else None
+    cached = _updated_preferences_cache.get(fingerprint) if fingerprint is not None else None
+    if cached is not None and cached[0] == versions:
+        return cached[1].copy()
+
+    success, overrides = get_all_preference_overrides()
+    if not success:
+        # Nothing to merge - simulate with the file preferences
+        return preferences_df.copy()
+
+    updated_preferences_df = apply_preference_overrides(preferences_df, staff_col_prefs, overrides)
+    if fingerprint is not None:
+        # Only the latest file frame is kept
+        _updated_preferences_cache.clear()
+        _updated_preferences_cache[fingerprint] = (versions, updated_preferences_df.copy())
     return updated_preferences_df
 
 def enhance_hypothetical_scheduler_with_staffing_analysis(
@@ -100,43 +154,62 @@ def enhance_hypothetical_scheduler_with_staffing_analysis(
     # or (for in-year modifications) the currently active track. Day-of-week
     # overrides (if enabled for this track) refine the flat max_day/night
     # nurse/medic caps per weekday; see db_utils.get_track_capacity_by_weekday.
-    from modules.db_utils import get_active_track_config, get_track_capacity_by_weekday
+    from modules.db_utils import get_active_track_config
+    from modules.capacity_engine import get_remaining_slots, get_capacity_array
+    from modules.staffing_counts import day_index_for
     effective_track_name = bid_track_name
     if not effective_track_name:
         active_cfg = get_active_track_config()
         effective_track_name = active_cfg['track_name'] if active_cfg else 'FY26'
-    weekday_caps = get_track_capacity_by_weekday(effective_track_name)
-
-    # Fallback caps, used only if a day's weekday token isn't recognized
-    fallback_caps = {
-        'max_day_nurses': st.session_state.get('max_day_nurses', 10),
-        'max_day_medics': st.session_state.get('max_day_medics', 10),
-        'max_night_nurses': st.session_state.get('max_night_nurses', 6),
-        'max_night_medics': st.session_state.get('max_night_medics', 5),
-    }
+
+    # Caps (cached per config version) minus live counts for all 42 days at once;
+    # Excel-sourced counts still go through calculate_shift_staffing_analysis
+    if use_database_logic:
+        remaining_slots = get_remaining_slots(
+            effective_track_name, bid_track_name,
+            updated_preferences_df, staff_col_prefs, role_col
+        )
+        capacity = remaining_slots.caps
+    else:
+        remaining_slots = None
+        capacity = get_capacity_array(effective_track_name)
+
+    # Fallback caps, used only if a day isn't one of the 42 pattern days
+    fallback_caps = (
+        (st.session_state.get('max_day_nurses', 10), st.session_state.get('max_day_medics', 10)),
+        (st.session_state.get('max_night_nurses', 6), st.session_state.get('max_night_medics', 5)),
+    )
 
     # Enhance assignment_details with comprehensive staffing analysis
     enhanced_assignment_details = {}
 
     for day in days:
         day_data = base_results['assignment_details'].get(day, {})
-        caps = weekday_caps.get(day.split()[0], fallback_caps)
-
-        # Calculate staffing for day shift
-        day_staffing = calculate_shift_staffing_analysis(
-            day, "D", "day", updated_preferences_df, current_tracks_df,
-            staff_col_prefs, staff_col_tracks, role_col,
-            caps['max_day_nurses'], caps['max_day_medics'], use_database_logic,
-            bid_track_name=bid_track_name
-        )
-
-        # Calculate staffing for night shift
-        night_staffing = calculate_shift_staffing_analysis(
-            day, "N", "night", updated_preferences_df, current_tracks_df,
-            staff_col_prefs, staff_col_tracks, role_col,
-            caps['max_night_nurses'], caps['max_night_medics'], use_database_logic,
-            bid_track_name=bid_track_name
-        )
+        day_index = day_index_for(day)
+
+        if remaining_slots is not None and day_index is not None:
+            day_staffing = remaining_slots.staffing_analysis(day_index, "D")
+            night_staffing = remaining_slots.staffing_analysis(day_index, "N")
+        else:
+            (max_dn, max_dm), (max_nn, max_nm) = (
+                capacity[day_index].tolist() if day_index is not None else fallback_caps
+            )
+
+            # Calculate staffing for day shift
+            day_staffing = calculate_shift_staffing_analysis(
+                day, "D", "day", updated_preferences_df, current_tracks_df,
+                staff_col_prefs, staff_col_tracks, role_col,
+                max_dn, max_dm, use_database_logic,
+                bid_track_name=bid_track_name
+            )
+
+            # Calculate staffing for night shift
+            night_staffing = calculate_shift_staffing_analysis(
+                day, "N", "night", updated_preferences_df, current_tracks_df,
+                staff_col_prefs, staff_col_tracks, role_col,
+                max_nn, max_nm, use_database_logic,
+                bid_track_name=bid_track_name
+            )
         
         # Rest of the function remains the same...
         # Get preference scores from base results with enhanced preference information
@@ -194,7 +267,7 @@ def calculate_shift_staffing_analysis(
     day, shift_code, shift_type, preferences_df, current_tracks_df,
     staff_col_prefs, staff_col_tracks, role_col,
     max_nurses, max_medics, use_database_logic,
-    bid_track_name=None
+    bid_track_name=None, staffing_counts=None
 ):
     """
     Calculate comprehensive staffing analysis for a specific shift
@@ -202,32 +275,33 @@ def calculate_shift_staffing_analysis(
 
     bid_track_name: if set, count occupancy against submitted bids for this
         cycle instead of the active roster (see get_staff_on_shift_from_database).
+    staffing_counts: result of db_utils.get_day_staffing_counts() to reuse across
+        calls; database counts come from the materialized day_staffing_counts table.
 
     Returns:
         dict: Complete staffing analysis including counts, needs, etc.
     """
-    from modules.hypothetical_scheduler_new import get_staff_on_shift_from_database, get_staff_on_shift_from_excel, get_staff_role_for_counting
-
-    # Get current staff on shift using the same logic as hypothetical scheduler
     if use_database_logic:
-        staff_on_shift = get_staff_on_shift_from_database(
+        from modules.db_utils import get_shift_role_counts
+        nurses, medics = get_shift_role_counts(
             day, shift_code, preferences_df, staff_col_prefs, role_col,
-            bid_track_name=bid_track_name
+            bid_track_name=bid_track_name, staffing_counts=staffing_counts
         )
     else:
+        from modules.hypothetical_scheduler_new import get_staff_on_shift_from_excel, get_staff_role_for_counting
         staff_on_shift = get_staff_on_shift_from_excel(day, shift_code, current_tracks_df, staff_col_tracks)
-    
-    # Count staff by role using the same logic as hypothetical scheduler
-    nurses = 0
-    medics = 0
-    
-    for staff in staff_on_shift:
-        if staff in preferences_df[staff_col_prefs].values:
-            effective_role = get_staff_role_for_counting(staff, preferences_df, staff_col_prefs, role_col)
-            if effective_role == "nurse":
-                nurses += 1
-            elif effective_role == "medic":
-                medics += 1
+        
+        # Count staff by role using the same logic as hypothetical scheduler
+        nurses = 0
+        medics = 0
+        
+        for staff in staff_on_shift:
+            if staff in preferences_df[staff_col_prefs].values:
+                effective_role = get_staff_role_for_counting(staff, preferences_df, staff_col_prefs, role_col)
+                if effective_role == "nurse":
+                    nurses += 1
+                elif effective_role == "medic":
+                    medics += 1
     
     # Calculate needs
     nurse_needs = max_nurses - nurses
@@ -241,8 +315,7 @@ def calculate_shift_staffing_analysis(
         'nurse_needs': nurse_needs,
         'medic_needs': medic_needs,
         'nurses_needed': nurse_needs > 0,
-        'medics_needed': medic_needs > 0,
-        'staff_on_shift': staff_on_shift
+        'medics_needed': medic_needs > 0
     }
 
 def analyze_track_modification_needs_from_scheduler(
@@ -477,8 +550,13 @@ def validate_preference_usage(selected_staff, preferences_df, staff_col_prefs):
 # Legacy functions kept for compatibility but marked as deprecated
 def get_database_track_counts(day, shift_type, role):
     """DEPRECATED: Use staffing_analysis from enhanced scheduler instead"""
-    # Implementation kept for backward compatibility but should not be used
-    pass
+    # Kept for backward compatibility - a single lookup in day_staffing_counts
+    from modules.db_utils import get_day_staffing_counts
+    from modules.staffing_counts import day_index_for
+    role_counts = get_day_staffing_counts().get((day_index_for(day), shift_type), {})
+    if role == "nurse":
+        return role_counts.get("nurse", 0) + role_counts.get("dual", 0)
+    return role_counts.get(role, 0)
 
 def get_excel_track_counts(day, shift_type, current_tracks_df, staff_col_tracks, 
                           preferences_df, staff_col_prefs, role_col):
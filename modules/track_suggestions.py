@@ -0,0 +1,400 @@
+# modules/track_suggestions.py
+"""
+Automatic track suggestions: the top-K 42-day tracks that pass
+validate_track_comprehensive() for one staff member, found by backtracking
+over the days with pruning instead of by trial and error in the editor.
+
+The search fills in one code per schedule position and, next to the codes
+chosen so far, keeps counters: worked days in the current pay period and
+week, the current run of worked days (and whether it holds an N), nights,
+weekend shifts, and weekend shifts in each weekend-group period (the
+group's 42-bit period masks mapped onto positions). The validator's rules
+become incremental checks on those counters and the previous two codes:
+
+- exactly `shifts_per_pay_period` worked days (D/N/AT) per 14-day pay period
+- fewer than 4 worked days per 7-day week
+- at least `night_minimum` N and `weekend_minimum` weekend shifts
+  (Fri N, Sat/Sun D/N/AT)
+- no D or AT the day after an N, and no D two days after an N unless a D/AT
+  sits between them
+- at most 4 consecutive worked days, 5 if one of them is an N
+- at least 2 weekend shifts (Fri N, Sat/Sun D/N) in every period of the
+  staff member's weekend group
+
+Preassigned days are fixed the way create_combined_track() fills them in,
+and D/N are only offered on days the caller allows (remaining capacity, or
+what the track already has). Every branch is bounded by the best score its
+remaining pay periods could still reach, so only tracks that could make the
+top K are explored, and the bound found for a search state is kept so the
+same state reached along another path isn't searched again.
+"""
+
+import heapq
+import time
+
+from modules.enhanced_track_validator import create_combined_track
+from modules.instrumentation import instrumented
+from modules.weekend_group_validator import (
+    WEEKEND_PERIOD_MASKS, get_schedule_day_bits, normalize_weekend_group
+)
+
+PAY_PERIOD_DAYS = 14
+WEEK_DAYS = 7
+MAX_SHIFTS_PER_WEEK = 3
+MAX_CONSECUTIVE = 4
+MAX_CONSECUTIVE_WITH_NIGHT = 5
+WEEKEND_PERIOD_MINIMUM = 2
+
+# Search limits: suggestions are best-so-far once either is hit
+DEFAULT_MAX_NODES = 250000
+DEFAULT_TIME_LIMIT = 0.5
+
+# Score weights used by suggestion_scores_from_options()
+BASE_ASSIGNED_SCORE = 10
+NO_BASE_SCORE = 1
+KEEP_CURRENT_SCORE = 3
+
+_OFF, _DAY, _NIGHT, _AT = "", "D", "N", "AT"
+_WORK = (_DAY, _NIGHT, _AT)
+_NEG_INF = float('-inf')
+
+
+def suggestion_scores_from_options(options_by_day, assignment_details, days, current_track=None):
+    """
+    Allowed shifts and per-shift scores for the search, from the editor's inputs
+
+    A shift is allowed where calculate_all_modification_options() says the
+    staff member's role is still needed, or where the track already has it
+    (the editor keeps those selectable too). It scores BASE_ASSIGNED_SCORE
+    plus a bonus for the base preference rank when the hypothetical scheduler
+    gives it a base, NO_BASE_SCORE otherwise, and KEEP_CURRENT_SCORE more
+    when it matches the current track, so suggestions stay close to the
+    edits already made.
+
+    Returns:
+        dict: day -> {'D': score, 'N': score} for the allowed shifts only
+    """
+    current_track = current_track or {}
+    scores = {}
+    for day in days:
+        day_options = options_by_day.get(day, {})
+        current = current_track.get(day, "")
+        allowed = {}
+        for code, period, option_key, max_rank in ((_DAY, 'day', 'day_shift', 5), (_NIGHT, 'night', 'night_shift', 3)):
+            if not (day_options.get(option_key, {}).get('is_needed') or current == code):
+                continue
+            details = (assignment_details or {}).get(day, {}).get(period, {})
+            if details.get('assignment'):
+                score = BASE_ASSIGNED_SCORE
+                rank = details.get('preference_score')
+                if isinstance(rank, (int, float)) and rank == rank:
+                    score += max(0, max_rank + 1 - int(rank))
+            else:
+                score = NO_BASE_SCORE
+            if current == code:
+                score += KEEP_CURRENT_SCORE
+            allowed[code] = score
+        scores[day] = allowed
+    return scores
+
+
+def _weekday(day):
+    return day.split()[0] if day.split() else ""
+
+
+class _Problem:
+    """Precomputed masks, bounds and lookups for one search"""
+
+    def __init__(self, days, shift_scores, shifts_per_pay_period, night_minimum,
+                 weekend_minimum, fixed, weekend_group):
+        n = len(days)
+        self.n = n
+        self.days = days
+        self.sppp = shifts_per_pay_period
+        self.night_minimum = night_minimum
+        self.weekend_minimum = weekend_minimum
+        self.fixed = [fixed.get(day) for day in days]
+
+        weekdays = [_weekday(day) for day in days]
+        self.is_friday = [wd == "Fri" for wd in weekdays]
+        self.is_sat_sun = [wd in ("Sat", "Sun") for wd in weekdays]
+
+        # Choices per position, best score first (Off scores 0)
+        self.choices = []
+        self.best_free = []
+        for i, day in enumerate(days):
+            if self.fixed[i] is not None:
+                self.choices.append(((self.fixed[i], 0),))
+                self.best_free.append(None)
+                continue
+            allowed = shift_scores.get(day, {})
+            options = [(code, allowed[code]) for code in (_DAY, _NIGHT) if code in allowed]
+            options.append((_OFF, 0))
+            options.sort(key=lambda option: -option[1])
+            self.choices.append(tuple(options))
+            work_scores = [score for code, score in options if code != _OFF]
+            self.best_free.append(max(work_scores) if work_scores else None)
+
+        # Weekend group periods as lists of positions
+        self.periods = []
+        if weekend_group:
+            bits = get_schedule_day_bits(days)
+            position_of_bit = {}
+            for i, day in enumerate(days):
+                mask = bits.get(day, 0)
+                while mask:
+                    low = mask & -mask
+                    position_of_bit.setdefault(low.bit_length() - 1, i)
+                    mask ^= low
+            for period_mask in WEEKEND_PERIOD_MASKS[weekend_group]:
+                positions = []
+                mask = period_mask
+                while mask:
+                    low = mask & -mask
+                    pattern_index = low.bit_length() - 1
+                    if pattern_index in position_of_bit:
+                        positions.append(position_of_bit[pattern_index])
+                    mask ^= low
+                self.periods.append(sorted(positions))
+        self.period_of = {}
+        for period_index, positions in enumerate(self.periods):
+            for position in positions:
+                self.period_of.setdefault(position, []).append(period_index)
+        # Group shifts still possible in a period after each of its positions
+        self.period_left = {}
+        for period_index, positions in enumerate(self.periods):
+            for position in positions:
+                self.period_left[(period_index, position)] = sum(
+                    1 for later in positions if later > position and self._group_possible(later)
+                )
+
+        # Suffix counts of positions that could still add a night / weekend shift
+        self.nights_possible = [0] * (n + 1)
+        self.weekend_possible = [0] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            codes = {code for code, _ in self.choices[i]}
+            self.nights_possible[i] = self.nights_possible[i + 1] + (_NIGHT in codes)
+            weekend = (self.is_friday[i] and _NIGHT in codes) or (
+                self.is_sat_sun[i] and bool(codes & set(_WORK)))
+            self.weekend_possible[i] = self.weekend_possible[i + 1] + weekend
+
+        # Pay period bounds: best_top[i][r] is the best total of r more free
+        # worked days among positions i..end of i's pay period
+        self.chunk_end = [min((i // PAY_PERIOD_DAYS + 1) * PAY_PERIOD_DAYS, n) for i in range(n)]
+        self.fixed_work_left = [0] * (n + 1)
+        self.best_top = [None] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            end = self.chunk_end[i]
+            fixed_later = self.fixed_work_left[i + 1] if i + 1 < end else 0
+            self.fixed_work_left[i] = fixed_later + (self.fixed[i] in _WORK)
+            free = sorted((self.best_free[j] for j in range(i, end) if self.best_free[j] is not None), reverse=True)
+            prefix = [0]
+            for score in free:
+                prefix.append(prefix[-1] + score)
+            self.best_top[i] = prefix
+        # Best total of every full pay period from chunk start c onwards
+        self.future_best = {n: 0}
+        for start in sorted(range(0, n, PAY_PERIOD_DAYS), reverse=True):
+            need = self.sppp - self.fixed_work_left[start]
+            prefix = self.best_top[start]
+            later = self.future_best[min(start + PAY_PERIOD_DAYS, n)]
+            if need < 0 or need >= len(prefix) or later == _NEG_INF:
+                self.future_best[start] = _NEG_INF
+            else:
+                self.future_best[start] = prefix[need] + later
+
+    def _group_possible(self, i):
+        codes = {code for code, _ in self.choices[i]}
+        return bool((self.is_friday[i] and _NIGHT in codes)
+                    or (self.is_sat_sun[i] and codes & {_DAY, _NIGHT}))
+
+    def bound(self, i, chunk_count):
+        """Best score still reachable from position i with chunk_count worked days so far this pay period"""
+        if i >= self.n:
+            return 0
+        end = self.chunk_end[i]
+        need = self.sppp - chunk_count - self.fixed_work_left[i]
+        prefix = self.best_top[i]
+        if need < 0 or need >= len(prefix):
+            return _NEG_INF
+        return prefix[need] + self.future_best[end]
+
+
+@instrumented
+def suggest_tracks(days, shift_scores, shifts_per_pay_period, night_minimum=0, weekend_minimum=0,
+                   preassignments=None, weekend_group=None, top_k=5,
+                   max_nodes=DEFAULT_MAX_NODES, time_limit=DEFAULT_TIME_LIMIT):
+    """
+    The top-K valid tracks for one staff member
+
+    Args:
+        days (list): Schedule days in order (pay periods are consecutive 14-day runs)
+        shift_scores (dict): day -> {'D': score, 'N': score} for the shifts allowed
+            that day (see suggestion_scores_from_options())
+        shifts_per_pay_period (int): Required worked days per pay period
+        night_minimum (int): Minimum N shifts
+        weekend_minimum (int): Minimum weekend shifts
+        preassignments (dict, optional): day -> preassignment value (fixed)
+        weekend_group (str, optional): Weekend group (A-E)
+        top_k (int): Number of tracks to return
+        max_nodes (int): Search nodes before returning the best found so far
+        time_limit (float): Seconds before returning the best found so far
+
+    Returns:
+        dict: suggestions (list of {'track', 'score', 'nights', 'weekend_shifts'},
+            best first), complete (True if the search wasn't cut short), nodes,
+            elapsed_ms and message (why there are none, if so)
+    """
+    started = time.perf_counter()
+    result = {'suggestions': [], 'complete': True, 'nodes': 0, 'elapsed_ms': 0.0, 'message': ''}
+
+    # Requirements read from Excel arrive as floats
+    shifts_per_pay_period = int(shifts_per_pay_period or 0)
+    night_minimum = int(night_minimum or 0)
+    weekend_minimum = int(weekend_minimum or 0)
+    if shifts_per_pay_period <= 0:
+        result['message'] = "No pay period requirement on file, so there is no shift count to build a track around."
+        return result
+    if shifts_per_pay_period > 2 * MAX_SHIFTS_PER_WEEK:
+        result['message'] = (f"{shifts_per_pay_period} shifts per pay period can't fit under the "
+                             f"{MAX_SHIFTS_PER_WEEK}-per-week limit.")
+        return result
+    group = normalize_weekend_group(weekend_group) if weekend_group else None
+    if weekend_group and not group:
+        result['message'] = f"Invalid weekend group: {weekend_group}"
+        return result
+
+    # Preassigned days as the validator fills them in
+    combined = create_combined_track({day: "" for day in days}, preassignments)
+    fixed = {day: combined[day] for day in days if combined.get(day)}
+
+    problem = _Problem(list(days), shift_scores, shifts_per_pay_period, night_minimum,
+                       weekend_minimum, fixed, group)
+    n = problem.n
+    if problem.bound(0, 0) == _NEG_INF:
+        result['message'] = ("Not enough available days for the required shifts per pay period "
+                             "with the current capacity and preassignments.")
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    track = [_OFF] * n
+    best = []  # min-heap of (score, sequence, track tuple)
+    state = {'nodes': 0, 'stopped': False, 'sequence': 0}
+    deadline = started + time_limit
+    period_counts = [0] * len(problem.periods)
+    # state -> upper bound on the score still reachable from it (-inf: no valid completion)
+    future_bounds = {}
+
+    def search(i, score, chunk_count, week_count, run_length, run_has_night, nights, weekend_shifts):
+        """Returns an upper bound on the score reachable from this state (-inf if none)"""
+        # Counts restart with each pay period and week
+        if i % PAY_PERIOD_DAYS == 0:
+            chunk_count = 0
+        if i % WEEK_DAYS == 0:
+            week_count = 0
+        if state['stopped']:
+            return problem.bound(i, chunk_count)
+        state['nodes'] += 1
+        if state['nodes'] >= max_nodes or (state['nodes'] & 1023 == 0 and time.perf_counter() > deadline):
+            state['stopped'] = True
+            return problem.bound(i, chunk_count)
+
+        if i == n:
+            if nights < problem.night_minimum or weekend_shifts < problem.weekend_minimum:
+                return _NEG_INF
+            entry = (score, -state['sequence'], tuple(track))
+            state['sequence'] += 1
+            if len(best) < top_k:
+                heapq.heappush(best, entry)
+            elif entry > best[0]:
+                heapq.heapreplace(best, entry)
+            return 0
+
+        if nights + problem.nights_possible[i] < problem.night_minimum:
+            return _NEG_INF
+        if weekend_shifts + problem.weekend_possible[i] < problem.weekend_minimum:
+            return _NEG_INF
+
+        prev1 = track[i - 1] if i >= 1 else _OFF
+        prev2 = track[i - 2] if i >= 2 else _OFF
+        # What can still be reached depends only on this state, not on the
+        # path here, so a bound found once applies wherever the state reappears
+        key = (i, chunk_count, week_count, run_length, run_has_night, prev1 == _NIGHT, prev2 == _NIGHT and prev1 not in (_DAY, _AT),
+               min(nights, problem.night_minimum), min(weekend_shifts, problem.weekend_minimum),
+               tuple(min(count, WEEKEND_PERIOD_MINIMUM) for count in period_counts))
+        future = future_bounds.get(key)
+        if future is None:
+            future = problem.bound(i, chunk_count)
+        # Remaining reachable score can't beat the current K-th best
+        if future == _NEG_INF or (len(best) >= top_k and score + future <= best[0][0]):
+            return future
+
+        reachable = _NEG_INF
+        for code, gain in problem.choices[i]:
+            working = code in _WORK
+            new_chunk = chunk_count + working
+            new_week = week_count + working
+            if new_chunk > problem.sppp or new_week > MAX_SHIFTS_PER_WEEK:
+                continue
+            # Rest after nights
+            if code in (_DAY, _AT) and prev1 == _NIGHT:
+                continue
+            if code == _DAY and prev2 == _NIGHT and prev1 not in (_DAY, _AT):
+                continue
+            # Consecutive worked days
+            if working:
+                new_run = run_length + 1
+                new_run_night = run_has_night or code == _NIGHT
+                if new_run > MAX_CONSECUTIVE_WITH_NIGHT or (new_run > MAX_CONSECUTIVE and not new_run_night):
+                    continue
+            else:
+                new_run, new_run_night = 0, False
+            # Pay period closes with exactly the required count
+            if i + 1 == problem.chunk_end[i] and new_chunk != problem.sppp:
+                continue
+
+            weekend_gain = ((problem.is_friday[i] and code == _NIGHT)
+                            or (problem.is_sat_sun[i] and working))
+            group_gain = ((problem.is_friday[i] and code == _NIGHT)
+                          or (problem.is_sat_sun[i] and code in (_DAY, _NIGHT)))
+
+            # Every weekend group period touched here must still be able to reach its minimum
+            touched = problem.period_of.get(i, ())
+            if any(period_counts[period_index] + group_gain + problem.period_left[(period_index, i)]
+                   < WEEKEND_PERIOD_MINIMUM for period_index in touched):
+                continue
+
+            track[i] = code
+            for period_index in touched:
+                period_counts[period_index] += group_gain
+            reachable = max(reachable, gain + search(
+                i + 1, score + gain, new_chunk, new_week, new_run, new_run_night,
+                nights + (code == _NIGHT), weekend_shifts + weekend_gain))
+            for period_index in touched:
+                period_counts[period_index] -= group_gain
+            track[i] = _OFF
+            if state['stopped']:
+                return problem.bound(i, chunk_count)
+
+        future_bounds[key] = reachable
+        return reachable
+
+    search(0, 0, 0, 0, 0, False, 0, 0)
+
+    for score, _, codes in sorted(best, reverse=True):
+        result['suggestions'].append({
+            'track': dict(zip(days, codes)),
+            'score': score,
+            'nights': codes.count(_NIGHT),
+            'weekend_shifts': sum(
+                1 for i, code in enumerate(codes)
+                if (problem.is_friday[i] and code == _NIGHT) or (problem.is_sat_sun[i] and code in _WORK)
+            ),
+        })
+    result['complete'] = not state['stopped']
+    result['nodes'] = state['nodes']
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    if not result['suggestions']:
+        result['message'] = ("No valid track found within the search limit." if state['stopped'] else
+                             "No valid track exists with the current capacity, preassignments and requirements.")
+    return result
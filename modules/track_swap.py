@@ -110,6 +110,10 @@ def display_track_swap_form():
         st.error("Staff data not available")
         return
     
+    # Optional helper that looks up compatible partners and prefills the form
+    display_swap_partner_finder(staff_names[1:])
+    prefill = st.session_state.get('swap_prefill') or {}
+    
     # Form container
     with st.form("track_swap_form"):
         st.markdown("### Requester Information")
@@ -120,6 +124,7 @@ def display_track_swap_form():
             requester_last_name = st.selectbox(
                 "Your Name *",
                 staff_names,
+                index=staff_names.index(prefill['requester']) if prefill.get('requester') in staff_names else 0,
                 help="Select from dropdown"
             )
             
@@ -138,11 +143,13 @@ def display_track_swap_form():
             other_member_last_name = st.selectbox(
                 "Other Member *",
                 staff_names,
+                index=staff_names.index(prefill['other_member']) if prefill.get('other_member') in staff_names else 0,
                 help="Select from dropdown"
             )
         
         swap_details = st.text_area(
             "Swap Details *",
+            value=prefill.get('details', ""),
             placeholder="Please describe the swap request in detail:\n\n- Which specific shifts/days you want to swap",
             height=150,
             help="Provide as much detail as possible about the requested swap"
@@ -154,6 +161,8 @@ def display_track_swap_form():
         with col7:
             if st.form_submit_button("Cancel", use_container_width=True):
                 st.session_state.show_swap_form = False
+                st.session_state.pop('swap_prefill', None)
+                st.session_state.pop('swap_partner_results', None)
                 st.rerun()
         
         with col8:
@@ -204,6 +213,8 @@ def display_track_swap_form():
                     
                     # Hide the form
                     st.session_state.show_swap_form = False
+                    st.session_state.pop('swap_prefill', None)
+                    st.session_state.pop('swap_partner_results', None)
                     
                     # Show balloons effect for successful submission
                     st.balloons()
@@ -214,6 +225,115 @@ def display_track_swap_form():
                 else:
                     st.error(f"❌ {message}")
 
+def _describe_swap(requester, match):
+    """Swap Details text for a matched partner"""
+    lines = [f"- {requester} gives {match['staff']} the {code} shift on {day}" for day, code in match['takes'].items()]
+    lines += [f"- {match['staff']} gives {requester} the {code} shift on {day}" for day, code in match['gives'].items()]
+    return "\n".join(lines)
+
+def display_swap_partner_finder(staff_names):
+    """
+    Find staff whose track stays valid with a requested swap, and prefill the
+    request form with the chosen partner
+    
+    Args:
+        staff_names (list): Staff names for the requester dropdown
+    """
+    from .swap_matcher import build_swap_index, find_swap_partners
+    
+    with st.expander("🔍 Find a Swap Partner", expanded=bool(st.session_state.get('swap_partner_results'))):
+        st.caption("Pick the days you want to give away or pick up. Partners are listed only if both "
+                   "tracks stay valid and the day/night counts stay within capacity.")
+        
+        days = st.session_state.get('days')
+        if days is None:
+            st.warning("Schedule days not available")
+            return
+        days = list(days)
+        
+        index, error = build_swap_index(
+            days, st.session_state.get('preferences_df'),
+            st.session_state.get('staff_col_prefs'), st.session_state.get('role_col')
+        )
+        if index is None:
+            st.warning(f"Active tracks not available: {error}")
+            return
+        
+        requester = st.selectbox("Your Name", [""] + [name for name in staff_names if name in index.position],
+                                 key="swap_finder_requester")
+        if not requester:
+            return
+        
+        track = index.tracks[requester]
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            give_days = st.multiselect(
+                "Days to give away", [day for day in days if track.get(day) in ("D", "N")],
+                format_func=lambda day: f"{day} ({track[day]})", key="swap_finder_give"
+            )
+        with col2:
+            pick_up_days = st.multiselect(
+                "Days to pick up", [day for day in days if track.get(day) not in ("D", "N", "AT")],
+                key="swap_finder_pick_up"
+            )
+        with col3:
+            pick_up_shift = st.radio("Pick up", ["Any", "D", "N"], horizontal=True, key="swap_finder_shift")
+        
+        if st.button("Find Partners", key="swap_finder_search"):
+            remaining = None
+            try:
+                from .db_utils import get_active_track_config
+                from .capacity_engine import get_remaining_slots
+                active_config = get_active_track_config()
+                slots = get_remaining_slots(
+                    active_config['track_name'] if active_config else 'FY26', None,
+                    st.session_state.get('preferences_df'), st.session_state.get('staff_col_prefs'),
+                    st.session_state.get('role_col')
+                )
+                remaining = slots.remaining
+            except Exception as e:
+                st.warning(f"Capacity not available, matching without it: {str(e)}")
+            
+            st.session_state.swap_partner_results = {
+                'requester': requester,
+                'result': find_swap_partners(
+                    index, requester, give_days, pick_up_days,
+                    None if pick_up_shift == "Any" else pick_up_shift,
+                    st.session_state.get('requirements_df'), st.session_state.get('preassignment_df'),
+                    remaining
+                ),
+            }
+        
+        saved = st.session_state.get('swap_partner_results')
+        if not saved or saved['requester'] != requester:
+            return
+        result = saved['result']
+        
+        if not result['matches']:
+            st.warning(result['message'])
+            for issue in result['requester_issues'][:5]:
+                st.write(f"• {issue}")
+            return
+        
+        st.success(f"{len(result['matches'])} compatible partner(s) found ({result['elapsed_ms']:.0f} ms)")
+        st.dataframe(pd.DataFrame([{
+            'Staff': match['staff'],
+            'Role': match['role'].title(),
+            'Takes': ", ".join(f"{day} {code}" for day, code in match['takes'].items()),
+            'Gives': ", ".join(f"{day} {code}" for day, code in match['gives'].items()),
+        } for match in result['matches']]), hide_index=True, use_container_width=True)
+        
+        partner = st.selectbox("Use partner", [match['staff'] for match in result['matches']],
+                               key="swap_finder_partner")
+        if st.button("Fill In Request Form", key="swap_finder_prefill"):
+            match = next(m for m in result['matches'] if m['staff'] == partner)
+            st.session_state.swap_prefill = {
+                'requester': requester,
+                'other_member': partner,
+                'details': _describe_swap(requester, match),
+            }
+            st.rerun()
+
 def submit_track_swap_request(requester_last_name, requester_email, other_member_last_name, 
                              swap_details):
     """
@@ -5,6 +5,7 @@ Updated to properly handle AT preassignments
 """
 
 import pandas as pd
+from modules.instrumentation import instrumented
 
 def check_rest_requirements(track_data, preassignments=None):
     """
@@ -147,6 +148,7 @@ def count_weekend_shifts(track_data, preassignments=None):
     
     return weekend_count
 
+@instrumented
 def validate_track(track_data, shifts_per_pay_period=0, night_minimum=0, weekend_minimum=5, preassignments=None):
     """
     Validate a track against requirements, including preassignments with AT handling
@@ -1,11 +1,20 @@
 # modules/weekend_group_validator.py
 """
 Module for validating weekend group assignments
+
+Weekend groups are precomputed as 42-bit day masks over the cycle pattern (bit i
+is DAY_KEYS[i], "Sun A 1" = bit 0 ... "Sat C 6" = bit 41), and each schedule's
+day labels are resolved onto that pattern once per distinct day list, so
+validation and highlighting are bit tests instead of string matching. Staff
+weekend groups come from a name index built once per requirements DataFrame.
 """
 
-import streamlit as st
+import weakref
+from functools import lru_cache
 import pandas as pd
 
+from modules.cycle_calendar import DAY_KEYS, DAY_INDEX, PATTERN_LENGTH
+
 # Define weekend group assignments
 WEEKEND_GROUPS = {
     'A': {
@@ -47,6 +56,103 @@ WEEKEND_GROUPS = {
     }
 }
 
+# Staff-name columns tried, in order, when looking up a staff member's weekend group
+STAFF_NAME_COLUMNS = ['STAFF NAME', 'Staff Name', 'staff name', 'Name', 'NAME']
+
+# Weekday position of each pattern day (0 = Sun ... 6 = Sat)
+_FRIDAY, _SATURDAY, _SUNDAY = 5, 6, 0
+
+
+def _day_mask(day_keys):
+    mask = 0
+    for day_key in day_keys:
+        mask |= 1 << DAY_INDEX[day_key]
+    return mask
+
+
+# Pattern indexes of every group day, in period order (Fri, Sat, Sun per period)
+WEEKEND_GROUP_DAY_INDEXES = {
+    group: tuple(DAY_INDEX[day] for period in config['periods'] for day in period)
+    for group, config in WEEKEND_GROUPS.items()
+}
+
+# group -> one day mask per period, and group -> all of its days
+WEEKEND_PERIOD_MASKS = {
+    group: tuple(_day_mask(period) for period in config['periods'])
+    for group, config in WEEKEND_GROUPS.items()
+}
+WEEKEND_GROUP_MASKS = {
+    group: _day_mask(day for period in config['periods'] for day in period)
+    for group, config in WEEKEND_GROUPS.items()
+}
+
+FRIDAY_MASK = _day_mask(day for i, day in enumerate(DAY_KEYS) if i % 7 == _FRIDAY)
+SAT_SUN_MASK = _day_mask(day for i, day in enumerate(DAY_KEYS) if i % 7 in (_SATURDAY, _SUNDAY))
+
+
+def normalize_weekend_group(value):
+    """
+    Normalize a WEEKEND GROUP cell from Requirements.xlsx
+
+    Returns:
+        str or None: 'A'-'E', or None for blank/unknown values
+    """
+    if pd.isna(value):
+        return None
+    group = str(value).strip().upper()
+    return group if group in WEEKEND_GROUPS else None
+
+
+# id(requirements_df) -> (weakref to the DataFrame, shape, index)
+_weekend_group_indexes = {}
+
+
+def _build_weekend_group_index(requirements_df):
+    columns = requirements_df.columns
+    if len(columns) >= 5:
+        groups = [normalize_weekend_group(value) for value in requirements_df.iloc[:, 4]]
+    else:
+        groups = [None] * len(requirements_df)
+
+    index = []
+    for col_name in [columns[0]] + STAFF_NAME_COLUMNS:
+        if col_name not in columns or any(col_name == name for name, _, _ in index):
+            continue
+        exact, lowered = {}, {}
+        for name, group in zip(requirements_df[col_name], groups):
+            if pd.isna(name):
+                continue
+            # First row wins, as with the row scan this replaces
+            exact.setdefault(name, group)
+            if isinstance(name, str):
+                lowered.setdefault(name.lower(), group)
+        index.append((col_name, exact, lowered))
+    return index
+
+
+def get_weekend_group_index(requirements_df):
+    """
+    Staff name -> weekend group index for a requirements DataFrame, built once
+    per loaded Requirements.xlsx and reused for every lookup against it
+
+    Args:
+        requirements_df (DataFrame): Requirements DataFrame
+
+    Returns:
+        list: (column, {name: group}, {lowercase name: group}) per staff-name
+            column, in lookup order
+    """
+    key = id(requirements_df)
+    cached = _weekend_group_indexes.get(key)
+    if cached is not None and cached[0]() is requirements_df and cached[1] == requirements_df.shape:
+        return cached[2]
+
+    index = _build_weekend_group_index(requirements_df)
+    ref = weakref.ref(requirements_df, lambda _, key=key: _weekend_group_indexes.pop(key, None))
+    _weekend_group_indexes[key] = (ref, requirements_df.shape, index)
+    return index
+
+
 def get_staff_weekend_group(staff_name, requirements_df):
     """
     Get the weekend group assignment for a staff member
@@ -62,40 +168,12 @@ def get_staff_weekend_group(staff_name, requirements_df):
         return None
     
     try:
-        # Find staff member in requirements
-        staff_found = False
-        staff_req = None
-        
-        # Try different possible staff column names
-        possible_staff_cols = [
-            requirements_df.columns[0],
-            'STAFF NAME', 'Staff Name', 'staff name', 'Name', 'NAME'
-        ]
-        
-        for col_name in possible_staff_cols:
-            if col_name in requirements_df.columns:
-                staff_req = requirements_df[requirements_df[col_name] == staff_name]
-                if not staff_req.empty:
-                    staff_found = True
-                    break
-                    
-                # Try case-insensitive match
-                staff_req = requirements_df[requirements_df[col_name].str.lower() == staff_name.lower()]
-                if not staff_req.empty:
-                    staff_found = True
-                    break
-        
-        if not staff_found or staff_req.empty:
-            return None
-        
-        # Get weekend group from column 4 (0-indexed)
-        if len(requirements_df.columns) >= 5:  # Column 4 exists
-            weekend_group = staff_req.iloc[0].iloc[4]
-            
-            if pd.notna(weekend_group):
-                weekend_group = str(weekend_group).strip().upper()
-                if weekend_group in WEEKEND_GROUPS:
-                    return weekend_group
+        # Exact match first, then case-insensitive, column by column
+        for _, exact, lowered in get_weekend_group_index(requirements_df):
+            if staff_name in exact:
+                return exact[staff_name]
+            if staff_name.lower() in lowered:
+                return lowered[staff_name.lower()]
         
         return None
         
@@ -116,53 +194,135 @@ def get_weekend_days_for_group(weekend_group):
     if weekend_group not in WEEKEND_GROUPS:
         return []
     
-    all_days = []
-    for period in WEEKEND_GROUPS[weekend_group]['periods']:
-        all_days.extend(period)
-    
-    return all_days
+    return [DAY_KEYS[i] for i in WEEKEND_GROUP_DAY_INDEXES[weekend_group]]
 
-def map_weekend_day_to_schedule_day(weekend_day, days):
+def get_weekend_group_mask(weekend_group):
     """
-    Map a weekend group day (e.g., 'Fri A 1') to actual schedule day
+    Day mask of a weekend group (bit i set for pattern day DAY_KEYS[i])
     
     Args:
-        weekend_day (str): Weekend day in format 'Fri A 1'
-        days (list): List of actual schedule days
+        weekend_group (str): Weekend group (A, B, C, D, E)
         
     Returns:
-        str or None: Matching schedule day or None if not found
+        int: 42-bit day mask, 0 for an unknown group
     """
-    # Parse the weekend day format
+    return WEEKEND_GROUP_MASKS.get(weekend_group, 0)
+
+def _match_schedule_day(weekend_day, days):
+    """String match of a pattern day against schedule days with non-standard labels"""
     parts = weekend_day.split()
     if len(parts) != 3:
         return None
     
     day_name, block, week = parts
     
-    # Find matching day in schedule
     for schedule_day in days:
         schedule_parts = schedule_day.split()
-        if len(schedule_parts) >= 1:
-            schedule_day_name = schedule_parts[0]
-            
-            # Check if day names match (Fri, Sat, Sun)
-            if schedule_day_name == day_name:
-                # Check if it contains the block and week
-                if block in schedule_day and week in schedule_day:
-                    return schedule_day
+        if len(schedule_parts) >= 1 and schedule_parts[0] == day_name:
+            # Check if it contains the block and week
+            if block in schedule_day and week in schedule_day:
+                return schedule_day
     
     return None
 
-def validate_weekend_group_assignment(track_data, weekend_group, days, preassignments=None):
+@lru_cache(maxsize=64)
+def _resolve_schedule_days(days):
     """
-    Validate weekend group assignment for a staff member
+    Map a schedule's day labels onto the 42-day pattern, once per distinct day list
+
+    Returns:
+        tuple: (slots, bits) - slots[i] is the schedule day for DAY_KEYS[i] (or None),
+            bits maps each schedule day to its pattern-day mask
+    """
+    if all(day in DAY_INDEX for day in days):
+        # Standard "Sun A 1" labels resolve directly
+        slots = [None] * PATTERN_LENGTH
+        for day in days:
+            slots[DAY_INDEX[day]] = day
+    else:
+        slots = [_match_schedule_day(day_key, days) for day_key in DAY_KEYS]
+
+    bits = {}
+    for i, day in enumerate(slots):
+        if day is not None:
+            bits[day] = bits.get(day, 0) | (1 << i)
+    return tuple(slots), bits
+
+def get_schedule_day_bits(days):
+    """
+    Pattern-day mask of every schedule day, for testing days against group masks
+    
+    Args:
+        days (list): List of schedule days
+        
+    Returns:
+        dict: Schedule day -> day mask (shared; do not modify)
+    """
+    return _resolve_schedule_days(tuple(days))[1]
+
+def map_weekend_day_to_schedule_day(weekend_day, days):
+    """
+    Map a weekend group day (e.g., 'Fri A 1') to actual schedule day
+    
+    Args:
+        weekend_day (str): Weekend day in format 'Fri A 1'
+        days (list): List of actual schedule days
+        
+    Returns:
+        str or None: Matching schedule day or None if not found
+    """
+    if weekend_day in DAY_INDEX:
+        return _resolve_schedule_days(tuple(days))[0][DAY_INDEX[weekend_day]]
+    return _match_schedule_day(weekend_day, days)
+
+def get_weekend_schedule_days(weekend_group, days):
+    """
+    Schedule days belonging to a weekend group, in period order (used for highlighting)
+    
+    Args:
+        weekend_group (str): Weekend group (A, B, C, D, E)
+        days (list): List of schedule days
+        
+    Returns:
+        list: Schedule days that are part of the group's weekend periods
+    """
+    if weekend_group not in WEEKEND_GROUPS:
+        return []
+    
+    slots = _resolve_schedule_days(tuple(days))[0]
+    return [slots[i] for i in WEEKEND_GROUP_DAY_INDEXES[weekend_group] if slots[i] is not None]
+
+def get_weekend_shift_mask(track_data, days):
+    """
+    Day mask of the weekend shifts worked in a track (N on Friday, D or N on Saturday/Sunday)
     
     Args:
         track_data (dict): Dictionary of day -> assignment
+        days (list): List of schedule days
+        
+    Returns:
+        int: 42-bit day mask
+    """
+    slots = _resolve_schedule_days(tuple(days))[0]
+    mask = 0
+    for i, schedule_day in enumerate(slots):
+        if schedule_day is None:
+            continue
+        bit = 1 << i
+        assignment = track_data.get(schedule_day, "")
+        if (bit & FRIDAY_MASK and assignment == "N") or (bit & SAT_SUN_MASK and assignment in ("D", "N")):
+            mask |= bit
+    return mask
+
+def validate_weekend_periods(combined_track, weekend_group, days):
+    """
+    Validate the weekend periods of a group against a track that already
+    includes preassignments
+    
+    Args:
+        combined_track (dict): Dictionary of day -> assignment
         weekend_group (str): Weekend group (A, B, C, D, E)
         days (list): List of schedule days
-        preassignments (dict, optional): Dictionary of day -> preassignment value
         
     Returns:
         dict: Validation result with status and details
@@ -180,45 +340,31 @@ def validate_weekend_group_assignment(track_data, weekend_group, days, preassign
         result['details'] = f"Invalid weekend group: {weekend_group}"
         return result
     
-    # Get weekend group configuration
-    group_config = WEEKEND_GROUPS[weekend_group]
-    periods = group_config['periods']
-    
-    # Create combined track data with preassignments
-    combined_track = track_data.copy()
-    if preassignments:
-        for day, activity in preassignments.items():
-            if day not in combined_track or not combined_track[day]:
-                # Treat all preassignments (including AT) as day shifts
-                combined_track[day] = "D"
+    periods = WEEKEND_GROUPS[weekend_group]['periods']
+    slots = _resolve_schedule_days(tuple(days))[0]
+    worked_mask = get_weekend_shift_mask(combined_track, days)
     
     # Validate each period
     total_periods = len(periods)
     periods_with_minimum = 0
     
-    for period_idx, period_days in enumerate(periods):
+    for period_idx, (period_days, period_mask) in enumerate(zip(periods, WEEKEND_PERIOD_MASKS[weekend_group])):
         period_num = period_idx + 1
-        period_shifts = 0
+        period_hits = worked_mask & period_mask
+        period_shifts = bin(period_hits).count("1")
         period_details = []
         
-        # Check each day in the period
         for weekend_day in period_days:
-            # Map to actual schedule day
-            schedule_day = map_weekend_day_to_schedule_day(weekend_day, days)
-            
-            if schedule_day:
-                assignment = combined_track.get(schedule_day, "")
-                
-                # Count weekend shifts (N on Friday, D or N on Saturday/Sunday)
-                day_name = weekend_day.split()[0]
-                
-                if day_name == "Fri" and assignment == "N":
-                    period_shifts += 1
-                    period_details.append(f"{schedule_day}: Friday Night")
-                elif day_name in ["Sat", "Sun"] and assignment in ["D", "N"]:
-                    shift_type = "Day" if assignment == "D" else "Night"
-                    period_shifts += 1
-                    period_details.append(f"{schedule_day}: {day_name} {shift_type}")
+            day_index = DAY_INDEX[weekend_day]
+            if not period_hits >> day_index & 1:
+                continue
+            schedule_day = slots[day_index]
+            day_name = weekend_day.split()[0]
+            if day_name == "Fri":
+                period_details.append(f"{schedule_day}: Friday Night")
+            else:
+                shift_type = "Day" if combined_track.get(schedule_day) == "D" else "Night"
+                period_details.append(f"{schedule_day}: {day_name} {shift_type}")
         
         # Check if period meets minimum (2 shifts)
         period_valid = period_shifts >= 2
@@ -247,6 +393,29 @@ def validate_weekend_group_assignment(track_data, weekend_group, days, preassign
     
     return result
 
+def validate_weekend_group_assignment(track_data, weekend_group, days, preassignments=None):
+    """
+    Validate weekend group assignment for a staff member
+    
+    Args:
+        track_data (dict): Dictionary of day -> assignment
+        weekend_group (str): Weekend group (A, B, C, D, E)
+        days (list): List of schedule days
+        preassignments (dict, optional): Dictionary of day -> preassignment value
+        
+    Returns:
+        dict: Validation result with status and details
+    """
+    # Create combined track data with preassignments
+    combined_track = track_data.copy()
+    if preassignments:
+        for day, activity in preassignments.items():
+            if day not in combined_track or not combined_track[day]:
+                # Treat all preassignments (including AT) as day shifts
+                combined_track[day] = "D"
+    
+    return validate_weekend_periods(combined_track, weekend_group, days)
+
 def get_weekend_group_info(weekend_group):
     """
     Get information about a weekend group
@@ -266,7 +435,8 @@ def get_weekend_group_info(weekend_group):
         'type': config['type'],
         'total_periods': len(config['periods']),
         'periods': config['periods'],
-        'all_days': get_weekend_days_for_group(weekend_group)
+        'all_days': get_weekend_days_for_group(weekend_group),
+        'day_mask': WEEKEND_GROUP_MASKS[weekend_group]
     }
 
 def is_weekend_group_day(day, weekend_group, days):
@@ -284,15 +454,32 @@ def is_weekend_group_day(day, weekend_group, days):
     if weekend_group not in WEEKEND_GROUPS:
         return False
     
-    # Get all weekend days for the group
-    weekend_days = get_weekend_days_for_group(weekend_group)
+    return bool(get_schedule_day_bits(days).get(day, 0) & WEEKEND_GROUP_MASKS[weekend_group])
+
+def get_weekend_group_highlighting_info(weekend_group, days):
+    """
+    Get information about which days should be highlighted for weekend group requirements
     
-    # Check if the day matches any weekend group day
-    for weekend_day in weekend_days:
-        if map_weekend_day_to_schedule_day(weekend_day, days) == day:
-            return True
+    Args:
+        weekend_group (str): Weekend group (A, B, C, D, E)
+        days (list): List of schedule days
+        
+    Returns:
+        dict: Information about weekend highlighting
+    """
+    if not weekend_group:
+        return {'highlight_days': [], 'weekend_group': None}
     
-    return False
+    try:
+        return {
+            'highlight_days': get_weekend_schedule_days(weekend_group, days),
+            'highlight_mask': get_weekend_group_mask(weekend_group),
+            'weekend_group': weekend_group,
+            'highlight_color': '#fff3cd',  # Light yellow
+            'highlight_info': f"Weekend Group {weekend_group} required days"
+        }
+    except Exception as e:
+        return {'highlight_days': [], 'weekend_group': weekend_group, 'error': str(e)}
 
 def format_weekend_group_display(weekend_group):
     """
@@ -308,4 +495,4 @@ def format_weekend_group_display(weekend_group):
         return "Unknown"
     
     config = WEEKEND_GROUPS[weekend_group]
-    return f"Group {weekend_group} ({config['type']}, {len(config['periods'])} periods)"
\ No newline at end of file
+    return f"Group {weekend_group} ({config['type']}, {len(config['periods'])} periods)"
@@ -1439,11 +1439,12 @@ class AdminAccess:
                                     ok, msg = unified_db.promote_training_year_to_active(label)
                                     st.session_state[f'confirm_ty_promote_{label}'] = False
                                     if ok:
-                                        # Force the training subsystem to reload against the
-                                        # newly active roster instead of serving stale cached
-                                        # Excel/enrollment objects for the rest of the session.
-                                        for key in ('training_excel_handler', 'training_track_manager',
-                                                    'training_enrollment_manager', 'training_educator_manager',
+                                        # Publish a new shared snapshot against the newly active
+                                        # roster for every session, and rebuild this session's
+                                        # enrollment wrappers around it.
+                                        from training_modules.shared_data import notify_roster_changed
+                                        notify_roster_changed()
+                                        for key in ('training_enrollment_manager', 'training_educator_manager',
                                                     'training_excel_admin_functions'):
                                             st.session_state.pop(key, None)
                                         st.success(msg)
@@ -415,58 +415,61 @@ class ExcelAdminFunctions:
             return pd.DataFrame()
 
     def export_comprehensive_schedule_to_excel(self, schedule_df, start_date, end_date):
-        """Export comprehensive schedule report to Excel format as a Table with class detail comments"""
+        """Export comprehensive schedule report to Excel with an auto-filtered, banded
+        header and class detail comments. Rows are streamed through a constant_memory
+        xlsxwriter workbook with shared formats."""
         try:
             from io import BytesIO
-            import openpyxl
-            from openpyxl.styles import Font, Alignment
-            from openpyxl.worksheet.table import Table, TableStyleInfo
-            from openpyxl.comments import Comment
+            from modules.export_utils import open_streaming_workbook
             
             if schedule_df.empty:
                 return None
             
             # Create a new workbook and worksheet
-            workbook = openpyxl.Workbook()
-            worksheet = workbook.active
-            worksheet.title = 'Education Schedule'
+            output = BytesIO()
+            workbook = open_streaming_workbook(output)
+            worksheet = workbook.add_worksheet('Education Schedule')
             
-            # Write title and date range
-            worksheet.merge_cells('A1:E1')
-            title_cell = worksheet['A1']
-            title_cell.value = f'Comprehensive Education Schedule Report'
-            title_cell.font = Font(bold=True, size=16)
-            title_cell.alignment = Alignment(horizontal='center')
-            
-            worksheet.merge_cells('A2:E2')
-            subtitle_cell = worksheet['A2']
-            subtitle_cell.value = f'Date Range: {start_date} to {end_date}'
-            subtitle_cell.font = Font(italic=True)
-            subtitle_cell.alignment = Alignment(horizontal='center')
+            # Shared formats (blue banded look of the former TableStyleMedium9 table)
+            title_format = workbook.add_format({'bold': True, 'font_size': 16, 'align': 'center'})
+            subtitle_format = workbook.add_format({'italic': True, 'align': 'center'})
+            header_format = workbook.add_format({'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#4F81BD'})
+            stripe_format = workbook.add_format({'bg_color': '#DCE6F1'})
+            bold_format = workbook.add_format({'bold': True})
             
             # Start data at row 4
-            start_row = 4
-            
-            # Write headers
-            for col_num, column_name in enumerate(schedule_df.columns, 1):
-                cell = worksheet.cell(row=start_row, column=col_num, value=column_name)
+            start_row = 3
+            last_row = start_row + len(schedule_df)
+            last_col = len(schedule_df.columns) - 1
             
             # Set column widths
-            worksheet.column_dimensions['A'].width = 25  # Staff Name
-            worksheet.column_dimensions['B'].width = 12  # Role column
+            worksheet.set_column(0, 0, 25)  # Staff Name
+            worksheet.set_column(1, 1, 12)  # Role column
             
             # Date columns
-            date_columns = len(schedule_df.columns) - 2  # Subtract STAFF NAME and ROLE columns
-            if date_columns > 0:
-                for col_num in range(3, 3 + date_columns):  # Start from column C (3rd column)
-                    col_letter = openpyxl.utils.get_column_letter(col_num)
-                    worksheet.column_dimensions[col_letter].width = 15
+            if last_col >= 2:
+                worksheet.set_column(2, last_col, 15)
+            
+            # Write title and date range
+            worksheet.merge_range(0, 0, 0, 4, 'Comprehensive Education Schedule Report', title_format)
+            worksheet.merge_range(1, 0, 1, 4, f'Date Range: {start_date} to {end_date}', subtitle_format)
+            
+            # Write headers; autofilter keeps the sort/filter the Excel Table provided
+            worksheet.write_row(start_row, 0, list(schedule_df.columns), header_format)
+            worksheet.autofilter(start_row, 0, last_row, last_col)
+            
+            columns = list(schedule_df.columns)
             
             # Write data with comments
-            for row_num, (index, row) in enumerate(schedule_df.iterrows(), start_row + 1):
-                for col_num, (column_name, value) in enumerate(row.items(), 1):
+            for row_num, row in enumerate(schedule_df.itertuples(index=False, name=None), start_row + 1):
+                # Set row heights for better readability
+                worksheet.set_row(row_num, 30)
+                row_format = stripe_format if (row_num - start_row) % 2 == 1 else None
+                staff_name = row[0]  # Get staff name from first column
+                
+                for col_num, (column_name, value) in enumerate(zip(columns, row)):
                     cell_value = str(value) if pd.notna(value) and value != '' else ''
-                    cell = worksheet.cell(row=row_num, column=col_num, value=cell_value)
+                    worksheet.write_string(row_num, col_num, cell_value, row_format)
                     
                     # Add comments to date columns that have activities
                     if column_name not in ['STAFF NAME', 'ROLE']:
@@ -475,61 +478,32 @@ class ExcelAdminFunctions:
                             activities = [activity.strip() for activity in cell_value.split(',') if activity.strip()]
                             
                             # Generate comment with class details
-                            staff_name = row.iloc[0]  # Get staff name from first column
                             comment_text = self._generate_class_details_comment(activities, column_name, staff_name)
                             
                             # Add Excel COMMENT (purple triangle) if we have details
                             if comment_text:
                                 try:
                                     # Create traditional Excel comment (purple triangle)
-                                    comment = Comment(comment_text, "Training System")
-                                    comment.width = 400
-                                    comment.height = 120
-                                    comment.author = "Training System"
-                                    cell.comment = comment
-                                    
-                                    print(f"DEBUG: Added comment to {cell.coordinate} for {staff_name}")
+                                    worksheet.write_comment(row_num, col_num, comment_text, {
+                                        'author': 'Training System',
+                                        'width': 400,
+                                        'height': 120
+                                    })
                                 except Exception as comment_error:
-                                    print(f"Error adding comment to cell {cell.coordinate}: {comment_error}")
+                                    print(f"Error adding comment to cell ({row_num}, {col_num}): {comment_error}")
                                     import traceback
                                     traceback.print_exc()
             
-            # Set row heights for better readability
-            for row in range(start_row + 1, start_row + 1 + len(schedule_df)):
-                worksheet.row_dimensions[row].height = 30
-            
-            # Create Excel Table
-            last_row = start_row + len(schedule_df)
-            last_col = len(schedule_df.columns)
-            last_col_letter = openpyxl.utils.get_column_letter(last_col)
-            
-            table_ref = f"A{start_row}:{last_col_letter}{last_row}"
-            table = Table(displayName="ScheduleTable", ref=table_ref)
-            
-            # Apply default blue table style
-            style = TableStyleInfo(
-                name="TableStyleMedium9",  # Default blue table style
-                showFirstColumn=False,
-                showLastColumn=False,
-                showRowStripes=True,
-                showColumnStripes=False
-            )
-            table.tableStyleInfo = style
-            
-            worksheet.add_table(table)
-            
             # Add a legend
-            legend_row = start_row + len(schedule_df) + 2
-            worksheet.cell(row=legend_row, column=1, value='Legend:').font = Font(bold=True)
-            worksheet.cell(row=legend_row + 1, column=1, value='Regular text = Student enrollment')
-            worksheet.cell(row=legend_row + 2, column=1, value='EDU: prefix = Educator signup')
-            worksheet.cell(row=legend_row + 3, column=1, value='Purple triangles = Class time & location details (hover to view)')
-            worksheet.cell(row=legend_row + 4, column=1, value='Sort by Role column to group staff by their roles')
-            
-            # Save to BytesIO buffer
-            output = BytesIO()
-            workbook.save(output)
-            output.seek(0)
+            legend_row = last_row + 2
+            worksheet.write(legend_row, 0, 'Legend:', bold_format)
+            worksheet.write(legend_row + 1, 0, 'Regular text = Student enrollment')
+            worksheet.write(legend_row + 2, 0, 'EDU: prefix = Educator signup')
+            worksheet.write(legend_row + 3, 0, 'Purple triangles = Class time & location details (hover to view)')
+            worksheet.write(legend_row + 4, 0, 'Sort by Role column to group staff by their roles')
+            
+            # Finish writing into the BytesIO buffer
+            workbook.close()
             
             return output.getvalue()
             
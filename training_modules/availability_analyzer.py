@@ -8,7 +8,9 @@ INCLUDES ALL MISSING METHODS
 from datetime import datetime, timedelta
 import sqlite3
 import pandas as pd
+from modules.instrumentation import instrument_class
 
+@instrument_class(include_private=True)
 class AvailabilityAnalyzer:
     def __init__(self, unified_database, excel_handler, enrollment_manager, track_manager=None):
         """
@@ -4,6 +4,7 @@ import openpyxl
 from datetime import datetime, time
 import os
 from training_modules.config import NON_CLASS_COLUMNS
+from modules.instrumentation import instrument_class
 
 # Enhanced default class details
 DEFAULT_CLASS_DETAILS = {
@@ -19,6 +20,7 @@ DEFAULT_CLASS_DETAILS = {
     'is_count_exempt': False,
 }
 
+@instrument_class
 class ExcelHandler:
     def __init__(self, excel_path):
         self.excel_path = excel_path
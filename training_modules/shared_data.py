@@ -0,0 +1,280 @@
+# training_modules/shared_data.py
+"""
+Process-wide shared data plane for the training subsystem.
+
+The roster workbook, the Tracks.xlsx workbook and the decoded track data are
+loaded once per process (behind st.cache_resource) instead of once per browser
+session. Each load is published as an immutable TrainingSnapshot with a version
+number; a new snapshot is only built when something actually changed:
+
+- a workbook file was replaced (path or mtime differs), e.g. a new roster upload
+- the database was committed to by any connection (PRAGMA data_version) and the
+  active-track stamp or active training year differs
+- a writer called notify_tracks_changed() / notify_roster_changed()
+
+Sessions hold a TrainingDataHandle that is pinned to one snapshot per rerun, plus
+lightweight proxies (st.session_state.training_excel_handler, ...) that always
+forward to the handle's current snapshot. Shared objects are treated as
+read-only; anything that needs to change them publishes a new snapshot instead.
+"""
+
+import os
+import threading
+import streamlit as st
+
+from training_modules.excel_handler import ExcelHandler
+from training_modules.track_manager import TrainingTrackManager
+from training_modules.unified_database import get_active_roster_path
+from modules.query_profiler import open_connection
+
+TRACKS_DB_PATH = 'data/medflight_tracks.db'
+TRACKS_EXCEL_PATH = 'upload files/Tracks.xlsx'
+
+
+class TrainingSnapshot:
+    """Immutable bundle of the shared training objects for one data version"""
+
+    __slots__ = ('version', 'roster_path', 'excel_handler', 'tracks_excel_handler', 'track_manager')
+
+    def __init__(self, version, roster_path, excel_handler, tracks_excel_handler, track_manager):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'roster_path', roster_path)
+        object.__setattr__(self, 'excel_handler', excel_handler)
+        object.__setattr__(self, 'tracks_excel_handler', tracks_excel_handler)
+        object.__setattr__(self, 'track_manager', track_manager)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TrainingSnapshot is immutable")
+
+
+def _file_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class TrainingDataPlane:
+    """Owns the shared workbooks/track data and publishes versioned snapshots"""
+
+    def __init__(self, db_path=TRACKS_DB_PATH, tracks_excel_path=TRACKS_EXCEL_PATH):
+        self.db_path = db_path
+        self.tracks_excel_path = tracks_excel_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._data_version = None
+        self._tracks_stamp = None
+        self._roster_key = None
+        self._tracks_excel_key = None
+        self._force_tracks = False
+        self._force_roster = False
+        self._snapshot = None
+        self.version = 0
+
+    def notify_tracks_changed(self):
+        """Mark the shared track data stale; the next snapshot() reloads it"""
+        with self._lock:
+            self._force_tracks = True
+
+    def notify_roster_changed(self):
+        """Mark the active roster stale (e.g. a training year was promoted)"""
+        with self._lock:
+            self._force_roster = True
+
+    def snapshot(self):
+        """
+        Return the current snapshot, publishing a new one first if anything changed
+
+        Returns:
+            TrainingSnapshot: Shared, read-only training objects
+        """
+        with self._lock:
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"Error refreshing shared training data: {str(e)}")
+                if self._snapshot is None:
+                    raise
+            return self._snapshot
+
+    def _db_changed(self):
+        """Cheap per-rerun check: has any connection committed since the last look?"""
+        if not os.path.exists(self.db_path):
+            return False
+        if self._conn is None:
+            self._conn = open_connection(self.db_path, check_same_thread=False)
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return False
+        self._data_version = data_version
+        return True
+
+    def _active_tracks_stamp(self):
+        cursor = self._conn.execute(
+            "SELECT COUNT(*), GROUP_CONCAT(id || ':' || version) FROM tracks WHERE is_active = 1"
+        )
+        return cursor.fetchone()
+
+    def _refresh(self):
+        db_changed = self._db_changed()
+        force_roster, self._force_roster = self._force_roster, False
+        force_tracks, self._force_tracks = self._force_tracks, False
+
+        if self._snapshot is not None and (db_changed or force_roster):
+            roster_path = get_active_roster_path(self.db_path)
+        elif self._snapshot is not None:
+            roster_path = self._snapshot.roster_path
+        else:
+            roster_path = get_active_roster_path(self.db_path)
+
+        roster_key = (roster_path, _file_mtime(roster_path))
+        tracks_excel_key = (self.tracks_excel_path, _file_mtime(self.tracks_excel_path))
+
+        tracks_stamp = self._tracks_stamp
+        if self._conn is not None and (db_changed or self._snapshot is None):
+            tracks_stamp = self._active_tracks_stamp()
+
+        if (self._snapshot is not None and not force_roster and not force_tracks
+                and roster_key == self._roster_key
+                and tracks_excel_key == self._tracks_excel_key
+                and tracks_stamp == self._tracks_stamp):
+            return
+
+        previous = self._snapshot
+        roster_changed = previous is None or force_roster or roster_key != self._roster_key
+        tracks_excel_changed = previous is None or tracks_excel_key != self._tracks_excel_key
+
+        if roster_changed:
+            excel_handler = ExcelHandler(roster_path) if roster_key[1] is not None else None
+        else:
+            excel_handler = previous.excel_handler
+
+        if tracks_excel_changed:
+            tracks_excel_handler = ExcelHandler(self.tracks_excel_path) if tracks_excel_key[1] is not None else None
+        else:
+            tracks_excel_handler = previous.tracks_excel_handler
+
+        track_manager = TrainingTrackManager(self.db_path)
+        if tracks_excel_handler is not None:
+            if tracks_excel_changed or previous.track_manager.tracks_excel_handler is None:
+                track_manager.set_excel_handler(
+                    tracks_excel_handler=tracks_excel_handler,
+                    enrollment_excel_handler=excel_handler
+                )
+            else:
+                # CCEMT schedules only depend on Tracks.xlsx - reuse the parsed patterns
+                track_manager.tracks_excel_handler = tracks_excel_handler
+                track_manager.enrollment_excel_handler = excel_handler or tracks_excel_handler
+                track_manager.ccemt_schedule_cache = previous.track_manager.ccemt_schedule_cache
+                track_manager.ccemt_raw_cache = previous.track_manager.ccemt_raw_cache
+
+        self.version += 1
+        self._roster_key = roster_key
+        self._tracks_excel_key = tracks_excel_key
+        self._tracks_stamp = tracks_stamp
+        self._snapshot = TrainingSnapshot(self.version, roster_path, excel_handler,
+                                          tracks_excel_handler, track_manager)
+        print(f"Published shared training data v{self.version}")
+
+
+@st.cache_resource
+def get_training_data_plane():
+    """Return the process-wide training data plane (one per server process)"""
+    return TrainingDataPlane()
+
+
+class _SharedProxy:
+    """Session-side stand-in that forwards to one object of the pinned snapshot"""
+
+    __slots__ = ('_handle', '_attr')
+
+    def __init__(self, handle, attr):
+        object.__setattr__(self, '_handle', handle)
+        object.__setattr__(self, '_attr', attr)
+
+    def _target(self):
+        return getattr(self._handle.snapshot, self._attr)
+
+    def __getattr__(self, name):
+        target = self._target()
+        if target is None:
+            raise AttributeError(f"{self._attr} is not available")
+        return getattr(target, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Shared {self._attr} is read-only")
+
+    def __bool__(self):
+        return self._target() is not None
+
+
+class _SharedTrackManagerProxy(_SharedProxy):
+    """Track manager proxy; reload_tracks() publishes a new snapshot for everyone"""
+
+    __slots__ = ()
+
+    def reload_tracks(self):
+        self._handle.plane.notify_tracks_changed()
+        self._handle.sync()
+
+
+class TrainingDataHandle:
+    """
+    Lightweight per-session handle onto the shared training data
+
+    Pinned to one snapshot between sync() calls, so a single rerun never sees a
+    mix of old and new data.
+    """
+
+    def __init__(self, plane):
+        self.plane = plane
+        self.snapshot = plane.snapshot()
+        self.excel_handler = _SharedProxy(self, 'excel_handler')
+        self.tracks_excel_handler = _SharedProxy(self, 'tracks_excel_handler')
+        self.track_manager = _SharedTrackManagerProxy(self, 'track_manager')
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    @property
+    def roster_path(self):
+        return self.snapshot.roster_path
+
+    def sync(self):
+        """
+        Re-pin to the latest snapshot
+
+        Returns:
+            bool: True if the data changed since the previous sync
+        """
+        snapshot = self.plane.snapshot()
+        changed = snapshot is not self.snapshot
+        self.snapshot = snapshot
+        return changed
+
+
+def get_session_training_data():
+    """
+    Return this session's handle onto the shared training data, synced for this rerun
+
+    Returns:
+        TrainingDataHandle: Handle whose proxies forward to the shared snapshot
+    """
+    handle = st.session_state.get('training_data_handle')
+    if handle is None:
+        handle = TrainingDataHandle(get_training_data_plane())
+        st.session_state.training_data_handle = handle
+    else:
+        handle.sync()
+    return handle
+
+
+def notify_tracks_changed():
+    """Tell every session that track data changed (picked up on their next rerun)"""
+    get_training_data_plane().notify_tracks_changed()
+
+
+def notify_roster_changed():
+    """Tell every session that the active roster changed (picked up on their next rerun)"""
+    get_training_data_plane().notify_roster_changed()
@@ -1,8 +1,11 @@
 # training_modules/track_manager.py - Updated to include CCEMT schedule integration from Excel
 
 from datetime import datetime, timedelta
-import sqlite3
-import json
+import numpy as np
+
+from modules.cycle_calendar import get_cycle_calendar, DEFAULT_TRACK_NAME, PATTERN_LENGTH
+from modules.track_codes import decode_track_data, get_day_schema
+from modules.query_profiler import open_connection
 
 class TrainingTrackManager:
     """Enhanced Track Manager that includes CCEMT schedule integration from Excel"""
@@ -15,9 +18,10 @@ class TrainingTrackManager:
         self.tracks_excel_handler = None  # For loading CCEMT schedules from Tracks.xlsx
         self.enrollment_excel_handler = None  # For getting staff roles from enrollment sheet
         
-        # Pattern configuration for regular tracks
-        self.pattern_start = datetime(2025, 9, 14)  # Sun A 1 - pattern start date
-        self.pattern_length = 42  # 6 weeks = 42 days
+        # Pattern configuration for regular tracks (shared cycle calendar)
+        self.calendar = get_cycle_calendar(DEFAULT_TRACK_NAME)
+        self.pattern_start = datetime.combine(self.calendar.pattern_anchor, datetime.min.time())  # Sun A 1
+        self.pattern_length = len(self.calendar.day_keys)  # 6 weeks = 42 days
         
         # CCEMT schedule start date (same as pattern start)
         self.ccemt_start_date = datetime(2025, 9, 14)  # First Sunday in CCEMT schedule
@@ -44,34 +48,10 @@ class TrainingTrackManager:
         Returns:
             str: Pattern day name
         """
-        if isinstance(date, str):
-            try:
-                date = datetime.strptime(date, '%m/%d/%Y')
-            except:
-                return ""
-        
-        # Calculate days since pattern start
-        days_since_start = (date - self.pattern_start).days
-        
-        # Get position in current pattern cycle
-        pattern_day_index = days_since_start % self.pattern_length
-        
-        # Calculate week and day
-        week_index = pattern_day_index // 7
-        day_index = pattern_day_index % 7
-        
-        # Define components
-        days_of_week = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
-        week_letters = ["A", "A", "B", "B", "C", "C"]
-        week_numbers = [1, 2, 3, 4, 5, 6]
-        
-        if week_index < 6:
-            day_name = days_of_week[day_index]
-            week_letter = week_letters[week_index]
-            week_number = week_numbers[week_index]
-            return f"{day_name} {week_letter} {week_number}"
-        
-        return f"Day {pattern_day_index + 1}"
+        try:
+            return self.calendar.label_for_date(date)
+        except ValueError:
+            return ""
     
     def set_excel_handler(self, tracks_excel_handler, enrollment_excel_handler=None):
         """
@@ -167,12 +147,12 @@ class TrainingTrackManager:
             return
         
         try:
-            conn = sqlite3.connect(self.tracks_db_path)
+            conn = open_connection(self.tracks_db_path)
             cursor = conn.cursor()
             
             # Get active tracks
             cursor.execute("""
-                SELECT staff_name, track_data 
+                SELECT staff_name, track_name, track_data 
                 FROM tracks 
                 WHERE is_active = 1
             """)
@@ -180,12 +160,12 @@ class TrainingTrackManager:
             results = cursor.fetchall()
             self.tracks_cache = {}
             
-            for staff_name, track_data_json in results:
+            for staff_name, track_name, track_data_json in results:
                 if track_data_json:
                     try:
-                        track_data = json.loads(track_data_json)
+                        track_data = decode_track_data(track_data_json, get_day_schema(cursor, track_name))
                         self.tracks_cache[staff_name] = track_data
-                    except json.JSONDecodeError:
+                    except ValueError:
                         continue
             
             conn.close()
@@ -224,6 +204,93 @@ class TrainingTrackManager:
         
         return None
     
+    def get_staff_roles(self, staff_names):
+        """
+        Roles for many staff members from one pass over the enrollment sheet.
+        Same result as calling get_staff_role for each name.
+
+        Args:
+            staff_names: Iterable of staff names
+
+        Returns:
+            dict: staff_name -> role (or None)
+        """
+        wanted = set(staff_names)
+        roles = {}
+        if self.enrollment_excel_handler:
+            try:
+                enrollment_sheet = self.enrollment_excel_handler.enrollment_sheet
+                if enrollment_sheet:
+                    for row in enrollment_sheet.iter_rows(min_row=2):
+                        if not row[0].value:
+                            continue
+                        name = str(row[0].value).strip()
+                        # The first row for a name wins, as in get_staff_role
+                        if name in wanted and name not in roles:
+                            role_cell = row[1].value if len(row) > 1 else None
+                            roles[name] = str(role_cell).strip() if role_cell else None
+            except Exception as e:
+                print(f"Error getting staff roles from enrollment sheet: {e}")
+                roles = {}
+
+        for name in wanted:
+            if name not in roles:
+                roles[name] = 'CCEMT' if name in self.ccemt_schedule_cache else None
+        return roles
+
+    def project_schedule(self, staff_names, dates, roles=None):
+        """
+        Shift and raw codes for every staff member on every date, in one step.
+
+        Each staff member's 42-day track (or 28-day CCEMT pattern) is laid out
+        as a row of a pattern table once, and the dates are mapped to pattern
+        indexes once; the result is a single gather. Cells match
+        get_staff_shift / get_staff_raw_shift for the same staff and date.
+
+        Args:
+            staff_names: List of staff names (matrix rows)
+            dates: List of datetime/date objects (matrix columns)
+            roles (dict, optional): staff_name -> role from get_staff_roles, to reuse
+
+        Returns:
+            tuple: (shift codes, raw codes) as object ndarrays of shape
+                (len(staff_names), len(dates)); '' where nothing is scheduled
+                (None/empty track values included)
+        """
+        staff_names = list(staff_names)
+        if roles is None:
+            roles = self.get_staff_roles(staff_names)
+        day_numbers = np.array([d.date() if isinstance(d, datetime) else d for d in dates], dtype='datetime64[D]')
+        pattern_index = (day_numbers - np.datetime64(self.calendar.pattern_anchor, 'D')).astype(np.int64) % PATTERN_LENGTH
+        ccemt_index = (day_numbers - np.datetime64(self.ccemt_start_date.date(), 'D')).astype(np.int64) % 28
+
+        shifts = np.full((len(staff_names), len(dates)), "", dtype=object)
+        raw = np.full((len(staff_names), len(dates)), "", dtype=object)
+        if not staff_names or not len(dates):
+            return shifts, raw
+
+        track_rows, track_table = [], []
+        ccemt_rows, ccemt_shift_table, ccemt_raw_table = [], [], []
+        for row, name in enumerate(staff_names):
+            if roles.get(name) == 'CCEMT':
+                if name in self.ccemt_schedule_cache:
+                    ccemt_rows.append(row)
+                    ccemt_shift_table.append([self.ccemt_schedule_cache[name].get(i) or "" for i in range(28)])
+                    ccemt_raw_table.append([self.ccemt_raw_cache.get(name, {}).get(i) or "" for i in range(28)])
+            elif name in self.tracks_cache:
+                track_data = self.tracks_cache.get(name, {})
+                track_rows.append(row)
+                track_table.append([track_data.get(day_key) or "" for day_key in self.calendar.day_keys])
+
+        if track_rows:
+            gathered = np.array(track_table, dtype=object)[:, pattern_index]
+            shifts[track_rows] = gathered
+            raw[track_rows] = gathered
+        if ccemt_rows:
+            shifts[ccemt_rows] = np.array(ccemt_shift_table, dtype=object)[:, ccemt_index]
+            raw[ccemt_rows] = np.array(ccemt_raw_table, dtype=object)[:, ccemt_index]
+        return shifts, raw
+
     def has_track_data(self, staff_name):
         """Check if staff member has track data (regular track OR CCEMT schedule)"""
         # Check regular track data first
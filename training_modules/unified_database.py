@@ -9,7 +9,10 @@ from datetime import datetime
 import os
 import pytz
 from .training_email_notifications import send_training_event_notification
+from modules.instrumentation import instrument_class
+from modules.query_profiler import open_connection
 
+@instrument_class
 class UnifiedDatabase:
     def __init__(self, db_path, excel_handler=None):
         '''
@@ -48,7 +51,7 @@ class UnifiedDatabase:
                 pass
         
         # Create new connection with check_same_thread=False for Streamlit compatibility
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn = open_connection(self.db_path, check_same_thread=False)
         # CRITICAL: Always ensure row factory is set for dictionary access
         self.conn.row_factory = sqlite3.Row
         self.cursor = self.conn.cursor()        
@@ -1199,7 +1202,7 @@ def get_active_roster_path(db_path='data/medflight_tracks.db', upload_folder='tr
     (e.g. the training_years table hasn't been created by initialize_training_tables() yet).
     """
     try:
-        conn = sqlite3.connect(db_path)
+        conn = open_connection(db_path)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         cursor.execute("SELECT roster_filename FROM training_years WHERE is_active = 1 LIMIT 1")